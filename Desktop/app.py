@@ -16,13 +16,41 @@ def create_app(config_class=None):
         config_class = Config
     app.config.from_object(config_class)
 
+    # JSON log records written from a background thread (see app_logging.py)
+    from app_logging import configure_logging
+    configure_logging(app.config)
+
     # Initialize extensions
     db.init_app(app)
     limiter.init_app(app)
 
-    # Create all tables if they don't exist
+    # Create missing tables/indexes only when the stored schema version is behind
     with app.app_context():
-        db.create_all()
+        # SQLite pragmas on every new connection (see db_pool.py)
+        from db_pool import install_engine_hooks
+        install_engine_hooks(db.engine, app.config)
+        from schema_version import ensure_schema
+        ensure_schema(db.engine)
+        # Statement imports left queued/running by a process that died
+        from statement_import import fail_stale_jobs
+        with db.engine.begin() as conn:
+            fail_stale_jobs(conn, app.config.get('IMPORT_STALE_SECONDS', 120))
+        # Every commit that writes user data bumps that user's data version
+        from data_versions import install_data_versioning
+        install_data_versioning(db.engine)
+        # Query count / DB time per request → Server-Timing header and a log
+        # line. Installed first so its hooks wrap every other request hook.
+        from sql_stats import install_sql_instrumentation
+        install_sql_instrumentation(app, db.engine)
+        # Per-endpoint latency histograms etc. at /metrics (METRICS_TOKEN)
+        from metrics import install_metrics
+        install_metrics(app)
+        # Hourly PRAGMA optimize in the background (SQLite only)
+        from sqlite_maintenance import install_sqlite_maintenance
+        install_sqlite_maintenance(app, db.engine)
+        # Incremental local backups every BACKUP_INTERVAL seconds (local mode)
+        from backup_chain import install_backup_schedule
+        install_backup_schedule(app)
 
     # Enable CORS so the desktop web frontend and Flutter can reach the API.
     from flask import request as _request
@@ -42,14 +70,23 @@ def create_app(config_class=None):
             if origin in allowed_list:
                 response.headers['Access-Control-Allow-Origin'] = origin
                 response.headers['Vary'] = 'Origin'
+        response.headers['Access-Control-Expose-Headers'] = 'ETag'
 
         if _request.method == 'OPTIONS':
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, PATCH, OPTIONS'
-            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+            response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, If-None-Match'
             response.headers['Access-Control-Max-Age'] = '86400'
 
         return response
 
+    # ETag / Cache-Control on cacheable JSON GETs (304s are answered in
+    # the blueprint hooks installed by install_response_cache below)
+    from response_cache import apply_etag, install_response_cache, publish_bumped_versions
+    app.after_request(apply_etag)
+
+    # Publish data versions bumped by this request's commits to the shared cache tier
+    app.after_request(publish_bumped_versions)
+
     # Import and register blueprints
     from blueprints.dashboards.routes import dashboards_bp
     from blueprints.debts.routes import debts_bp
@@ -60,10 +97,15 @@ def create_app(config_class=None):
     from blueprints.settings.routes import settings_bp
     from blueprints.admin.routes import admin_bp
     from blueprints.onboarding.routes import onboarding_bp
+    from blueprints.health.routes import health_bp
 
     from auth import check_jwt, check_web_session, auth_bp
     api_bp.before_request(check_jwt)
     app.before_request(check_web_session)
+
+    # Response cache hooks run after the auth hooks above
+    for bp in (api_bp, analytics_bp, budgets_bp):
+        install_response_cache(bp)
     app.register_blueprint(auth_bp)
 
     app.register_blueprint(dashboards_bp)
@@ -75,6 +117,7 @@ def create_app(config_class=None):
     app.register_blueprint(settings_bp)
     app.register_blueprint(admin_bp)
     app.register_blueprint(onboarding_bp)
+    app.register_blueprint(health_bp)
 
     @app.template_filter('currency')
     def currency_filter(value):
@@ -103,6 +146,46 @@ def create_app(config_class=None):
     return app
 
 
+def _config_engine(config_class=None):
+    from sqlalchemy import create_engine
+    from db_pool import install_engine_hooks
+    config_class = config_class or Config
+    engine = create_engine(config_class.SQLALCHEMY_DATABASE_URI, **config_class.SQLALCHEMY_ENGINE_OPTIONS)
+    install_engine_hooks(engine, config_class)
+    return engine
+
+
+def initialize_personal_finance_database(config_class=None):
+    """Bring the configured database up to the current schema before the app starts (desktop launcher)."""
+    from app_logging import configure_logging
+    from schema_version import ensure_schema
+    configure_logging(config_class or Config)
+    engine = _config_engine(config_class)
+    try:
+        ensure_schema(engine)
+        return True
+    except Exception as e:
+        print(f"❌ Database initialization failed: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+
+def test_database_connection(config_class=None):
+    """Return True if the configured database answers a trivial query."""
+    from sqlalchemy import text
+    engine = _config_engine(config_class)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        print(f"❌ Database connection failed: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+
 if __name__ == '__main__':
     print("Starting Personal Finance Dashboard...")
     print("Dashboard will be available at: http://127.0.0.1:5000")
@@ -0,0 +1,126 @@
+"""
+Leveled, structured logging with the I/O off the request thread.
+
+configure_logging() puts one QueueHandler on the root logger. Request
+threads only format the message and enqueue the record; a QueueListener
+thread writes it to stdout. Output is one JSON object per line:
+
+    {"ts": "2026-10-17T09:30:01.123Z", "level": "INFO", "logger": "blueprints.api.routes",
+     "msg": "Owner 'Ana' added for user 3", "method": "POST", "path": "/api/owners"}
+
+Records logged inside a request carry its method, path and endpoint;
+fields passed with extra={...} are added as top-level keys and tracebacks
+go to "exc". LOG_FORMAT = 'text' prints plain lines instead (desktop
+console).
+
+Levels: LOG_LEVEL for everything, overridden per logger by LOG_LEVELS,
+e.g. LOG_LEVELS="blueprints.debts=DEBUG,sql_stats=WARNING". The per-step
+chatter in the blueprints ("Returning 12 categories") is DEBUG, so it is
+off at the default INFO.
+"""
+
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+# LogRecord attributes that are not extra={...} fields
+_RESERVED = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {
+    'message', 'asctime', 'taskName',
+}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc)
+                          .isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _RequestQueueHandler(logging.handlers.QueueHandler):
+    """
+    Runs on the thread that logs: merges the message args, renders any
+    traceback and attaches the request fields, so the listener thread
+    needs no request context and the record holds no live objects.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+
+        from flask import has_request_context, request
+        if has_request_context() and not hasattr(record, 'path'):
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+        return record
+
+
+def _parse_levels(spec):
+    """'a.b=DEBUG, c=warning' → {'a.b': 'DEBUG', 'c': 'WARNING'}; a dict passes through."""
+    if isinstance(spec, dict):
+        return {name: str(level).upper() for name, level in spec.items()}
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _setting(config, key, default=None):
+    """Read from app.config or straight from a Config class."""
+    if isinstance(config, dict):
+        return config.get(key, default)
+    return getattr(config, key, default)
+
+
+def configure_logging(config):
+    """
+    Install the queue handler and listener (once per process) and apply the
+    levels. config is app.config or a Config class.
+    """
+    global _listener
+
+    root = logging.getLogger()
+    root.setLevel(str(_setting(config, 'LOG_LEVEL', 'INFO')).upper())
+    for name, level in _parse_levels(_setting(config, 'LOG_LEVELS')).items():
+        logging.getLogger(name).setLevel(level)
+
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if _setting(config, 'LOG_FORMAT', 'json') == 'json':
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.Queue(-1)
+    root.addHandler(_RequestQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Drain what is still queued when the worker exits
+    atexit.register(_listener.stop)
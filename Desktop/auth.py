@@ -130,7 +130,8 @@ def check_jwt():
 # ---------------------------------------------------------------------------
 
 _SKIP_PATHS = ('/static/', '/api/')
-_SKIP_ENDPOINTS = ('auth.login', 'auth.logout', 'onboarding.onboarding', 'onboarding.onboarding_complete')
+_SKIP_ENDPOINTS = ('auth.login', 'auth.logout', 'onboarding.onboarding', 'onboarding.onboarding_complete',
+                   'metrics.metrics', 'health.healthz', 'health.readyz')
 
 
 def _session_valid():
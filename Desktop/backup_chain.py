@@ -0,0 +1,470 @@
+"""
+Incremental local backups (local mode, data/backups/).
+
+Create Local Backup used to dump every table each time. Backups now form a
+chain: one full backup, then incrementals that each hold only what changed
+since the backup before them:
+
+    backup_20260101_090000.ndjson.gz         full
+    backup_20260101_100000.incr.ndjson.gz    changes since 09:00
+    backup_20260101_110000.incr.ndjson.gz    changes since 10:00
+
+An incremental is an NDJSON backup (backup_io.py) whose header has
+"kind": "incremental" and "base": the file it follows. For each table with
+an updated_at column it holds, as an "upsert" section:
+  - rows whose updated_at or created_at is at or after the previous
+    backup's high-water mark (the newest timestamp that backup saw, capped
+    at the time it started, less BACKUP_OVERLAP_SECONDS) — or,
+    when that backup saw only NULL timestamps, is set at all — or whose id
+    the previous backup did not have (rows written before every INSERT set
+    the timestamps can have both NULL);
+  - tombstones: [first, last] runs of ids the previous backup had and the
+    table has lost to hard deletes.
+The small tables without updated_at (debt_payments and the owner, type,
+subcategory and account lists) are copied whole.
+
+chain.json records the newest backup in the chain. It also stores each
+tracked table's high-water mark and live ids, kept as [first, last] runs so
+a ledger with consecutive ids costs a few bytes. The next incremental diffs
+against it. The state is read before any rows, so a write that races a
+backup is picked up again by the next one.
+
+restore_backup_file() follows the "base" links back to the full backup and
+replays the chain in one transaction. compact_chain() folds the current
+chain into a new full backup through a scratch SQLite database and deletes
+the incrementals it replaced. Restores and imports bring back old ids and
+timestamps, so they reset the chain and the next backup is a full one.
+
+When the database is a SQLite file, local backups are page-level snapshots
+instead (snapshots.py); create_local_backup() picks the kind. The chain is
+what Postgres-backed local installs use, and its files stay restorable.
+
+index.json lists every local backup with its size, time and kind, so the
+settings page does not stat each file. It is rebuilt from the directory
+whenever the directory has changed since it was written (list_backups).
+
+With BACKUP_INTERVAL set, the end of a request schedules a background
+backup (query_pool.submit_background) every BACKUP_INTERVAL seconds. Once the chain reaches
+BACKUP_MAX_CHAIN incrementals it is compacted.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import create_engine, text
+
+from backup_io import (BACKUP_TABLES, BACKUP_SUFFIXES, export_filename, write_export,
+                       read_backup_header, replay_backup_chain, load_backup_chain)
+
+logger = logging.getLogger(__name__)
+
+# Tables diffed by updated_at / id; the rest of BACKUP_TABLES are copied whole
+TRACKED_TABLES = (
+    'transactions', 'budget_templates', 'budget_subcategory_templates', 'monthly_budgets',
+    'unexpected_expenses', 'debt_accounts', 'budget_commitments',
+)
+
+STATE_FILE = 'chain.json'
+MANIFEST_FILE = 'index.json'
+_INCREMENTAL_TAG = '.incr'
+# Gzipped SQLite database files written by snapshots.py
+SNAPSHOT_SUFFIX = '.sqlite.gz'
+LOCAL_BACKUP_SUFFIXES = BACKUP_SUFFIXES + (SNAPSHOT_SUFFIX,)
+# More new-id runs than this and an incremental selects id >= the first one
+_MAX_ID_RANGES = 50
+
+_lock = threading.Lock()      # one backup, compaction or restore at a time
+_manifest_lock = threading.Lock()
+_schedule_lock = threading.Lock()
+_last_run = None              # monotonic time of the last scheduled backup
+_scheduled = False
+
+
+def backups_dir():
+    base = current_app.config.get('BACKUP_DIR') or os.path.join(os.path.dirname(__file__), 'data', 'backups')
+    base = os.path.abspath(base)
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def is_incremental(filename):
+    return _INCREMENTAL_TAG + '.' in filename
+
+
+def backup_kind(filename):
+    """'snapshot', 'incremental' or 'full', from the file name."""
+    if filename.endswith(SNAPSHOT_SUFFIX):
+        return 'snapshot'
+    return 'incremental' if is_incremental(filename) else 'full'
+
+
+# ── index.json ─────────────────────────────────────────────────────────────────
+
+def _scan_directory(directory):
+    entries = []
+    for name in os.listdir(directory):
+        if name in (STATE_FILE, MANIFEST_FILE) or not name.endswith(LOCAL_BACKUP_SUFFIXES):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        entries.append({'filename': name, 'size': stat.st_size,
+                        'created': datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                        'kind': backup_kind(name)})
+    entries.sort(key=lambda e: e['filename'], reverse=True)
+    return entries
+
+
+def _manifest_entries(directory):
+    """
+    The manifest's entries, rebuilt when the directory changed after it was
+    last written. It is rewritten in place (a rename would itself change the
+    directory), and a torn read just rebuilds it.
+    """
+    path = os.path.join(directory, MANIFEST_FILE)
+    try:
+        if os.stat(path).st_mtime_ns > os.stat(directory).st_mtime_ns:
+            with open(path) as f:
+                return json.load(f)['backups']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    with _manifest_lock:
+        entries = _scan_directory(directory)
+        with open(path, 'w') as f:
+            json.dump({'backups': entries}, f, separators=(',', ':'))
+    return entries
+
+
+def list_backups():
+    """Local backups, newest first: {'filename', 'size', 'created', 'kind', 'incremental'}."""
+    backups = []
+    for entry in _manifest_entries(backups_dir()):
+        backups.append(dict(entry, created=datetime.fromisoformat(entry['created']),
+                            incremental=entry['kind'] == 'incremental'))
+    return backups
+
+
+# ── chain.json ─────────────────────────────────────────────────────────────────
+
+def _load_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not state.get('tail') or not os.path.exists(os.path.join(directory, state['tail'])):
+        return None
+    return state
+
+
+def _save_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + '.partial', 'w') as f:
+        json.dump(state, f, separators=(',', ':'))
+    os.replace(path + '.partial', path)
+
+
+def reset_chain():
+    """Forget the chain so the next backup is a full one (after the data was replaced)."""
+    try:
+        os.remove(os.path.join(backups_dir(), STATE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+# ── id runs ────────────────────────────────────────────────────────────────────
+
+def _id_runs(ids):
+    """[first, last] runs of consecutive values in sorted ids."""
+    runs = []
+    for value in ids:
+        if runs and value == runs[-1][1] + 1:
+            runs[-1][1] = value
+        else:
+            runs.append([value, value])
+    return runs
+
+
+def _subtract_runs(a, b):
+    """Runs of the ids in a that are not in b (both sorted, non-overlapping)."""
+    result = []
+    j = 0
+    for first, last in a:
+        while j < len(b) and b[j][1] < first:
+            j += 1
+        k = j
+        while first <= last:
+            if k >= len(b) or b[k][0] > last:
+                result.append([first, last])
+                break
+            if b[k][0] > first:
+                result.append([first, b[k][0] - 1])
+            first = max(first, b[k][1] + 1)
+            k += 1
+    return result
+
+
+def _timestamp(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _scan(conn, started, overlap):
+    """
+    Each tracked table's live id runs and high-water mark: the newest
+    created_at / updated_at, but no later than started, less overlap seconds.
+    Timestamps are taken before commit, so a slow transaction can commit a
+    row stamped earlier than a mark already recorded; the overlap has the
+    next incremental copy such rows again (upserts are idempotent).
+    """
+    ids, high_water = {}, {}
+    for table in TRACKED_TABLES:
+        result = conn.execution_options(stream_results=True, yield_per=10000).execute(
+            text(f"SELECT id FROM {table} ORDER BY id"))
+        ids[table] = _id_runs(row[0] for row in result)
+        newest = conn.execute(text(f"SELECT MAX(updated_at), MAX(created_at) FROM {table}")).one()
+        stamps = [_timestamp(v) for v in newest if v is not None]
+        if stamps:
+            mark = min(max(stamps), started) - timedelta(seconds=overlap)
+            # The format SQLAlchemy stores DateTime in on SQLite, so the
+            # comparison also holds for SQLite's text timestamps
+            high_water[table] = mark.strftime('%Y-%m-%d %H:%M:%S.%f')
+        else:
+            high_water[table] = None
+    return ids, high_water
+
+
+def _incremental_sections(state, ids, high_water):
+    sections = []
+    for table in BACKUP_TABLES:
+        previous_ids = state['ids'].get(table)
+        if table not in TRACKED_TABLES or previous_ids is None:
+            sections.append((table, None, None, {}))
+            continue
+
+        clauses, params = [], {}
+        since = state['high_water'].get(table)
+        if since is not None:
+            clauses += ["updated_at >= :since", "created_at >= :since"]
+            params['since'] = since
+        else:
+            # The previous backup saw no timestamps at all: any row that has
+            # one now was written since
+            clauses += ["updated_at IS NOT NULL", "created_at IS NOT NULL"]
+        added = _subtract_runs(ids[table], previous_ids)
+        if len(added) > _MAX_ID_RANGES:
+            added = [[added[0][0], None]]
+        for i, (first, last) in enumerate(added):
+            if last is None:
+                clauses.append(f"id >= :first{i}")
+            else:
+                clauses.append(f"id BETWEEN :first{i} AND :last{i}")
+                params[f'last{i}'] = last
+            params[f'first{i}'] = first
+
+        sections.append((table, ' OR '.join(clauses) or '1 = 0', params,
+                         {'mode': 'upsert', 'deleted': _subtract_runs(previous_ids, ids[table])}))
+    return sections
+
+
+def _unique_path(directory, filename):
+    stem, dot, rest = filename.partition('.')
+    candidate, n = filename, 1
+    while os.path.exists(os.path.join(directory, candidate)):
+        n += 1
+        candidate = f"{stem}_{n}{dot}{rest}"
+    return os.path.join(directory, candidate)
+
+
+# ── backup / compact / restore ─────────────────────────────────────────────────
+
+def create_local_backup(full=False):
+    """A snapshot when the database is a SQLite file, otherwise the next backup in the chain."""
+    import snapshots
+
+    if snapshots.snapshots_enabled():
+        return snapshots.create_snapshot()
+    return create_backup(full)
+
+
+def restore_local_backup(filename):
+    """Replace everyone's data with the state at a local backup of either kind."""
+    if filename.endswith(SNAPSHOT_SUFFIX):
+        import snapshots
+        return snapshots.restore_snapshot(filename)
+    return restore_backup_file(filename)
+
+
+def create_backup(full=False):
+    """
+    Write the next backup of everyone's data: incremental when a chain
+    exists and full is False, otherwise full. Compacts the chain once it is
+    BACKUP_MAX_CHAIN incrementals long. Returns {'filename', 'kind', 'bytes'}.
+    """
+    from models import db
+
+    config = current_app.config
+    compress = config.get('BACKUP_COMPRESS', True)
+    directory = backups_dir()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    with _lock:
+        state = None if full else _load_state(directory)
+        started = datetime.utcnow()
+        with db.engine.connect() as conn:
+            ids, high_water = _scan(conn, started, config.get('BACKUP_OVERLAP_SECONDS', 300))
+            if state is None:
+                fmt = config.get('BACKUP_FORMAT', 'ndjson')
+                path = _unique_path(directory, export_filename(f'backup_{stamp}', fmt, compress))
+                options = {'header': {'kind': 'full'}} if fmt == 'ndjson' else {}
+                written = write_export(path, None, fmt, compress, conn=conn, **options)
+                length = 0
+            else:
+                path = _unique_path(directory, export_filename(f'backup_{stamp}{_INCREMENTAL_TAG}', 'ndjson', compress))
+                written = write_export(
+                    path, None, 'ndjson', compress, conn=conn,
+                    sections=_incremental_sections(state, ids, high_water),
+                    header={'kind': 'incremental', 'base': state['tail']},
+                )
+                length = state['length'] + 1
+
+        filename = os.path.basename(path)
+        _save_state(directory, {'tail': filename, 'length': length, 'high_water': high_water, 'ids': ids})
+        logger.info("Wrote %s backup %s (%s bytes)", 'incremental' if length else 'full', filename, written)
+
+        if length >= config.get('BACKUP_MAX_CHAIN', 24):
+            _compact(directory)
+    return {'filename': filename, 'kind': 'incremental' if length else 'full', 'bytes': written}
+
+
+def backup_chain(filename, directory=None):
+    """Paths of the full backup filename builds on and every incremental up to it, oldest first."""
+    directory = directory or backups_dir()
+    paths = []
+    while True:
+        path = os.path.join(directory, os.path.basename(filename))
+        if not os.path.exists(path):
+            raise ValueError(f"Backup chain is broken: {filename} is missing.")
+        paths.append(path)
+        header = read_backup_header(path)
+        if header.get('kind') != 'incremental':
+            return paths[::-1]
+        filename = header.get('base') or ''
+
+
+def dependents(filename):
+    """Backups whose header names filename as their base."""
+    directory = backups_dir()
+    found = []
+    for name in os.listdir(directory):
+        if is_incremental(name) and name.endswith(BACKUP_SUFFIXES):
+            if read_backup_header(os.path.join(directory, name)).get('base') == filename:
+                found.append(name)
+    return found
+
+
+def forget(filename):
+    """A backup file is going away: if it ends the chain, the next backup must be full."""
+    state = _load_state(backups_dir())
+    if state and state['tail'] == filename:
+        reset_chain()
+
+
+def _compact(directory):
+    from models import db
+
+    state = _load_state(directory)
+    if state is None or not state['length']:
+        return None
+    paths = backup_chain(state['tail'], directory)
+
+    config = current_app.config
+    fmt = config.get('BACKUP_FORMAT', 'ndjson')
+    compress = config.get('BACKUP_COMPRESS', True)
+    # Named for the point in time it restores to
+    stem = state['tail'].split(_INCREMENTAL_TAG + '.')[0]
+    path = _unique_path(directory, export_filename(stem, fmt, compress))
+
+    scratch = os.path.join(directory, '.compact.db')
+    if os.path.exists(scratch):
+        os.remove(scratch)
+    engine = create_engine(f'sqlite:///{scratch}')
+    try:
+        db.metadata.create_all(engine, tables=[db.metadata.tables[t] for t in BACKUP_TABLES])
+        with engine.begin() as conn:
+            replay_backup_chain(conn, paths)
+        with engine.connect() as conn:
+            header = {'kind': 'full', 'compacted_from': [os.path.basename(p) for p in paths]}
+            write_export(path, None, fmt, compress, conn=conn,
+                         **({'header': header} if fmt == 'ndjson' else {}))
+    finally:
+        engine.dispose()
+        os.remove(scratch)
+
+    filename = os.path.basename(path)
+    _save_state(directory, dict(state, tail=filename, length=0))
+    for old in paths[1:]:
+        os.remove(old)
+    logger.info("Compacted %s backups into %s", len(paths), filename)
+    return filename
+
+
+def compact_chain():
+    """Fold the current chain into one full backup; returns its filename, or None if there was nothing to fold."""
+    with _lock:
+        return _compact(backups_dir())
+
+
+def restore_backup_file(filename):
+    """Replace everyone's data with the state at a local backup, replaying its chain."""
+    with _lock:
+        counts = load_backup_chain(backup_chain(filename))
+        reset_chain()
+    return counts
+
+
+# ── schedule ───────────────────────────────────────────────────────────────────
+
+def _background_backup():
+    global _scheduled
+    try:
+        create_local_backup()
+    finally:
+        with _schedule_lock:
+            _scheduled = False
+
+
+def _schedule_if_due(response):
+    global _last_run, _scheduled
+    from auth import _auth_disabled
+
+    interval = current_app.config.get('BACKUP_INTERVAL', 0)
+    if not interval or not _auth_disabled():
+        return response
+    now = time.monotonic()
+    with _schedule_lock:
+        if _scheduled or (_last_run is not None and now - _last_run < interval):
+            return response
+        previous_run = _last_run
+        _scheduled = True
+        _last_run = now
+
+    from query_pool import submit_background
+    if submit_background(_background_backup) is None:
+        # Dropped by a full queue; let the next request retry
+        with _schedule_lock:
+            _scheduled = False
+            _last_run = previous_run
+    return response
+
+
+def install_backup_schedule(app):
+    """Schedule local backups from after_request when BACKUP_INTERVAL is set."""
+    if app.config.get('BACKUP_INTERVAL', 0):
+        app.after_request(_schedule_if_due)
@@ -0,0 +1,620 @@
+"""
+Streaming JSON backup export and restore.
+
+A backup is one JSON object with an array of rows for each user-data table:
+
+    {"transactions": [{...}, {...}], "budget_templates": [...], ...}
+
+or the same rows as NDJSON: a header line, then for each table a marker line
+followed by one row object per line:
+
+    {"format": "ndjson-backup", "version": 1, "exported_at": "..."}
+    {"__table__": "transactions"}
+    {"id": 1, "date": "2024-01-03", ...}
+
+Either form may be gzip-compressed. Incremental backups (backup_chain.py)
+are NDJSON with "kind": "incremental" and a "base" file in the header. Their
+markers can say {"mode": "upsert", "deleted": [[first, last], ...]}: delete
+those ids, then replace the rows that follow by id.
+
+iter_export() writes a backup chunk by chunk. Each table is read with
+a streaming cursor (stream_results/yield_per), so neither side ever holds
+more than one batch of rows.
+
+load_backup() never holds the whole document either. read_backup()
+detects gzip and NDJSON from the first bytes. It reads the file in 64KB
+chunks and yields one row at a time, decoding each row object with json's
+C decoder (raw_decode). Rows are written in batches of RESTORE_BATCH_SIZE
+with multi-row INSERTs (SQLAlchemy "insertmanyvalues"). Memory therefore
+stays flat whatever the file size.
+
+Everything runs in one database transaction. The user's existing rows are
+deleted first, and a parse or insert error anywhere rolls the whole restore
+back.
+
+In cloud mode (uid given), rows get fresh ids so they never collide with
+other users' rows. The tables that other rows point at (FK_REFS) are
+inserted with RETURNING id. Each old id → new id pair goes into a temporary
+table, restore_id_map. Once every table is loaded, one UPDATE per reference
+rewrites the pointers from that table. Tables can therefore appear in any
+order in the file. In dev mode (uid None) the original ids are kept.
+"""
+
+import io
+import os
+import gzip
+import json
+import zlib
+import logging
+from contextlib import nullcontext
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+from sqlalchemy import Column, Integer, MetaData, String, Table, bindparam, text
+
+logger = logging.getLogger(__name__)
+
+# User-data tables in a backup, in export order
+BACKUP_TABLES = (
+    'transactions', 'budget_templates', 'budget_subcategory_templates',
+    'monthly_budgets', 'unexpected_expenses', 'debt_accounts',
+    'debt_payments', 'budget_commitments',
+    'user_owners', 'custom_types', 'custom_subcategories', 'custom_accounts',
+)
+
+# Children before parents
+DELETE_ORDER = (
+    'debt_payments', 'debt_accounts', 'budget_commitments',
+    'budget_subcategory_templates', 'monthly_budgets', 'unexpected_expenses',
+    'budget_templates', 'transactions',
+    'custom_types', 'custom_subcategories', 'custom_accounts', 'user_owners',
+)
+
+# Logical FK columns within user data (not enforced by DB constraints):
+# (child_table, child_fk_col) → parent_table
+FK_REFS = {
+    ('debt_payments', 'debt_account_id'): 'debt_accounts',
+    ('transactions', 'debt_payment_id'): 'debt_payments',
+}
+
+# Export formats → file extension (before any .gz)
+EXPORT_FORMATS = {'json': '.json', 'ndjson': '.ndjson'}
+NDJSON_FORMAT = 'ndjson-backup'
+_TABLE_MARKER = '__table__'
+
+# Backup file names the importer and the local backup list accept
+BACKUP_SUFFIXES = ('.json', '.json.gz', '.ndjson', '.ndjson.gz')
+
+_CHUNK_BYTES = 64 * 1024
+_WHITESPACE = ' \t\r\n'
+
+_id_map = Table(
+    'restore_id_map', MetaData(),
+    Column('tbl', String(40), primary_key=True),
+    Column('old_id', Integer, primary_key=True),
+    Column('new_id', Integer, nullable=False),
+    prefixes=['TEMPORARY'],
+)
+
+
+# ── Export ─────────────────────────────────────────────────────────────────────
+
+def _json_default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+_encode = json.JSONEncoder(default=_json_default, separators=(',', ':'), ensure_ascii=False).encode
+
+
+def _iter_table_rows(conn, table, uid, batch_size, where=None, params=None):
+    """One table's rows (those matching where, if given) as dicts, fetched batch_size at a time by a streaming cursor."""
+    clauses = (["user_id = :uid"] if uid is not None else []) + ([f"({where})"] if where else [])
+    params = dict(params or {})
+    if uid is not None:
+        params['uid'] = uid
+    result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+        text(f"SELECT * FROM {table}{' WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY id"),
+        params,
+    )
+    keys = tuple(result.keys())
+    for partition in result.partitions():
+        for row in partition:
+            yield dict(zip(keys, row))
+
+
+def _json_pieces(conn, uid, batch_size):
+    yield '{'
+    for i, table in enumerate(BACKUP_TABLES):
+        yield f'{"," if i else ""}"{table}":['
+        separator = ''
+        for row in _iter_table_rows(conn, table, uid, batch_size):
+            yield separator + _encode(row)
+            separator = ','
+        yield ']'
+    yield '}\n'
+
+
+def _ndjson_pieces(conn, uid, batch_size, sections, header):
+    from schema_version import SCHEMA_VERSION
+
+    yield _encode({'format': NDJSON_FORMAT, 'version': 1, 'kind': 'full', 'schema_version': SCHEMA_VERSION,
+                   'exported_at': datetime.utcnow().isoformat(),
+                   'tables': [section[0] for section in sections], **header}) + '\n'
+    for table, where, params, options in sections:
+        yield _encode({_TABLE_MARKER: table, **options}) + '\n'
+        for row in _iter_table_rows(conn, table, uid, batch_size, where, params):
+            yield _encode(row) + '\n'
+
+
+def export_filename(prefix, fmt='json', compress=False):
+    return f"{prefix}{EXPORT_FORMATS[fmt]}{'.gz' if compress else ''}"
+
+
+def export_mimetype(fmt='json', compress=False):
+    if compress:
+        return 'application/gzip'
+    return 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+
+
+def iter_export(uid, fmt='json', compress=False, sections=None, header=None, conn=None):
+    """
+    Yield a backup of uid's data (everyone's in dev mode, uid None) as bytes
+    chunks of about 64KB: compact JSON or NDJSON (fmt), gzipped if compress.
+
+    NDJSON only: sections narrows the export to [(table, where, params,
+    marker options)] (default: every table, whole) and header adds keys to
+    the header line. Reads through conn if given, else holds one pooled
+    connection until the generator is exhausted or closed.
+    """
+    from models import db
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    if (sections or header) and fmt != 'ndjson':
+        raise ValueError("Only NDJSON backups carry table options and header fields.")
+    sections = sections or [(table, None, None, {}) for table in BACKUP_TABLES]
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # 31: gzip container
+
+    with (nullcontext(conn) if conn is not None else db.engine.connect()) as conn:
+        if fmt == 'ndjson':
+            pieces = _ndjson_pieces(conn, uid, batch_size, sections, header or {})
+        else:
+            pieces = _json_pieces(conn, uid, batch_size)
+        buffered, size = [], 0
+        for piece in pieces:
+            buffered.append(piece)
+            size += len(piece)
+            if size < _CHUNK_BYTES:
+                continue
+            chunk = ''.join(buffered).encode('utf-8')
+            buffered, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = ''.join(buffered).encode('utf-8')
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def write_export(path, uid=None, fmt='json', compress=False, **options):
+    """Write iter_export() to path (atomically, via a temp file); returns the bytes written."""
+    written = 0
+    partial = path + '.partial'
+    try:
+        with open(partial, 'wb') as f:
+            for chunk in iter_export(uid, fmt, compress, **options):
+                f.write(chunk)
+                written += len(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return written
+
+
+# ── Streaming parser ──────────────────────────────────────────────────────────
+
+class _JsonStream:
+    """Just enough of a pull parser for {"name": [{...}, ...], ...}."""
+
+    def __init__(self, reader, buf='', chunk_size=_CHUNK_BYTES, max_value_bytes=16 * 1024 * 1024):
+        self.reader = reader
+        self.chunk_size = chunk_size
+        self.max_value_bytes = max_value_bytes
+        self.decoder = json.JSONDecoder()
+        self.buf = buf
+        self.pos = 0
+
+    def _fill(self):
+        chunk = self.reader.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of input)."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char, what):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Invalid backup format: expected {what}, found {found or 'end of file'!r}.")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Most likely cut at the chunk boundary: read on and retry
+                if len(self.buf) - self.pos > self.max_value_bytes or not self._fill():
+                    raise ValueError(f"Invalid JSON in backup: {e.msg}") from None
+                continue
+            self.pos = end
+            return value
+
+    def rows(self):
+        """The elements of an array whose '[' was just consumed."""
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError("Invalid backup format: expected ',' or ']' between rows.")
+
+
+def _open_text(fh):
+    """A text reader over the binary file fh, gunzipping it if it starts with the gzip magic."""
+    if isinstance(fh, io.TextIOBase):
+        return fh
+    if hasattr(fh, 'peek'):
+        magic = fh.peek(2)[:2]
+    elif fh.seekable():
+        start = fh.tell()
+        magic = fh.read(2)
+        fh.seek(start)
+    else:
+        fh = io.BufferedReader(fh)
+        magic = fh.peek(2)[:2]
+    if magic == b'\x1f\x8b':
+        fh = gzip.GzipFile(fileobj=fh, mode='rb')
+    return io.TextIOWrapper(fh, encoding='utf-8-sig')
+
+
+def _ndjson_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in backup: {e.msg}") from None
+
+
+def _iter_ndjson_tables(reader):
+    items = (_ndjson_line(line) for line in reader if not line.isspace())
+    item = next(items, None)
+    while item is not None:
+        if not (isinstance(item, dict) and _TABLE_MARKER in item):
+            raise ValueError("Invalid backup format: expected a table marker line.")
+        following = []
+
+        def rows():
+            for row in items:
+                if isinstance(row, dict) and _TABLE_MARKER in row:
+                    following.append(row)
+                    return
+                yield row
+
+        table_rows = rows()
+        options = {k: v for k, v in item.items() if k != _TABLE_MARKER}
+        yield item[_TABLE_MARKER], options, table_rows
+        for _ in table_rows:
+            pass
+        item = following[0] if following else None
+
+
+def _iter_json_tables(stream):
+    stream.expect('{', 'a JSON object at the top level')
+    if stream.peek() == '}':
+        return
+    while True:
+        if stream.peek() != '"':
+            raise ValueError("Invalid backup format: expected a table name.")
+        name = stream.value()
+        stream.expect(':', "':' after the table name")
+        stream.expect('[', f"an array of rows for table '{name}'")
+        rows = stream.rows()
+        yield name, {}, rows
+        for _ in rows:
+            pass
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError("Invalid backup format: expected ',' or '}' between tables.")
+
+
+def read_backup(fh):
+    """
+    Open a JSON or NDJSON backup, gzipped or not. Returns (header, sections):
+    header is the NDJSON header line ({} for a JSON document); sections
+    yields (table_name, options, rows) where options is the rest of the
+    table's NDJSON marker line ({} for JSON) and rows an iterator of row
+    dicts. Each rows iterator must be consumed (or is skipped) before the
+    next section is read.
+    """
+    reader = _open_text(fh)
+    # An NDJSON backup starts with its header line; anything else is the
+    # start of a JSON document and goes back into the parser's buffer
+    first = reader.readline(_CHUNK_BYTES)
+    if first.lstrip().startswith('{"format"'):
+        try:
+            header = json.loads(first)
+        except json.JSONDecodeError:
+            header = None
+        if isinstance(header, dict) and header.get('format') == NDJSON_FORMAT:
+            if header.get('version', 1) > 1:
+                raise ValueError(f"Backup format version {header['version']} is newer than this app supports.")
+            return header, _iter_ndjson_tables(reader)
+    return {}, _iter_json_tables(_JsonStream(reader, first))
+
+
+def read_backup_header(path):
+    """The header of the backup file at path ({} for a JSON document)."""
+    with open(path, 'rb') as f:
+        return read_backup(f)[0]
+
+
+# ── Restore ────────────────────────────────────────────────────────────────────
+
+def _converter(table):
+    """Per-table coercion of JSON values (ISO strings, decimal strings) to column types."""
+    kinds = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+        if python_type in (date, datetime, bool, Decimal):
+            kinds[column.name] = python_type
+
+    def convert(row):
+        for name, kind in kinds.items():
+            value = row.get(name)
+            if value is None or isinstance(value, kind):
+                continue
+            try:
+                if kind is datetime:
+                    row[name] = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+                elif kind is date:
+                    row[name] = date.fromisoformat(str(value)[:10])
+                elif kind is bool:
+                    row[name] = value.lower() in ('1', 'true', 't') if isinstance(value, str) else bool(value)
+                else:
+                    row[name] = Decimal(str(value))
+            except (ValueError, InvalidOperation):
+                raise ValueError(f"Bad value {value!r} for {table.name}.{name}") from None
+        return row
+    return convert
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _restore_table(conn, table, rows, uid, batch_size, upsert=False):
+    """
+    Insert one table's rows in batches; returns the row count. With upsert
+    (incremental backups, original ids) each batch first deletes the rows
+    it replaces.
+    """
+    remap = uid is not None
+    returning = remap and table.name in FK_REFS.values()
+    convert = _converter(table)
+    columns = None
+    count = 0
+
+    for batch in _batches(rows, batch_size):
+        if columns is None:
+            if not isinstance(batch[0], dict):
+                raise ValueError(f"Rows of table '{table.name}' must be objects.")
+            columns = [c for c in batch[0] if not (remap and c == 'id')]
+            unknown = set(columns) - set(table.columns.keys())
+            if unknown:
+                raise ValueError(f"Unknown columns in table '{table.name}': {sorted(unknown)}")
+
+        params, old_ids = [], []
+        for row in batch:
+            if not isinstance(row, dict):
+                raise ValueError(f"Rows of table '{table.name}' must be objects.")
+            values = {c: row.get(c) for c in columns}
+            # Cloud mode: every row belongs to the restoring user
+            if remap and 'user_id' in values:
+                values['user_id'] = uid
+            params.append(convert(values))
+            old_ids.append(row.get('id'))
+
+        if returning:
+            new_ids = conn.execute(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True), params
+            ).scalars().all()
+            pairs = [{'tbl': table.name, 'old_id': old, 'new_id': new}
+                     for old, new in zip(old_ids, new_ids) if old is not None]
+            if pairs:
+                conn.execute(_id_map.insert(), pairs)
+        else:
+            if upsert:
+                conn.execute(table.delete().where(table.c.id.in_([p['id'] for p in params])))
+            conn.execute(table.insert(), params)
+        count += len(params)
+    return count
+
+
+def _remap_references(conn, uid):
+    """Point the restored rows' FK columns at their parents' new ids, one UPDATE per reference."""
+    for (child, column), parent in FK_REFS.items():
+        conn.execute(text(f"""
+            UPDATE {child}
+            SET {column} = (SELECT m.new_id FROM restore_id_map m
+                            WHERE m.tbl = :parent AND m.old_id = {child}.{column})
+            WHERE user_id = :uid
+              AND {column} IN (SELECT old_id FROM restore_id_map WHERE tbl = :parent)
+        """), {'parent': parent, 'uid': uid})
+
+
+def _delete_id_runs(conn, table, runs):
+    """Delete the ids in [first, last] runs: an incremental backup's tombstones."""
+    if runs:
+        conn.execute(table.delete().where(table.c.id.between(bindparam('first'), bindparam('last'))),
+                     [{'first': first, 'last': last} for first, last in runs])
+
+
+def _load_sections(conn, sections, uid, batch_size, incremental=False):
+    """
+    Write a backup's table sections; returns {table: rows written}. For an
+    incremental backup, "upsert" tables get their tombstones deleted and
+    their rows replaced by id, and every other table is replaced whole.
+    """
+    from models import db
+
+    counts = {}
+    for name, options, rows in sections:
+        if name not in BACKUP_TABLES:
+            raise ValueError(f"Unrecognised table in backup: {name!r}")
+        if name in counts:
+            raise ValueError(f"Table {name!r} appears twice in the backup.")
+        table = db.metadata.tables[name]
+        upsert = incremental and options.get('mode') == 'upsert'
+        if upsert:
+            _delete_id_runs(conn, table, options.get('deleted'))
+        elif incremental:
+            conn.execute(table.delete())
+        counts[name] = _restore_table(conn, table, rows, uid, batch_size, upsert=upsert)
+    return counts
+
+
+def _finish_restore(conn, uid):
+    from rollups import rebuild_rollups
+
+    if uid is None and conn.dialect.name == 'postgresql':
+        # Explicit ids don't advance sequences; reset them so future
+        # inserts get fresh ids
+        for table in BACKUP_TABLES:
+            seq = conn.execute(text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+            if seq:
+                conn.execute(text(
+                    f"SELECT setval('{seq}', "
+                    f"GREATEST(COALESCE((SELECT MAX(id) FROM {table}), 1), 1))"
+                ))
+
+    # The restored transactions replace everything the rollup knew about
+    rebuild_rollups(conn, uid)
+
+
+def load_backup(fh, uid):
+    """
+    Replace a user's data (everyone's in dev mode, uid None) with a full
+    backup read from the file object fh. Raises ValueError on a malformed
+    backup; any error leaves the database unchanged. Returns {table: row count}.
+    """
+    from models import db
+
+    batch_size = current_app.config.get('RESTORE_BATCH_SIZE', 5000)
+    uid_where = "WHERE user_id = :uid" if uid is not None else ""
+    uid_p = {"uid": uid} if uid is not None else {}
+
+    header, sections = read_backup(fh)
+    if header.get('kind') == 'incremental':
+        raise ValueError("This is an incremental backup. Restore it from the local backup list, "
+                         "which replays the backups it builds on.")
+
+    with db.engine.begin() as conn:
+        for table in DELETE_ORDER:
+            conn.execute(text(f"DELETE FROM {table} {uid_where}"), uid_p)
+        if uid is not None:
+            _id_map.drop(conn, checkfirst=True)
+            _id_map.create(conn)
+
+        counts = _load_sections(conn, sections, uid, batch_size)
+
+        if uid is not None:
+            _remap_references(conn, uid)
+            _id_map.drop(conn)
+        _finish_restore(conn, uid)
+
+    logger.info("Restored %s rows from backup", sum(counts.values()),
+                extra={'tables': counts, 'user_id': uid})
+    return counts
+
+
+def replay_backup_chain(conn, paths, batch_size=None):
+    """
+    Write a full backup and the incrementals built on it (paths, oldest
+    first) through conn, keeping ids; the tables should start out empty.
+    Each incremental must name the file before it as its base.
+    Returns {table: rows written}.
+    """
+    batch_size = batch_size or current_app.config.get('RESTORE_BATCH_SIZE', 5000)
+    counts = {}
+    previous = None
+    for path in paths:
+        with open(path, 'rb') as f:
+            header, sections = read_backup(f)
+            incremental = header.get('kind') == 'incremental'
+            if previous is None and incremental:
+                raise ValueError(f"{os.path.basename(path)} is incremental; a chain starts with a full backup.")
+            if previous is not None and (not incremental or header.get('base') != previous):
+                raise ValueError(f"{os.path.basename(path)} does not follow {previous}.")
+            for table, written in _load_sections(conn, sections, None, batch_size, incremental).items():
+                counts[table] = counts.get(table, 0) + written
+        previous = os.path.basename(path)
+    return counts
+
+
+def load_backup_chain(paths):
+    """
+    Replace everyone's data (dev mode) with the state a backup chain ends
+    at; see replay_backup_chain(). Any error leaves the database unchanged.
+    """
+    from models import db
+
+    with db.engine.begin() as conn:
+        for table in DELETE_ORDER:
+            conn.execute(text(f"DELETE FROM {table}"))
+        counts = replay_backup_chain(conn, paths)
+        _finish_restore(conn, None)
+
+    logger.info("Restored %s rows from a chain of %s backups", sum(counts.values()), len(paths),
+                extra={'tables': counts})
+    return counts
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark and round-trip check: incremental local backups (backup_chain.py).
+
+Seeds a fresh SQLite database with --rows transactions whose created_at and
+updated_at are NULL, as rows written by raw INSERTs before those set the
+timestamps are. Then writes a full backup followed by --rounds incrementals,
+each after a round of app-style changes:
+
+  - updates to --changes random rows (description, amount, date), stamping
+    updated_at as the app's update routes do. Round 1 touches rows whose
+    previous backup saw no timestamps at all (high-water mark NULL);
+  - hard deletes of --changes // 4 rows, which become tombstones;
+  - --changes // 2 new rows with timestamps, and one without.
+
+Reported per backup: kind, seconds and file size. Then every backup is
+restored, newest first (restore_backup_file replays its chain), and the
+database is compared with the state it was taken from. The compacted chain
+is checked the same way. Any difference is printed and the exit status is 1.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_backup_chain.py
+    python benchmarks/bench_backup_chain.py --rows 200000 --rounds 5 --changes 2000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+_CATEGORIES = ['Groceries', 'Rent', 'Transport', 'Dining', 'Utilities', 'Salary', 'Shopping']
+
+_INSERT = """
+    INSERT INTO transactions (account_name, date, description, amount, category, type, owner,
+                              is_business, is_active, created_at, updated_at)
+    VALUES ('Checking', :date, :description, :amount, :category, 'Needs', 'Bench', false, true,
+            :now, :now)
+"""
+
+
+def _row(rng, n, now):
+    return {'date': date.today() - timedelta(days=rng.randint(0, 1800)),
+            'description': f'Synthetic transaction {n}', 'amount': round(rng.uniform(1, 250), 2),
+            'category': rng.choice(_CATEGORIES), 'now': now}
+
+
+def _seed(engine, rows):
+    from sqlalchemy import text
+
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            conn.execute(text(_INSERT), [_row(rng, start + i, None)
+                                         for i in range(min(5000, rows - start))])
+
+
+def _change(engine, rng, changes):
+    """One round of updates, hard deletes and inserts, the way the app writes them."""
+    from sqlalchemy import text
+
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        ids = [r[0] for r in conn.execute(text("SELECT id FROM transactions"))]
+        picked = rng.sample(ids, min(len(ids), changes + changes // 4))
+        updated, deleted = picked[:changes], picked[changes:]
+        conn.execute(text("""
+            UPDATE transactions SET description = :description, amount = :amount, date = :date,
+                                    updated_at = :now
+            WHERE id = :id
+        """), [{'id': i, 'description': f'Edited {i}', 'amount': round(rng.uniform(1, 250), 2),
+                'date': date.today() - timedelta(days=rng.randint(0, 1800)), 'now': now}
+               for i in updated])
+        if deleted:
+            conn.execute(text("DELETE FROM transactions WHERE id = :id"), [{'id': i} for i in deleted])
+        conn.execute(text(_INSERT), [_row(rng, i, now) for i in range(changes // 2)] + [_row(rng, -1, None)])
+
+
+def _state(engine):
+    """Every backed-up row, normalized so values read back from a restore compare equal."""
+    from sqlalchemy import text
+    from backup_io import BACKUP_TABLES
+
+    def norm(value):
+        if value is None:
+            return None
+        if isinstance(value, float):
+            return round(value, 2)
+        return str(value).replace('T', ' ')
+
+    with engine.connect() as conn:
+        return {table: [tuple(norm(v) for v in row)
+                        for row in conn.execute(text(f"SELECT * FROM {table} ORDER BY id"))]
+                for table in BACKUP_TABLES}
+
+
+def _differences(expected, actual):
+    """{table: (expected rows, actual rows, rows that differ)} for tables that do not match."""
+    return {table: (len(rows), len(actual[table]),
+                    sum(1 for a, b in zip(rows, actual[table]) if a != b))
+            for table, rows in expected.items() if rows != actual[table]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and check incremental local backups')
+    parser.add_argument('--rows', type=int, default=50_000, help='transactions seeded without timestamps')
+    parser.add_argument('--rounds', type=int, default=3, help='incremental backups after the full one')
+    parser.add_argument('--changes', type=int, default=500, help='rows updated per round')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_backup_chain_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['BACKUP_DIR'] = os.path.join(tmp, 'backups')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import warnings
+    warnings.simplefilter('ignore')
+    from app import create_app
+    from models import db
+    import backup_chain
+
+    app = create_app()
+    rng = random.Random(1)
+    taken = []
+    with app.test_request_context():
+        engine = db.engine
+        _seed(engine, args.rows)
+        print(f"Seeded {args.rows:,} transactions with NULL timestamps")
+
+        for round_no in range(args.rounds + 1):
+            if round_no:
+                _change(engine, rng, args.changes)
+            started = time.perf_counter()
+            backup = backup_chain.create_backup(full=round_no == 0)
+            seconds = time.perf_counter() - started
+            taken.append((backup['filename'], _state(engine)))
+            print(f"{backup['kind']:<12} {backup['bytes'] / 1024:9.1f} KB in {seconds:5.2f}s  "
+                  f"{backup['filename']}")
+
+        failures = 0
+        for filename, expected in reversed(taken):
+            started = time.perf_counter()
+            backup_chain.restore_backup_file(filename)
+            seconds = time.perf_counter() - started
+            diff = _differences(expected, _state(engine))
+            failures += bool(diff)
+            print(f"Restore {filename:<44} {seconds:5.2f}s  {diff or 'identical'}")
+
+        # Restores reset the chain; build a fresh one and check its compaction
+        backup_chain.create_backup(full=True)
+        _change(engine, rng, args.changes)
+        backup_chain.create_backup()
+        expected = _state(engine)
+        started = time.perf_counter()
+        compacted = backup_chain.compact_chain()
+        seconds = time.perf_counter() - started
+        backup_chain.restore_backup_file(compacted)
+        diff = _differences(expected, _state(engine))
+        failures += bool(diff)
+        print(f"Compact + restore {compacted:<34} {seconds:5.2f}s  {diff or 'identical'}")
+
+    print(f"Backups in {os.environ['BACKUP_DIR']}")
+    if failures:
+        print(f"{failures} restore(s) did not match the backed-up state")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
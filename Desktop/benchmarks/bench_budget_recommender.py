@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batch budget recommender vs the previous per-subcategory path.
+
+The previous implementation (kept below as legacy_recommendations) ran four
+queries per subcategory — 600+ round trips for 150 subcategories. The batch
+engine in budget_recommender.py runs three queries in total.
+
+Seeds a throw-away SQLite database, checks that both paths return the same
+recommendations, and times them. --latency-ms adds a sleep per statement to
+approximate a remote database such as Neon.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_budget_recommender.py
+    python benchmarks/bench_budget_recommender.py --subcategories 150 --months 36 --latency-ms 20
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+_TMP = tempfile.mkdtemp(prefix='bench_recommender_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_TMP, 'bench.db')}"
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import text, event
+import numpy as np
+
+from budget_recommender import (
+    calculate_subcategory_recommendations, _get_engine, _build_owner_clause, _confidence,
+)
+
+
+# ── legacy reference implementation ───────────────────────────────────────────
+
+def legacy_recommendations(owner=None):
+    """The previous per-subcategory implementation: four queries per group."""
+    engine = _get_engine()
+
+    today = datetime.now()
+    six_months_ago = today - relativedelta(months=6)
+    three_months_ago = today - relativedelta(months=3)
+    one_month_ago = today - relativedelta(months=1)
+
+    with engine.connect() as conn:
+        # Get category budget_by_category settings
+        result = conn.execute(text("""
+            SELECT DISTINCT category, budget_by_category
+            FROM budget_subcategory_templates
+            WHERE is_active = true
+            ORDER BY category
+        """))
+        category_settings = {}
+        for cat, budget_by_cat in result:
+            if cat not in category_settings:
+                category_settings[cat] = budget_by_cat
+
+        # Get all unique category/subcategory combos from the monthly rollup
+        if owner:
+            result = conn.execute(text("""
+                SELECT DISTINCT category, sub_category
+                FROM transaction_monthly_rollups
+                WHERE sub_category != ''
+                AND type IN ('Needs', 'Wants', 'Business')
+                AND owner = :owner
+                ORDER BY category, sub_category
+            """), {"owner": owner})
+        else:
+            result = conn.execute(text("""
+                SELECT DISTINCT category, sub_category
+                FROM transaction_monthly_rollups
+                WHERE sub_category != ''
+                AND type IN ('Needs', 'Wants', 'Business')
+                ORDER BY category, sub_category
+            """))
+        subcategories = result.fetchall()
+
+    # Group subcategories by category
+    categories_grouped = {}
+    for category, sub_category in subcategories:
+        if category not in categories_grouped:
+            categories_grouped[category] = []
+        categories_grouped[category].append(sub_category)
+
+    recommendations = []
+    with engine.connect() as conn:
+        for category, subcategory_list in categories_grouped.items():
+            budget_by_category = category_settings.get(category, False)
+
+            if budget_by_category:
+                rec = _calc_category_recommendation(
+                    conn, category, subcategory_list,
+                    six_months_ago, three_months_ago, one_month_ago, today, owner
+                )
+                if rec:
+                    recommendations.append(rec)
+            else:
+                for sub_category in subcategory_list:
+                    rec = _calc_subcategory_recommendation(
+                        conn, category, sub_category,
+                        six_months_ago, three_months_ago, one_month_ago, today, owner
+                    )
+                    if rec:
+                        recommendations.append(rec)
+
+    return recommendations
+
+
+def _calc_subcategory_recommendation(conn, category, sub_category,
+                                     six_months_ago, three_months_ago, one_month_ago, today,
+                                     owner):
+    owner_sql, owner_params = _build_owner_clause(owner)
+
+    base_params = {
+        "six_months_ago": six_months_ago.strftime('%Y-%m-%d'),
+        "three_months_ago": three_months_ago.strftime('%Y-%m-%d'),
+        "one_month_ago": one_month_ago.strftime('%Y-%m-%d'),
+        "today": today.strftime('%Y-%m-%d'),
+        "category": category,
+        "sub_category": sub_category,
+        **owner_params
+    }
+
+    # 6-month totals
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_6mo
+        FROM transactions
+        WHERE date >= :six_months_ago
+        AND category = :category AND sub_category = :sub_category
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+
+    total_6mo = float(row[0]) if row[0] else 0.0
+    avg_6mo = total_6mo / 6
+
+    # 3-month totals
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_3mo
+        FROM transactions
+        WHERE date >= :three_months_ago
+        AND category = :category AND sub_category = :sub_category
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+    avg_3mo = float(row[0]) / 3 if row[0] else 0.0
+
+    # Last month actual
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_1mo
+        FROM transactions
+        WHERE date >= :one_month_ago AND date < :today
+        AND category = :category AND sub_category = :sub_category
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+    actual_1mo = float(row[0]) if row[0] else 0.0
+
+    if avg_6mo == 0 and avg_3mo == 0 and actual_1mo == 0:
+        return None
+
+    # All historical monthly data for ML
+    monthly_rows = conn.execute(text(f"""
+        SELECT year * 100 + month as month, SUM(total_abs) as total
+        FROM transaction_monthly_rollups
+        WHERE category = :category AND sub_category = :sub_category
+        AND type IN ('Needs', 'Wants', 'Business')
+        {owner_sql}
+        GROUP BY year, month
+        ORDER BY year, month
+    """), base_params).fetchall()
+
+    recommended_budget = _ml_recommend(monthly_rows, avg_6mo, avg_3mo)
+    confidence = _confidence(len(monthly_rows))
+
+    return {
+        'category': category,
+        'sub_category': sub_category,
+        'recommended_budget': round(recommended_budget, 2),
+        'last_6mo_avg': round(avg_6mo, 2),
+        'last_3mo_avg': round(avg_3mo, 2),
+        'last_1mo_actual': round(actual_1mo, 2),
+        'data_months': len(monthly_rows),
+        'confidence': confidence,
+        'budget_by_category': False
+    }
+
+
+def _calc_category_recommendation(conn, category, subcategory_list,
+                                   six_months_ago, three_months_ago, one_month_ago, today,
+                                   owner):
+    owner_sql, owner_params = _build_owner_clause(owner)
+    sub_in = ','.join([f':sub_{i}' for i in range(len(subcategory_list))])
+    sub_params = {f'sub_{i}': v for i, v in enumerate(subcategory_list)}
+
+    base_params = {
+        "six_months_ago": six_months_ago.strftime('%Y-%m-%d'),
+        "three_months_ago": three_months_ago.strftime('%Y-%m-%d'),
+        "one_month_ago": one_month_ago.strftime('%Y-%m-%d'),
+        "today": today.strftime('%Y-%m-%d'),
+        "category": category,
+        **sub_params,
+        **owner_params
+    }
+
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_6mo
+        FROM transactions
+        WHERE date >= :six_months_ago
+        AND category = :category AND sub_category IN ({sub_in})
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+    total_6mo = float(row[0]) if row[0] else 0.0
+    avg_6mo = total_6mo / 6
+
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_3mo
+        FROM transactions
+        WHERE date >= :three_months_ago
+        AND category = :category AND sub_category IN ({sub_in})
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+    avg_3mo = float(row[0]) / 3 if row[0] else 0.0
+
+    row = conn.execute(text(f"""
+        SELECT SUM(ABS(amount)) as total_1mo
+        FROM transactions
+        WHERE date >= :one_month_ago AND date < :today
+        AND category = :category AND sub_category IN ({sub_in})
+        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+        {owner_sql}
+    """), base_params).fetchone()
+    actual_1mo = float(row[0]) if row[0] else 0.0
+
+    if avg_6mo == 0 and avg_3mo == 0 and actual_1mo == 0:
+        return None
+
+    monthly_rows = conn.execute(text(f"""
+        SELECT year * 100 + month as month, SUM(total_abs) as total
+        FROM transaction_monthly_rollups
+        WHERE category = :category AND sub_category IN ({sub_in})
+        AND type IN ('Needs', 'Wants', 'Business')
+        {owner_sql}
+        GROUP BY year, month
+        ORDER BY year, month
+    """), base_params).fetchall()
+
+    recommended_budget = _ml_recommend(monthly_rows, avg_6mo, avg_3mo)
+    confidence = _confidence(len(monthly_rows))
+
+    return {
+        'category': category,
+        'sub_category': f'ALL ({len(subcategory_list)} subcategories)',
+        'recommended_budget': round(recommended_budget, 2),
+        'last_6mo_avg': round(avg_6mo, 2),
+        'last_3mo_avg': round(avg_3mo, 2),
+        'last_1mo_actual': round(actual_1mo, 2),
+        'data_months': len(monthly_rows),
+        'confidence': confidence,
+        'budget_by_category': True
+    }
+
+
+def _ml_recommend(monthly_rows, avg_6mo, avg_3mo):
+    if len(monthly_rows) >= 3:
+        amounts = np.array([float(row[1]) for row in monthly_rows])
+        Q1, Q3 = np.percentile(amounts, 25), np.percentile(amounts, 75)
+        IQR = Q3 - Q1
+        filtered = amounts[(amounts >= Q1 - 1.5 * IQR) & (amounts <= Q3 + 1.5 * IQR)]
+        if len(filtered) > 0:
+            p80 = np.percentile(filtered, 80)
+            return (avg_3mo * 0.7 + p80 * 0.3) if avg_3mo > 0 else p80
+    return avg_6mo
+
+
+# ── harness ───────────────────────────────────────────────────────────────────
+
+def _seed(conn, n_subcategories, n_months, txns_per_month):
+    rng = random.Random(42)
+    owners = ['Juan', 'Maria']
+    types = ['Needs', 'Wants', 'Business']
+    n_categories = max(n_subcategories // 5, 1)
+    today = date.today()
+    rows = []
+    for s in range(n_subcategories):
+        category = f'Category {s % n_categories:02d}'
+        sub_category = f'Sub {s:03d}'
+        type_ = types[s % len(types)]
+        base = rng.uniform(20, 400)
+        for m in range(n_months):
+            month_start = (today.replace(day=1) - relativedelta(months=m))
+            if rng.random() < 0.15:
+                continue  # gaps in the history
+            for _ in range(rng.randint(1, txns_per_month)):
+                amount = base * rng.uniform(0.5, 1.5) * (6 if rng.random() < 0.03 else 1)
+                rows.append({
+                    'account_name': 'Checking', 'date': month_start + timedelta(days=rng.randint(0, 27)),
+                    'description': 'bench', 'amount': round(-amount, 2),
+                    'sub_category': sub_category, 'category': category, 'type': type_,
+                    'owner': rng.choice(owners), 'is_business': type_ == 'Business',
+                    'is_active': True, 'created_at': datetime.utcnow(),
+                })
+    conn.execute(text("""
+        INSERT INTO transactions (account_name, date, description, amount, sub_category, category,
+                                  type, owner, is_business, is_active, created_at)
+        VALUES (:account_name, :date, :description, :amount, :sub_category, :category,
+                :type, :owner, :is_business, :is_active, :created_at)
+    """), rows)
+    # Every third category is budgeted as a whole
+    conn.execute(text("""
+        INSERT INTO budget_subcategory_templates (category, sub_category, budget_amount,
+                                                  budget_by_category, is_active)
+        VALUES (:category, 'Sub', 0, :by_category, true)
+    """), [{'category': f'Category {c:02d}', 'by_category': c % 3 == 0} for c in range(n_categories)])
+    return len(rows)
+
+
+def _timed(fn, repeat, **kwargs):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(**kwargs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _compare(legacy, batch):
+    key = lambda r: (r['category'], r['sub_category'])
+    legacy, batch = {key(r): r for r in legacy}, {key(r): r for r in batch}
+    if legacy.keys() != batch.keys():
+        return [f'groups differ: {sorted(legacy.keys() ^ batch.keys())[:5]}']
+    problems = []
+    for k, old in legacy.items():
+        for field, value in old.items():
+            new = batch[k][field]
+            if isinstance(value, float) and abs(value - new) <= 0.011:
+                continue
+            if value != new:
+                problems.append(f'{k} {field}: legacy={value!r} batch={new!r}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the budget recommender')
+    parser.add_argument('--subcategories', type=int, default=150)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--txns-per-month', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Simulated network latency added to every statement')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app import create_app
+    from rollups import rebuild_rollups
+
+    app = create_app()
+    with app.app_context():
+        engine = _get_engine()
+        with engine.begin() as conn:
+            n_rows = _seed(conn, args.subcategories, args.months, args.txns_per_month)
+            rebuild_rollups(conn)
+        print(f"Seeded {n_rows:,} transactions across {args.subcategories} subcategories "
+              f"and {args.months} months")
+
+        statements = {'count': 0}
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _count_and_delay(*_):
+            statements['count'] += 1
+            if args.latency_ms:
+                time.sleep(args.latency_ms / 1000)
+
+        results = {}
+        for label, fn in (('legacy', legacy_recommendations),
+                          ('batch', calculate_subcategory_recommendations)):
+            for owner in (None, 'Juan'):
+                statements['count'] = 0
+                elapsed, recs = _timed(fn, args.repeat, owner=owner)
+                results[(label, owner)] = recs
+                print(f"  {label:<7} owner={owner or 'all':<5} {elapsed * 1000:9.1f} ms  "
+                      f"{statements['count'] // args.repeat:5d} statements  {len(recs)} recommendations")
+
+        for owner in (None, 'Juan'):
+            problems = _compare(results[('legacy', owner)], results[('batch', owner)])
+            if problems:
+                print(f"❌ owner={owner or 'all'}: {len(problems)} mismatches")
+                for p in problems[:10]:
+                    print(f"   {p}")
+                sys.exit(1)
+        print("✅ Batch and legacy recommendations match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming statement import (statement_import.py) on a large file.
+
+Writes a synthetic multi-year bank export of about --mb megabytes in the
+chosen format, then imports it into a fresh SQLite database through
+import_statement(), the function the background import job runs, and
+reports:
+
+  rows, rows/s, MB/s   throughput of parse + validate + insert + rollup
+  peak RSS growth      how much the process grew during the import (the
+                       parsers hold one batch at a time, so this should not
+                       track the file size)
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --mb 50 --format qif --batch-size 5000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+from datetime import date, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+_PAYEES = ['GROCERY OUTLET #1234', 'SHELL OIL 5551234', 'AMAZON MKTPLACE PMTS', 'NETFLIX.COM',
+           'PAYROLL DEPOSIT ACME CORP', 'CITY WATER UTIL', 'STARBUCKS STORE 0042', 'RENT PAYMENT']
+
+
+def _write_statement(path, fmt, target_bytes):
+    rng = random.Random(7)
+    day = date.today() - timedelta(days=365 * 5)
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        if fmt == 'csv':
+            f.write('Date,Description,Amount,Balance\n')
+        elif fmt == 'qif':
+            f.write('!Type:Bank\n')
+        else:
+            f.write('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\n\n<OFX><BANKMSGSRSV1><STMTTRNRS>'
+                    '<STMTRS><CURDEF>USD<BANKTRANLIST>\n')
+        while f.tell() < target_bytes:
+            if rows % 300 == 0:
+                day += timedelta(days=1)
+            amount = round(rng.uniform(-250, 80), 2) or 1.0
+            payee = rng.choice(_PAYEES)
+            if fmt == 'csv':
+                f.write(f'{day:%m/%d/%Y},"{payee} REF{rows}",{amount:.2f},{rng.uniform(0, 9000):.2f}\n')
+            elif fmt == 'qif':
+                f.write(f'D{day:%m/%d/%Y}\nT{amount:,.2f}\nP{payee} REF{rows}\nLShopping:Online\n^\n')
+            else:
+                f.write(f'<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>{day:%Y%m%d}120000<TRNAMT>{amount:.2f}'
+                        f'<FITID>{rows}<NAME>{payee} REF{rows}</STMTTRN>\n')
+            rows += 1
+        if fmt == 'ofx':
+            f.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming statement importer')
+    parser.add_argument('--mb', type=float, default=50, help='approximate file size in MB')
+    parser.add_argument('--format', choices=('csv', 'ofx', 'qif'), default='csv')
+    parser.add_argument('--batch-size', type=int, default=None, help='rows per batch (IMPORT_BATCH_SIZE)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_import_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'import.db')}"
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import warnings
+    warnings.simplefilter('ignore')
+    from app import create_app
+    from statement_import import merge_mapping, import_statement
+
+    path = os.path.join(tmp, f'statement.{args.format}')
+    started = time.perf_counter()
+    written = _write_statement(path, args.format, int(args.mb * 1024 * 1024))
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"Wrote {written:,} {args.format.upper()} rows, {size_mb:.1f} MB "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    app = create_app()
+    mapping = merge_mapping(None, {'format': args.format, 'defaults': {'owner': 'Bench'}})
+    with app.app_context():
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result = import_statement(path, args.format, mapping, 'Checking', None,
+                                  batch_size=args.batch_size)
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    seconds = result['seconds']
+    print(f"Imported {result['inserted']:,}/{result['rows']:,} rows in {seconds:.1f}s — "
+          f"{result['rows'] / seconds:,.0f} rows/s, {size_mb / seconds:.1f} MB/s, "
+          f"{result['error_count']} errors")
+    print(f"Peak RSS growth during import: {(rss_after - rss_before) / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: query_rows.fetch_rows() vs the previous pandas result path.
+
+Routes used to build JSON by running pd.read_sql_query() and walking
+df.iterrows() with float()/str() casts (kept below as legacy_rows). The
+replacement reads DBAPI rows straight into dicts via query_rows.fetch_rows().
+
+Seeds a throw-away SQLite database with 1k/10k/100k transactions, checks
+that both paths produce the same JSON, and reports CPU time (best of
+--repeat) and peak traced allocations for each. pandas is only needed for
+the legacy side; without it only the new path is measured.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_query_rows.py
+    python benchmarks/bench_query_rows.py --sizes 1000 10000 100000 --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+from sqlalchemy import create_engine, text
+
+from models import Transaction
+from query_rows import fetch_rows
+
+_SQL = """
+    SELECT id, date, description, amount, category, sub_category, owner, account_name, type
+    FROM transactions
+    ORDER BY date DESC, id DESC
+    LIMIT :limit
+"""
+
+
+# ── the two result paths ──────────────────────────────────────────────────────
+
+def legacy_rows(conn, limit):
+    """The previous path: DataFrame + iterrows() + per-field casts."""
+    import pandas as pd
+    df = pd.read_sql_query(text(_SQL), conn, params={'limit': limit})
+    return [{
+        'id': int(row['id']),
+        'date': str(row['date']),
+        'description': str(row['description']),
+        'amount': float(row['amount']),
+        'category': str(row['category']),
+        'sub_category': str(row['sub_category']) if row['sub_category'] else '',
+        'owner': str(row['owner']),
+        'account_name': str(row['account_name']),
+        'type': str(row['type']),
+    } for _, row in df.iterrows()]
+
+
+def fast_rows(conn, limit):
+    """The current path: typed rows straight into dicts."""
+    return [{
+        **row,
+        'sub_category': row['sub_category'] or '',
+    } for row in fetch_rows(conn, _SQL, {'limit': limit})]
+
+
+# ── harness ───────────────────────────────────────────────────────────────────
+
+def _seed(conn, n_rows):
+    rng = random.Random(7)
+    today = date.today()
+    rows = [{
+        'account_name': rng.choice(['Checking', 'Visa', 'Amex']),
+        'date': today - timedelta(days=rng.randint(0, 1500)),
+        'description': f'merchant {rng.randint(1, 500)}',
+        'amount': round(rng.uniform(-400, 400), 2),
+        # No NULLs: the legacy path turned them into NaN and emitted 'nan'
+        'sub_category': rng.choice(['Groceries', 'Rent', 'Fuel', '']),
+        'category': rng.choice(['Food', 'Home', 'Transport']),
+        'type': rng.choice(['Needs', 'Wants']),
+        'owner': rng.choice(['Juan', 'Ana']),
+        'created_at': datetime.utcnow(),
+    } for _ in range(n_rows)]
+    conn.execute(text("""
+        INSERT INTO transactions (account_name, date, description, amount, sub_category,
+                                  category, type, owner, is_business, is_active, created_at)
+        VALUES (:account_name, :date, :description, :amount, :sub_category,
+                :category, :type, :owner, false, true, :created_at)
+    """), rows)
+
+
+def _cpu(fn, conn, limit, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.process_time()
+        result = json.dumps(fn(conn, limit))
+        best = min(best, time.process_time() - started)
+    return best, result
+
+
+def _peak_alloc(fn, conn, limit):
+    """Peak bytes allocated while building the rows (before serialization)."""
+    tracemalloc.start()
+    try:
+        fn(conn, limit)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pandas-free query result path')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import pandas  # noqa: F401
+        paths = (('pandas', legacy_rows), ('fetch_rows', fast_rows))
+    except ImportError:
+        print("pandas is not installed — measuring fetch_rows only")
+        paths = (('fetch_rows', fast_rows),)
+
+    tmp = tempfile.mkdtemp(prefix='bench_query_rows_')
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+    Transaction.__table__.create(engine)
+    with engine.begin() as conn:
+        _seed(conn, max(args.sizes))
+
+    print(f"{'rows':>8}  {'path':<10} {'cpu ms':>9} {'peak alloc':>12}")
+    with engine.connect() as conn:
+        for size in args.sizes:
+            outputs = {}
+            for label, fn in paths:
+                elapsed, outputs[label] = _cpu(fn, conn, size, args.repeat)
+                peak = _peak_alloc(fn, conn, size)
+                print(f"{size:>8,}  {label:<10} {elapsed * 1000:9.1f} {peak / 1024 / 1024:9.1f} MB")
+            # Compared parsed: SQLite hands back whole amounts as ints (12 vs 12.0)
+            if len(outputs) == 2 and json.loads(outputs['pandas']) != json.loads(outputs['fetch_rows']):
+                print(f"❌ Outputs differ at {size:,} rows")
+                sys.exit(1)
+    if len(paths) == 2:
+        print("✅ Both paths produce identical JSON")
+
+
+if __name__ == '__main__':
+    main()
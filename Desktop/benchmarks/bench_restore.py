@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming JSON backup restore and export (backup_io.py).
+
+Writes a synthetic backup with --rows transactions (plus a few debt accounts
+and payments that transactions point at), then restores it into a fresh
+SQLite database the way /settings/import-data does, and reports:
+
+  rows/s, MB/s       throughput of parse + convert + insert + rollup rebuild
+  peak RSS growth    how much the process grew during the restore. Rows are
+                     streamed in RESTORE_BATCH_SIZE batches, so the Python heap
+                     stays flat; most of this is SQLite's memory map and page
+                     cache (SQLITE_PRAGMAS), which is bounded
+
+It then streams the data back out with iter_export() in each format, with
+and without gzip, and reports rows/s and output size, plus the Python heap
+peak of one export (tracemalloc), which should stay flat as --rows grows.
+
+--uid restores as that user (cloud mode: new ids, references remapped);
+without it the original ids are kept (dev mode).
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_restore.py
+    python benchmarks/bench_restore.py --rows 500000 --uid 1 --batch-size 10000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+_CATEGORIES = ['Groceries', 'Dining', 'Utilities', 'Rent', 'Travel', 'Shopping', 'Income']
+
+
+def _write_backup(path, rows):
+    """Pretty-printed like the app's own exports, one row at a time."""
+    rng = random.Random(7)
+    stamp = datetime(2025, 6, 30, 19, 25, 30).isoformat()
+    start = date.today() - timedelta(days=365 * 5)
+
+    def table(f, name, items, last=False):
+        f.write(f'  "{name}": [')
+        for i, row in enumerate(items):
+            f.write(',' if i else '')
+            f.write('\n    ' + json.dumps(row))
+        f.write('\n  ]' + ('' if last else ',') + '\n')
+
+    accounts = [{'id': 100 + i, 'user_id': 1, 'name': f'Card {i}', 'debt_type': 'credit_card',
+                 'original_balance': '5000.00', 'current_balance': '2500.00', 'owner': 'Bench',
+                 'category': 'Debt',
+                 'is_active': True, 'created_at': stamp, 'updated_at': stamp} for i in range(5)]
+    payments = [{'id': 200 + i, 'user_id': 1, 'debt_account_id': 100 + i % 5,
+                 'payment_date': start.isoformat(), 'payment_amount': '150.00',
+                 'balance_after_payment': '2350.00'} for i in range(50)]
+    transactions = ({
+        'id': i + 1, 'user_id': 1, 'account_name': 'Checking',
+        'date': (start + timedelta(days=i % 1800)).isoformat(),
+        'description': f'Synthetic transaction {i}', 'amount': f'{rng.uniform(1, 250):.2f}',
+        'sub_category': None, 'category': rng.choice(_CATEGORIES), 'type': 'Needs',
+        'owner': 'Bench', 'is_business': False, 'is_active': True,
+        'debt_payment_id': 200 + i % 50 if i % 1000 == 0 else None,
+        'created_at': stamp, 'updated_at': stamp,
+    } for i in range(rows))
+
+    with open(path, 'w') as f:
+        f.write('{\n')
+        table(f, 'transactions', transactions)
+        table(f, 'debt_accounts', accounts)
+        table(f, 'debt_payments', payments, last=True)
+        f.write('}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming JSON backup restore')
+    parser.add_argument('--rows', type=int, default=500_000, help='transactions in the backup')
+    parser.add_argument('--uid', type=int, default=None, help='restore as this user (cloud mode)')
+    parser.add_argument('--batch-size', type=int, default=None, help='rows per INSERT (RESTORE_BATCH_SIZE)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_restore_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'restore.db')}"
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import warnings
+    warnings.simplefilter('ignore')
+    from app import create_app
+    from backup_io import load_backup, iter_export
+
+    path = os.path.join(tmp, 'backup.json')
+    started = time.perf_counter()
+    _write_backup(path, args.rows)
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"Wrote a {args.rows:,}-transaction backup, {size_mb:.1f} MB "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    app = create_app()
+    if args.batch_size:
+        app.config['RESTORE_BATCH_SIZE'] = args.batch_size
+    with app.test_request_context():
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        with open(path, 'rb') as f:
+            counts = load_backup(f, args.uid)
+        seconds = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    total = sum(counts.values())
+    print(f"Restored {total:,} rows ({'uid ' + str(args.uid) if args.uid else 'original ids'}) "
+          f"in {seconds:.1f}s — {total / seconds:,.0f} rows/s, {size_mb / seconds:.1f} MB/s")
+    print(f"Peak RSS growth during restore: {(rss_after - rss_before) / 1024:.0f} MB")
+
+    with app.test_request_context():
+        for fmt in ('json', 'ndjson'):
+            for compress in (False, True):
+                started = time.perf_counter()
+                size = sum(len(chunk) for chunk in iter_export(args.uid, fmt, compress))
+                seconds = time.perf_counter() - started
+                print(f"Export {fmt + ('.gz' if compress else ''):<10} {size / 1024 / 1024:6.1f} MB "
+                      f"in {seconds:5.1f}s — {total / seconds:,.0f} rows/s")
+        # Separate pass: tracemalloc slows allocation down several times
+        tracemalloc.start()
+        for _ in iter_export(args.uid, 'ndjson', True):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"Python heap peak during export: {peak / 1024 / 1024:.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: local backups of a SQLite database — JSON dump vs native snapshot.
+
+Seeds a fresh SQLite database with --rows transactions, then writes a local
+backup each way while a writer thread keeps committing single-row updates
+(as the app would between requests):
+
+  json full     backup_chain.create_backup(full=True): every row streamed
+                through the ORM-free NDJSON writer (backup_io.write_export)
+  snapshot      snapshots.create_snapshot(): SQLite online backup API,
+                SNAPSHOT_STEP_PAGES pages per step, then gzip
+
+Reported per method: seconds, file size, and the writer's p95 / max commit
+latency while the backup ran (how much the backup got in the app's way).
+Then each backup is restored (backup_chain.restore_backup_file vs
+snapshots.restore_snapshot) and timed.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_snapshot.py
+    python benchmarks/bench_snapshot.py --rows 500000 --step-pages 4096
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+_CATEGORIES = ['Groceries', 'Rent', 'Transport', 'Dining', 'Utilities', 'Salary', 'Shopping']
+
+
+def _seed(engine, rows):
+    from sqlalchemy import text
+
+    rng = random.Random(42)
+    today = date.today()
+    now = datetime.utcnow()
+    sql = text("""
+        INSERT INTO transactions (account_name, date, description, amount, category,
+                                  type, owner, is_business, is_active, created_at, updated_at)
+        VALUES ('Checking', :date, :description, :amount, :category, 'Needs', 'Bench', 0, 1, :now, :now)
+    """)
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            conn.execute(sql, [{
+                'date': today - timedelta(days=rng.randint(0, 1800)),
+                'description': f'Synthetic transaction {start + i}',
+                'amount': round(rng.uniform(1, 250), 2),
+                'category': rng.choice(_CATEGORIES), 'now': now,
+            } for i in range(min(5000, rows - start))])
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _with_writer(app, engine, fn):
+    """Run fn() while a thread commits one-row updates; returns (result, seconds, latencies)."""
+    from sqlalchemy import text
+
+    stop = threading.Event()
+    latencies = []
+
+    def writer():
+        rng = random.Random(1)
+        while not stop.is_set():
+            began = time.perf_counter()
+            with engine.begin() as conn:
+                conn.execute(text("UPDATE transactions SET amount = amount WHERE id = :id"),
+                             {'id': rng.randint(1, 1000)})
+            latencies.append(time.perf_counter() - began)
+            time.sleep(0.005)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    started = time.perf_counter()
+    try:
+        with app.app_context():
+            result = fn()
+    finally:
+        seconds = time.perf_counter() - started
+        stop.set()
+        thread.join()
+    return result, seconds, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON backups vs SQLite snapshots')
+    parser.add_argument('--rows', type=int, default=200_000, help='transactions in the database')
+    parser.add_argument('--step-pages', type=int, default=None, help='pages per backup step (SNAPSHOT_STEP_PAGES)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_snapshot_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ['BACKUP_DIR'] = os.path.join(tmp, 'backups')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import warnings
+    warnings.simplefilter('ignore')
+    from app import create_app
+    from models import db
+    import backup_chain
+    import snapshots
+
+    app = create_app()
+    if args.step_pages:
+        app.config['SNAPSHOT_STEP_PAGES'] = args.step_pages
+    with app.app_context():
+        engine = db.engine
+        started = time.perf_counter()
+        _seed(engine, args.rows)
+        db_mb = os.path.getsize(os.path.join(tmp, 'bench.db')) / 1024 / 1024
+        print(f"Seeded {args.rows:,} transactions ({db_mb:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+    directory = os.environ['BACKUP_DIR']
+    methods = [
+        ('json full', lambda: backup_chain.create_backup(full=True)),
+        ('snapshot', snapshots.create_snapshot),
+    ]
+    written = {}
+    for name, fn in methods:
+        backup, seconds, latencies = _with_writer(app, engine, fn)
+        written[name] = backup['filename']
+        print(f"{name:<10} {backup['bytes'] / 1024 / 1024:6.1f} MB in {seconds:5.2f}s — "
+              f"{len(latencies)} writes meanwhile, p95 {_percentile(latencies, 95) * 1000:.1f} ms, "
+              f"max {max(latencies, default=0) * 1000:.1f} ms")
+
+    for name, restore in (('json full', backup_chain.restore_backup_file),
+                          ('snapshot', snapshots.restore_snapshot)):
+        with app.test_request_context():
+            started = time.perf_counter()
+            restore(written[name])
+            print(f"Restore {name:<10} {time.perf_counter() - started:5.2f}s")
+    print(f"Backups in {directory}")
+
+
+if __name__ == '__main__':
+    main()
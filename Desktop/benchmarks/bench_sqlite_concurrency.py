@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent reads and writes on the desktop SQLite database,
+with and without the SQLITE_PRAGMAS from config.py.
+
+Two fresh databases are seeded with the same transactions. On each, reader
+threads run a dashboard-style monthly aggregate while writer threads insert
+single transactions (one commit each), for --seconds. Reported per profile:
+
+  reads/s, writes/s     completed operations per second
+  p50 / p95             latency per operation
+  locked                "database is locked" errors (gave up after the
+                        busy timeout)
+
+  baseline   SQLite defaults: rollback journal, synchronous=FULL, 2MB cache
+  tuned      Config.SQLITE_PRAGMAS (WAL, synchronous=NORMAL, mmap, cache,
+             temp_store, busy_timeout), applied by db_pool.install_engine_hooks
+
+Both engines use db_pool.engine_options(), i.e. the pool the app runs with.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_sqlite_concurrency.py
+    python benchmarks/bench_sqlite_concurrency.py --readers 4 --writers 2 --seconds 10 --rows 200000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from config import Config  # noqa: E402
+from db_pool import engine_options, install_engine_hooks  # noqa: E402
+from models import Transaction  # noqa: E402
+
+_CATEGORIES = ['Groceries', 'Rent', 'Transport', 'Dining', 'Utilities', 'Salary', 'Shopping']
+_USERS = 20
+
+_READ_SQL = text("""
+    SELECT category, SUM(amount) AS total, COUNT(*) AS n
+    FROM transactions
+    WHERE user_id = :uid AND date >= :start AND date < :end AND is_active = 1
+    GROUP BY category
+""")
+
+_WRITE_SQL = text("""
+    INSERT INTO transactions (user_id, account_name, date, description, amount, category,
+                              type, owner, is_business, is_active, created_at, updated_at)
+    VALUES (:user_id, 'Checking', :date, 'bench', :amount, :category,
+            'Expense', 'Me', 0, 1, :now, :now)
+""")
+
+
+def _row(rng, today):
+    return {
+        'user_id': rng.randint(1, _USERS),
+        'date': today - timedelta(days=rng.randint(0, 730)),
+        'amount': round(rng.uniform(1, 500), 2),
+        'category': rng.choice(_CATEGORIES),
+        'now': today,
+    }
+
+
+def _make_engine(path, pragmas):
+    url = f'sqlite:///{path}'
+    engine = create_engine(url, **engine_options(url))
+    install_engine_hooks(engine, {'SQLITE_PRAGMAS': pragmas})
+    return engine
+
+
+def _seed(engine, rows, today):
+    Transaction.__table__.create(engine)
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            conn.execute(_WRITE_SQL, [_row(rng, today) for _ in range(min(5000, rows - start))])
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _run(engine, readers, writers, seconds, today):
+    stop = threading.Event()
+    results = {'read': [], 'write': [], 'locked': 0}
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        latencies = []
+        locked = 0
+        while not stop.is_set():
+            month = today.replace(day=1) - timedelta(days=30 * rng.randint(0, 23))
+            start = month.replace(day=1)
+            params = {'uid': rng.randint(1, _USERS), 'start': start, 'end': start + timedelta(days=31)}
+            began = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(_READ_SQL, params).fetchall()
+                latencies.append(time.perf_counter() - began)
+            except OperationalError:
+                locked += 1
+        with lock:
+            results['read'].extend(latencies)
+            results['locked'] += locked
+
+    def writer(seed):
+        rng = random.Random(seed)
+        latencies = []
+        locked = 0
+        while not stop.is_set():
+            began = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(_WRITE_SQL, _row(rng, today))
+                latencies.append(time.perf_counter() - began)
+            except OperationalError:
+                locked += 1
+        with lock:
+            results['write'].extend(latencies)
+            results['locked'] += locked
+
+    threads = ([threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+               + [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)])
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark concurrent SQLite reads/writes per pragma profile')
+    parser.add_argument('--readers', type=int, default=4, help='reader threads')
+    parser.add_argument('--writers', type=int, default=2, help='writer threads')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration per profile')
+    parser.add_argument('--rows', type=int, default=100_000, help='transactions seeded per database')
+    args = parser.parse_args()
+
+    today = date.today()
+    tmp = tempfile.mkdtemp(prefix='bench_sqlite_')
+
+    print(f"{args.readers} readers + {args.writers} writers, {args.seconds:g}s each, "
+          f"{args.rows:,} seeded transactions")
+    print(f"  {'profile':<18} {'reads/s':>9} {'p50':>8} {'p95':>8}   "
+          f"{'writes/s':>9} {'p50':>8} {'p95':>8}   {'locked':>6}")
+    for label, pragmas in (('baseline', {}), ('tuned', Config.SQLITE_PRAGMAS)):
+        engine = _make_engine(os.path.join(tmp, f'{label}.db'), pragmas)
+        _seed(engine, args.rows, today)
+        with engine.connect() as conn:
+            mode = conn.execute(text('PRAGMA journal_mode')).scalar()
+        res = _run(engine, args.readers, args.writers, args.seconds, today)
+        engine.dispose()
+
+        def ms(values, pct):
+            return _percentile(values, pct) * 1000
+
+        print(f"  {label + ' (' + mode + ')':<18} "
+              f"{len(res['read']) / args.seconds:9.0f} {ms(res['read'], 50):6.1f}ms {ms(res['read'], 95):6.1f}ms   "
+              f"{len(res['write']) / args.seconds:9.0f} {ms(res['write'], 50):6.1f}ms {ms(res['write'], 95):6.1f}ms   "
+              f"{res['locked']:6d}")
+
+
+if __name__ == '__main__':
+    main()
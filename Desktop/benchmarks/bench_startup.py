@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark: process startup for app.py (gunicorn workers) and
+desktop_app_launcher.py (desktop launches).
+
+Each sample runs in a fresh interpreter and reports:
+
+  import     importing the module (app / desktop_app_launcher)
+  create     create_app() — or initialize_app() for the launcher, which
+             also runs the database init and connection test
+  first req  the first GET / through the test client
+  total      interpreter start → first response
+
+The first sample runs against an empty database (schema upgrade); the rest
+hit the schema-version fast path. The script ends by timing the startup
+schema gate against the full create_all() + index checks it replaces;
+--latency-ms adds a sleep per statement there to approximate remote
+Postgres, where each catalog check is a round trip.
+
+Usage (run from the Desktop/ directory):
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --latency-ms 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+
+_CHILD = r'''
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+started = time.perf_counter()
+sys.path.insert(0, {desktop!r})
+if {launcher!r}:
+    import desktop_app_launcher as launcher
+    imported = time.perf_counter()
+    launcher.initialize_app()
+    app = launcher.app
+else:
+    import app as app_module
+    imported = time.perf_counter()
+    app = app_module.create_app()
+created = time.perf_counter()
+status = app.test_client().get('/').status_code
+done = time.perf_counter()
+sys.__stdout__.write(json.dumps({{
+    'import': imported - started, 'create': created - imported,
+    'first_request': done - created, 'status': status,
+}}) + '\n')
+'''
+
+
+def _sample(launcher, db_url):
+    env = {**os.environ, 'DATABASE_URL': db_url}
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', _CHILD.format(desktop=_DESKTOP, launcher=launcher)],
+                         env=env, cwd=_DESKTOP, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - started
+    timings = json.loads(out.stdout.strip().splitlines()[-1])
+    timings['total'] = total
+    return timings
+
+
+def _report(label, samples):
+    def ms(key, rows):
+        return sum(r[key] for r in rows) / len(rows) * 1000
+
+    cold, warm = samples[0], samples[1:]
+    print(f"{label}")
+    print(f"  {'':<12} {'import':>9} {'create':>9} {'first req':>10} {'total':>9}")
+    for name, rows in (('cold (1)', [cold]), (f'warm ({len(warm)})', warm)):
+        if rows:
+            print(f"  {name:<12} {ms('import', rows):8.0f}ms {ms('create', rows):8.0f}ms "
+                  f"{ms('first_request', rows):9.0f}ms {ms('total', rows):8.0f}ms")
+
+
+def _gate_vs_create_all(db_url, latency_ms, repeat=5):
+    sys.path.insert(0, _DESKTOP)
+    from sqlalchemy import create_engine, event
+    from models import db
+    from schema_version import stored_schema_version
+
+    engine = create_engine(db_url)
+    statements = {'count': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count_and_delay(*_):
+        statements['count'] += 1
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    def legacy():
+        db.metadata.create_all(engine)
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(engine, checkfirst=True)
+
+    for label, fn in (('schema gate', lambda: stored_schema_version(engine)),
+                      ('create_all + index checks', legacy)):
+        best = float('inf')
+        statements['count'] = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        print(f"  {label:<26} {best * 1000:8.1f}ms  {statements['count'] // repeat:3d} statements")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark app and desktop launcher startup')
+    parser.add_argument('--runs', type=int, default=5, help='samples per entry point (first is cold)')
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help='Simulated network latency per statement in the schema comparison')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_startup_')
+    for label, launcher in (('app.py (gunicorn worker)', False),
+                            ('desktop_app_launcher.py', True)):
+        db_url = f"sqlite:///{os.path.join(tmp, f'{launcher}.db')}"
+        samples = [_sample(launcher, db_url) for _ in range(args.runs)]
+        bad = [s['status'] for s in samples if s['status'] >= 500]
+        if bad:
+            print(f"❌ {label}: first request failed with {bad[0]}")
+            sys.exit(1)
+        _report(label, samples)
+
+    print(f"Startup schema work on an up-to-date database (latency {args.latency_ms:g}ms/statement)")
+    _gate_vs_create_all(f"sqlite:///{os.path.join(tmp, 'False.db')}", args.latency_ms)
+
+
+if __name__ == '__main__':
+    main()
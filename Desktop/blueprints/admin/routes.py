@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from werkzeug.security import generate_password_hash
 from models import db, User
 from sqlalchemy import text
@@ -145,7 +145,9 @@ def delete_user(user_id):
         'budget_subcategory_templates', 'monthly_budgets', 'unexpected_expenses',
         'budget_templates', 'transactions',
         'custom_types', 'custom_subcategories', 'custom_accounts',
-        'user_owners', 'revoked_tokens'
+        'user_owners', 'revoked_tokens', 'transaction_monthly_rollups',
+        'budget_recommendation_cache', 'user_data_versions',
+        'import_mappings', 'import_jobs'
     ]
     with db.engine.begin() as conn:
         for table in data_tables:
@@ -197,3 +199,38 @@ def audit_logs():
         filter_user_id=filter_user_id,
         filter_action=filter_action,
     )
+
+
+@admin_bp.route('/slow-queries')
+def slow_queries():
+    """Slow statements from the last N days, aggregated per fingerprint."""
+    from datetime import datetime, timedelta
+    from slow_queries import flush_slow_queries, slow_query_summary
+
+    try:
+        days = min(max(int(request.args.get('days', 7)), 1), 90)
+    except ValueError:
+        days = 7
+    filter_endpoint = request.args.get('endpoint', '').strip()
+
+    # Show this worker's buffered rows too, not just what has been flushed
+    flush_slow_queries()
+    with db.engine.connect() as conn:
+        summary, truncated = slow_query_summary(
+            conn, datetime.utcnow() - timedelta(days=days), endpoint=filter_endpoint or None)
+
+    return render_template(
+        'admin_slow_queries.html',
+        queries=summary,
+        truncated=truncated,
+        days=days,
+        filter_endpoint=filter_endpoint,
+        threshold_ms=current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 0),
+    )
+
+
+@admin_bp.route('/cache-stats')
+def cache_stats():
+    """Response cache hit/miss counters for this worker process."""
+    import response_cache
+    return jsonify(response_cache.stats())
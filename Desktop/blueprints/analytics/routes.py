@@ -1,29 +1,15 @@
 from flask import Blueprint, render_template, request, jsonify
+import logging
 from datetime import datetime, timedelta
-import pandas as pd
 from models import db
 from sqlalchemy import text
-from utils import uid_clause, local_now
+from utils import uid_clause, local_now, transaction_years
+from rollups import apply_rollup
+from query_pool import run_queries
+from query_rows import fetch_rows, fetch_column
 
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/analytics')
-
-
-def _df(conn, sql, params=None):
-    return pd.read_sql_query(text(sql), conn, params=params or {})
-
-
-def _year_expr():
-    """Return a SQL fragment that extracts the year as an integer, compatible with both Postgres and SQLite."""
-    if db.engine.dialect.name == 'sqlite':
-        return "CAST(strftime('%Y', date) AS INTEGER)"
-    return "EXTRACT(YEAR FROM date)::integer"
-
-
-def _month_expr():
-    """Return a SQL fragment that extracts the month as an integer, compatible with both Postgres and SQLite."""
-    if db.engine.dialect.name == 'sqlite':
-        return "CAST(strftime('%m', date) AS INTEGER)"
-    return "EXTRACT(MONTH FROM date)::integer"
+logger = logging.getLogger(__name__)
 
 
 def _build_analytics_filters(args):
@@ -80,51 +66,48 @@ def _build_analytics_filters(args):
 @analytics_bp.route('/')
 def analytics_dashboard():
     """Main analytics dashboard page"""
-    print("📊 Loading analytics dashboard...")
+    logger.debug("Loading analytics dashboard...")
     try:
         uid_sql, uid_p = uid_clause()
-        with db.engine.connect() as conn:
-            years_df = _df(conn, f"""
-                SELECT DISTINCT {_year_expr()} AS year
-                FROM transactions WHERE COALESCE(is_active, true) = true {uid_sql} ORDER BY year DESC
-            """, uid_p)
-            available_years = [int(y) for y in years_df['year'].tolist() if y is not None]
+        active = f"COALESCE(is_active, true) = true {uid_sql}"
 
-            owners_df = _df(conn, f"""
+        # Independent filter-option queries — run side by side on the shared query pool
+        results = run_queries({
+            'years': lambda conn: transaction_years(conn, uid_sql, uid_p),
+            'owners': lambda conn: fetch_column(conn, f"""
                 SELECT DISTINCT owner FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql} ORDER BY owner
-            """, uid_p)
-            available_owners = [o for o in owners_df['owner'].tolist() if o is not None]
-
-            categories_df = _df(conn, f"""
+                WHERE {active} ORDER BY owner
+            """, uid_p),
+            'categories': lambda conn: fetch_column(conn, f"""
                 SELECT DISTINCT category FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql} ORDER BY category
-            """, uid_p)
-            available_categories = [c for c in categories_df['category'].tolist() if c is not None]
-
-            accounts_df = _df(conn, f"""
+                WHERE {active} ORDER BY category
+            """, uid_p),
+            'accounts': lambda conn: fetch_column(conn, f"""
                 SELECT DISTINCT account_name FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql} ORDER BY account_name
-            """, uid_p)
-            available_accounts = [a for a in accounts_df['account_name'].tolist() if a is not None]
-
-            subcategories_df = _df(conn, f"""
+                WHERE {active} ORDER BY account_name
+            """, uid_p),
+            'subcategories': lambda conn: fetch_rows(conn, f"""
                 SELECT DISTINCT sub_category, category FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql}
+                WHERE {active}
                 AND sub_category IS NOT NULL AND sub_category != ''
                 ORDER BY category, sub_category
-            """, uid_p)
-            available_subcategories = [
-                {'subcategory': row['sub_category'], 'category': row['category']}
-                for _, row in subcategories_df.iterrows()
-            ]
-
-            types_df = _df(conn, f"""
+            """, uid_p),
+            'types': lambda conn: fetch_column(conn, f"""
                 SELECT DISTINCT type FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql} AND type IS NOT NULL AND type != ''
+                WHERE {active} AND type IS NOT NULL AND type != ''
                 ORDER BY type
-            """, uid_p)
-            txn_types = types_df['type'].tolist()
+            """, uid_p),
+        })
+
+        available_years = results['years']
+        available_owners = [o for o in results['owners'] if o is not None]
+        available_categories = [c for c in results['categories'] if c is not None]
+        available_accounts = [a for a in results['accounts'] if a is not None]
+        available_subcategories = [
+            {'subcategory': row['sub_category'], 'category': row['category']}
+            for row in results['subcategories']
+        ]
+        txn_types = results['types']
 
         _defaults = ['Needs', 'Wants', 'Savings', 'Business']
         seen = set(_defaults)
@@ -148,9 +131,7 @@ def analytics_dashboard():
                              default_end_date=end_date.strftime('%Y-%m-%d'))
 
     except Exception as e:
-        print(f"❌ Error loading analytics dashboard: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading analytics dashboard: %s", e)
         return render_template('analytics.html',
                              available_years=[local_now().year - 1, local_now().year],
                              available_owners=[],
@@ -173,7 +154,7 @@ def api_subcategories():
             if categories and 'all' not in categories:
                 cat_params = {f'cat_{i}': v for i, v in enumerate(categories)}
                 placeholders = ', '.join(f':{k}' for k in cat_params)
-                df = _df(conn, f"""
+                rows = fetch_rows(conn, f"""
                     SELECT DISTINCT sub_category, category FROM transactions
                     WHERE COALESCE(is_active, true) = true {uid_sql}
                     AND sub_category IS NOT NULL AND sub_category != ''
@@ -181,17 +162,17 @@ def api_subcategories():
                     ORDER BY category, sub_category
                 """, {**cat_params, **uid_p})
             else:
-                df = _df(conn, f"""
+                rows = fetch_rows(conn, f"""
                     SELECT DISTINCT sub_category, category FROM transactions
                     WHERE COALESCE(is_active, true) = true {uid_sql}
                     AND sub_category IS NOT NULL AND sub_category != ''
                     ORDER BY category, sub_category
                 """, uid_p)
         result = [{'subcategory': row['sub_category'], 'category': row['category']}
-                  for _, row in df.iterrows()]
+                  for row in rows]
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in subcategories API: {e}")
+        logger.error("Error in subcategories API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -199,10 +180,10 @@ def api_subcategories():
 def api_subcategory_breakdown():
     """Get subcategory breakdown data with filters"""
     try:
-        print("🔍 API: Getting subcategory breakdown")
+        logger.debug("Getting subcategory breakdown")
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT sub_category, category,
                        SUM(amount) as total,
                        COUNT(*) as transaction_count,
@@ -223,12 +204,12 @@ def api_subcategory_breakdown():
                 'transaction_count': int(row['transaction_count']),
                 'avg_amount': float(row['avg_amount'])
             }
-            for _, row in df.iterrows()
+            for row in rows
         ]
-        print(f"🔍 Returning breakdown for {len(result)} subcategories")
+        logger.debug("Returning breakdown for %s subcategories", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in subcategory breakdown API: {e}")
+        logger.error("Error in subcategory breakdown API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -236,10 +217,10 @@ def api_subcategory_breakdown():
 def api_spending_trends():
     """Get spending trends data with filters"""
     try:
-        print("📈 API: Getting spending trends")
+        logger.debug("Getting spending trends")
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT TO_CHAR(date, 'YYYY-MM') as month,
                        type,
                        SUM(amount) as total,
@@ -251,7 +232,7 @@ def api_spending_trends():
             """, params)
 
         result = {}
-        for _, row in df.iterrows():
+        for row in rows:
             month = row['month']
             if month not in result:
                 result[month] = {'month': month}
@@ -260,12 +241,10 @@ def api_spending_trends():
                 'count': int(row['transaction_count'])
             }
         result_list = sorted(result.values(), key=lambda x: x['month'])
-        print(f"📈 Returning trends for {len(result_list)} months")
+        logger.debug("Returning trends for %s months", len(result_list))
         return jsonify(result_list)
     except Exception as e:
-        print(f"❌ Error in spending trends API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in spending trends API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -273,10 +252,10 @@ def api_spending_trends():
 def api_category_breakdown():
     """Get category breakdown data with filters"""
     try:
-        print("🥧 API: Getting category breakdown")
+        logger.debug("Getting category breakdown")
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category,
                        SUM(amount) as total,
                        COUNT(*) as transaction_count,
@@ -287,7 +266,7 @@ def api_category_breakdown():
                 ORDER BY total DESC
             """, params)
 
-        total_amount = df['total'].sum()
+        total_amount = sum(float(row['total']) for row in rows)
         result = [
             {
                 'category': row['category'],
@@ -296,12 +275,12 @@ def api_category_breakdown():
                 'avg_amount': float(row['avg_amount']),
                 'percentage': (float(row['total']) / total_amount * 100) if total_amount > 0 else 0
             }
-            for _, row in df.iterrows()
+            for row in rows
         ]
-        print(f"🥧 Returning breakdown for {len(result)} categories")
+        logger.debug("Returning breakdown for %s categories", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in category breakdown API: {e}")
+        logger.error("Error in category breakdown API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -309,10 +288,10 @@ def api_category_breakdown():
 def api_owner_comparison():
     """Get owner comparison data with filters"""
     try:
-        print("👥 API: Getting owner comparison")
+        logger.debug("Getting owner comparison")
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT owner, type,
                        SUM(amount) as total,
                        COUNT(*) as transaction_count,
@@ -324,7 +303,7 @@ def api_owner_comparison():
             """, params)
 
         result = {}
-        for _, row in df.iterrows():
+        for row in rows:
             owner = row['owner']
             if owner not in result:
                 result[owner] = {'owner': owner, 'total': 0, 'transaction_count': 0, 'types': {}}
@@ -336,10 +315,10 @@ def api_owner_comparison():
                 'avg': float(row['avg_amount'])
             }
         result_list = sorted(result.values(), key=lambda x: x['total'], reverse=True)
-        print(f"👥 Returning comparison for {len(result_list)} owners")
+        logger.debug("Returning comparison for %s owners", len(result_list))
         return jsonify(result_list)
     except Exception as e:
-        print(f"❌ Error in owner comparison API: {e}")
+        logger.error("Error in owner comparison API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -347,10 +326,10 @@ def api_owner_comparison():
 def api_transaction_types_breakdown():
     """Get transaction types breakdown data with filters"""
     try:
-        print("💳 API: Getting transaction types breakdown")
+        logger.debug("Getting transaction types breakdown")
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT type,
                        SUM(amount) as total,
                        COUNT(*) as transaction_count,
@@ -361,7 +340,7 @@ def api_transaction_types_breakdown():
                 ORDER BY total DESC
             """, params)
 
-        total_amount = df['total'].sum()
+        total_amount = sum(float(row['total']) for row in rows)
         result = [
             {
                 'type': row['type'],
@@ -370,12 +349,12 @@ def api_transaction_types_breakdown():
                 'avg_amount': float(row['avg_amount']),
                 'percentage': (float(row['total']) / total_amount * 100) if total_amount > 0 else 0
             }
-            for _, row in df.iterrows()
+            for row in rows
         ]
-        print(f"💳 Returning breakdown for {len(result)} transaction types")
+        logger.debug("Returning breakdown for %s transaction types", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in transaction types breakdown API: {e}")
+        logger.error("Error in transaction types breakdown API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -385,7 +364,7 @@ def api_filtered_transactions():
     try:
         where_clause, params = _build_analytics_filters(request.args)
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT id, date, description, amount, category,
                        sub_category, owner, account_name, type
                 FROM transactions
@@ -393,12 +372,9 @@ def api_filtered_transactions():
                 ORDER BY date DESC
                 LIMIT 100
             """, params)
-        result = df.to_dict(orient='records')
-        return jsonify(result)
+        return jsonify(rows)
     except Exception as e:
-        print(f"❌ Error in filtered transactions API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in filtered transactions API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -417,34 +393,30 @@ def get_monthly_spending_matrix(conn, filter_type=None, filter_value=None):
     uid_sql, uid_p = uid_clause()
     params.update(uid_p)
 
-    df = pd.read_sql_query(text(f"""
-        SELECT {_year_expr()} AS year,
-               {_month_expr()} AS month,
-               SUM(amount) AS total
-        FROM transactions
-        WHERE COALESCE(is_active, true) = true{extra} {uid_sql}
+    rows = fetch_rows(conn, f"""
+        SELECT year, month, SUM(total) AS total
+        FROM transaction_monthly_rollups
+        WHERE 1=1{extra} {uid_sql}
         GROUP BY year, month
         ORDER BY year, month
-    """), conn, params=params)
+    """, params)
 
-    if df.empty:
+    if not rows:
         return {}
 
-    pivot = df.pivot(index='year', columns='month', values='total').fillna(0)
-    pct_change = pivot.copy()
-    for col in pivot.columns:
-        for i in range(1, len(pivot)):
-            prev_val = pivot.iloc[i - 1][col]
-            curr_val = pivot.iloc[i][col]
-            pct_change.iloc[i][col] = ((curr_val - prev_val) / abs(prev_val)) * 100 if prev_val != 0 else 0
-        pct_change.iloc[0][col] = 0
+    totals = {(int(r['year']), int(r['month'])): float(r['total']) for r in rows}
+    years = sorted({y for y, _ in totals})
+    months = sorted({m for _, m in totals})
 
     result = {}
-    for year in pivot.index:
+    for i, year in enumerate(years):
         result[year] = {}
-        for month in pivot.columns:
-            total = float(pivot.loc[year, month])
-            pct = float(pct_change.loc[year, month]) if year != pivot.index[0] else None
+        for month in months:
+            total = totals.get((year, month), 0.0)
+            pct = None
+            if i > 0:
+                prev_val = totals.get((years[i - 1], month), 0.0)
+                pct = ((total - prev_val) / abs(prev_val)) * 100 if prev_val != 0 else 0.0
             result[year][month] = {'total': total, 'pct_change': pct}
     return result
 
@@ -459,9 +431,7 @@ def api_monthly_spending_matrix():
             matrix = get_monthly_spending_matrix(conn, filter_type, filter_value)
         return jsonify(matrix)
     except Exception as e:
-        print(f"❌ Error in monthly spending matrix API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in monthly spending matrix API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -478,7 +448,7 @@ def api_bulk_update_transactions():
         if not updates:
             return jsonify({'error': 'No updates provided'}), 400
 
-        print(f"🔄 Bulk updating {len(transaction_ids)} transactions with: {updates}")
+        logger.info("Bulk updating %s transactions with: %s", len(transaction_ids), updates)
 
         set_clauses = []
         params = {}
@@ -497,22 +467,24 @@ def api_bulk_update_transactions():
         uid_sql, uid_p = uid_clause()
         params.update(uid_p)
 
+        id_where = f"id IN ({id_placeholders}) {uid_sql}"
+        params['now'] = datetime.utcnow()
         with db.engine.begin() as conn:
+            apply_rollup(conn, id_where, params, sign=-1)
             result = conn.execute(text(f"""
                 UPDATE transactions
-                SET {', '.join(set_clauses)}
-                WHERE id IN ({id_placeholders}) {uid_sql}
+                SET {', '.join(set_clauses)}, updated_at = :now
+                WHERE {id_where}
             """), params)
             rows_updated = result.rowcount
+            apply_rollup(conn, id_where, params)
 
-        print(f"✅ Successfully updated {rows_updated} transactions")
+        logger.info("Successfully updated %s transactions", rows_updated)
         return jsonify({
             'success': True,
             'rows_updated': rows_updated,
             'message': f'Successfully updated {rows_updated} transactions'
         })
     except Exception as e:
-        print(f"❌ Error in bulk update API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in bulk update API: %s", e)
         return jsonify({'error': str(e)}), 500
@@ -1,61 +1,18 @@
 from flask import Blueprint, jsonify, request
+import logging
 from datetime import datetime, date, timedelta
-from utils import ensure_budget_tables, uid_clause, local_now, current_user_id
-import pandas as pd
+from utils import (ensure_budget_tables, uid_clause, local_now, current_user_id,
+                   period_clause, month_in_years_clause, keyset_clause, keyset_cursor,
+                   transaction_years)
 from models import db
 from sqlalchemy import text
 from app import limiter
+from rollups import (apply_rollup, rollup_rekey, rollup_period_clause, rollup_since_clause,
+                     rollup_txn_count)
+from query_rows import fetch_rows, fetch_row
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
-
-
-def _df(conn, sql, params=None):
-    return pd.read_sql_query(text(sql), conn, params=params or {})
-
-
-# ── Dialect-aware date helpers (Postgres vs SQLite) ───────────────────────────
-
-def _yr(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"CAST(strftime('%Y', {col}) AS INTEGER)"
-    return f"EXTRACT(YEAR FROM {col})::integer"
-
-
-def _mo(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"CAST(strftime('%m', {col}) AS INTEGER)"
-    return f"EXTRACT(MONTH FROM {col})::integer"
-
-
-def _ym(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"strftime('%Y-%m', {col})"
-    return f"TO_CHAR({col}, 'YYYY-MM')"
-
-
-def _ago_12m():
-    if db.engine.dialect.name == 'sqlite':
-        return "date('now', '-12 months')"
-    return "CURRENT_DATE - INTERVAL '12 months'"
-
-
-def _year_month_owner_filter(year, month, owner='all', month_str=False):
-    """Build a WHERE fragment and params dict for year/month/owner filters."""
-    filters = []
-    params = {}
-    filters.append(f"{_yr()} = :year")
-    params['year'] = year
-    if month and month != 'all':
-        filters.append(f"{_mo()} = :month")
-        params['month'] = int(month)
-    if owner and owner != 'all':
-        filters.append("owner = :owner")
-        params['owner'] = owner
-    uid_sql, uid_p = uid_clause()
-    if uid_sql:
-        filters.append("user_id = :_uid")
-        params.update(uid_p)
-    return " AND ".join(filters), params
+logger = logging.getLogger(__name__)
 
 
 @api_bp.route('/monthly_trends')
@@ -65,8 +22,8 @@ def monthly_trends():
         owner = request.args.get('owner', 'all')
         type_filter = request.args.get('type')
 
+        since_sql, params = rollup_since_clause(12)
         extra_filters = ""
-        params = {}
         if owner != 'all':
             extra_filters += " AND owner = :owner"
             params['owner'] = owner
@@ -78,24 +35,22 @@ def monthly_trends():
         params.update(uid_p)
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
-                SELECT {_ym()} as month, SUM(amount) as total
-                FROM transactions
-                WHERE date >= {_ago_12m()}
-                AND COALESCE(is_active, true) = true
+            rows = fetch_rows(conn, f"""
+                SELECT year, month, SUM(total) as total
+                FROM transaction_monthly_rollups
+                WHERE {since_sql}
                 {extra_filters}
-                GROUP BY {_ym()}
-                ORDER BY month DESC
+                GROUP BY year, month
             """, params)
 
         result_list = [
-            {'month': row['month'], 'expense': float(row['total'])}
-            for _, row in df.iterrows()
+            {'month': f"{int(row['year'])}-{int(row['month']):02d}", 'expense': float(row['total'])}
+            for row in rows
         ]
         result_list.sort(key=lambda x: x['month'])
         return jsonify(result_list)
     except Exception as e:
-        print(f"❌ Error in monthly trends API: {e}")
+        logger.error("Error in monthly trends API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -128,7 +83,7 @@ def category_spending():
         where_clause = "WHERE " + " AND ".join(filters)
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category,
                        SUM(amount) as total,
                        COUNT(*) as transaction_count,
@@ -145,10 +100,10 @@ def category_spending():
             'total': float(row['total']),
             'transaction_count': int(row['transaction_count']),
             'avg_amount': float(row['avg_amount'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in category spending API: {e}")
+        logger.error("Error in category spending API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -160,10 +115,7 @@ def budget_analysis():
         year = request.args.get('year', local_now().year, type=int)
         owner = request.args.get('owner', 'all')
 
-        spending_filter = (f"{_mo()} = :month"
-                           f" AND {_yr()} = :year"
-                           " AND COALESCE(is_active, true) = true")
-        spending_params = {'month': month, 'year': year}
+        spending_filter, spending_params = rollup_period_clause(year, month)
         if owner != 'all':
             spending_filter += " AND owner = :owner"
             spending_params['owner'] = owner
@@ -172,17 +124,17 @@ def budget_analysis():
         spending_params.update(uid_p)
 
         with db.engine.connect() as conn:
-            actual_df = _df(conn, f"""
+            actual_rows = fetch_rows(conn, f"""
                 SELECT category,
-                       SUM(amount) as actual_amount,
-                       COUNT(*) as transaction_count
-                FROM transactions
+                       SUM(total) as actual_amount,
+                       SUM(txn_count) as transaction_count
+                FROM transaction_monthly_rollups
                 WHERE {spending_filter}
                 GROUP BY category
                 ORDER BY actual_amount DESC
             """, spending_params)
 
-            budgets_df = _df(conn, f"""
+            budgets_rows = fetch_rows(conn, f"""
                 SELECT category, SUM(budget_amount) AS budget_amount
                 FROM budget_subcategory_templates
                 WHERE is_active = true {uid_sql}
@@ -190,7 +142,7 @@ def budget_analysis():
                 ORDER BY category
             """, uid_p)
 
-            unexpected_df = _df(conn, f"""
+            unexpected_rows = fetch_rows(conn, f"""
                 SELECT category, SUM(amount) as total_unexpected
                 FROM unexpected_expenses
                 WHERE month = :month AND year = :year AND is_active = true {uid_sql}
@@ -198,9 +150,9 @@ def budget_analysis():
                 ORDER BY category
             """, {'month': month, 'year': year, **uid_p})
 
-        initial_budget_dict = {row['category']: float(row['budget_amount']) for _, row in budgets_df.iterrows()}
-        unexpected_dict = {row['category']: float(row['total_unexpected']) for _, row in unexpected_df.iterrows()}
-        actual_dict = {row['category']: float(row['actual_amount']) for _, row in actual_df.iterrows()}
+        initial_budget_dict = {row['category']: float(row['budget_amount']) for row in budgets_rows}
+        unexpected_dict = {row['category']: float(row['total_unexpected']) for row in unexpected_rows}
+        actual_dict = {row['category']: float(row['actual_amount']) for row in actual_rows}
 
         all_categories = set(initial_budget_dict.keys()) | set(unexpected_dict.keys()) | set(actual_dict.keys())
 
@@ -235,7 +187,7 @@ def budget_analysis():
 
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in budget analysis API: {e}")
+        logger.error("Error in budget analysis API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -247,10 +199,7 @@ def budget_subcategories():
         year = request.args.get('year', local_now().year, type=int)
         owner = request.args.get('owner', 'all')
 
-        spending_filter = (f"{_mo()} = :month"
-                           f" AND {_yr()} = :year"
-                           " AND COALESCE(is_active, true) = true")
-        spending_params = {'month': month, 'year': year}
+        spending_filter, spending_params = rollup_period_clause(year, month)
         if owner != 'all':
             spending_filter += " AND owner = :owner"
             spending_params['owner'] = owner
@@ -259,43 +208,43 @@ def budget_subcategories():
         spending_params.update(uid_p)
 
         with db.engine.connect() as conn:
-            spending_df = _df(conn, f"""
+            spending_rows = fetch_rows(conn, f"""
                 SELECT category,
                        COALESCE(NULLIF(TRIM(sub_category), ''), '(other)') AS sub_category,
-                       SUM(amount) AS actual
-                FROM transactions
+                       SUM(total) AS actual
+                FROM transaction_monthly_rollups
                 WHERE {spending_filter}
                 GROUP BY category, sub_category
                 ORDER BY category, sub_category
             """, spending_params)
 
-            cat_budgets_df = _df(conn, f"""
+            cat_budgets_rows = fetch_rows(conn, f"""
                 SELECT category, SUM(budget_amount) AS budget_amount
                 FROM budget_subcategory_templates WHERE is_active = true {uid_sql}
                 GROUP BY category
             """, uid_p)
 
-            subcat_budgets_df = _df(conn, f"""
+            subcat_budgets_rows = fetch_rows(conn, f"""
                 SELECT category, sub_category, budget_amount
                 FROM budget_subcategory_templates WHERE is_active = true {uid_sql}
             """, uid_p)
 
-            unexpected_df = _df(conn, f"""
+            unexpected_rows = fetch_rows(conn, f"""
                 SELECT category, SUM(amount) AS total_unexpected
                 FROM unexpected_expenses
                 WHERE month = :month AND year = :year AND is_active = true {uid_sql}
                 GROUP BY category
             """, {'month': month, 'year': year, **uid_p})
 
-        cat_budgets = {r['category']: float(r['budget_amount']) for _, r in cat_budgets_df.iterrows()}
-        unexpected = {r['category']: float(r['total_unexpected']) for _, r in unexpected_df.iterrows()}
+        cat_budgets = {r['category']: float(r['budget_amount']) for r in cat_budgets_rows}
+        unexpected = {r['category']: float(r['total_unexpected']) for r in unexpected_rows}
 
         subcat_budgets = {}
-        for _, r in subcat_budgets_df.iterrows():
+        for r in subcat_budgets_rows:
             subcat_budgets.setdefault(r['category'], {})[r['sub_category']] = float(r['budget_amount'])
 
         spending = {}
-        for _, r in spending_df.iterrows():
+        for r in spending_rows:
             spending.setdefault(r['category'], {})[r['sub_category']] = float(r['actual'])
 
         def _status(variance, budget):
@@ -356,9 +305,7 @@ def budget_subcategories():
 
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error in budget_subcategories: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in budget_subcategories: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -370,10 +317,7 @@ def dashboard_summary():
         month = request.args.get('month', local_now().month, type=int)
         owner = request.args.get('owner', 'all')
 
-        date_filter = (f"{_mo()} = :month"
-                       f" AND {_yr()} = :year"
-                       " AND COALESCE(is_active, true) = true")
-        params = {'month': month, 'year': year}
+        date_filter, params = rollup_period_clause(year, month)
         if owner != 'all':
             date_filter += " AND owner = :owner"
             params['owner'] = owner
@@ -382,16 +326,16 @@ def dashboard_summary():
         params.update(uid_p)
 
         with db.engine.connect() as conn:
-            monthly_df = _df(conn, f"""
-                SELECT type, SUM(amount) as total, COUNT(*) as count
-                FROM transactions
+            monthly_rows = fetch_rows(conn, f"""
+                SELECT type, SUM(total) as total, SUM(txn_count) as count
+                FROM transaction_monthly_rollups
                 WHERE {date_filter}
                 GROUP BY type
             """, params)
 
-            categories_df = _df(conn, f"""
-                SELECT category, SUM(amount) as total, COUNT(*) as count
-                FROM transactions
+            categories_rows = fetch_rows(conn, f"""
+                SELECT category, SUM(total) as total, SUM(txn_count) as count
+                FROM transaction_monthly_rollups
                 WHERE {date_filter}
                 GROUP BY category
                 ORDER BY total DESC
@@ -399,19 +343,18 @@ def dashboard_summary():
             """, params)
 
             try:
-                debt_df = _df(conn, f"""
+                debt_data = fetch_row(conn, f"""
                     SELECT COALESCE(SUM(current_balance), 0) as total_debt,
                            COALESCE(SUM(minimum_payment), 0) as total_minimum_payments,
                            COUNT(*) as debt_accounts
                     FROM debt_accounts WHERE is_active = true {uid_sql}
-                """, uid_p)
-                debt_data = debt_df.iloc[0].to_dict() if not debt_df.empty else {}
+                """, uid_p) or {}
             except Exception:
                 debt_data = {}
 
         monthly_spending = {}
         total_spending = 0
-        for _, row in monthly_df.iterrows():
+        for row in monthly_rows:
             monthly_spending[row['type']] = {
                 'total': float(row['total']),
                 'count': int(row['count'])
@@ -422,7 +365,7 @@ def dashboard_summary():
             'category': str(row['category']),
             'total': float(row['total']),
             'count': int(row['count'])
-        } for _, row in categories_df.iterrows()]
+        } for row in categories_rows]
 
         return jsonify({
             'summary': {
@@ -437,7 +380,7 @@ def dashboard_summary():
             'top_categories': top_categories
         })
     except Exception as e:
-        print(f"❌ Error in dashboard summary API: {e}")
+        logger.error("Error in dashboard summary API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -450,11 +393,9 @@ def api_categories():
         month = request.args.get('month', 'all')
         owner = request.args.get('owner', 'all')
 
-        date_filter = f"{_yr('t.date')} = :year"
-        params = {'year': year}
-        if month != 'all':
-            date_filter += f" AND {_mo('t.date')} = :month"
-            params['month'] = int(month)
+        date_filter, params = period_clause(year, month, col='t.date')
+        year_sql, year_p = period_clause(year, col='t.date', prefix='year')
+        params.update(year_p)
         if owner != 'all':
             date_filter += " AND t.owner = :owner"
             params['owner'] = owner
@@ -467,7 +408,7 @@ def api_categories():
 
         with db.engine.connect() as conn:
             # Anchor on budget_templates so zero-transaction categories are included
-            categories_df = _df(conn, f"""
+            categories_rows = fetch_rows(conn, f"""
                 SELECT bt.category,
                        bt.budget_amount,
                        bt.notes AS bt_type,
@@ -493,21 +434,21 @@ def api_categories():
             """, params)
 
             # Most-common type per category (for categories that have transactions)
-            type_df = _df(conn, f"""
+            type_rows = fetch_rows(conn, f"""
                 SELECT category, type, COUNT(*) AS type_count
                 FROM transactions t
-                WHERE {_yr('t.date')} = :year {t_uid_cond}
+                WHERE {year_sql} {t_uid_cond}
                 GROUP BY category, type
                 ORDER BY category, type_count DESC
             """, params)
 
         category_types = {}
-        for _, row in type_df.iterrows():
+        for row in type_rows:
             if row['category'] not in category_types:
                 category_types[row['category']] = row['type']
 
         result = []
-        for _, row in categories_df.iterrows():
+        for row in categories_rows:
             cat = str(row['category'])
             # Prefer transaction-derived type; fall back to budget_templates.notes
             cat_type = category_types.get(cat) or (str(row['bt_type']) if row['bt_type'] else '')
@@ -522,10 +463,10 @@ def api_categories():
                 'first_used': str(row['first_used']) if row['first_used'] else '—',
             })
 
-        print(f"📊 Returning {len(result)} categories")
+        logger.debug("Returning %s categories", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error getting categories: {e}")
+        logger.error("Error getting categories: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -538,11 +479,7 @@ def api_subcategories():
         month = request.args.get('month', 'all')
         owner = request.args.get('owner', 'all')
 
-        date_filter = "EXTRACT(YEAR FROM date)::integer = :year"
-        params = {'year': year}
-        if month != 'all':
-            date_filter += " AND EXTRACT(MONTH FROM date)::integer = :month"
-            params['month'] = int(month)
+        date_filter, params = period_clause(year, month)
         if owner != 'all':
             date_filter += " AND owner = :owner"
             params['owner'] = owner
@@ -552,7 +489,7 @@ def api_subcategories():
         uid = uid_p.get('_uid')
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT sub_category as name, category,
                        COUNT(*) as transaction_count,
                        SUM(amount) as total_amount,
@@ -594,7 +531,7 @@ def api_subcategories():
             'avg_amount': float(row['avg_amount']),
             'last_used': str(row['last_used']),
             'first_used': str(row['first_used'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         for row in cs_rows:
             result.append({
@@ -607,10 +544,10 @@ def api_subcategories():
                 'first_used': '—',
             })
 
-        print(f"🏷️ Returning {len(result)} subcategories")
+        logger.debug("Returning %s subcategories", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error getting subcategories: {e}")
+        logger.error("Error getting subcategories: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -622,18 +559,14 @@ def api_owners():
         year = request.args.get('year', local_now().year, type=int)
         month = request.args.get('month', 'all')
 
-        date_filter = "EXTRACT(YEAR FROM date)::integer = :year"
-        params = {'year': year}
-        if month != 'all':
-            date_filter += " AND EXTRACT(MONTH FROM date)::integer = :month"
-            params['month'] = int(month)
+        date_filter, params = period_clause(year, month)
         uid_sql, uid_p = uid_clause()
         date_filter += f" {uid_sql}"
         params.update(uid_p)
         uid = uid_p.get('_uid')
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT owner as name,
                        COUNT(*) as transaction_count,
                        SUM(amount) as total_amount,
@@ -665,7 +598,7 @@ def api_owners():
             'avg_amount': float(row['avg_amount']),
             'last_used': str(row['last_used']),
             'first_used': str(row['first_used'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         for row in uo_rows:
             result.append({
@@ -677,10 +610,10 @@ def api_owners():
                 'first_used': '—',
             })
 
-        print(f"👥 Returning {len(result)} owners")
+        logger.debug("Returning %s owners", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error getting owners: {e}")
+        logger.error("Error getting owners: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -692,18 +625,14 @@ def api_accounts():
         year = request.args.get('year', local_now().year, type=int)
         month = request.args.get('month', 'all')
 
-        date_filter = "EXTRACT(YEAR FROM date)::integer = :year"
-        params = {'year': year}
-        if month != 'all':
-            date_filter += " AND EXTRACT(MONTH FROM date)::integer = :month"
-            params['month'] = int(month)
+        date_filter, params = period_clause(year, month)
         uid_sql, uid_p = uid_clause()
         date_filter += f" {uid_sql}"
         params.update(uid_p)
         uid = uid_p.get('_uid')
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT account_name as name,
                        COUNT(*) as transaction_count,
                        SUM(amount) as total_amount,
@@ -740,7 +669,7 @@ def api_accounts():
             'avg_amount': float(row['avg_amount']),
             'last_used': str(row['last_used']),
             'first_used': str(row['first_used'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         for row in ca_rows:
             result.append({
@@ -752,10 +681,10 @@ def api_accounts():
                 'first_used': '—',
             })
 
-        print(f"💳 Returning {len(result)} accounts")
+        logger.debug("Returning %s accounts", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error getting accounts: {e}")
+        logger.error("Error getting accounts: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -773,11 +702,7 @@ def api_types():
             date_filter = "1=1"
             params = {}
         else:
-            date_filter = "EXTRACT(YEAR FROM date)::integer = :year"
-            params = {'year': year}
-            if month != 'all':
-                date_filter += " AND EXTRACT(MONTH FROM date)::integer = :month"
-                params['month'] = int(month)
+            date_filter, params = period_clause(year, month)
         if owner != 'all':
             date_filter += " AND owner = :owner"
             params['owner'] = owner
@@ -787,7 +712,7 @@ def api_types():
         uid = uid_p.get('_uid')
 
         with db.engine.connect() as conn:
-            df_txn = _df(conn, f"""
+            txn_rows = fetch_rows(conn, f"""
                 SELECT type AS name,
                        COUNT(*) AS transaction_count,
                        SUM(amount) AS total_amount,
@@ -824,7 +749,7 @@ def api_types():
             'avg_amount': float(row['avg_amount']),
             'last_used': str(row['last_used']),
             'first_used': str(row['first_used'])
-        } for _, row in df_txn.iterrows()]
+        } for row in txn_rows]
 
         for row in ct_rows:
             result.append({
@@ -837,10 +762,10 @@ def api_types():
             })
 
         result.sort(key=lambda x: -x['total_amount'])
-        print(f"🔖 Returning {len(result)} types")
+        logger.debug("Returning %s types", len(result))
         return jsonify(result)
     except Exception as e:
-        print(f"❌ Error getting types: {e}")
+        logger.error("Error getting types: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -872,10 +797,10 @@ def add_type():
                 "INSERT INTO custom_types (user_id, name) VALUES (:uid, :name)"
             ), {'uid': uid, 'name': name})
 
-        print(f"✅ Custom type '{name}' created for user {uid}")
+        logger.info("Custom type '%s' created for user %s", name, uid)
         return jsonify({'success': True, 'message': f'Type "{name}" created successfully'})
     except Exception as e:
-        print(f"❌ Error adding type: {e}")
+        logger.error("Error adding type: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -892,10 +817,11 @@ def edit_type(type_name):
         uid = uid_p.get('_uid')
         uid_cond = 'user_id = :uid' if uid else 'user_id IS NULL'
         with db.engine.begin() as conn:
-            conn.execute(text(f"""
-                UPDATE transactions SET type = :new_name, updated_at = :now
-                WHERE type = :old_name {uid_sql}
-            """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': type_name, **uid_p})
+            with rollup_rekey(conn, 'type', type_name, new_name, uid_sql, uid_p):
+                conn.execute(text(f"""
+                    UPDATE transactions SET type = :new_name, updated_at = :now
+                    WHERE type = :old_name {uid_sql}
+                """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': type_name, **uid_p})
 
             conn.execute(text(
                 f"UPDATE custom_types SET name = :new_name WHERE name = :old_name AND {uid_cond}"
@@ -903,7 +829,7 @@ def edit_type(type_name):
 
         return jsonify({'success': True, 'message': f'Type renamed from "{type_name}" to "{new_name}"'})
     except Exception as e:
-        print(f"❌ Error editing type: {e}")
+        logger.error("Error editing type: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -932,7 +858,7 @@ def delete_type(type_name):
 
         return jsonify({'success': True, 'message': f'Type "{type_name}" deleted'})
     except Exception as e:
-        print(f"❌ Error deleting type: {e}")
+        logger.error("Error deleting type: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -965,7 +891,7 @@ def api_migration_preview():
             ).fetchone()
             total_count = int(count_row[0]) if count_row else 0
 
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT date, description, amount, category,
                        sub_category, owner, account_name
                 FROM transactions
@@ -982,12 +908,12 @@ def api_migration_preview():
             'sub_category': str(row['sub_category']) if row['sub_category'] else '',
             'owner': str(row['owner']),
             'account_name': str(row['account_name'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
-        print(f"🔍 Returning preview of {total_count} transactions for {item_type}: {name}")
+        logger.debug("Returning preview of %s transactions for %s: %s", total_count, item_type, name)
         return jsonify({'total_count': total_count, 'transactions': transactions})
     except Exception as e:
-        print(f"❌ Error getting migration preview: {e}")
+        logger.error("Error getting migration preview: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -1016,10 +942,10 @@ def add_category():
                 VALUES (:name, 0.00, :notes, true, :uid, :now, :now)
             """), {'name': name, 'notes': item_type or None, 'uid': uid, 'now': datetime.utcnow()})
 
-        print(f"✅ Added category: {name}")
+        logger.info("Added category: %s", name)
         return jsonify({'success': True, 'message': f'Category "{name}" added successfully'})
     except Exception as e:
-        print(f"❌ Error adding category: {e}")
+        logger.error("Error adding category: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1053,10 +979,10 @@ def add_subcategory():
                 "INSERT INTO custom_subcategories (user_id, name, category) VALUES (:uid, :name, :category)"
             ), {'uid': uid, 'name': name, 'category': category})
 
-        print(f"✅ Custom subcategory '{name}' created under '{category}' for user {uid}")
+        logger.info("Custom subcategory '%s' created under '%s' for user %s", name, category, uid)
         return jsonify({'success': True, 'message': f'Subcategory "{name}" added under "{category}"'})
     except Exception as e:
-        print(f"❌ Error adding subcategory: {e}")
+        logger.error("Error adding subcategory: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1089,10 +1015,10 @@ def add_owner():
                 "INSERT INTO user_owners (user_id, name, is_active) VALUES (:uid, :name, true)"
             ), {'uid': uid, 'name': name})
 
-        print(f"✅ Owner '{name}' added for user {uid}")
+        logger.info("Owner '%s' added for user %s", name, uid)
         return jsonify({'success': True, 'message': f'Owner "{name}" added successfully'})
     except Exception as e:
-        print(f"❌ Error adding owner: {e}")
+        logger.error("Error adding owner: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1124,10 +1050,10 @@ def add_account():
                 "INSERT INTO custom_accounts (user_id, name) VALUES (:uid, :name)"
             ), {'uid': uid, 'name': name})
 
-        print(f"✅ Custom account '{name}' created for user {uid}")
+        logger.info("Custom account '%s' created for user %s", name, uid)
         return jsonify({'success': True, 'message': f'Account "{name}" added successfully'})
     except Exception as e:
-        print(f"❌ Error adding account: {e}")
+        logger.error("Error adding account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1163,11 +1089,12 @@ def migrate_categories():
             if count == 0:
                 return jsonify({'success': False, 'error': 'No transactions found to migrate'}), 400
 
-            upd = conn.execute(text(f"""
-                UPDATE transactions
-                SET {field} = :target, updated_at = :now
-                WHERE {field} = :source {uid_sql}
-            """), {'target': target, 'now': datetime.utcnow(), 'source': source, **uid_p})
+            with rollup_rekey(conn, field, source, target, uid_sql, uid_p):
+                upd = conn.execute(text(f"""
+                    UPDATE transactions
+                    SET {field} = :target, updated_at = :now
+                    WHERE {field} = :source {uid_sql}
+                """), {'target': target, 'now': datetime.utcnow(), 'source': source, **uid_p})
             migrated_count = upd.rowcount
 
             uid = uid_p.get('_uid')
@@ -1197,13 +1124,13 @@ def migrate_categories():
                     f"DELETE FROM custom_types WHERE name = :source AND {uid_cond}"
                 ), {'source': source, **extra})
 
-        print(f"✅ Migrated {migrated_count} transactions from {source} to {target}")
+        logger.info("Migrated %s transactions from %s to %s", migrated_count, source, target)
         return jsonify({
             'success': True,
             'message': f'Successfully migrated {migrated_count} transactions from "{source}" to "{target}"'
         })
     except Exception as e:
-        print(f"❌ Error migrating categories: {e}")
+        logger.error("Error migrating categories: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1227,10 +1154,10 @@ def delete_category(category_name):
                 f"DELETE FROM budget_templates WHERE category = :name {uid_sql}"
             ), {'name': category_name, **uid_p})
 
-        print(f"✅ Deleted category: {category_name}")
+        logger.info("Deleted category: %s", category_name)
         return jsonify({'success': True, 'message': f'Category "{category_name}" deleted successfully'})
     except Exception as e:
-        print(f"❌ Error deleting category: {e}")
+        logger.error("Error deleting category: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1257,10 +1184,10 @@ def delete_subcategory(subcategory_name):
                 f"DELETE FROM custom_subcategories WHERE name = :name AND {uid_cond}"
             ), {'name': subcategory_name, **({'uid': uid} if uid else {})})
 
-        print(f"✅ Deleted subcategory: {subcategory_name}")
+        logger.info("Deleted subcategory: %s", subcategory_name)
         return jsonify({'success': True, 'message': f'Subcategory "{subcategory_name}" deleted successfully'})
     except Exception as e:
-        print(f"❌ Error deleting subcategory: {e}")
+        logger.error("Error deleting subcategory: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1291,10 +1218,11 @@ def edit_category(category_name):
                 if exists > 0:
                     return jsonify({'success': False, 'error': 'Category name already exists'}), 400
 
-                conn.execute(text(f"""
-                    UPDATE transactions SET category = :new_name, updated_at = :now
-                    WHERE category = :old_name {uid_sql}
-                """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': category_name, **uid_p})
+                with rollup_rekey(conn, 'category', category_name, new_name, uid_sql, uid_p):
+                    conn.execute(text(f"""
+                        UPDATE transactions SET category = :new_name, updated_at = :now
+                        WHERE category = :old_name {uid_sql}
+                    """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': category_name, **uid_p})
 
                 conn.execute(text(f"""
                     UPDATE budget_templates SET category = :new_name, updated_at = :now
@@ -1312,10 +1240,10 @@ def edit_category(category_name):
         parts = []
         if name_changed: parts.append(f'renamed to "{new_name}"')
         if type_changed: parts.append('type updated')
-        print(f"✅ Category {category_name}: {', '.join(parts)}")
+        logger.info("Category %s: %s", category_name, ', '.join(parts))
         return jsonify({'success': True, 'message': f'Category {" and ".join(parts)} successfully'})
     except Exception as e:
-        print(f"❌ Error editing category: {e}")
+        logger.error("Error editing category: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1335,30 +1263,32 @@ def edit_subcategory(subcategory_name):
         uid_cond = 'user_id = :uid' if uid else 'user_id IS NULL'
         with db.engine.begin() as conn:
             if new_category:
-                conn.execute(text(f"""
-                    UPDATE transactions
-                    SET sub_category = :new_name, category = :new_cat, updated_at = :now
-                    WHERE sub_category = :old_name {uid_sql}
-                """), {'new_name': new_name, 'new_cat': new_category,
-                       'now': datetime.utcnow(), 'old_name': subcategory_name, **uid_p})
+                with rollup_rekey(conn, 'sub_category', subcategory_name, new_name, uid_sql, uid_p):
+                    conn.execute(text(f"""
+                        UPDATE transactions
+                        SET sub_category = :new_name, category = :new_cat, updated_at = :now
+                        WHERE sub_category = :old_name {uid_sql}
+                    """), {'new_name': new_name, 'new_cat': new_category,
+                           'now': datetime.utcnow(), 'old_name': subcategory_name, **uid_p})
                 conn.execute(text(
                     f"UPDATE custom_subcategories SET name = :new_name, category = :new_cat"
                     f" WHERE name = :old_name AND {uid_cond}"
                 ), {'new_name': new_name, 'new_cat': new_category, 'old_name': subcategory_name,
                     **({'uid': uid} if uid else {})})
             else:
-                conn.execute(text(f"""
-                    UPDATE transactions SET sub_category = :new_name, updated_at = :now
-                    WHERE sub_category = :old_name {uid_sql}
-                """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': subcategory_name, **uid_p})
+                with rollup_rekey(conn, 'sub_category', subcategory_name, new_name, uid_sql, uid_p):
+                    conn.execute(text(f"""
+                        UPDATE transactions SET sub_category = :new_name, updated_at = :now
+                        WHERE sub_category = :old_name {uid_sql}
+                    """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': subcategory_name, **uid_p})
                 conn.execute(text(
                     f"UPDATE custom_subcategories SET name = :new_name WHERE name = :old_name AND {uid_cond}"
                 ), {'new_name': new_name, 'old_name': subcategory_name, **({'uid': uid} if uid else {})})
 
-        print(f"✅ Updated subcategory from {subcategory_name} to {new_name}")
+        logger.info("Updated subcategory from %s to %s", subcategory_name, new_name)
         return jsonify({'success': True, 'message': 'Subcategory updated successfully'})
     except Exception as e:
-        print(f"❌ Error editing subcategory: {e}")
+        logger.error("Error editing subcategory: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1377,19 +1307,20 @@ def edit_owner(owner_name):
         uid = uid_p.get('_uid')
         uid_cond = 'user_id = :uid' if uid else 'user_id IS NULL'
         with db.engine.begin() as conn:
-            conn.execute(text(f"""
-                UPDATE transactions SET owner = :new_name, updated_at = :now
-                WHERE owner = :old_name {uid_sql}
-            """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': owner_name, **uid_p})
+            with rollup_rekey(conn, 'owner', owner_name, new_name, uid_sql, uid_p):
+                conn.execute(text(f"""
+                    UPDATE transactions SET owner = :new_name, updated_at = :now
+                    WHERE owner = :old_name {uid_sql}
+                """), {'new_name': new_name, 'now': datetime.utcnow(), 'old_name': owner_name, **uid_p})
 
             conn.execute(text(
                 f"UPDATE user_owners SET name = :new_name WHERE name = :old_name AND {uid_cond}"
             ), {'new_name': new_name, 'old_name': owner_name, **({'uid': uid} if uid else {})})
 
-        print(f"✅ Renamed owner from {owner_name} to {new_name}")
+        logger.info("Renamed owner from %s to %s", owner_name, new_name)
         return jsonify({'success': True, 'message': 'Owner renamed successfully'})
     except Exception as e:
-        print(f"❌ Error editing owner: {e}")
+        logger.error("Error editing owner: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1417,10 +1348,10 @@ def edit_account(account_name):
                 f"UPDATE custom_accounts SET name = :new_name WHERE name = :old_name AND {uid_cond}"
             ), {'new_name': new_name, 'old_name': account_name, **({'uid': uid} if uid else {})})
 
-        print(f"✅ Renamed account from {account_name} to {new_name}")
+        logger.info("Renamed account from %s to %s", account_name, new_name)
         return jsonify({'success': True, 'message': 'Account renamed successfully'})
     except Exception as e:
-        print(f"❌ Error editing account: {e}")
+        logger.error("Error editing account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1447,10 +1378,10 @@ def delete_owner(owner_name):
                     "DELETE FROM user_owners WHERE name = :name AND user_id = :uid"
                 ), {'name': owner_name, 'uid': uid})
 
-        print(f"✅ Deleted owner: {owner_name}")
+        logger.info("Deleted owner: %s", owner_name)
         return jsonify({'success': True, 'message': f'Owner "{owner_name}" deleted'})
     except Exception as e:
-        print(f"❌ Error deleting owner: {e}")
+        logger.error("Error deleting owner: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1477,10 +1408,10 @@ def delete_account(account_name):
                 f"DELETE FROM custom_accounts WHERE name = :name AND {uid_cond}"
             ), {'name': account_name, **({'uid': uid} if uid else {})})
 
-        print(f"✅ Deleted account: {account_name}")
+        logger.info("Deleted account: %s", account_name)
         return jsonify({'success': True, 'message': f'Account "{account_name}" deleted'})
     except Exception as e:
-        print(f"❌ Error deleting account: {e}")
+        logger.error("Error deleting account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1492,11 +1423,7 @@ def api_categories_statistics():
         month = request.args.get('month', 'all')
         owner = request.args.get('owner', 'all')
 
-        date_filter = f"{_yr()} = :year"
-        params = {'year': year}
-        if month != 'all':
-            date_filter += f" AND {_mo()} = :month"
-            params['month'] = int(month)
+        date_filter, params = period_clause(year, month)
         if owner != 'all':
             date_filter += " AND owner = :owner"
             params['owner'] = owner
@@ -1521,12 +1448,10 @@ def api_categories_statistics():
                 'types': _scalar(f"SELECT COUNT(DISTINCT type) FROM transactions WHERE {active_filter}"),
             }
 
-        print(f"📊 Statistics for {year}-{month} owner={owner}: {stats}")
+        logger.debug("Statistics for %s-%s owner=%s: %s", year, month, owner, stats)
         return jsonify(stats)
     except Exception as e:
-        print(f"❌ Error getting statistics: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting statistics: %s", e)
         return jsonify({'categories': 0, 'subcategories': 0, 'owners': 0, 'accounts': 0, 'types': 0}), 500
 
 
@@ -1534,7 +1459,7 @@ def api_categories_statistics():
 def get_accounts_list():
     """Get all accounts (regular + debt accounts) for transaction form dropdown"""
     try:
-        print("💳 Getting accounts list for transaction form")
+        logger.debug("Getting accounts list for transaction form")
         accounts_list = []
 
         with db.engine.connect() as conn:
@@ -1573,12 +1498,10 @@ def get_accounts_list():
                     })
 
         accounts_list.sort(key=lambda x: x['name'])
-        print(f"💳 Returning {len(accounts_list)} accounts")
+        logger.debug("Returning %s accounts", len(accounts_list))
         return jsonify(accounts_list)
     except Exception as e:
-        print(f"❌ Error getting accounts list: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting accounts list: %s", e)
         return jsonify([]), 500
 
 
@@ -1596,17 +1519,17 @@ def get_transactions_by_subcategory():
             return jsonify({'error': 'Missing required parameters: category, year, month'}), 400
 
         if subcategory:
-            print(f"📊 Fetching transactions: {category} > {subcategory} for {year}-{month:02d}")
+            logger.debug("Fetching transactions: %s > %s for %s-%02d", category, subcategory, year, month)
         else:
-            print(f"📊 Fetching all transactions for category: {category} for {year}-{month:02d}")
+            logger.debug("Fetching all transactions for category: %s for %s-%02d", category, year, month)
 
+        period_sql, period_p = period_clause(year, month)
         filters = [
             "category = :category",
-            "EXTRACT(YEAR FROM date)::integer = :year",
-            "EXTRACT(MONTH FROM date)::integer = :month",
+            period_sql,
             "COALESCE(is_active, true) = true"
         ]
-        params = {'category': category, 'year': year, 'month': month}
+        params = {'category': category, **period_p}
 
         if subcategory:
             filters.append("sub_category = :subcategory")
@@ -1640,7 +1563,7 @@ def get_transactions_by_subcategory():
             'sub_category': row[7] or ''
         } for row in rows]
 
-        print(f"✅ Found {len(transactions)} transactions")
+        logger.debug("Found %s transactions", len(transactions))
         return jsonify({
             'transactions': transactions,
             'count': len(transactions),
@@ -1649,9 +1572,7 @@ def get_transactions_by_subcategory():
             'month': f"{year}-{month:02d}"
         })
     except Exception as e:
-        print(f"❌ Error fetching transactions by subcategory: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error fetching transactions by subcategory: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -1661,7 +1582,12 @@ def get_transactions_by_subcategory():
 
 @api_bp.route('/transactions', methods=['GET'])
 def api_transactions_list():
-    """Paginated transaction list for the Flutter mobile app."""
+    """
+    Paginated transaction list for the Flutter mobile app.
+
+    Pass `after=<next_cursor>` from the previous response to page by keyset
+    (constant cost at any depth); `page` (LIMIT/OFFSET) is kept for jumping.
+    """
     try:
         page = max(1, request.args.get('page', 1, type=int))
         per_page = min(200, max(1, request.args.get('per_page', 50, type=int)))
@@ -1670,41 +1596,73 @@ def api_transactions_list():
         year = request.args.get('year', type=int)
         month = request.args.get('month', type=int)
         category = request.args.get('category', '')
+        after = request.args.get('after', '')
+        if month is not None and not 1 <= month <= 12:
+            return jsonify({'error': 'Invalid month'}), 400
 
         filters = ["COALESCE(is_active, true) = true"]
         params = {}
+        # The same filters against transaction_monthly_rollups, for the total
+        count_sql = ""
 
         if owner and owner != 'all':
             filters.append("owner = :owner")
             params['owner'] = owner
+            count_sql += " AND owner = :owner"
         if year:
-            filters.append("EXTRACT(YEAR FROM date)::integer = :year")
-            params['year'] = year
-        if month:
-            filters.append("EXTRACT(MONTH FROM date)::integer = :month")
-            params['month'] = month
+            period_sql, period_p = period_clause(year, month)
+            filters.append(period_sql)
+            params.update(period_p)
+            rollup_sql, rollup_p = rollup_period_clause(year, month, prefix='rollup')
+            count_sql += f" AND {rollup_sql}"
+            params.update(rollup_p)
+        elif month:
+            # A bare month means that month of every year, as it always has:
+            # one date range per year that has transactions
+            with db.engine.connect() as conn:
+                years = transaction_years(conn, *uid_clause())
+            period_sql, period_p = month_in_years_clause(years, month)
+            filters.append(period_sql)
+            params.update(period_p)
+            count_sql += " AND month = :rollup_month"
+            params['rollup_month'] = month
         if category:
             filters.append("category = :category")
             params['category'] = category
+            count_sql += " AND category = :category"
         uid_sql, uid_p = uid_clause()
         if uid_sql:
             filters.append("user_id = :_uid")
             params.update(uid_p)
+            count_sql += f" {uid_sql}"
+
+        if after:
+            try:
+                after_sql, after_p = keyset_clause(after)
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            filters.append(after_sql)
+            params.update(after_p)
+            offset = 0
 
         where = "WHERE " + " AND ".join(filters)
 
         with db.engine.connect() as conn:
-            total = conn.execute(text(f"SELECT COUNT(*) FROM transactions {where}"), params).scalar()
+            total = rollup_txn_count(conn, count_sql, params)
 
-            params_paged = {**params, 'per_page': per_page, 'offset': offset}
+            # One extra row tells us whether there is a next page
+            params_paged = {**params, 'limit': per_page + 1, 'offset': offset}
             rows = conn.execute(text(f"""
                 SELECT id, account_name, date, description, amount,
                        sub_category, category, type, owner, is_business
                 FROM transactions {where}
                 ORDER BY date DESC, id DESC
-                LIMIT :per_page OFFSET :offset
+                LIMIT :limit OFFSET :offset
             """), params_paged).fetchall()
 
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+
         transactions = [{
             'id': r[0], 'account_name': r[1], 'date': r[2],
             'description': r[3], 'amount': float(r[4]) if r[4] is not None else 0.0,
@@ -1718,12 +1676,12 @@ def api_transactions_list():
             'page': page,
             'per_page': per_page,
             'pages': (total + per_page - 1) // per_page,
-            'has_next': offset + per_page < total,
-            'has_prev': page > 1
+            'has_next': has_next,
+            'has_prev': bool(after) or page > 1,
+            'next_cursor': keyset_cursor(rows[-1][2], rows[-1][0]) if has_next else None
         })
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in api_transactions_list")
         return jsonify({'error': str(e)}), 500
 
 
@@ -1755,9 +1713,9 @@ def api_add_transaction():
             result = conn.execute(text("""
                 INSERT INTO transactions
                 (account_name, date, description, amount, sub_category, category,
-                 type, owner, is_business, is_active, user_id)
+                 type, owner, is_business, is_active, user_id, created_at, updated_at)
                 VALUES (:account_name, :date, :description, :amount, :sub_category,
-                        :category, :type, :owner, :is_business, true, :user_id)
+                        :category, :type, :owner, :is_business, true, :user_id, :now, :now)
                 RETURNING id
             """), {
                 'account_name': data.get('account_name', ''),
@@ -1770,13 +1728,58 @@ def api_add_transaction():
                 'owner': data['owner'],
                 'is_business': bool(data.get('is_business', False)),
                 'user_id': current_user_id(),
+                'now': datetime.utcnow(),
             })
             transaction_id = result.fetchone()[0]
+            apply_rollup(conn, "id = :id", {'id': transaction_id})
 
         return jsonify({'success': True, 'id': transaction_id}), 201
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in api_add_transaction")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api_bp.route('/transactions/batch', methods=['POST'])
+def api_add_transactions_batch():
+    """
+    Add many transactions in one request from the Flutter app.
+
+    Body: {"transactions": [{date, description, amount, account_name, category,
+    sub_category, type, owner, is_business}, ...], "defaults": {...},
+    "all_or_nothing": false}. Fields missing from an item come from
+    "defaults". Valid items are written with a few set-based statements
+    (ingest.py); invalid ones come back in "errors" by position. With
+    all_or_nothing, any error writes nothing.
+    """
+    from flask import current_app
+    from ingest import validate_transactions, insert_transactions
+    from recommendation_cache import refresh_recommendations_async
+
+    try:
+        data = request.get_json(force=True, silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Body must be a JSON object'}), 400
+        items = data.get('transactions')
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'transactions must be a non-empty list'}), 400
+        max_items = current_app.config.get('BULK_INSERT_MAX_ITEMS', 5000)
+        if len(items) > max_items:
+            return jsonify({'success': False, 'error': f'At most {max_items} transactions per batch'}), 413
+        defaults = data.get('defaults') if isinstance(data.get('defaults'), dict) else {}
+
+        rows, errors = validate_transactions(items, defaults)
+        if not rows or (errors and data.get('all_or_nothing')):
+            return jsonify({'success': False, 'inserted': 0, 'errors': errors}), 400
+
+        user_id = current_user_id()
+        with db.engine.begin() as conn:
+            inserted = insert_transactions(conn, rows, user_id, 'Added from the mobile app')
+        refresh_recommendations_async(user_id)
+
+        logger.info("Batch added %s transactions (%s rejected)", inserted, len(errors))
+        return jsonify({'success': True, 'inserted': inserted, 'errors': errors}), 201
+    except Exception as e:
+        logger.exception("Error in api_add_transactions_batch")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -1856,6 +1859,5 @@ def api_debts_list():
             'active_count': len(active_debts)
         })
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in api_debts_list")
         return jsonify({'error': str(e)}), 500
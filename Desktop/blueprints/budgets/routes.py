@@ -1,20 +1,15 @@
 from flask import Blueprint, render_template, request, jsonify
+import logging
 from datetime import datetime
 from models import db
 from sqlalchemy import text
-from utils import ensure_budget_tables, uid_clause, current_user_id, local_now
-import pandas as pd
-from budget_recommender import (
-    calculate_subcategory_recommendations,
-    migrate_category_budgets_to_subcategories,
-    get_commitment_summary
-)
+from utils import (ensure_budget_tables, uid_clause, current_user_id, local_now, period_clause,
+                   transaction_years)
+from recommendation_cache import get_recommendations
+from query_rows import fetch_rows
 
 budgets_bp = Blueprint('budgets', __name__, url_prefix='/budget')
-
-
-def _df(conn, sql, params=None):
-    return pd.read_sql_query(text(sql), conn, params=params or {})
+logger = logging.getLogger(__name__)
 
 
 def sync_budgets_from_commitments(conn, uid=None):
@@ -55,9 +50,7 @@ def sync_budgets_from_commitments(conn, uid=None):
                 """), {"cat": category, "sub": sub_category, "amount": total_commitment, "uid": uid, "now": now})
 
     except Exception as e:
-        print(f"Error syncing budgets from commitments: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error syncing budgets from commitments: %s", e)
 
 
 @budgets_bp.route('/')
@@ -69,14 +62,7 @@ def budget_management():
     try:
         with db.engine.connect() as conn:
             uid_sql, uid_p = uid_clause()
-            year_expr = ("CAST(strftime('%Y', date) AS INTEGER)"
-                         if db.engine.dialect.name == 'sqlite'
-                         else "EXTRACT(YEAR FROM date)::integer")
-            years_df = _df(conn, f"""
-                SELECT DISTINCT {year_expr} AS year
-                FROM transactions WHERE 1=1 {uid_sql} ORDER BY year DESC
-            """, uid_p)
-            available_years = [int(y) for y in years_df['year'].tolist() if y is not None]
+            available_years = transaction_years(conn, uid_sql, uid_p)
     except Exception:
         available_years = []
 
@@ -99,20 +85,20 @@ def api_budget_templates():
         uid_sql, uid_p = uid_clause()
         uid_val = current_user_id()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category, budget_amount, notes, is_active
                 FROM budget_templates WHERE is_active = true {uid_sql} ORDER BY category
             """, uid_p)
 
-            if df.empty:
+            if not rows:
                 # Create from transaction categories
-                cats_df = _df(conn, f"""
+                cats_rows = fetch_rows(conn, f"""
                     SELECT DISTINCT category FROM transactions
                     WHERE category IS NOT NULL AND category != '' {uid_sql} ORDER BY category
                 """, uid_p)
                 now = datetime.utcnow()
                 with db.engine.begin() as write_conn:
-                    for _, row in cats_df.iterrows():
+                    for row in cats_rows:
                         write_conn.execute(text("""
                             INSERT INTO budget_templates (category, budget_amount, notes, is_active, user_id, created_at, updated_at)
                             VALUES (:cat, 0.00, '', true, :uid, :now, :now)
@@ -120,7 +106,7 @@ def api_budget_templates():
                         """), {"cat": row['category'], "uid": uid_val, "now": now})
 
                 with db.engine.connect() as conn2:
-                    df = _df(conn2, f"""
+                    rows = fetch_rows(conn2, f"""
                         SELECT category, budget_amount, notes, is_active
                         FROM budget_templates WHERE is_active = true {uid_sql} ORDER BY category
                     """, uid_p)
@@ -130,14 +116,12 @@ def api_budget_templates():
             'budget_amount': float(row['budget_amount']),
             'notes': str(row['notes']) if row['notes'] else '',
             'is_active': bool(row['is_active'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting budget templates: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting budget templates: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -153,7 +137,7 @@ def api_unexpected_expenses():
 
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT id, category, amount, description, is_active, created_at
                 FROM unexpected_expenses
                 WHERE month = :month AND year = :year AND is_active = true {uid_sql}
@@ -167,14 +151,12 @@ def api_unexpected_expenses():
             'description': str(row['description']),
             'is_active': bool(row['is_active']),
             'created_at': str(row['created_at'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting unexpected expenses: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting unexpected expenses: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -201,9 +183,7 @@ def add_unexpected_expense():
         return jsonify({'success': True, 'id': expense_id, 'message': 'Unexpected expense added successfully'})
 
     except Exception as e:
-        print(f"Error adding unexpected expense: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error adding unexpected expense: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -229,9 +209,7 @@ def update_unexpected_expense(expense_id):
         return jsonify({'success': True, 'message': 'Unexpected expense updated successfully'})
 
     except Exception as e:
-        print(f"Error updating unexpected expense: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating unexpected expense: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -251,9 +229,7 @@ def delete_unexpected_expense(expense_id):
         return jsonify({'success': True, 'message': 'Unexpected expense deleted successfully'})
 
     except Exception as e:
-        print(f"Error deleting unexpected expense: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting unexpected expense: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -268,13 +244,7 @@ def api_actual_spending():
         if not month or not year:
             return jsonify({'error': 'Month and year required'}), 400
 
-        if db.engine.dialect.name == 'sqlite':
-            date_filter = ("CAST(strftime('%m', date) AS INTEGER) = :month"
-                           " AND CAST(strftime('%Y', date) AS INTEGER) = :year")
-        else:
-            date_filter = ("EXTRACT(MONTH FROM date)::integer = :month"
-                           " AND EXTRACT(YEAR FROM date)::integer = :year")
-        params = {"month": month, "year": year}
+        date_filter, params = period_clause(year, month)
 
         if owner != 'all':
             date_filter += " AND owner = :owner"
@@ -286,7 +256,7 @@ def api_actual_spending():
             params.update(uid_p)
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category, SUM(amount) as actual_amount, COUNT(*) as transaction_count
                 FROM transactions
                 WHERE {date_filter} AND COALESCE(is_active, true) = true
@@ -297,14 +267,12 @@ def api_actual_spending():
             'category': str(row['category']),
             'actual_amount': float(row['actual_amount']),
             'transaction_count': int(row['transaction_count'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting actual spending: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting actual spending: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -332,9 +300,7 @@ def update_budget_template():
         return jsonify({'success': True, 'message': 'Budget template updated successfully'})
 
     except Exception as e:
-        print(f"Error updating budget template: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating budget template: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -349,22 +315,22 @@ def api_subcategory_templates():
         uid_sql, uid_p = uid_clause()
         uid_val = current_user_id()
         with db.engine.connect() as conn:
-            templates_df = _df(conn, f"""
+            templates_rows = fetch_rows(conn, f"""
                 SELECT category, sub_category, budget_amount, notes, budget_by_category, is_active
                 FROM budget_subcategory_templates WHERE is_active = true {uid_sql}
                 ORDER BY category, sub_category
             """, uid_p)
 
-            if templates_df.empty:
+            if not templates_rows:
                 # Auto-create from transaction subcategories
-                subcats_df = _df(conn, f"""
+                subcats_rows = fetch_rows(conn, f"""
                     SELECT DISTINCT category, sub_category FROM transactions
                     WHERE sub_category IS NOT NULL AND sub_category != '' {uid_sql}
                     ORDER BY category, sub_category
                 """, uid_p)
                 now = datetime.utcnow()
                 with db.engine.begin() as write_conn:
-                    for _, row in subcats_df.iterrows():
+                    for row in subcats_rows:
                         write_conn.execute(text("""
                             INSERT INTO budget_subcategory_templates
                             (category, sub_category, budget_amount, notes, is_active, user_id, created_at, updated_at)
@@ -373,29 +339,28 @@ def api_subcategory_templates():
                         """), {"cat": row['category'], "sub": row['sub_category'], "uid": uid_val, "now": now})
 
                 with db.engine.connect() as conn2:
-                    templates_df = _df(conn2, f"""
+                    templates_rows = fetch_rows(conn2, f"""
                         SELECT category, sub_category, budget_amount, notes, is_active
                         FROM budget_subcategory_templates WHERE is_active = true {uid_sql}
                         ORDER BY category, sub_category
                     """, uid_p)
 
-            commitments_df = _df(conn, f"""
+            commitments_rows = fetch_rows(conn, f"""
                 SELECT category, sub_category, COALESCE(SUM(estimated_amount), 0) as total_commitment
                 FROM budget_commitments WHERE is_active = true {uid_sql}
                 GROUP BY category, sub_category
             """, uid_p)
 
+        commitment_minimums = {(r['category'], r['sub_category']): float(r['total_commitment'])
+                               for r in commitments_rows}
+
         result = []
-        for _, row in templates_df.iterrows():
+        for row in templates_rows:
             category = str(row['category'])
             sub_category = str(row['sub_category'])
             budget_amount = float(row['budget_amount'])
 
-            commitment_row = commitments_df[
-                (commitments_df['category'] == category) &
-                (commitments_df['sub_category'] == sub_category)
-            ]
-            commitment_minimum = float(commitment_row.iloc[0]['total_commitment']) if not commitment_row.empty else 0.0
+            commitment_minimum = commitment_minimums.get((category, sub_category), 0.0)
             effective_budget = max(budget_amount, commitment_minimum)
 
             result.append({
@@ -411,9 +376,7 @@ def api_subcategory_templates():
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting subcategory templates: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting subcategory templates: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -424,21 +387,21 @@ def sync_subcategory_templates():
         uid_sql, uid_p = uid_clause()
         uid_val = current_user_id()
         with db.engine.connect() as conn:
-            subcats_df = _df(conn, f"""
+            subcats_rows = fetch_rows(conn, f"""
                 SELECT DISTINCT category, sub_category FROM transactions
                 WHERE sub_category IS NOT NULL AND sub_category != '' {uid_sql}
                 ORDER BY category, sub_category
             """, uid_p)
-            existing_df = _df(conn, f"""
+            existing_rows = fetch_rows(conn, f"""
                 SELECT category, sub_category FROM budget_subcategory_templates
                 WHERE 1=1 {uid_sql}
             """, uid_p)
 
         transaction_pairs = set(
-            (row['category'], row['sub_category']) for _, row in subcats_df.iterrows()
+            (row['category'], row['sub_category']) for row in subcats_rows
         )
         existing_pairs = set(
-            (row['category'], row['sub_category']) for _, row in existing_df.iterrows()
+            (row['category'], row['sub_category']) for row in existing_rows
         )
 
         to_add = transaction_pairs - existing_pairs
@@ -468,9 +431,7 @@ def sync_subcategory_templates():
         return jsonify({'success': True, 'message': message, 'added_count': added_count, 'removed_count': removed_count})
 
     except Exception as e:
-        print(f"Error syncing subcategory templates: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error syncing subcategory templates: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -523,9 +484,7 @@ def update_subcategory_template():
         return jsonify({'success': True, 'message': 'Subcategory budget updated successfully'})
 
     except Exception as e:
-        print(f"Error updating subcategory budget: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating subcategory budget: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -557,9 +516,7 @@ def batch_update_subcategory_templates():
         return jsonify({'success': True, 'message': f'{len(budgets)} budgets updated successfully'})
 
     except Exception as e:
-        print(f"Error batch updating subcategory budgets: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error batch updating subcategory budgets: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -583,9 +540,7 @@ def toggle_category_granularity():
         return jsonify({'success': True, 'message': f'Updated {rows_updated} subcategories', 'rows_updated': rows_updated})
 
     except Exception as e:
-        print(f"Error toggling category granularity: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error toggling category granularity: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -601,13 +556,12 @@ def api_recommend_budgets():
         if owner == 'all':
             owner = None
 
-        recommendations = calculate_subcategory_recommendations(owner=owner)
-        return jsonify({'success': True, 'recommendations': recommendations, 'count': len(recommendations)})
+        recommendations, computed_at = get_recommendations(current_user_id(), owner)
+        return jsonify({'success': True, 'recommendations': recommendations, 'count': len(recommendations),
+                        'computed_at': computed_at.isoformat()})
 
     except Exception as e:
-        print(f"Error calculating budget recommendations: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error calculating budget recommendations: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -615,13 +569,12 @@ def api_recommend_budgets():
 def api_migrate_budgets():
     """Migrate existing category budgets to subcategory budgets"""
     try:
+        from budget_recommender import migrate_category_budgets_to_subcategories
         stats = migrate_category_budgets_to_subcategories()
         return jsonify({'success': True, 'message': 'Budget migration completed successfully', 'stats': stats})
 
     except Exception as e:
-        print(f"Error migrating budgets: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error migrating budgets: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -635,7 +588,7 @@ def api_get_commitments():
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT id, name, category, sub_category, estimated_amount,
                        due_day_of_month, is_fixed, created_at
                 FROM budget_commitments WHERE is_active = true {uid_sql}
@@ -651,14 +604,12 @@ def api_get_commitments():
             'due_day_of_month': int(row['due_day_of_month']),
             'is_fixed': bool(row['is_fixed']),
             'created_at': str(row['created_at'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting commitments: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting commitments: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -693,9 +644,7 @@ def api_add_commitment():
         return jsonify({'success': True, 'id': commitment_id, 'message': 'Commitment added successfully'})
 
     except Exception as e:
-        print(f"Error adding commitment: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error adding commitment: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -732,9 +681,7 @@ def api_update_commitment(commitment_id):
         return jsonify({'success': True, 'message': 'Commitment updated successfully'})
 
     except Exception as e:
-        print(f"Error updating commitment: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating commitment: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -758,9 +705,7 @@ def api_delete_commitment(commitment_id):
         return jsonify({'success': True, 'message': 'Commitment deleted successfully'})
 
     except Exception as e:
-        print(f"Error deleting commitment: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting commitment: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -768,12 +713,11 @@ def api_delete_commitment(commitment_id):
 def api_commitment_summary():
     """Get summary of all commitments"""
     try:
+        from budget_recommender import get_commitment_summary
         summary = get_commitment_summary()
         return jsonify(summary)
     except Exception as e:
-        print(f"Error getting commitment summary: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting commitment summary: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -792,13 +736,7 @@ def api_actual_spending_subcategory():
         if not month or not year:
             return jsonify({'error': 'Month and year required'}), 400
 
-        if db.engine.dialect.name == 'sqlite':
-            date_filter = ("CAST(strftime('%m', date) AS INTEGER) = :month"
-                           " AND CAST(strftime('%Y', date) AS INTEGER) = :year")
-        else:
-            date_filter = ("EXTRACT(MONTH FROM date)::integer = :month"
-                           " AND EXTRACT(YEAR FROM date)::integer = :year")
-        params = {"month": month, "year": year}
+        date_filter, params = period_clause(year, month)
 
         if owner != 'all':
             date_filter += " AND owner = :owner"
@@ -810,7 +748,7 @@ def api_actual_spending_subcategory():
             params.update(uid_p)
 
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category, sub_category, SUM(ABS(amount)) as actual_amount, COUNT(*) as transaction_count
                 FROM transactions
                 WHERE {date_filter}
@@ -826,12 +764,10 @@ def api_actual_spending_subcategory():
             'sub_category': str(row['sub_category']),
             'actual_amount': float(row['actual_amount']),
             'transaction_count': int(row['transaction_count'])
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error getting actual spending by subcategory: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting actual spending by subcategory: %s", e)
         return jsonify({'error': str(e)}), 500
@@ -1,4 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for
+import logging
 from datetime import datetime
 from utils import get_available_years_and_owners, ensure_budget_tables, local_now
 from .views import (
@@ -9,6 +10,7 @@ from .views import (
 
 # Create the blueprint
 dashboards_bp = Blueprint('dashboards', __name__)
+logger = logging.getLogger(__name__)
 
 @dashboards_bp.route('/')
 def dashboard():
@@ -24,8 +26,8 @@ def enhanced_dashboard(view='overview'):
     selected_month = request.args.get('month', local_now().month, type=int)
     selected_owner = request.args.get('owner', 'all')
     
-    print(f"🎯 Loading dashboard view: {view}")
-    print(f"📅 Filters: Year={selected_year}, Month={selected_month}, Owner={selected_owner}")
+    logger.debug("Loading dashboard view: %s", view)
+    logger.debug("Filters: Year=%s, Month=%s, Owner=%s", selected_year, selected_month, selected_owner)
     
     # Get available years and owners
     available_years, available_owners = get_available_years_and_owners()
@@ -1,308 +1,43 @@
 from flask import render_template, request
+import logging
 from datetime import datetime
+from dataclasses import asdict
 from models import db
 from sqlalchemy import text
-import pandas as pd
-from utils import uid_clause, local_now
+from utils import uid_clause, local_now, period_clause
+from rollups import rollup_period_clause
+from overview import OverviewData, build_overview
+from query_pool import run_queries
+from query_rows import fetch_rows, fetch_row
 
-
-def _df(conn, sql, params=None):
-    """Execute a SQLAlchemy text query and return a pandas DataFrame."""
-    return pd.read_sql_query(text(sql), conn, params=params or {})
-
-
-# ── Dialect-aware date helpers (Postgres vs SQLite) ───────────────────────────
-
-def _year_eq(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"CAST(strftime('%Y', {col}) AS INTEGER) = :year"
-    return f"EXTRACT(YEAR FROM {col})::integer = :year"
-
-
-def _month_eq(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"CAST(strftime('%m', {col}) AS INTEGER) = :month"
-    return f"EXTRACT(MONTH FROM {col})::integer = :month"
-
-
-def _month_lte(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"CAST(strftime('%m', {col}) AS INTEGER) <= :month"
-    return f"EXTRACT(MONTH FROM {col})::integer <= :month"
-
-
-def _ym_str(col='date'):
-    if db.engine.dialect.name == 'sqlite':
-        return f"strftime('%Y-%m', {col})"
-    return f"TO_CHAR({col}, 'YYYY-MM')"
-
-
-def _date_3m_ago():
-    if db.engine.dialect.name == 'sqlite':
-        return "date('now', '-3 months')"
-    return "CURRENT_DATE - INTERVAL '3 months'"
+logger = logging.getLogger(__name__)
 
 
 def dashboard_overview_view(year, month, owner, available_years, available_owners):
-    """Dashboard Overview - Enhanced with additional metrics"""
+    """Dashboard Overview - every widget computed by overview.build_overview()"""
 
     try:
         uid_sql, uid_p = uid_clause()
-        with db.engine.connect() as conn:
-            # Build filter conditions
-            date_filter = f"{_month_eq()} AND {_year_eq()}"
-            params = {"month": month, "year": year}
-
-            if owner != 'all':
-                date_filter += " AND owner = :owner"
-                params["owner"] = owner
-            date_filter += f" {uid_sql}"
-            params.update(uid_p)
-
-            # Monthly spending by type
-            monthly_spending_df = _df(conn, f"""
-                SELECT type, SUM(amount) as total, COUNT(*) as count
-                FROM transactions
-                WHERE {date_filter} AND COALESCE(is_active, true) = true
-                GROUP BY type ORDER BY total DESC
-            """, params)
-            monthly_spending = [(row['type'], float(row['total']), int(row['count']))
-                                for _, row in monthly_spending_df.iterrows()]
-
-            # Top 5 categories – 3-month trend
-            cat_trend_params = {"owner": owner} if owner != 'all' else {}
-            cat_owner_clause = "AND owner = :owner" if owner != 'all' else ""
-            cat_trend_params.update(uid_p)
-            cat_trend_df = _df(conn, f"""
-                SELECT category, {_ym_str()} as month_year, SUM(amount) as total
-                FROM transactions
-                WHERE date >= {_date_3m_ago()}
-                AND COALESCE(is_active, true) = true
-                AND category IS NOT NULL AND category <> ''
-                {cat_owner_clause} {uid_sql}
-                GROUP BY category, {_ym_str()}
-                ORDER BY category, month_year
-            """, cat_trend_params)
-
-            top_categories = []  # kept for error-path fallback
-            category_trend = []
-            if not cat_trend_df.empty:
-                cat_totals = cat_trend_df.groupby('category')['total'].sum()
-                top5_cats = cat_totals.nlargest(5).index.tolist()
-                cat_months = sorted(cat_trend_df['month_year'].unique())
-                for cat in top5_cats:
-                    cat_df = cat_trend_df[cat_trend_df['category'] == cat]
-                    month_map = {row['month_year']: float(row['total'])
-                                 for _, row in cat_df.iterrows()}
-                    category_trend.append({
-                        'category': cat,
-                        'months': [{'month': m, 'total': month_map.get(m, 0.0)}
-                                   for m in cat_months]
-                    })
-
-            # Previous year same month
-            prev_params = {"month": month, "year": year - 1}
-            if owner != 'all':
-                prev_params["owner"] = owner
-            prev_params.update(uid_p)
-            prev_year_df = _df(conn, f"""
-                SELECT SUM(amount) as total FROM transactions
-                WHERE {date_filter} AND COALESCE(is_active, true) = true
-            """, prev_params)
-            prev_year_total = float(prev_year_df['total'].iloc[0]) if not prev_year_df.empty and prev_year_df['total'].iloc[0] else 0
-
-            current_total = sum(amount for _, amount, _ in monthly_spending)
-
-            # Year-to-date
-            ytd_filter = f"{_year_eq()} AND {_month_lte()}"
-            ytd_params = {"year": year, "month": month}
-            if owner != 'all':
-                ytd_filter += " AND owner = :owner"
-                ytd_params["owner"] = owner
-            ytd_filter += f" {uid_sql}"
-            ytd_params.update(uid_p)
-
-            ytd_df = _df(conn, f"""
-                SELECT SUM(amount) as total FROM transactions
-                WHERE {ytd_filter} AND COALESCE(is_active, true) = true
-            """, ytd_params)
-            ytd_total = float(ytd_df['total'].iloc[0]) if not ytd_df.empty and ytd_df['total'].iloc[0] else 0
-
-            prev_ytd_params = {"year": year - 1, "month": month}
-            if owner != 'all':
-                prev_ytd_params["owner"] = owner
-            prev_ytd_params.update(uid_p)
-            prev_ytd_df = _df(conn, f"""
-                SELECT SUM(amount) as total FROM transactions
-                WHERE {ytd_filter} AND COALESCE(is_active, true) = true
-            """, prev_ytd_params)
-            prev_ytd_total = float(prev_ytd_df['total'].iloc[0]) if not prev_ytd_df.empty and prev_ytd_df['total'].iloc[0] else 0
-
-            # Budget performance summary
-            budget_df = _df(conn, f"""
-                SELECT
-                    bt.category,
-                    bt.budget_amount,
-                    COALESCE(ue.total_unexpected, 0) as unexpected_expenses,
-                    COALESCE(actual.actual_amount, 0) as actual_spending
-                FROM budget_templates bt
-                LEFT JOIN (
-                    SELECT category, SUM(amount) as total_unexpected
-                    FROM unexpected_expenses
-                    WHERE month = :month AND year = :year AND is_active = true {uid_sql}
-                    GROUP BY category
-                ) ue ON bt.category = ue.category
-                LEFT JOIN (
-                    SELECT category, SUM(amount) as actual_amount
-                    FROM transactions
-                    WHERE {date_filter} AND COALESCE(is_active, true) = true
-                    GROUP BY category
-                ) actual ON bt.category = actual.category
-                WHERE bt.is_active = true {uid_sql}
-            """, params)
-
-            over_budget_count = under_budget_count = on_track_count = 0
-            for _, row in budget_df.iterrows():
-                eff = float(row['budget_amount']) + float(row['unexpected_expenses'])
-                actual = float(row['actual_spending'])
-                variance = actual - eff
-                if eff > 0:
-                    if variance > 50:
-                        over_budget_count += 1
-                    elif variance < -50:
-                        under_budget_count += 1
-                    else:
-                        on_track_count += 1
-
-            # Recent transactions
-            recent_df = _df(conn, f"""
-                SELECT date, description, amount, category, owner, account_name
-                FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql}
-                ORDER BY date DESC, created_at DESC
-                LIMIT 10
-            """, uid_p)
-            recent_transactions = [{
-                'date': str(row['date']),
-                'description': row['description'],
-                'amount': float(row['amount']),
-                'category': row['category'],
-                'owner': row['owner'],
-                'account_name': row['account_name']
-            } for _, row in recent_df.iterrows()]
-
-            # Top 5 subcategories – 3-month trend
-            trend_params = {"owner": owner} if owner != 'all' else {}
-            owner_clause = "AND owner = :owner" if owner != 'all' else ""
-            trend_params.update(uid_p)
-            trend_df = _df(conn, f"""
-                SELECT sub_category, {_ym_str()} as month_year, SUM(amount) as total
-                FROM transactions
-                WHERE date >= {_date_3m_ago()}
-                AND COALESCE(is_active, true) = true
-                AND sub_category IS NOT NULL AND sub_category <> ''
-                {owner_clause} {uid_sql}
-                GROUP BY sub_category, {_ym_str()}
-                ORDER BY sub_category, month_year
-            """, trend_params)
-
-            monthly_trend = []  # kept for error-path fallback
-            subcategory_trend = []
-            if not trend_df.empty:
-                totals = trend_df.groupby('sub_category')['total'].sum()
-                top5 = totals.nlargest(5).index.tolist()
-                months_sorted = sorted(trend_df['month_year'].unique())
-                for sub in top5:
-                    sub_df = trend_df[trend_df['sub_category'] == sub]
-                    month_map = {row['month_year']: float(row['total'])
-                                 for _, row in sub_df.iterrows()}
-                    subcategory_trend.append({
-                        'subcategory': sub,
-                        'months': [{'month': m, 'total': month_map.get(m, 0.0)}
-                                   for m in months_sorted]
-                    })
-
-            # Total debt
-            try:
-                debt_df = _df(conn, f"""
-                    SELECT COALESCE(SUM(current_balance), 0) as total_debt
-                    FROM debt_accounts WHERE is_active = true {uid_sql}
-                """, uid_p)
-                total_debt = float(debt_df['total_debt'].iloc[0]) if not debt_df.empty else 0
-            except Exception:
-                total_debt = 0
-
-            # Owner comparison
-            current_month_str = f"{year}-{month:02d}"
-            prev_month_str = f"{year-1}-12" if month == 1 else f"{year}-{month-1:02d}"
-            owner_df = _df(conn, f"""
-                SELECT owner,
-                    SUM(CASE WHEN {_ym_str()} = :current_month THEN amount ELSE 0 END) as current_month,
-                    SUM(CASE WHEN {_ym_str()} = :prev_month THEN amount ELSE 0 END) as previous_month
-                FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql}
-                GROUP BY owner
-                HAVING SUM(CASE WHEN {_ym_str()} = :current_month THEN amount ELSE 0 END) > 0
-                    OR SUM(CASE WHEN {_ym_str()} = :prev_month THEN amount ELSE 0 END) > 0
-                ORDER BY current_month DESC
-            """, {"current_month": current_month_str, "prev_month": prev_month_str, **uid_p})
-            owner_comparison = []
-            for _, row in owner_df.iterrows():
-                current = float(row['current_month'])
-                previous = float(row['previous_month'])
-                change = ((current - previous) / previous * 100) if previous > 0 else 0
-                owner_comparison.append({
-                    'owner': row['owner'],
-                    'current_month': current,
-                    'previous_month': previous,
-                    'change_percent': change
-                })
-
-        month_change = ((current_total - prev_year_total) / prev_year_total * 100) if prev_year_total > 0 else 0
-        ytd_change = ((ytd_total - prev_ytd_total) / prev_ytd_total * 100) if prev_ytd_total > 0 else 0
+        overview = build_overview(year, month, owner, uid_sql, uid_p)
 
         return render_template('enhanced_dashboard.html',
                              view='overview',
                              current_year=year, current_month=month, current_owner=owner,
                              available_years=available_years, available_owners=available_owners,
-                             monthly_spending=monthly_spending,
-                             top_categories=top_categories,
-                             category_trend=category_trend,
-                             current_total=current_total,
-                             prev_year_total=prev_year_total,
-                             month_change=month_change,
-                             ytd_total=ytd_total,
-                             prev_ytd_total=prev_ytd_total,
-                             ytd_change=ytd_change,
-                             budget_performance={
-                                 'over_budget_count': over_budget_count,
-                                 'under_budget_count': under_budget_count,
-                                 'on_track_count': on_track_count
-                             },
-                             recent_transactions=recent_transactions,
-                             monthly_trend=monthly_trend,
-                             subcategory_trend=subcategory_trend,
-                             total_debt=total_debt,
-                             owner_comparison=owner_comparison,
+                             **asdict(overview),
                              yearly_data={}, category_trends={}, monthly_data=[],
                              budget_analysis=[], categories_data=[],
                              total_initial_budget=0, total_effective_budget=0,
                              total_unexpected_expenses=0, total_actual_spending=0)
 
     except Exception as e:
-        print(f"Error in enhanced overview view: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in enhanced overview view: %s", e)
         return render_template('enhanced_dashboard.html',
                              view='overview', current_year=year, current_month=month,
                              current_owner=owner, available_years=available_years,
                              available_owners=available_owners,
-                             current_total=0, prev_year_total=0, month_change=0,
-                             ytd_total=0, prev_ytd_total=0, ytd_change=0,
-                             monthly_spending=[], top_categories=[], category_trend=[],
-                             budget_performance={'over_budget_count': 0, 'under_budget_count': 0, 'on_track_count': 0},
-                             recent_transactions=[], monthly_trend=[], subcategory_trend=[], total_debt=0,
-                             owner_comparison=[], yearly_data={}, category_trends={},
+                             **asdict(OverviewData()),
+                             yearly_data={}, category_trends={},
                              monthly_data=[], budget_analysis=[], categories_data=[],
                              total_initial_budget=0, total_effective_budget=0,
                              total_unexpected_expenses=0, total_actual_spending=0,
@@ -314,66 +49,67 @@ def dashboard_budget_view(year, month, owner, available_years, available_owners)
 
     try:
         uid_sql, uid_p = uid_clause()
-        with db.engine.connect() as conn:
-            spending_filter = f"{_month_eq()} AND {_year_eq()}"
-            spending_params = {"month": month, "year": year}
-            if owner != 'all':
-                spending_filter += " AND owner = :owner"
-                spending_params["owner"] = owner
-            spending_filter += f" {uid_sql}"
-            spending_params.update(uid_p)
-
-            actual_spending_df = _df(conn, f"""
-                SELECT category, sub_category, SUM(amount) as actual_amount, COUNT(*) as transaction_count
-                FROM transactions
+        spending_filter, spending_params = rollup_period_clause(year, month)
+        if owner != 'all':
+            spending_filter += " AND owner = :owner"
+            spending_params["owner"] = owner
+        spending_filter += f" {uid_sql}"
+        spending_params.update(uid_p)
+
+        # Independent queries — run side by side on the shared query pool
+        results = run_queries({
+            'actual_spending': lambda conn: fetch_rows(conn, f"""
+                SELECT category, sub_category, SUM(total) as actual_amount, SUM(txn_count) as transaction_count
+                FROM transaction_monthly_rollups
                 WHERE {spending_filter}
-                AND sub_category IS NOT NULL AND sub_category != ''
-                AND COALESCE(type, '') != ''
-                AND COALESCE(is_active, true) = true
+                AND sub_category != ''
+                AND type != ''
                 GROUP BY category, sub_category
                 ORDER BY category, sub_category
-            """, spending_params)
-
-            subcategory_budgets_df = _df(conn, f"""
+            """, spending_params),
+            'subcategory_budgets': lambda conn: fetch_rows(conn, f"""
                 SELECT category, sub_category, budget_amount, notes, budget_by_category
                 FROM budget_subcategory_templates
                 WHERE is_active = true AND budget_amount > 0 {uid_sql}
                 ORDER BY category, sub_category
-            """, uid_p)
-
-            category_budget_mode = {}
-            for _, row in subcategory_budgets_df.iterrows():
-                if row['category'] not in category_budget_mode:
-                    category_budget_mode[row['category']] = bool(row['budget_by_category'])
-
-            commitments_df = _df(conn, f"""
+            """, uid_p),
+            'commitments': lambda conn: fetch_row(conn, f"""
                 SELECT COALESCE(SUM(estimated_amount), 0) as total_commitments,
                        COALESCE(SUM(CASE WHEN is_fixed = true THEN estimated_amount ELSE 0 END), 0) as total_fixed,
                        COALESCE(SUM(CASE WHEN is_fixed = false THEN estimated_amount ELSE 0 END), 0) as total_variable,
                        COUNT(*) as count
                 FROM budget_commitments WHERE is_active = true {uid_sql}
-            """, uid_p)
-
-            unexpected_expenses_df = _df(conn, f"""
+            """, uid_p),
+            'unexpected_expenses': lambda conn: fetch_rows(conn, f"""
                 SELECT category, SUM(amount) as total_unexpected
                 FROM unexpected_expenses
                 WHERE month = :month AND year = :year AND is_active = true {uid_sql}
                 GROUP BY category ORDER BY category
-            """, {"month": month, "year": year, **uid_p})
+            """, {"month": month, "year": year, **uid_p}),
+        })
+        actual_spending_rows = results['actual_spending']
+        subcategory_budgets_rows = results['subcategory_budgets']
+        commitments = results['commitments'] or {}
+        unexpected_expenses_rows = results['unexpected_expenses']
+
+        category_budget_mode = {}
+        for row in subcategory_budgets_rows:
+            if row['category'] not in category_budget_mode:
+                category_budget_mode[row['category']] = bool(row['budget_by_category'])
 
         # Build budget analysis
         subcategory_budget_dict = {}
-        for _, row in subcategory_budgets_df.iterrows():
+        for row in subcategory_budgets_rows:
             key = f"{row['category']}|{row['sub_category']}"
             subcategory_budget_dict[key] = float(row['budget_amount'])
 
         actual_spending_dict = {}
-        for _, row in actual_spending_df.iterrows():
+        for row in actual_spending_rows:
             key = f"{row['category']}|{row['sub_category']}"
             actual_spending_dict[key] = float(row['actual_amount'])
 
         unexpected_expenses_dict = {row['category']: float(row['total_unexpected'])
-                                    for _, row in unexpected_expenses_df.iterrows()}
+                                    for row in unexpected_expenses_rows}
 
         all_subcategories = set(subcategory_budget_dict.keys()) | set(actual_spending_dict.keys())
 
@@ -455,10 +191,10 @@ def dashboard_budget_view(year, month, owner, available_years, available_owners)
         total_effective_budget = total_budget + total_unexpected_expenses
         total_actual_spending = sum(item['actual_spending'] for item in budget_analysis)
 
-        total_commitments = float(commitments_df['total_commitments'].iloc[0]) if not commitments_df.empty else 0.0
-        total_fixed_commitments = float(commitments_df['total_fixed'].iloc[0]) if not commitments_df.empty else 0.0
-        total_variable_commitments = float(commitments_df['total_variable'].iloc[0]) if not commitments_df.empty else 0.0
-        commitment_count = int(commitments_df['count'].iloc[0]) if not commitments_df.empty else 0
+        total_commitments = float(commitments.get('total_commitments', 0.0))
+        total_fixed_commitments = float(commitments.get('total_fixed', 0.0))
+        total_variable_commitments = float(commitments.get('total_variable', 0.0))
+        commitment_count = int(commitments.get('count', 0))
         living_budget = total_budget - total_commitments
 
         return render_template('enhanced_dashboard.html',
@@ -478,12 +214,11 @@ def dashboard_budget_view(year, month, owner, available_years, available_owners)
                              current_total=0, prev_year_total=0, month_change=0,
                              ytd_total=0, prev_ytd_total=0, ytd_change=0,
                              monthly_spending=[], top_categories=[], category_trend=[],
+                             subcategory_trend=[],
                              yearly_data={}, category_trends={}, monthly_data=[], categories_data=[])
 
     except Exception as e:
-        print(f"Error in budget view: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in budget view: %s", e)
         return render_template('enhanced_dashboard.html',
                              view='budget', current_year=year, current_month=month,
                              current_owner=owner, available_years=available_years,
@@ -518,24 +253,16 @@ def dashboard_categories_view(available_years, available_owners):
                 ORDER BY category
             """), uid_p).fetchall()
 
+            period_sql, period_p = period_clause(current_year, current_month)
             categories_data = []
             for cat_row in categories_rows:
                 cat_id, category_name, notes, budget_amount, is_active = cat_row
-                if current_month == 'all':
-                    stats = conn.execute(text(f"""
-                        SELECT COUNT(*) as count, SUM(amount) as total, AVG(amount) as avg
-                        FROM transactions
-                        WHERE category = :category
-                        AND {_year_eq()} {uid_sql}
-                    """), {"category": category_name, "year": current_year, **uid_p}).fetchone()
-                else:
-                    stats = conn.execute(text(f"""
-                        SELECT COUNT(*) as count, SUM(amount) as total, AVG(amount) as avg
-                        FROM transactions
-                        WHERE category = :category
-                        AND {_year_eq()}
-                        AND {_month_eq()} {uid_sql}
-                    """), {"category": category_name, "year": current_year, "month": int(current_month), **uid_p}).fetchone()
+                stats = conn.execute(text(f"""
+                    SELECT COUNT(*) as count, SUM(amount) as total, AVG(amount) as avg
+                    FROM transactions
+                    WHERE category = :category
+                    AND {period_sql} {uid_sql}
+                """), {"category": category_name, **period_p, **uid_p}).fetchone()
 
                 categories_data.append({
                     'category': category_name,
@@ -560,9 +287,7 @@ def dashboard_categories_view(available_years, available_owners):
                              total_actual_spending=0)
 
     except Exception as e:
-        print(f"Error in categories view: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in categories view: %s", e)
         return render_template('enhanced_dashboard.html',
                              view='categories', current_year=local_now().year,
                              current_month='all', current_owner='all',
@@ -1,50 +1,50 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import logging
 from datetime import datetime
-import pandas as pd
 from models import db
 from sqlalchemy import text
 from utils import uid_clause, current_user_id
+from rollups import apply_rollup
+from query_rows import fetch_rows, fetch_row
 
 debts_bp = Blueprint('debts', __name__, url_prefix='/debts')
-
-
-def _df(conn, sql, params=None):
-    return pd.read_sql_query(text(sql), conn, params=params or {})
+logger = logging.getLogger(__name__)
 
 
 @debts_bp.route('/')
 def list_debts():
     """Debt accounts overview"""
-    print("💳 Loading debts page...")
+    logger.debug("Loading debts page...")
     try:
         show_paid_off = request.args.get('show_paid_off', 'false').lower() == 'true'
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
             if show_paid_off:
-                debts_df = _df(conn, f"""
+                debts_rows = fetch_rows(conn, f"""
                     SELECT * FROM debt_accounts WHERE 1=1 {uid_sql}
                     ORDER BY is_active DESC, current_balance DESC
                 """, uid_p)
-                print("💳 Loading all debts (including paid-off)...")
+                logger.debug("Loading all debts (including paid-off)...")
             else:
-                debts_df = _df(conn, f"""
+                debts_rows = fetch_rows(conn, f"""
                     SELECT * FROM debt_accounts WHERE is_active = true {uid_sql}
                     ORDER BY current_balance DESC
                 """, uid_p)
-                print("💳 Loading active debts only...")
+                logger.debug("Loading active debts only...")
 
         debts = []
-        for _, row in debts_df.iterrows():
+        for row in debts_rows:
             debt_obj = type('DebtAccount', (), {})()
-            for col in debts_df.columns:
-                setattr(debt_obj, col, row[col])
+            for col, value in row.items():
+                setattr(debt_obj, col, value)
             debts.append(debt_obj)
 
         active_debts = [debt for debt in debts if debt.is_active]
         total_debt = sum(float(debt.current_balance) for debt in active_debts)
         total_minimum_payments = sum(float(debt.minimum_payment or 0) for debt in active_debts)
 
-        print(f"💳 Found {len(debts)} debt accounts ({len(active_debts)} active), total: ${total_debt}")
+        logger.debug("Found %s debt accounts (%s active), total: $%s",
+                     len(debts), len(active_debts), total_debt)
         return render_template('debts.html',
                              debts=debts,
                              total_debt=total_debt,
@@ -52,9 +52,7 @@ def list_debts():
                              show_paid_off=show_paid_off,
                              active_count=len(active_debts))
     except Exception as e:
-        print(f"❌ Error in debts route: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in debts route: %s", e)
         return render_template('debts.html', debts=[], total_debt=0,
                              total_minimum_payments=0, show_paid_off=False, active_count=0)
 
@@ -72,9 +70,11 @@ def add_debt():
                 conn.execute(text("""
                     INSERT INTO debt_accounts
                     (name, debt_type, original_balance, current_balance, interest_rate,
-                     minimum_payment, due_date, owner, category, account_number_last4, is_active, user_id)
+                     minimum_payment, due_date, owner, category, account_number_last4, is_active, user_id,
+                     created_at, updated_at)
                     VALUES (:name, :debt_type, :original_balance, :current_balance, :interest_rate,
-                            :minimum_payment, :due_date, :owner, :category, :account_number_last4, true, :uid)
+                            :minimum_payment, :due_date, :owner, :category, :account_number_last4, true, :uid,
+                            :now, :now)
                 """), {
                     'name': request.form['name'],
                     'debt_type': request.form['debt_type'],
@@ -87,15 +87,14 @@ def add_debt():
                     'category': request.form['category'],
                     'account_number_last4': request.form.get('account_number_last4'),
                     'uid': current_user_id(),
+                    'now': datetime.utcnow(),
                 })
 
-            print(f"✅ Added debt account: {request.form['name']}")
+            logger.info("Added debt account: %s", request.form['name'])
             flash('Debt account added successfully!', 'success')
             return redirect(url_for('debts.list_debts'))
         except Exception as e:
-            print(f"❌ Error adding debt: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error adding debt: %s", e)
             flash(f'Error adding debt account: {str(e)}', 'error')
 
     return render_template('add_debt.html')
@@ -106,8 +105,8 @@ def make_payment(debt_id):
     """Process a debt payment (optionally linked to a specific charge)"""
     try:
         data = request.get_json()
-        print(f"💰 Processing payment for debt ID {debt_id}")
-        print(f"📝 Received data: {data}")
+        logger.debug("Processing payment for debt ID %s", debt_id)
+        logger.debug("Received data: %s", data)
 
         required_fields = ['date', 'amount', 'description', 'account_name', 'owner', 'type']
         for field in required_fields:
@@ -136,10 +135,11 @@ def make_payment(debt_id):
             was_active = bool(current_is_active)
             will_be_paid_off = new_balance <= 0
 
-            print(f"💳 Debt: {debt_name}, Current: ${current_balance}, Payment: ${payment_amount}, New: ${new_balance}")
+            logger.debug("Debt: %s, Current: $%s, Payment: $%s, New: $%s",
+                         debt_name, current_balance, payment_amount, new_balance)
 
             if new_balance < 0:
-                print(f"⚠️ Overpayment detected. New balance would be ${new_balance}")
+                logger.warning("Overpayment detected. New balance would be $%s", new_balance)
 
             if debt_charge_id:
                 charge_row = conn.execute(text("""
@@ -151,11 +151,12 @@ def make_payment(debt_id):
                     return jsonify({'success': False, 'error': 'Charge not found or already paid'}), 404
 
                 charge_amount, charge_description = charge_row
-                print(f"💳 Paying charge ID {debt_charge_id}: {charge_description} - ${charge_amount}")
+                logger.debug("Paying charge ID %s: %s - $%s",
+                             debt_charge_id, charge_description, charge_amount)
 
                 conn.execute(text("UPDATE debt_charges SET is_paid = true WHERE id = :id"),
                              {'id': debt_charge_id})
-                print(f"✅ Marked charge ID {debt_charge_id} as paid")
+                logger.info("Marked charge ID %s as paid", debt_charge_id)
 
             dp_result = conn.execute(text("""
                 INSERT INTO debt_payments
@@ -174,8 +175,8 @@ def make_payment(debt_id):
                 'uid': uid,
             })
             debt_payment_id = dp_result.fetchone()[0]
-            print(f"✅ Created debt payment record ID: {debt_payment_id}" +
-                  (f" (linked to charge {debt_charge_id})" if debt_charge_id else " (general payment)"))
+            logger.info("Created debt payment record ID: %s (%s)", debt_payment_id,
+                        f"linked to charge {debt_charge_id}" if debt_charge_id else "general payment")
 
             t_result = conn.execute(text("""
                 INSERT INTO transactions
@@ -199,7 +200,8 @@ def make_payment(debt_id):
                 'now': datetime.utcnow(),
             })
             transaction_id = t_result.fetchone()[0]
-            print(f"✅ Created transaction record ID: {transaction_id}")
+            apply_rollup(conn, "id = :id", {'id': transaction_id})
+            logger.info("Created transaction record ID: %s", transaction_id)
 
             new_is_active = new_balance > 0
             conn.execute(text("""
@@ -210,13 +212,15 @@ def make_payment(debt_id):
 
         if will_be_paid_off and was_active:
             success_message = f'🎉 Congratulations! Payment of ${payment_amount:.2f} applied - Debt is now PAID OFF!'
-            print(f"✅ Payment of ${payment_amount} applied to {debt_name}. DEBT PAID OFF!")
+            logger.info("Payment of $%s applied to %s. DEBT PAID OFF!", payment_amount, debt_name)
         elif not was_active and new_balance > 0:
             success_message = f'Payment of ${payment_amount:.2f} applied - Debt account reopened.'
-            print(f"✅ Payment of ${payment_amount} applied to {debt_name}. Debt reopened. New balance: ${new_balance}")
+            logger.info("Payment of $%s applied to %s. Debt reopened. New balance: $%s",
+                        payment_amount, debt_name, new_balance)
         else:
             success_message = f'Payment of ${payment_amount:.2f} applied successfully!'
-            print(f"✅ Payment of ${payment_amount} applied to {debt_name}. New balance: ${new_balance}")
+            logger.info("Payment of $%s applied to %s. New balance: $%s",
+                        payment_amount, debt_name, new_balance)
 
         return jsonify({
             'success': True,
@@ -226,9 +230,7 @@ def make_payment(debt_id):
             'is_paid_off': not new_is_active
         })
     except Exception as e:
-        print(f"❌ Error processing payment: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error processing payment: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -236,16 +238,15 @@ def make_payment(debt_id):
 def get_debt(debt_id):
     """Get debt account details for editing"""
     try:
-        print(f"📄 Getting debt account ID {debt_id}")
+        logger.debug("Getting debt account ID %s", debt_id)
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"SELECT * FROM debt_accounts WHERE id = :id AND is_active = true {uid_sql}",
-                     {'id': debt_id, **uid_p})
+            debt = fetch_row(conn, f"SELECT * FROM debt_accounts WHERE id = :id AND is_active = true {uid_sql}",
+                             {'id': debt_id, **uid_p})
 
-        if df.empty:
+        if debt is None:
             return jsonify({'success': False, 'error': 'Debt account not found'}), 404
 
-        debt = df.iloc[0].to_dict()
         debt['account_number_last4'] = debt.get('account_number_last4') or ''
         debt['minimum_payment'] = float(debt['minimum_payment']) if debt.get('minimum_payment') is not None else None
         debt['interest_rate'] = float(debt['interest_rate']) if debt.get('interest_rate') is not None else None
@@ -253,12 +254,10 @@ def get_debt(debt_id):
         debt['original_balance'] = float(debt['original_balance'])
         debt['current_balance'] = float(debt['current_balance'])
 
-        print(f"📄 Returning debt account: {debt['name']}")
+        logger.debug("Returning debt account: %s", debt['name'])
         return jsonify({'success': True, 'debt': debt})
     except Exception as e:
-        print(f"❌ Error getting debt account: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting debt account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -267,17 +266,17 @@ def update_debt(debt_id):
     """Update debt account details"""
     try:
         data = request.get_json()
-        print(f"✏️ Updating debt account ID {debt_id}")
-        print(f"📝 Update data: {data}")
+        logger.debug("Updating debt account ID %s", debt_id)
+        logger.debug("Update data: %s", data)
 
         required_fields = ['name', 'debt_type', 'owner', 'original_balance', 'current_balance', 'category']
         for field in required_fields:
             value = data.get(field)
             if value is None or (isinstance(value, str) and value.strip() == ''):
-                print(f"❌ Validation failed: '{field}' is missing or empty")
+                logger.warning("Validation failed: '%s' is missing or empty", field)
                 return jsonify({'success': False, 'error': f'{field} is required'}), 400
 
-        print("✅ All required fields validated successfully")
+        logger.debug("All required fields validated successfully")
 
         uid_sql, uid_p = uid_clause()
         with db.engine.begin() as conn:
@@ -313,15 +312,13 @@ def update_debt(debt_id):
             if upd.rowcount == 0:
                 return jsonify({'success': False, 'error': 'No changes made'}), 404
 
-        print(f"✅ Updated debt account: {data['name']}")
+        logger.info("Updated debt account: %s", data['name'])
         return jsonify({
             'success': True,
             'message': f'Debt account "{data["name"]}" updated successfully!'
         })
     except Exception as e:
-        print(f"❌ Error updating debt account: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating debt account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -329,7 +326,7 @@ def update_debt(debt_id):
 def get_payment_history(debt_id):
     """Get payment history AND charges for a debt account"""
     try:
-        print(f"📊 Getting payment history + charges for debt ID {debt_id}")
+        logger.debug("Getting payment history + charges for debt ID %s", debt_id)
 
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
@@ -343,7 +340,7 @@ def get_payment_history(debt_id):
 
             debt_name, original_balance, current_balance = debt_row
 
-            payments_df = _df(conn, """
+            payments_rows = fetch_rows(conn, """
                 SELECT id, debt_charge_id, payment_amount, principal_amount, interest_amount,
                        payment_date, balance_after_payment, payment_type, notes
                 FROM debt_payments
@@ -351,7 +348,7 @@ def get_payment_history(debt_id):
                 ORDER BY payment_date DESC, id DESC
             """, {'id': debt_id})
 
-            charges_df = _df(conn, """
+            charges_rows = fetch_rows(conn, """
                 SELECT id, charge_amount, charge_date, description,
                        category, charge_type, is_paid, notes
                 FROM debt_charges
@@ -361,17 +358,17 @@ def get_payment_history(debt_id):
 
         payments = []
         total_paid = 0
-        for _, row in payments_df.iterrows():
+        for row in payments_rows:
             payment = {
                 'id': int(row['id']),
-                'debt_charge_id': int(row['debt_charge_id']) if pd.notna(row['debt_charge_id']) else None,
+                'debt_charge_id': int(row['debt_charge_id']) if row['debt_charge_id'] is not None else None,
                 'payment_amount': float(row['payment_amount']),
-                'principal_amount': float(row['principal_amount']) if pd.notna(row['principal_amount']) else None,
-                'interest_amount': float(row['interest_amount']) if pd.notna(row['interest_amount']) else None,
+                'principal_amount': float(row['principal_amount']) if row['principal_amount'] is not None else None,
+                'interest_amount': float(row['interest_amount']) if row['interest_amount'] is not None else None,
                 'payment_date': row['payment_date'],
                 'balance_after_payment': float(row['balance_after_payment']),
-                'payment_type': row['payment_type'] if pd.notna(row['payment_type']) else 'Regular',
-                'notes': row['notes'] if pd.notna(row['notes']) else ''
+                'payment_type': row['payment_type'] if row['payment_type'] is not None else 'Regular',
+                'notes': row['notes'] if row['notes'] is not None else ''
             }
             payments.append(payment)
             total_paid += float(row['payment_amount'])
@@ -379,16 +376,16 @@ def get_payment_history(debt_id):
         charges = []
         total_charges = 0
         unpaid_charges = 0
-        for _, row in charges_df.iterrows():
+        for row in charges_rows:
             charge = {
                 'id': int(row['id']),
                 'charge_amount': float(row['charge_amount']),
                 'charge_date': row['charge_date'],
                 'description': row['description'],
-                'category': row['category'] if pd.notna(row['category']) else '',
-                'charge_type': row['charge_type'] if pd.notna(row['charge_type']) else 'Purchase',
+                'category': row['category'] if row['category'] is not None else '',
+                'charge_type': row['charge_type'] if row['charge_type'] is not None else 'Purchase',
                 'is_paid': bool(row['is_paid']),
-                'notes': row['notes'] if pd.notna(row['notes']) else ''
+                'notes': row['notes'] if row['notes'] is not None else ''
             }
             charges.append(charge)
             total_charges += float(row['charge_amount'])
@@ -398,8 +395,9 @@ def get_payment_history(debt_id):
         payment_count = len(payments)
         avg_payment = total_paid / payment_count if payment_count > 0 else 0
 
-        print(f"📊 Found {payment_count} payments totaling ${total_paid:.2f}")
-        print(f"📊 Found {len(charges)} charges totaling ${total_charges:.2f} ({unpaid_charges} unpaid)")
+        logger.debug("Found %s payments totaling $%.2f", payment_count, total_paid)
+        logger.debug("Found %s charges totaling $%.2f (%s unpaid)",
+                     len(charges), total_charges, unpaid_charges)
 
         return jsonify({
             'success': True,
@@ -416,9 +414,7 @@ def get_payment_history(debt_id):
             'charges': charges
         })
     except Exception as e:
-        print(f"❌ Error getting payment history: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting payment history: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -426,9 +422,9 @@ def get_payment_history(debt_id):
 def get_unpaid_charges(debt_id):
     """Get all unpaid charges for a debt account"""
     try:
-        print(f"💳 Getting unpaid charges for debt ID {debt_id}")
+        logger.debug("Getting unpaid charges for debt ID %s", debt_id)
         with db.engine.connect() as conn:
-            df = _df(conn, """
+            rows = fetch_rows(conn, """
                 SELECT id, charge_amount, charge_date, description, category, charge_type
                 FROM debt_charges
                 WHERE debt_account_id = :id AND is_paid = false
@@ -441,17 +437,15 @@ def get_unpaid_charges(debt_id):
                 'charge_amount': float(row['charge_amount']),
                 'charge_date': row['charge_date'],
                 'description': row['description'],
-                'category': row['category'] if pd.notna(row['category']) else '',
-                'charge_type': row['charge_type'] if pd.notna(row['charge_type']) else 'Purchase'
+                'category': row['category'] if row['category'] is not None else '',
+                'charge_type': row['charge_type'] if row['charge_type'] is not None else 'Purchase'
             }
-            for _, row in df.iterrows()
+            for row in rows
         ]
-        print(f"💳 Found {len(charges)} unpaid charges")
+        logger.debug("Found %s unpaid charges", len(charges))
         return jsonify({'success': True, 'charges': charges, 'count': len(charges)})
     except Exception as e:
-        print(f"❌ Error getting unpaid charges: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting unpaid charges: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -459,7 +453,7 @@ def get_unpaid_charges(debt_id):
 def delete_debt(debt_id):
     """Delete a debt account and all associated records"""
     try:
-        print(f"🗑️ Deleting debt account ID {debt_id}")
+        logger.debug("Deleting debt account ID %s", debt_id)
 
         uid_sql, uid_p = uid_clause()
         with db.engine.begin() as conn:
@@ -473,18 +467,18 @@ def delete_debt(debt_id):
             debt_name = name_row[0]
 
             upd = conn.execute(text("""
-                UPDATE transactions SET debt_payment_id = NULL
+                UPDATE transactions SET debt_payment_id = NULL, updated_at = :now
                 WHERE debt_payment_id IN (
                     SELECT id FROM debt_payments WHERE debt_account_id = :id
                 )
-            """), {'id': debt_id})
+            """), {'id': debt_id, 'now': datetime.utcnow()})
             updated_transactions = upd.rowcount
-            print(f"📝 Updated {updated_transactions} transactions (removed debt payment link)")
+            logger.debug("Updated %s transactions (removed debt payment link)", updated_transactions)
 
             del_pay = conn.execute(text(
                 "DELETE FROM debt_payments WHERE debt_account_id = :id"
             ), {'id': debt_id})
-            print(f"🗑️ Deleted {del_pay.rowcount} debt payment records")
+            logger.info("Deleted %s debt payment records", del_pay.rowcount)
 
             del_debt = conn.execute(text(
                 f"DELETE FROM debt_accounts WHERE id = :id {uid_sql}"
@@ -492,13 +486,11 @@ def delete_debt(debt_id):
             if del_debt.rowcount == 0:
                 return jsonify({'success': False, 'error': 'Failed to delete debt account'}), 500
 
-        print(f"✅ Deleted debt account: {debt_name}")
+        logger.info("Deleted debt account: %s", debt_name)
         return jsonify({
             'success': True,
             'message': f'Debt account "{debt_name}" deleted successfully! ({updated_transactions} transactions preserved)'
         })
     except Exception as e:
-        print(f"❌ Error deleting debt account: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting debt account: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
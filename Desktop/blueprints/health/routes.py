@@ -0,0 +1,87 @@
+import os
+import time
+import logging
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from models import db
+
+logger = logging.getLogger(__name__)
+
+health_bp = Blueprint('health', __name__)
+
+
+def pool_stats(pool):
+    """Size / checked-out / checked-in / overflow of a QueuePool; {} for NullPool/StaticPool."""
+    stats = {}
+    for key, attr in (('size', 'size'), ('checked_out', 'checkedout'),
+                      ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+        if hasattr(pool, attr):
+            stats[key] = getattr(pool, attr)()
+    if 'overflow' in stats:
+        # QueuePool.overflow() counts up from -pool_size until the pool is full
+        stats['overflow'] = max(stats['overflow'], 0)
+        stats['max_overflow'] = getattr(pool, '_max_overflow', None)
+    return stats
+
+
+def _pool_exhausted(stats):
+    max_overflow = stats.get('max_overflow')
+    if 'size' not in stats or max_overflow is None or max_overflow < 0:
+        return False
+    return stats['checked_out'] >= stats['size'] + max_overflow
+
+
+def _no_store(response, status):
+    response.headers['Cache-Control'] = 'no-store'
+    return response, status
+
+
+@health_bp.route('/healthz')
+def healthz():
+    """Liveness: the worker answers requests. Touches no database."""
+    return _no_store(jsonify({'status': 'ok', 'pid': os.getpid()}), 200)
+
+
+@health_bp.route('/readyz')
+def readyz():
+    """
+    Readiness: one SELECT 1 under a statement timeout, the stored schema
+    version and the connection pool. 503 when the database does not answer,
+    the schema is behind the code, or every pooled connection is in use
+    (a new request would queue for pool_timeout).
+    """
+    from schema_version import required_schema_version, schema_is_current
+
+    engine = db.engine
+    timeout_ms = int(current_app.config.get('HEALTHCHECK_DB_TIMEOUT_MS', 2000))
+    pool = pool_stats(engine.pool)
+    body = {'status': 'ok', 'pid': os.getpid(), 'pool': pool}
+
+    if _pool_exhausted(pool):
+        body['status'] = 'unavailable'
+        body['error'] = 'connection pool exhausted'
+        return _no_store(jsonify(body), 503)
+
+    started = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == 'postgresql':
+                # Scoped to this probe's transaction (rolled back on close)
+                conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            conn.execute(text("SELECT 1"))
+            body['db_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            stored = conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+    except Exception as e:
+        logger.warning("Readiness check failed: %s", e)
+        body['status'] = 'unavailable'
+        body['error'] = type(e).__name__
+        return _no_store(jsonify(body), 503)
+
+    required = required_schema_version()
+    body['schema'] = {'stored': stored, 'required': required}
+    if not schema_is_current(stored, required):
+        body['status'] = 'unavailable'
+        body['error'] = 'database schema is behind the code'
+        return _no_store(jsonify(body), 503)
+
+    return _no_store(jsonify(body), 200)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from models import db, User, UserOwner
 from sqlalchemy import text
@@ -46,6 +47,7 @@ def onboarding_complete():
 
     owner_name = request.form.get('owner_name', '').strip() or user.username
 
+    now = datetime.utcnow()
     with db.engine.begin() as conn:
         conn.execute(text("""
             INSERT INTO user_owners (user_id, name, is_active)
@@ -55,10 +57,10 @@ def onboarding_complete():
 
         for seed in CATEGORY_SEEDS:
             conn.execute(text("""
-                INSERT INTO budget_templates (user_id, category, budget_amount)
-                VALUES (:uid, :category, :amount)
+                INSERT INTO budget_templates (user_id, category, budget_amount, created_at, updated_at)
+                VALUES (:uid, :category, :amount, :now, :now)
                 ON CONFLICT (category, user_id) DO NOTHING
-            """), {'uid': uid, 'category': seed['category'], 'amount': seed['budget_amount']})
+            """), {'uid': uid, 'category': seed['category'], 'amount': seed['budget_amount'], 'now': now})
 
         conn.execute(text("""
             UPDATE users SET onboarded = TRUE WHERE id = :uid
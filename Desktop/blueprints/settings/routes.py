@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, session, send_file
+from flask import (Blueprint, render_template, request, flash, redirect, url_for, jsonify, Response, session,
+                   send_file, stream_with_context)
 import os
+import logging
 import sys
 import shutil
 import zipfile
@@ -11,48 +13,21 @@ from config import get_app_version
 from models import db, User
 from sqlalchemy import text
 from utils import current_user_id
+from rollups import clear_rollups
+from backup_io import load_backup, iter_export, export_filename, export_mimetype, EXPORT_FORMATS, BACKUP_SUFFIXES
+import backup_chain
+from snapshots import snapshots_enabled
+from recommendation_cache import refresh_recommendations_async
 from auth import require_admin, _log_audit, _auth_disabled
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
+logger = logging.getLogger(__name__)
 
 
 def _is_local_mode():
     return _auth_disabled()
 
 
-def _backups_dir():
-    base = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'backups'))
-    os.makedirs(base, exist_ok=True)
-    return base
-
-
-def _serial(obj):
-    if hasattr(obj, 'isoformat'):
-        return obj.isoformat()
-    return str(obj)
-
-
-def _export_all_data(uid):
-    """Return dict of all 12 data tables, optionally scoped to uid."""
-    tables = [
-        'transactions', 'budget_templates', 'budget_subcategory_templates',
-        'monthly_budgets', 'unexpected_expenses', 'debt_accounts',
-        'debt_payments', 'budget_commitments',
-        'user_owners', 'custom_types', 'custom_subcategories', 'custom_accounts'
-    ]
-    uid_where = "WHERE user_id = :uid" if uid is not None else ""
-    uid_p = {"uid": uid} if uid is not None else {}
-    data = {}
-    with db.engine.connect() as conn:
-        for table in tables:
-            try:
-                rows = conn.execute(text(f"SELECT * FROM {table} {uid_where}"), uid_p).mappings().all()
-                data[table] = [dict(row) for row in rows]
-            except Exception:
-                data[table] = []
-    return data
-
-
 @settings_bp.route('/')
 def index():
     """Settings page"""
@@ -61,21 +36,14 @@ def index():
     if session.get('role') == 'admin':
         users = db.session.query(User).order_by(User.created_at).all()
     local_mode = _is_local_mode()
-    backups = []
-    if local_mode:
-        bdir = _backups_dir()
-        for f in sorted(os.listdir(bdir), reverse=True):
-            if f.endswith('.json'):
-                fp = os.path.join(bdir, f)
-                stat = os.stat(fp)
-                backups.append({'filename': f, 'size': stat.st_size,
-                                'created': datetime.fromtimestamp(stat.st_mtime)})
+    backups = backup_chain.list_backups() if local_mode else []
     return render_template('settings.html',
                          db_exists=True,
                          db_size=None,
                          db_modified=None,
                          backups=backups,
                          local_mode=local_mode,
+                         snapshots=local_mode and snapshots_enabled(),
                          version=version_info['version'],
                          build_date=version_info['build_date'],
                          build_number=version_info['build_number'],
@@ -84,22 +52,26 @@ def index():
 
 @settings_bp.route('/export-my-data')
 def export_my_data():
-    """Export the current user's own data as JSON."""
-    try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        uid = current_user_id()
-        data = _export_all_data(uid=uid)
-        _log_audit('export_personal_data', current_user_id())
-        json_str = json.dumps(data, default=_serial, indent=2)
-        return Response(
-            json_str,
-            mimetype='application/json',
-            headers={'Content-Disposition': f'attachment;filename=my_data_{timestamp}.json'}
-        )
-    except Exception as e:
-        flash(f'Error exporting data: {str(e)}', 'error')
+    """
+    Export the current user's own data, streamed as it is read.
+    ?format=json (default) or ndjson; ?gzip=1 compresses it.
+    """
+    fmt = request.args.get('format', 'json')
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    if fmt not in EXPORT_FORMATS:
+        flash(f'Unknown export format: {fmt}', 'error')
         return redirect(url_for('settings.index'))
 
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    uid = current_user_id()
+    _log_audit('export_personal_data', uid)
+    filename = export_filename(f'my_data_{timestamp}', fmt, compress)
+    return Response(
+        stream_with_context(iter_export(uid, fmt, compress)),
+        mimetype=export_mimetype(fmt, compress),
+        headers={'Content-Disposition': f'attachment;filename={filename}'}
+    )
+
 
 @settings_bp.route('/download-database')
 def download_database():
@@ -107,136 +79,20 @@ def download_database():
     return redirect(url_for('settings.export_my_data'))
 
 
-def _import_data(data, uid):
+def _import_data(fh, uid):
     """
-    Validate and atomically restore data from a parsed JSON backup dict.
+    Validate and atomically restore data from a JSON backup file object.
     - uid: current_user_id() in cloud, None in dev.
-    - In cloud mode: all row user_ids are overwritten with uid.
-    - In dev mode: original user_ids are preserved.
-    Raises ValueError on bad structure. Raises on DB error (caller rolls back).
+    - In cloud mode: all row user_ids are overwritten with uid and rows get
+      new ids (references between tables are remapped).
+    - In dev mode: original ids and user_ids are preserved.
+    The file is streamed (backup_io.load_backup), so its size is not limited.
+    Raises ValueError on bad structure. Raises on DB error (nothing is changed).
     """
-    KNOWN_TABLES = {
-        'transactions', 'budget_templates', 'budget_subcategory_templates',
-        'monthly_budgets', 'unexpected_expenses', 'debt_accounts',
-        'debt_payments', 'budget_commitments',
-        'user_owners', 'custom_types', 'custom_subcategories', 'custom_accounts'
-    }
-
-    # 1. Structural validation
-    if not isinstance(data, dict):
-        raise ValueError("Invalid backup format: root must be a JSON object.")
-    unknown = set(data.keys()) - KNOWN_TABLES
-    if unknown:
-        raise ValueError(f"Unrecognised tables in backup: {unknown}")
-    for key, rows in data.items():
-        if not isinstance(rows, list):
-            raise ValueError(f"Table '{key}' must be an array of rows.")
-
-    # 2. In cloud mode, rewrite every user_id to the current user
-    if uid is not None:
-        for rows in data.values():
-            for row in rows:
-                if 'user_id' in row:
-                    row['user_id'] = uid
-
-    # 3. Delete (FK-safe order) + Insert (reverse order) in one transaction
-    DELETE_ORDER = [
-        'debt_payments', 'debt_accounts', 'budget_commitments',
-        'budget_subcategory_templates', 'monthly_budgets', 'unexpected_expenses',
-        'budget_templates', 'transactions',
-        'custom_types', 'custom_subcategories', 'custom_accounts', 'user_owners'
-    ]
-    INSERT_ORDER = list(reversed(DELETE_ORDER))
-
-    uid_where = "WHERE user_id = :uid" if uid is not None else ""
-    uid_p = {"uid": uid} if uid is not None else {}
-
-    # Logical FK columns within user data (not enforced by DB constraints)
-    # child_table → (child_fk_col, parent_table)
-    FK_REFS = {
-        'debt_payments': ('debt_account_id', 'debt_accounts'),
-    }
-
-    with db.engine.begin() as conn:
-        # Delete existing data
-        for table in DELETE_ORDER:
-            conn.execute(text(f"DELETE FROM {table} {uid_where}"), uid_p)
-
-        if uid is not None:
-            # Cloud / multi-user mode:
-            # Strip the 'id' column entirely so we never collide with other
-            # users' rows.  Use RETURNING id to build old→new id maps for FK
-            # remapping across tables.
-            id_maps = {}
-            for table in INSERT_ORDER:
-                rows = data.get(table, [])
-                if not rows:
-                    id_maps[table] = {}
-                    continue
-
-                # Remap FK columns before insert, using parent id_maps
-                fk_info = FK_REFS.get(table)
-                if fk_info:
-                    fk_col, ref_table = fk_info
-                    ref_map = id_maps.get(ref_table, {})
-                    for row in rows:
-                        if row.get(fk_col) is not None:
-                            row[fk_col] = ref_map.get(row[fk_col], row[fk_col])
-
-                cols = [c for c in rows[0].keys() if c != 'id']
-                col_list = ', '.join(f'"{c}"' for c in cols)
-                placeholders = ', '.join(f':{c}' for c in cols)
-                id_maps[table] = {}
-                for row in rows:
-                    row_data = {k: v for k, v in row.items() if k != 'id'}
-                    old_id = row.get('id')
-                    result = conn.execute(
-                        text(f"INSERT INTO {table} ({col_list}) VALUES ({placeholders}) RETURNING id"),
-                        row_data
-                    )
-                    new_id = result.scalar()
-                    if old_id is not None:
-                        id_maps[table][old_id] = new_id
-
-            # transactions.debt_payment_id references debt_payments.id, but
-            # transactions are inserted before debt_payments in INSERT_ORDER,
-            # so fix those links with a post-insert UPDATE.
-            dp_map = id_maps.get('debt_payments', {})
-            if dp_map:
-                for old_id, new_id in dp_map.items():
-                    conn.execute(
-                        text("UPDATE transactions SET debt_payment_id = :new "
-                             "WHERE debt_payment_id = :old AND user_id = :uid"),
-                        {'new': new_id, 'old': old_id, 'uid': uid}
-                    )
+    load_backup(fh, uid)
 
-        else:
-            # Dev / single-user mode (typically SQLite):
-            # Keep original IDs — no other users to conflict with.
-            for table in INSERT_ORDER:
-                rows = data.get(table, [])
-                if not rows:
-                    continue
-                cols = list(rows[0].keys())
-                col_list = ', '.join(f'"{c}"' for c in cols)
-                placeholders = ', '.join(f':{c}' for c in cols)
-                for row in rows:
-                    conn.execute(text(
-                        f"INSERT INTO {table} ({col_list}) VALUES ({placeholders})"
-                    ), row)
-
-            # On Postgres dev mode, explicit IDs don't advance sequences;
-            # reset them so future inserts get fresh IDs.
-            if db.engine.dialect.name == 'postgresql':
-                for table in KNOWN_TABLES:
-                    seq = conn.execute(text(
-                        f"SELECT pg_get_serial_sequence('{table}', 'id')"
-                    )).scalar()
-                    if seq:
-                        conn.execute(text(
-                            f"SELECT setval('{seq}', "
-                            f"GREATEST(COALESCE((SELECT MAX(id) FROM {table}), 1), 1))"
-                        ))
+    # Warm the recommendation cache the rebuild just invalidated
+    refresh_recommendations_async(uid)
 
 
 @settings_bp.route('/upload-database', methods=['POST'])
@@ -262,36 +118,23 @@ def import_data():
 
     # 2. Security: filename sanitisation + extension check
     filename = secure_filename(file.filename)
-    if not filename.endswith('.json'):
-        flash('Only .json backup files are accepted.', 'error')
-        return redirect(url_for('settings.index'))
-
-    # 3. Size guard (10 MB ceiling)
-    file.seek(0, 2)
-    size = file.tell()
-    file.seek(0)
-    if size > 10 * 1024 * 1024:
-        flash('File too large (max 10 MB).', 'error')
+    if not filename.endswith(BACKUP_SUFFIXES):
+        flash('Only .json or .ndjson backup files (optionally .gz) are accepted.', 'error')
         return redirect(url_for('settings.index'))
 
-    # 4. Parse JSON
-    try:
-        data = json.load(file)
-    except json.JSONDecodeError as e:
-        flash(f'Invalid JSON file: {e}', 'error')
-        return redirect(url_for('settings.index'))
-
-    # 5. Import
+    # 3. Import (streamed from the upload, whatever its size)
     try:
         uid = current_user_id()
-        _import_data(data, uid)
+        _import_data(file.stream, uid)
         _log_audit('import_data', uid)
+        if _is_local_mode():
+            # Restored rows keep old ids and timestamps: start a new chain
+            backup_chain.reset_chain()
         flash('Data restored successfully from backup.', 'success')
     except ValueError as e:
         flash(f'Invalid backup file: {e}', 'error')
     except Exception as e:
-        from flask import current_app
-        current_app.logger.error(f'Import error: {e}', exc_info=True)
+        logger.exception('Import error: %s', e)
         flash('Import failed. The backup file may be from an incompatible version. '
               'No data was changed.', 'error')
 
@@ -304,29 +147,66 @@ def create_backup():
         flash('Local backups are not available on cloud deployments.', 'info')
         return redirect(url_for('settings.index'))
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'backup_{timestamp}.json'
-        data = _export_all_data(uid=None)
-        path = os.path.join(_backups_dir(), filename)
-        with open(path, 'w') as f:
-            json.dump(data, f, default=_serial, indent=2)
-        flash(f'Backup saved: {filename}', 'success')
+        # A snapshot on SQLite; otherwise an incremental on top of the chain
+        # unless a full one is asked for
+        backup = backup_chain.create_local_backup(full=request.form.get('kind') == 'full')
+        flash(f"{backup['kind'].capitalize()} backup saved: {backup['filename']}", 'success')
     except Exception as e:
+        logger.exception('Backup failed: %s', e)
         flash(f'Backup failed: {str(e)}', 'error')
     return redirect(url_for('settings.index'))
 
 
+@settings_bp.route('/compact-backups', methods=['POST'])
+def compact_backups():
+    """Fold the incremental backup chain into one full backup."""
+    if not _is_local_mode():
+        flash('Not available on cloud deployments.', 'info')
+        return redirect(url_for('settings.index'))
+    try:
+        filename = backup_chain.compact_chain()
+        if filename:
+            flash(f'Incremental backups compacted into {filename}', 'success')
+        else:
+            flash('No incremental backups to compact.', 'info')
+    except Exception as e:
+        logger.exception('Backup compaction failed: %s', e)
+        flash(f'Compaction failed: {str(e)}', 'error')
+    return redirect(url_for('settings.index'))
+
+
+@settings_bp.route('/restore-local-backup/<filename>', methods=['POST'])
+def restore_local_backup(filename):
+    """Restore a local backup: a SQLite snapshot, or a JSON backup and the chain it builds on."""
+    if not _is_local_mode():
+        flash('Not available on cloud deployments.', 'info')
+        return redirect(url_for('settings.index'))
+    filename = os.path.basename(filename)
+    try:
+        backup_chain.restore_local_backup(filename)
+        _log_audit('restore_local_backup', extra={'filename': filename})
+        refresh_recommendations_async(None)
+        flash(f'Data restored from {filename}.', 'success')
+    except ValueError as e:
+        flash(f'Invalid backup: {e}', 'error')
+    except Exception as e:
+        logger.exception('Restore error: %s', e)
+        flash('Restore failed. No data was changed.', 'error')
+    return redirect(url_for('settings.index'))
+
+
 @settings_bp.route('/restore-backup/<filename>', methods=['GET'])
 def restore_backup(filename):
     if not _is_local_mode():
         flash('Not available on cloud deployments.', 'info')
         return redirect(url_for('settings.index'))
     filename = os.path.basename(filename)
-    path = os.path.join(_backups_dir(), filename)
+    path = os.path.join(backup_chain.backups_dir(), filename)
     if not os.path.exists(path):
         flash('Backup not found.', 'error')
         return redirect(url_for('settings.index'))
-    return send_file(path, as_attachment=True, download_name=filename, mimetype='application/json')
+    mimetype = 'application/gzip' if filename.endswith('.gz') else 'application/json'
+    return send_file(path, as_attachment=True, download_name=filename, mimetype=mimetype)
 
 
 @settings_bp.route('/delete-backup/<filename>', methods=['POST'])
@@ -335,8 +215,14 @@ def delete_backup(filename):
         flash('Not available on cloud deployments.', 'info')
         return redirect(url_for('settings.index'))
     filename = os.path.basename(filename)
-    path = os.path.join(_backups_dir(), filename)
-    if os.path.exists(path) and filename.endswith('.json'):
+    path = os.path.join(backup_chain.backups_dir(), filename)
+    if os.path.exists(path) and filename.endswith(backup_chain.LOCAL_BACKUP_SUFFIXES):
+        dependents = backup_chain.dependents(filename)
+        if dependents:
+            flash(f'"{filename}" is needed to restore {len(dependents)} newer incremental backup(s). '
+                  f'Delete those first, or compact the chain.', 'error')
+            return redirect(url_for('settings.index'))
+        backup_chain.forget(filename)
         os.remove(path)
         flash(f'Backup "{filename}" deleted.', 'success')
     else:
@@ -358,7 +244,8 @@ def delete_all_data():
             'debt_payments', 'debt_accounts', 'budget_commitments',
             'budget_subcategory_templates', 'monthly_budgets', 'unexpected_expenses',
             'budget_templates', 'transactions',
-            'custom_types', 'custom_subcategories', 'custom_accounts', 'user_owners'
+            'custom_types', 'custom_subcategories', 'custom_accounts', 'user_owners',
+            'import_mappings', 'import_jobs'
         ]
         uid = current_user_id()
         uid_where = "WHERE user_id = :uid" if uid is not None else ""
@@ -366,6 +253,7 @@ def delete_all_data():
         with db.engine.begin() as conn:
             for table in tables:
                 conn.execute(text(f"DELETE FROM {table} {uid_where}"), uid_p)
+            clear_rollups(conn, uid)
 
         flash('Your data has been deleted successfully!', 'warning')
         flash('The database schema is preserved — you can start adding data again.', 'info')
@@ -393,7 +281,7 @@ def compare_versions(current, new):
                 return -1
         return 0
     except Exception as e:
-        print(f"Version comparison error: {e}")
+        logger.error("Version comparison error: %s", e)
         return 0
 
 
@@ -432,22 +320,19 @@ def install_update():
         upload_path = os.path.join(temp_upload_dir, 'update.zip')
         file.save(upload_path)
 
-        print(f"\n{'='*60}")
-        print("UPDATE INSTALLATION STARTED")
-        print(f"{'='*60}")
-        print(f"Upload saved to: {upload_path}")
+        logger.info("Update installation started, upload saved to: %s", upload_path)
 
         if not zipfile.is_zipfile(upload_path):
             shutil.rmtree(temp_upload_dir)
             return jsonify({'success': False, 'message': 'Invalid ZIP file'}), 400
 
-        print("✓ ZIP file validated")
+        logger.info("ZIP file validated")
 
         extract_dir = os.path.join(temp_upload_dir, 'extracted')
         os.makedirs(extract_dir, exist_ok=True)
         with zipfile.ZipFile(upload_path, 'r') as zip_ref:
             zip_ref.extractall(extract_dir)
-        print(f"✓ Extracted to: {extract_dir}")
+        logger.info("Extracted to: %s", extract_dir)
 
         app_bundle_path = os.path.join(extract_dir, 'app_bundle')
         if not os.path.exists(app_bundle_path):
@@ -464,12 +349,12 @@ def install_update():
 
         new_version = new_version_info.get('version', 'unknown')
         log_update(f"Update version: {new_version}")
-        print(f"✓ Update version: {new_version}")
+        logger.info("Update version: %s", new_version)
 
         current_version_info = get_app_version()
         current_version = current_version_info.get('version', '1.0.0')
         log_update(f"Current version: {current_version}")
-        print(f"  Current version: {current_version}")
+        logger.info("Current version: %s", current_version)
 
         version_comparison = compare_versions(current_version, new_version)
         if version_comparison == 0:
@@ -486,7 +371,7 @@ def install_update():
                 'message': f'Update package version ({new_version}) is older than current version ({current_version})'
             }), 400
 
-        print(f"✓ Version check passed: {current_version} -> {new_version}")
+        logger.info("Version check passed: %s -> %s", current_version, new_version)
 
         required_files = ['app.py', 'config.py', 'blueprints', 'templates', 'static']
         missing_files = [r for r in required_files if not os.path.exists(os.path.join(app_bundle_path, r))]
@@ -497,7 +382,7 @@ def install_update():
                 'message': f'Update package missing required files: {", ".join(missing_files)}'
             }), 400
 
-        print("✓ All required files present")
+        logger.info("All required files present")
 
         current_app_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
         executor_script = os.path.join(current_app_dir, 'update_executor.sh')
@@ -511,7 +396,7 @@ def install_update():
                     break
 
         if not os.path.exists(executor_script):
-            print(f"⚠️  Executor script not found at: {executor_script}")
+            logger.warning("Executor script not found at: %s", executor_script)
             return jsonify({
                 'success': True,
                 'message': f'Update to version {new_version} validated (manual installation required)',
@@ -528,7 +413,7 @@ def install_update():
                 stderr=subprocess.PIPE,
                 start_new_session=True
             )
-            print("✓ Update executor launched successfully")
+            logger.info("Update executor launched successfully")
 
             def shutdown_flask():
                 import time
@@ -547,16 +432,14 @@ def install_update():
             }), 200
 
         except Exception as executor_error:
-            print(f"❌ Failed to launch executor: {str(executor_error)}")
+            logger.error("Failed to launch executor: %s", executor_error)
             return jsonify({
                 'success': False,
                 'message': f'Failed to launch update executor: {str(executor_error)}'
             }), 500
 
     except Exception as e:
-        print(f"\n❌ UPDATE FAILED: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Update failed: %s", e)
         if 'temp_upload_dir' in locals() and os.path.exists(temp_upload_dir):
             shutil.rmtree(temp_upload_dir)
         return jsonify({
@@ -1,20 +1,21 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import logging
 from datetime import datetime
 from models import db
 from sqlalchemy import text
-import pandas as pd
-from utils import uid_clause, current_user_id
+from utils import uid_clause, current_user_id, keyset_clause, keyset_cursor
+from rollups import apply_rollup, rollup_txn_count
+from query_rows import fetch_rows, fetch_row, fetch_column
+from recommendation_cache import refresh_recommendations_async
+from ingest import validate_transactions, insert_transactions
 
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/transactions')
-
-
-def _df(conn, sql, params=None):
-    return pd.read_sql_query(text(sql), conn, params=params or {})
+logger = logging.getLogger(__name__)
 
 
 @transactions_bp.route('/')
 def list_transactions():
-    """List all transactions with pagination"""
+    """List all transactions with pagination (page numbers, or an `after` keyset cursor for Next)"""
     try:
         page = request.args.get('page', 1, type=int)
         _allowed_per_page = [25, 50, 100, 150, 200, 250]
@@ -24,20 +25,31 @@ def list_transactions():
         offset = (page - 1) * per_page
 
         uid_sql, uid_p = uid_clause()
+        after_sql, after_p = '', {}
+        after = request.args.get('after', '')
+        if after:
+            try:
+                after_sql, after_p = keyset_clause(after)
+                after_sql = f"AND {after_sql}"
+                offset = 0
+            except ValueError:
+                pass  # malformed cursor: fall back to the page number
+
         with db.engine.connect() as conn:
-            total = conn.execute(text(
-                f"SELECT COUNT(*) FROM transactions WHERE COALESCE(is_active, true) = true {uid_sql}"
-            ), uid_p).scalar() or 0
+            total = rollup_txn_count(conn, uid_sql, uid_p)
 
+            # One extra row tells us whether there is a next page
             rows = conn.execute(text(f"""
                 SELECT id, account_name, date, description, amount, sub_category,
                        category, type, owner, is_business, debt_payment_id, is_active,
                        created_at, updated_at
                 FROM transactions
-                WHERE COALESCE(is_active, true) = true {uid_sql}
+                WHERE COALESCE(is_active, true) = true {uid_sql} {after_sql}
                 ORDER BY date DESC, id DESC
                 LIMIT :limit OFFSET :offset
-            """), {"limit": per_page, "offset": offset, **uid_p}).fetchall()
+            """), {"limit": per_page + 1, "offset": offset, **uid_p, **after_p}).fetchall()
+            has_next = len(rows) > per_page
+            rows = rows[:per_page]
 
             # Build types list
             txn_types = [r[0] for r in conn.execute(text(
@@ -67,7 +79,6 @@ def list_transactions():
             transaction_items.append(obj)
 
         has_prev = page > 1
-        has_next = offset + per_page < total
         pages = (total + per_page - 1) // per_page
 
         pagination = type('Pagination', (), {})()
@@ -79,6 +90,7 @@ def list_transactions():
         pagination.has_next = has_next
         pagination.prev_num = page - 1 if has_prev else None
         pagination.next_num = page + 1 if has_next else None
+        pagination.next_cursor = keyset_cursor(rows[-1][2], rows[-1][0]) if has_next else None
 
         def iter_pages():
             start = max(1, page - 2)
@@ -90,9 +102,7 @@ def list_transactions():
         return render_template('transactions.html', transactions=pagination, per_page=per_page, types=types_list)
 
     except Exception as e:
-        print(f"Error in transactions route: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in transactions route: %s", e)
         empty_pagination = type('Pagination', (), {
             'items': [], 'total': 0, 'page': 1, 'pages': 0,
             'has_prev': False, 'has_next': False,
@@ -198,6 +208,7 @@ def add_transaction():
                         "user_id": current_user_id(), "now": now
                     })
                     transaction_id = result.fetchone()[0]
+                    apply_rollup(conn, "id = :id", {"id": transaction_id})
                     transaction_display = "Income" if amount < 0 else "Expense"
                     success_msg = f'{transaction_display} added! ${abs(amount):.2f} - {description}'
 
@@ -209,32 +220,30 @@ def add_transaction():
                 return redirect(url_for('transactions.list_transactions') if not is_credit else url_for('debts.list_debts'))
 
         except Exception as e:
-            print(f"Error adding transaction: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error adding transaction: %s", e)
             flash(f'Error adding transaction: {str(e)}', 'error')
 
     # GET request
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            categories_df = _df(conn, f"""
+            categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT category FROM budget_templates
                 WHERE is_active = true AND category IS NOT NULL {uid_sql}
                 UNION
                 SELECT DISTINCT category FROM transactions WHERE category IS NOT NULL {uid_sql}
                 ORDER BY category
             """, uid_p)
-            sub_categories_df = _df(conn, f"""
+            sub_categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT sub_category FROM transactions
                 WHERE sub_category IS NOT NULL AND sub_category != '' {uid_sql}
                 ORDER BY sub_category
             """, uid_p)
-            accounts_df = _df(conn, f"""
+            accounts_list = fetch_column(conn, f"""
                 SELECT DISTINCT account_name FROM transactions
                 WHERE account_name IS NOT NULL {uid_sql} ORDER BY account_name
             """, uid_p)
-            owners_df = _df(conn, f"""
+            owners_list = fetch_column(conn, f"""
                 SELECT DISTINCT owner FROM transactions
                 WHERE owner IS NOT NULL {uid_sql} ORDER BY owner
             """, uid_p)
@@ -242,10 +251,6 @@ def add_transaction():
                 f"SELECT DISTINCT type FROM transactions WHERE type IS NOT NULL AND type != '' {uid_sql} ORDER BY type"
             ), uid_p).fetchall()]
 
-        categories_list = categories_df['category'].tolist()
-        sub_categories_list = sub_categories_df['sub_category'].tolist()
-        accounts_list = accounts_df['account_name'].tolist()
-        owners_list = owners_df['owner'].tolist()
 
         _defaults = ['Needs', 'Wants', 'Savings', 'Business']
         seen = set(_defaults)
@@ -265,9 +270,7 @@ def add_transaction():
                              accounts=accounts_list, owners=owners_list, types=types_list)
 
     except Exception as e:
-        print(f"Error loading form data: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading form data: %s", e)
         return render_template('add_transaction.html',
                              categories=[], sub_categories=[],
                              accounts=['Venture', 'Cacas', 'Cata'],
@@ -298,51 +301,31 @@ def bulk_transaction():
                 flash('At least one transaction item is required', 'error')
                 raise ValueError("No transaction items provided")
 
-            now = datetime.utcnow()
-            success_count = error_count = 0
+            # Validate everything first, then write the valid rows in a few
+            # set-based statements (see ingest.py). Items only carry date,
+            # description and amount; the common fields apply to all of them.
+            items = [{k: item.get(k) for k in ('date', 'description', 'amount')}
+                     if isinstance(item, dict) else item for item in items]
+            defaults = {
+                'account_name': account_name, 'category': category, 'sub_category': sub_category,
+                'type': transaction_type, 'owner': owner, 'is_business': False,
+            }
+            rows, errors = validate_transactions(items, defaults)
+            user_id = current_user_id()
 
             with db.engine.begin() as conn:
-                # Ensure category exists
-                if category:
-                    conn.execute(text("""
-                        INSERT INTO budget_templates (category, budget_amount, notes, is_active, created_at, updated_at)
-                        VALUES (:cat, 0.00, 'Added from bulk transaction form', true, :now, :now)
-                        ON CONFLICT DO NOTHING
-                    """), {"cat": category, "now": now})
-
-                for item in items:
-                    try:
-                        item_date = item.get('date', '').strip()
-                        item_description = item.get('description', '').strip()
-                        item_amount = float(item.get('amount', 0))
-
-                        if not item_date or not item_description or item_amount == 0:
-                            error_count += 1
-                            continue
-
-                        transaction_date = datetime.strptime(item_date, '%Y-%m-%d').date()
-
-                        conn.execute(text("""
-                            INSERT INTO transactions
-                            (account_name, date, description, amount, sub_category, category,
-                             type, owner, is_business, is_active, user_id, created_at, updated_at)
-                            VALUES (:account, :date, :desc, :amount, :sub_cat, :cat,
-                                    :type, :owner, false, true, :user_id, :now, :now)
-                        """), {
-                            "account": account_name, "date": transaction_date,
-                            "desc": item_description, "amount": item_amount,
-                            "sub_cat": sub_category or None, "cat": category,
-                            "type": transaction_type, "owner": owner,
-                            "user_id": current_user_id(), "now": now
-                        })
-                        success_count += 1
-                    except Exception:
-                        error_count += 1
-
-            if error_count == 0:
+                success_count = insert_transactions(conn, rows, user_id)
+
+            if success_count:
+                refresh_recommendations_async(user_id)
+
+            if not errors:
                 flash(f'Successfully added {success_count} transactions!', 'success')
             else:
-                flash(f'Added {success_count} transactions. {error_count} items had errors.', 'warning')
+                details = '; '.join(f"row {e['index'] + 1}: {e['error']}" for e in errors[:5])
+                more = f' (and {len(errors) - 5} more)' if len(errors) > 5 else ''
+                flash(f'Added {success_count} transactions. {len(errors)} items had errors — '
+                      f'{details}{more}.', 'warning')
 
             return redirect(url_for('transactions.list_transactions'))
 
@@ -350,9 +333,7 @@ def bulk_transaction():
             flash('Error parsing transaction items', 'error')
             return redirect(url_for('transactions.bulk_transaction'))
         except Exception as e:
-            print(f"Error in bulk transaction: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in bulk transaction: %s", e)
             flash(f'Error processing bulk transaction: {str(e)}', 'error')
             return redirect(url_for('transactions.bulk_transaction'))
 
@@ -360,23 +341,23 @@ def bulk_transaction():
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            categories_df = _df(conn, f"""
+            categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT category FROM budget_templates
                 WHERE is_active = true AND category IS NOT NULL {uid_sql}
                 UNION
                 SELECT DISTINCT category FROM transactions WHERE category IS NOT NULL {uid_sql}
                 ORDER BY category
             """, uid_p)
-            sub_categories_df = _df(conn, f"""
+            sub_categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT sub_category FROM transactions
                 WHERE sub_category IS NOT NULL AND sub_category != '' {uid_sql}
                 ORDER BY sub_category
             """, uid_p)
-            accounts_df = _df(conn, f"""
+            accounts_list = fetch_column(conn, f"""
                 SELECT DISTINCT account_name FROM transactions
                 WHERE account_name IS NOT NULL {uid_sql} ORDER BY account_name
             """, uid_p)
-            owners_df = _df(conn, f"""
+            owners_list = fetch_column(conn, f"""
                 SELECT DISTINCT owner FROM transactions
                 WHERE owner IS NOT NULL {uid_sql} ORDER BY owner
             """, uid_p)
@@ -384,10 +365,6 @@ def bulk_transaction():
                 f"SELECT DISTINCT type FROM transactions WHERE type IS NOT NULL AND type != '' {uid_sql} ORDER BY type"
             ), uid_p).fetchall()]
 
-        categories_list = categories_df['category'].tolist()
-        sub_categories_list = sub_categories_df['sub_category'].tolist()
-        accounts_list = accounts_df['account_name'].tolist()
-        owners_list = owners_df['owner'].tolist()
 
         _defaults = ['Needs', 'Wants', 'Savings', 'Business']
         seen = set(_defaults)
@@ -405,42 +382,150 @@ def bulk_transaction():
                              accounts=accounts_list, owners=owners_list, types=types_list)
 
     except Exception as e:
-        print(f"Error loading bulk form data: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error loading bulk form data: %s", e)
         return render_template('bulk_transaction.html',
                              categories=[], sub_categories=[],
                              accounts=['Venture', 'Cacas', 'Cata'],
                              owners=[], types=['Needs', 'Wants', 'Savings', 'Business'])
 
 
+def _import_overrides(form):
+    """Mapping fields submitted on the import form (only those present)."""
+    overrides = {'columns': {}, 'defaults': {}}
+    for key in ('delimiter', 'date_format'):
+        if key in form:
+            overrides[key] = form.get(key, '')
+    if 'skip_rows' in form:
+        overrides['skip_rows'] = form.get('skip_rows', 0, type=int) or 0
+    for key in ('has_header', 'decimal_comma', 'negate'):
+        if f'{key}_present' in form:
+            overrides[key] = form.get(key) == 'on'
+    for field in ('date', 'description', 'amount', 'debit', 'credit', 'category', 'sub_category'):
+        if f'col_{field}' in form:
+            overrides['columns'][field] = form.get(f'col_{field}', '').strip()
+    for field in ('category', 'type', 'owner'):
+        if f'default_{field}' in form:
+            overrides['defaults'][field] = form.get(f'default_{field}', '').strip()
+    return overrides
+
+
+@transactions_bp.route('/import', methods=['GET', 'POST'])
+def import_transactions():
+    """Import a CSV/OFX/QIF bank statement; the import runs in the background (statement_import.py)"""
+    import os
+    import tempfile
+    from statement_import import (FORMATS, detect_format, merge_mapping, load_mapping,
+                                  save_mapping, create_job, submit_import_job)
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        account_name = request.form.get('account_name', '').strip()
+        if not upload or not upload.filename:
+            return jsonify({'success': False, 'error': 'Choose a statement file'}), 400
+        if not account_name:
+            return jsonify({'success': False, 'error': 'Account is required'}), 400
+
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        if fmt not in FORMATS:
+            return jsonify({'success': False, 'error': f'Unsupported format {fmt}'}), 400
+
+        user_id = current_user_id()
+        try:
+            with db.engine.begin() as conn:
+                mapping = merge_mapping(load_mapping(conn, user_id, account_name),
+                                        {**_import_overrides(request.form), 'format': fmt})
+                if not mapping['defaults'].get('owner') or not mapping['defaults'].get('type'):
+                    return jsonify({'success': False, 'error': 'Owner and type are required'}), 400
+                if request.form.get('save_mapping') == 'on':
+                    save_mapping(conn, user_id, account_name, mapping)
+
+            # The upload is streamed to disk, never held in memory
+            fd, path = tempfile.mkstemp(prefix='import_', suffix=f'.{fmt}')
+            os.close(fd)
+            upload.save(path)
+            size = os.path.getsize(path)
+            with db.engine.begin() as conn:
+                job_id = create_job(conn, user_id, account_name, upload.filename, fmt, size)
+
+            # The job deletes the file when it is done
+            submit_import_job(job_id, path, fmt, mapping, account_name, user_id)
+            logger.info("Statement import %s queued (%s, %s bytes)", job_id, fmt, size)
+            return jsonify({'success': True, 'job_id': job_id,
+                            'status_url': url_for('transactions.import_status', job_id=job_id)}), 202
+        except Exception as e:
+            logger.exception("Error starting statement import: %s", e)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    # GET request
+    try:
+        uid_sql, uid_p = uid_clause()
+        with db.engine.connect() as conn:
+            accounts_list = fetch_column(conn, f"""
+                SELECT DISTINCT account_name FROM transactions
+                WHERE account_name IS NOT NULL {uid_sql} ORDER BY account_name
+            """, uid_p)
+            owners_list = fetch_column(conn, f"""
+                SELECT DISTINCT owner FROM transactions
+                WHERE owner IS NOT NULL {uid_sql} ORDER BY owner
+            """, uid_p)
+    except Exception as e:
+        logger.exception("Error loading import form data: %s", e)
+        accounts_list, owners_list = [], []
+
+    return render_template('import_transactions.html',
+                           accounts=accounts_list, owners=owners_list,
+                           types=['Needs', 'Wants', 'Savings', 'Business'],
+                           mapping=merge_mapping())
+
+
+@transactions_bp.route('/import/mapping')
+def import_mapping():
+    """The saved import mapping for an account (defaults when none is saved)"""
+    from statement_import import merge_mapping, load_mapping
+
+    account_name = request.args.get('account', '').strip()
+    with db.engine.connect() as conn:
+        saved = load_mapping(conn, current_user_id(), account_name) if account_name else None
+    return jsonify({'saved': saved is not None, 'mapping': merge_mapping(saved)})
+
+
+@transactions_bp.route('/import/<int:job_id>')
+def import_status(job_id):
+    """Progress of a statement import, polled by the import page"""
+    from flask import current_app
+    from statement_import import job_status
+
+    stale_seconds = current_app.config.get('IMPORT_STALE_SECONDS', 120)
+    with db.engine.begin() as conn:
+        status = job_status(conn, job_id, current_user_id(), stale_seconds)
+    if status is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(status)
+
+
 @transactions_bp.route('/api/get_transaction/<int:transaction_id>')
 def get_transaction(transaction_id):
     """Get transaction details for editing"""
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            transaction = fetch_row(conn, f"""
                 SELECT id, account_name, date, description, amount, sub_category,
                        category, type, owner, is_business, debt_payment_id, created_at, updated_at
                 FROM transactions WHERE id = :id {uid_sql}
             """, {"id": transaction_id, **uid_p})
 
-        if df.empty:
+        if transaction is None:
             return jsonify({'success': False, 'error': 'Transaction not found'}), 404
 
-        transaction = df.iloc[0].to_dict()
         transaction['is_business'] = bool(transaction['is_business'])
         transaction['sub_category'] = transaction['sub_category'] if transaction['sub_category'] else ''
         transaction['amount'] = float(transaction['amount'])
-        transaction['date'] = str(transaction['date'])
 
         return jsonify({'success': True, 'transaction': transaction})
 
     except Exception as e:
-        print(f"Error getting transaction: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting transaction: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -485,6 +570,7 @@ def update_transaction(transaction_id):
                     ON CONFLICT DO NOTHING
                 """), {"cat": category, "now": now})
 
+            apply_rollup(conn, f"id = :id {uid_sql}", {"id": transaction_id, **uid_p}, sign=-1)
             result = conn.execute(text(f"""
                 UPDATE transactions
                 SET account_name = :account, date = :date, description = :desc, amount = :amount,
@@ -501,6 +587,7 @@ def update_transaction(transaction_id):
 
             if result.rowcount == 0:
                 return jsonify({'success': False, 'error': 'Transaction not found or no changes made'}), 404
+            apply_rollup(conn, f"id = :id {uid_sql}", {"id": transaction_id, **uid_p})
 
         transaction_display = "Income" if amount < 0 else "Expense"
         return jsonify({
@@ -509,9 +596,7 @@ def update_transaction(transaction_id):
         })
 
     except Exception as e:
-        print(f"Error updating transaction: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error updating transaction: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -529,6 +614,7 @@ def delete_transaction(transaction_id):
 
             description, amount = row[0], row[1]
 
+            apply_rollup(conn, f"id = :id {uid_sql}", {"id": transaction_id, **uid_p}, sign=-1)
             result = conn.execute(text(f"""
                 UPDATE transactions SET is_active = false, updated_at = :now WHERE id = :id {uid_sql}
             """), {"now": datetime.utcnow(), "id": transaction_id, **uid_p})
@@ -542,9 +628,7 @@ def delete_transaction(transaction_id):
         })
 
     except Exception as e:
-        print(f"Error deleting transaction: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting transaction: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -601,7 +685,7 @@ def add_category():
         return jsonify({'success': True, 'message': f'Category "{category_name}" added successfully'})
 
     except Exception as e:
-        print(f"Error adding category: {e}")
+        logger.error("Error adding category: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
 
@@ -617,7 +701,7 @@ def search_similar_transactions():
 
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT description, category, sub_category, amount, account_name, owner, type
                 FROM transactions
                 WHERE description ILIKE :term {uid_sql}
@@ -632,12 +716,12 @@ def search_similar_transactions():
             'account_name': row['account_name'],
             'owner': row['owner'],
             'type': row['type']
-        } for _, row in df.iterrows()]
+        } for row in rows]
 
         return jsonify(result)
 
     except Exception as e:
-        print(f"Error searching similar transactions: {e}")
+        logger.error("Error searching similar transactions: %s", e)
         return jsonify([])
 
 
@@ -647,32 +731,32 @@ def get_form_data():
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            categories_df = _df(conn, f"""
+            categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT category FROM budget_templates
                 WHERE is_active = true AND category IS NOT NULL {uid_sql}
                 UNION
                 SELECT DISTINCT category FROM transactions WHERE category IS NOT NULL {uid_sql}
                 ORDER BY category
             """, uid_p)
-            sub_categories_df = _df(conn, f"""
+            sub_categories_list = fetch_column(conn, f"""
                 SELECT DISTINCT sub_category FROM transactions
                 WHERE sub_category IS NOT NULL AND sub_category != '' {uid_sql}
                 ORDER BY sub_category
             """, uid_p)
-            accounts_df = _df(conn, f"""
+            accounts_list = fetch_column(conn, f"""
                 SELECT DISTINCT account_name FROM transactions
                 WHERE account_name IS NOT NULL {uid_sql} ORDER BY account_name
             """, uid_p)
-            owners_df = _df(conn, f"""
+            owners_list = fetch_column(conn, f"""
                 SELECT DISTINCT owner FROM transactions
                 WHERE owner IS NOT NULL {uid_sql} ORDER BY owner
             """, uid_p)
 
         form_data = {
-            'categories': categories_df['category'].tolist(),
-            'sub_categories': sub_categories_df['sub_category'].tolist(),
-            'accounts': accounts_df['account_name'].tolist(),
-            'owners': owners_df['owner'].tolist()
+            'categories': categories_list,
+            'sub_categories': sub_categories_list,
+            'accounts': accounts_list,
+            'owners': owners_list
         }
 
         if not form_data['accounts']:
@@ -681,7 +765,7 @@ def get_form_data():
         return jsonify(form_data)
 
     except Exception as e:
-        print(f"Error getting form data: {e}")
+        logger.error("Error getting form data: %s", e)
         return jsonify({
             'categories': [], 'sub_categories': [],
             'accounts': ['Venture', 'Cacas', 'Cata'], 'owners': []
@@ -694,7 +778,7 @@ def api_common_transaction_patterns():
     try:
         uid_sql, uid_p = uid_clause()
         with db.engine.connect() as conn:
-            df = _df(conn, f"""
+            rows = fetch_rows(conn, f"""
                 SELECT category, sub_category, type, COUNT(*) as freq
                 FROM transactions
                 WHERE category IS NOT NULL AND category != ''
@@ -703,11 +787,9 @@ def api_common_transaction_patterns():
                 ORDER BY freq DESC
                 LIMIT 10
             """, uid_p)
-        return jsonify(df.to_dict(orient='records'))
+        return jsonify(rows)
     except Exception as e:
-        print(f"Error in common transaction patterns API: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in common transaction patterns API: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -728,7 +810,5 @@ def api_get_subcategories():
             """), {"cat": category, **uid_p}).fetchall()
         return jsonify([row[0] for row in rows])
     except Exception as e:
-        print(f"Error getting subcategories: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting subcategories: %s", e)
         return jsonify({'error': str(e)}), 500
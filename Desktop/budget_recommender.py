@@ -4,6 +4,7 @@ Uses ML-powered statistical analysis with seasonality detection, trend analysis,
 PostgreSQL-compatible (no sqlite3).
 """
 
+import warnings
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from sqlalchemy import text
@@ -15,12 +16,22 @@ def _get_engine():
     return db.engine
 
 
-def calculate_subcategory_recommendations(owner=None):
+_SPEND_TYPES = "('Needs', 'Wants', 'Business')"
+
+
+def calculate_subcategory_recommendations(owner=None, user_id=None):
     """
     Calculate budget recommendations for all subcategories using ML-powered statistical analysis.
 
+    Every (category, sub_category) is scored in one batch: one grouped query
+    loads the full monthly history from the rollup, one more loads the
+    6/3/1-month window totals, and the outlier filter and percentile blend
+    run vectorized over a (groups × months) NumPy matrix. Categories with
+    budget_by_category set are scored as a single group.
+
     Args:
         owner: Optional owner filter (e.g., 'Cata', 'Cacas', 'Suricata')
+        user_id: Optional user scope (None = every row, as in dev mode)
 
     Returns:
         List of dicts with recommendations per subcategory
@@ -31,71 +42,114 @@ def calculate_subcategory_recommendations(owner=None):
     six_months_ago = today - relativedelta(months=6)
     three_months_ago = today - relativedelta(months=3)
     one_month_ago = today - relativedelta(months=1)
+    owner_sql, owner_params = _build_owner_clause(owner)
+    uid_sql = "AND user_id = :_uid" if user_id is not None else ""
+    scope_sql = f"{owner_sql} {uid_sql}"
+    scope_params = {**owner_params, **({"_uid": user_id} if user_id is not None else {})}
 
     with engine.connect() as conn:
         # Get category budget_by_category settings
-        result = conn.execute(text("""
+        result = conn.execute(text(f"""
             SELECT DISTINCT category, budget_by_category
             FROM budget_subcategory_templates
-            WHERE is_active = true
+            WHERE is_active = true {uid_sql}
             ORDER BY category
-        """))
+        """), scope_params)
         category_settings = {}
         for cat, budget_by_cat in result:
             if cat not in category_settings:
                 category_settings[cat] = budget_by_cat
 
-        # Get all unique category/subcategory combos from transactions
-        if owner:
-            result = conn.execute(text("""
-                SELECT DISTINCT category, sub_category
-                FROM transactions
-                WHERE sub_category IS NOT NULL
-                AND sub_category != ''
-                AND type IN ('Needs', 'Wants', 'Business')
-                AND is_active = true
-                AND owner = :owner
-                ORDER BY category, sub_category
-            """), {"owner": owner})
-        else:
-            result = conn.execute(text("""
-                SELECT DISTINCT category, sub_category
-                FROM transactions
-                WHERE sub_category IS NOT NULL
-                AND sub_category != ''
-                AND type IN ('Needs', 'Wants', 'Business')
-                AND is_active = true
-                ORDER BY category, sub_category
-            """))
-        subcategories = result.fetchall()
-
-    # Group subcategories by category
-    categories_grouped = {}
-    for category, sub_category in subcategories:
-        if category not in categories_grouped:
-            categories_grouped[category] = []
-        categories_grouped[category].append(sub_category)
+        # Full monthly history of every subcategory, from the monthly rollup
+        history = conn.execute(text(f"""
+            SELECT category, sub_category, year * 100 + month as month, SUM(total_abs) as total
+            FROM transaction_monthly_rollups
+            WHERE sub_category != ''
+            AND type IN {_SPEND_TYPES}
+            {scope_sql}
+            GROUP BY category, sub_category, year, month
+            ORDER BY category, sub_category, year, month
+        """), scope_params).fetchall()
+
+        # 6-month, 3-month and last-month totals in one pass over the last 6 months
+        windows = conn.execute(text(f"""
+            SELECT category, sub_category,
+                   SUM(ABS(amount)) as total_6mo,
+                   SUM(CASE WHEN date >= :three_months_ago THEN ABS(amount) ELSE 0 END) as total_3mo,
+                   SUM(CASE WHEN date >= :one_month_ago AND date < :today
+                            THEN ABS(amount) ELSE 0 END) as total_1mo
+            FROM transactions
+            WHERE date >= :six_months_ago
+            AND sub_category != ''
+            AND type IN {_SPEND_TYPES} AND is_active = true
+            {scope_sql}
+            GROUP BY category, sub_category
+        """), {
+            "six_months_ago": six_months_ago.strftime('%Y-%m-%d'),
+            "three_months_ago": three_months_ago.strftime('%Y-%m-%d'),
+            "one_month_ago": one_month_ago.strftime('%Y-%m-%d'),
+            "today": today.strftime('%Y-%m-%d'),
+            **scope_params
+        }).fetchall()
+
+    if not history:
+        return []
+
+    # Map each (category, sub_category) to its group — one per subcategory,
+    # or one per category when the category is budgeted as a whole
+    groups, group_index, group_subs = [], {}, {}
+
+    def _group_key(category, sub_category):
+        return (category, None) if category_settings.get(category, False) else (category, sub_category)
+
+    for category, sub_category, _, _ in history:
+        key = _group_key(category, sub_category)
+        if key not in group_index:
+            group_index[key] = len(groups)
+            groups.append(key)
+        group_subs.setdefault(key, set()).add(sub_category)
+
+    month_keys = sorted({int(r[2]) for r in history})
+    month_index = {m: i for i, m in enumerate(month_keys)}
+
+    # (groups × months) matrix of monthly totals; NaN where a group had no spending rows
+    rows_g = np.array([group_index[_group_key(r[0], r[1])] for r in history])
+    rows_m = np.array([month_index[int(r[2])] for r in history])
+    totals = np.zeros((len(groups), len(month_keys)))
+    np.add.at(totals, (rows_g, rows_m), np.array([float(r[3] or 0) for r in history]))
+    present = np.zeros_like(totals, dtype=bool)
+    present[rows_g, rows_m] = True
+    monthly = np.where(present, totals, np.nan)
+    data_months = present.sum(axis=1)
+
+    window_totals = np.zeros((len(groups), 3))
+    for category, sub_category, total_6mo, total_3mo, total_1mo in windows:
+        g = group_index.get(_group_key(category, sub_category))
+        if g is not None:
+            window_totals[g] += [float(total_6mo or 0), float(total_3mo or 0), float(total_1mo or 0)]
+    avg_6mo = window_totals[:, 0] / 6
+    avg_3mo = window_totals[:, 1] / 3
+    actual_1mo = window_totals[:, 2]
+
+    recommended = _ml_recommend_batch(monthly, data_months, avg_6mo, avg_3mo)
 
     recommendations = []
-    with engine.connect() as conn:
-        for category, subcategory_list in categories_grouped.items():
-            budget_by_category = category_settings.get(category, False)
-
-            if budget_by_category:
-                rec = _calc_category_recommendation(
-                    conn, category, subcategory_list,
-                    six_months_ago, three_months_ago, one_month_ago, today, owner
-                )
-                if rec:
-                    recommendations.append(rec)
-            else:
-                for sub_category in subcategory_list:
-                    rec = _calc_subcategory_recommendation(
-                        conn, category, sub_category,
-                        six_months_ago, three_months_ago, one_month_ago, today, owner
-                    )
-                    if rec:
-                        recommendations.append(rec)
+    for g, (category, sub_category) in enumerate(groups):
+        if avg_6mo[g] == 0 and avg_3mo[g] == 0 and actual_1mo[g] == 0:
+            continue
+        by_category = sub_category is None
+        recommendations.append({
+            'category': category,
+            'sub_category': (f'ALL ({len(group_subs[(category, None)])} subcategories)'
+                             if by_category else sub_category),
+            'recommended_budget': round(float(recommended[g]), 2),
+            'last_6mo_avg': round(float(avg_6mo[g]), 2),
+            'last_3mo_avg': round(float(avg_3mo[g]), 2),
+            'last_1mo_actual': round(float(actual_1mo[g]), 2),
+            'data_months': int(data_months[g]),
+            'confidence': _confidence(int(data_months[g])),
+            'budget_by_category': by_category
+        })
 
     return recommendations
 
@@ -107,175 +161,28 @@ def _build_owner_clause(owner):
     return "", {}
 
 
-def _calc_subcategory_recommendation(conn, category, sub_category,
-                                     six_months_ago, three_months_ago, one_month_ago, today,
-                                     owner):
-    owner_sql, owner_params = _build_owner_clause(owner)
-
-    base_params = {
-        "six_months_ago": six_months_ago.strftime('%Y-%m-%d'),
-        "three_months_ago": three_months_ago.strftime('%Y-%m-%d'),
-        "one_month_ago": one_month_ago.strftime('%Y-%m-%d'),
-        "today": today.strftime('%Y-%m-%d'),
-        "category": category,
-        "sub_category": sub_category,
-        **owner_params
-    }
-
-    # 6-month totals
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_6mo,
-               COUNT(DISTINCT TO_CHAR(date, 'YYYY-MM')) as months_with_spending
-        FROM transactions
-        WHERE date >= :six_months_ago
-        AND category = :category AND sub_category = :sub_category
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-
-    total_6mo = float(row[0]) if row[0] else 0.0
-    avg_6mo = total_6mo / 6
-
-    # 3-month totals
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_3mo
-        FROM transactions
-        WHERE date >= :three_months_ago
-        AND category = :category AND sub_category = :sub_category
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-    avg_3mo = float(row[0]) / 3 if row[0] else 0.0
-
-    # Last month actual
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_1mo
-        FROM transactions
-        WHERE date >= :one_month_ago AND date < :today
-        AND category = :category AND sub_category = :sub_category
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-    actual_1mo = float(row[0]) if row[0] else 0.0
-
-    if avg_6mo == 0 and avg_3mo == 0 and actual_1mo == 0:
-        return None
-
-    # All historical monthly data for ML
-    monthly_rows = conn.execute(text(f"""
-        SELECT TO_CHAR(date, 'YYYY-MM') as month, SUM(ABS(amount)) as total
-        FROM transactions
-        WHERE category = :category AND sub_category = :sub_category
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-        GROUP BY TO_CHAR(date, 'YYYY-MM')
-        ORDER BY month
-    """), base_params).fetchall()
-
-    recommended_budget = _ml_recommend(monthly_rows, avg_6mo, avg_3mo)
-    confidence = _confidence(len(monthly_rows))
-
-    return {
-        'category': category,
-        'sub_category': sub_category,
-        'recommended_budget': round(recommended_budget, 2),
-        'last_6mo_avg': round(avg_6mo, 2),
-        'last_3mo_avg': round(avg_3mo, 2),
-        'last_1mo_actual': round(actual_1mo, 2),
-        'data_months': len(monthly_rows),
-        'confidence': confidence,
-        'budget_by_category': False
-    }
-
-
-def _calc_category_recommendation(conn, category, subcategory_list,
-                                   six_months_ago, three_months_ago, one_month_ago, today,
-                                   owner):
-    owner_sql, owner_params = _build_owner_clause(owner)
-    sub_in = ','.join([f':sub_{i}' for i in range(len(subcategory_list))])
-    sub_params = {f'sub_{i}': v for i, v in enumerate(subcategory_list)}
-
-    base_params = {
-        "six_months_ago": six_months_ago.strftime('%Y-%m-%d'),
-        "three_months_ago": three_months_ago.strftime('%Y-%m-%d'),
-        "one_month_ago": one_month_ago.strftime('%Y-%m-%d'),
-        "today": today.strftime('%Y-%m-%d'),
-        "category": category,
-        **sub_params,
-        **owner_params
-    }
-
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_6mo,
-               COUNT(DISTINCT TO_CHAR(date, 'YYYY-MM')) as months_with_spending
-        FROM transactions
-        WHERE date >= :six_months_ago
-        AND category = :category AND sub_category IN ({sub_in})
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-    total_6mo = float(row[0]) if row[0] else 0.0
-    avg_6mo = total_6mo / 6
-
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_3mo
-        FROM transactions
-        WHERE date >= :three_months_ago
-        AND category = :category AND sub_category IN ({sub_in})
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-    avg_3mo = float(row[0]) / 3 if row[0] else 0.0
-
-    row = conn.execute(text(f"""
-        SELECT SUM(ABS(amount)) as total_1mo
-        FROM transactions
-        WHERE date >= :one_month_ago AND date < :today
-        AND category = :category AND sub_category IN ({sub_in})
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-    """), base_params).fetchone()
-    actual_1mo = float(row[0]) if row[0] else 0.0
-
-    if avg_6mo == 0 and avg_3mo == 0 and actual_1mo == 0:
-        return None
-
-    monthly_rows = conn.execute(text(f"""
-        SELECT TO_CHAR(date, 'YYYY-MM') as month, SUM(ABS(amount)) as total
-        FROM transactions
-        WHERE category = :category AND sub_category IN ({sub_in})
-        AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
-        {owner_sql}
-        GROUP BY TO_CHAR(date, 'YYYY-MM')
-        ORDER BY month
-    """), base_params).fetchall()
-
-    recommended_budget = _ml_recommend(monthly_rows, avg_6mo, avg_3mo)
-    confidence = _confidence(len(monthly_rows))
-
-    return {
-        'category': category,
-        'sub_category': f'ALL ({len(subcategory_list)} subcategories)',
-        'recommended_budget': round(recommended_budget, 2),
-        'last_6mo_avg': round(avg_6mo, 2),
-        'last_3mo_avg': round(avg_3mo, 2),
-        'last_1mo_actual': round(actual_1mo, 2),
-        'data_months': len(monthly_rows),
-        'confidence': confidence,
-        'budget_by_category': True
-    }
+def _ml_recommend_batch(monthly, data_months, avg_6mo, avg_3mo):
+    """
+    Row-wise recommendation over a (groups × months) matrix with NaN gaps.
 
+    For groups with at least 3 months of history: drop months outside
+    1.5 × IQR, take the 80th percentile of the rest and blend it 30/70 with
+    the 3-month average (or use it alone when there is no recent spending).
+    Groups with less history fall back to the 6-month average.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN rows
+        q1 = np.nanpercentile(monthly, 25, axis=1)
+        q3 = np.nanpercentile(monthly, 75, axis=1)
+        iqr = q3 - q1
+        with np.errstate(invalid='ignore'):
+            keep = ((monthly >= (q1 - 1.5 * iqr)[:, None]) &
+                    (monthly <= (q3 + 1.5 * iqr)[:, None]))
+        p80 = np.nanpercentile(np.where(keep, monthly, np.nan), 80, axis=1)
 
-def _ml_recommend(monthly_rows, avg_6mo, avg_3mo):
-    if len(monthly_rows) >= 3:
-        amounts = np.array([float(row[1]) for row in monthly_rows])
-        Q1, Q3 = np.percentile(amounts, 25), np.percentile(amounts, 75)
-        IQR = Q3 - Q1
-        filtered = amounts[(amounts >= Q1 - 1.5 * IQR) & (amounts <= Q3 + 1.5 * IQR)]
-        if len(filtered) > 0:
-            p80 = np.percentile(filtered, 80)
-            return (avg_3mo * 0.7 + p80 * 0.3) if avg_3mo > 0 else p80
-    return avg_6mo
+    blended = np.where(avg_3mo > 0, avg_3mo * 0.7 + p80 * 0.3, p80)
+    use_ml = (data_months >= 3) & (keep.sum(axis=1) > 0)
+    return np.where(use_ml, blended, avg_6mo)
 
 
 def _confidence(total_months):
@@ -302,11 +209,11 @@ def migrate_category_budgets_to_subcategories():
 
         for category, budget_amount in category_budgets:
             subcategories = conn.execute(text("""
-                SELECT sub_category, SUM(ABS(amount)) as total_spent
-                FROM transactions
+                SELECT sub_category, SUM(total_abs) as total_spent
+                FROM transaction_monthly_rollups
                 WHERE category = :category
-                AND sub_category IS NOT NULL AND sub_category != ''
-                AND type IN ('Needs', 'Wants', 'Business') AND is_active = true
+                AND sub_category != ''
+                AND type IN ('Needs', 'Wants', 'Business')
                 GROUP BY sub_category
             """), {"category": category}).fetchall()
 
@@ -1,6 +1,8 @@
 import os
 import json
 
+from db_pool import engine_options
+
 def get_app_version():
     """Load version information from version.json"""
     try:
@@ -21,6 +23,30 @@ class Config:
 
     # PostgreSQL on Neon (or SQLite fallback for local dev without DATABASE_URL)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///personal_finance.db'
+    # Pool sizing, pre-ping, timeouts per dialect (see db_pool.py); subclasses
+    # that change the URI recompute it
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Applied to every new SQLite connection (db_pool.install_engine_hooks),
+    # in this order. Ignored for Postgres.
+    #   journal_mode=WAL    readers no longer block the writer or each other
+    #                       (persistent: stored in the database file)
+    #   synchronous=NORMAL  fsync at checkpoints, not every commit; safe in WAL
+    #   mmap_size           read pages through a 256MB memory map
+    #   cache_size          32MB page cache per connection (negative = KiB)
+    #   temp_store=MEMORY   sorts and temp b-trees stay off disk
+    #   busy_timeout        wait up to 5s for a writer's lock instead of
+    #                       failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    }
+    # Seconds between PRAGMA optimize runs (sqlite_maintenance.py); 0 disables
+    SQLITE_OPTIMIZE_INTERVAL = int(os.environ.get('SQLITE_OPTIMIZE_INTERVAL', '3600'))
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
@@ -38,6 +64,90 @@ class Config:
     # Set APP_TIMEZONE on Railway to match the owner's timezone, e.g. America/Chicago.
     APP_TIMEZONE = os.environ.get('APP_TIMEZONE', 'UTC')
 
+    # Worker threads shared by all requests for running independent dashboard
+    # queries concurrently (see query_pool.py). Each busy worker holds one
+    # pooled DB connection, so keep this below the engine's pool size + overflow.
+    # 1 runs the queries sequentially on the request thread.
+    QUERY_POOL_WORKERS = int(os.environ.get('QUERY_POOL_WORKERS', '4'))
+
+    # Threads for fire-and-forget work (recommendation refreshes, slow-query
+    # flushes, backups, PRAGMA optimize), kept apart from the query pool so
+    # page queries never wait behind it. Each busy thread holds a DB
+    # connection too. At most BACKGROUND_QUEUE_SIZE tasks wait for a thread;
+    # beyond that new ones are dropped (they are all safe to skip).
+    BACKGROUND_WORKERS = int(os.environ.get('BACKGROUND_WORKERS', '2'))
+    BACKGROUND_QUEUE_SIZE = int(os.environ.get('BACKGROUND_QUEUE_SIZE', '32'))
+
+    # Response cache for read-only JSON GETs (see response_cache.py).
+    # RESPONSE_CACHE_SHARED_PATH points at a SQLite file shared by every
+    # gunicorn worker on the host (e.g. /tmp/response_cache.db on Railway);
+    # leave unset for a per-process cache only.
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', '300'))
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+    RESPONSE_CACHE_SHARED_PATH = os.environ.get('RESPONSE_CACHE_SHARED_PATH') or None
+
+    # Per-request SQL statement count / DB time, reported as a Server-Timing
+    # header and one log line per request (see sql_stats.py).
+    SQL_INSTRUMENTATION_ENABLED = os.environ.get('SQL_INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+
+    # Statements at or above SLOW_QUERY_THRESHOLD_MS (0 disables) are written
+    # to the slow_queries table in batches (see slow_queries.py) and shown on
+    # /admin/slow-queries. Needs SQL_INSTRUMENTATION_ENABLED.
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+    SLOW_QUERY_BATCH_SIZE = int(os.environ.get('SLOW_QUERY_BATCH_SIZE', '50'))
+    SLOW_QUERY_FLUSH_SECONDS = float(os.environ.get('SLOW_QUERY_FLUSH_SECONDS', '10'))
+    SLOW_QUERY_RETENTION_DAYS = int(os.environ.get('SLOW_QUERY_RETENTION_DAYS', '30'))
+
+    # Bulk transaction inserts (ingest.py): batches of at least this many rows
+    # use COPY on Postgres (0 disables); POST /api/transactions/batch limit
+    BULK_COPY_THRESHOLD = int(os.environ.get('BULK_COPY_THRESHOLD', '500'))
+    BULK_INSERT_MAX_ITEMS = int(os.environ.get('BULK_INSERT_MAX_ITEMS', '5000'))
+    # Rows per committed batch in statement imports (statement_import.py)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '2000'))
+    # A queued/running import whose progress stamp is older than this many
+    # seconds is taken to have died with its process and marked failed
+    IMPORT_STALE_SECONDS = int(os.environ.get('IMPORT_STALE_SECONDS', '120'))
+    # Rows per multi-row INSERT when restoring a JSON backup (backup_io.py)
+    RESTORE_BATCH_SIZE = int(os.environ.get('RESTORE_BATCH_SIZE', '5000'))
+    # Rows fetched per round trip while streaming an export; format of the
+    # local backups written by Settings → Create Local Backup
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+    BACKUP_FORMAT = os.environ.get('BACKUP_FORMAT', 'ndjson')  # 'json' or 'ndjson'
+    BACKUP_COMPRESS = os.environ.get('BACKUP_COMPRESS', 'true').lower() == 'true'
+    # Local backups (backup_chain.py): directory (default data/backups/ next
+    # to the app); seconds between automatic backups in local mode (0
+    # disables); incrementals before the chain is compacted into a new full
+    # backup; seconds each incremental reaches back past the previous
+    # backup's high-water mark, for rows stamped before a slow commit
+    BACKUP_DIR = os.environ.get('BACKUP_DIR') or None
+    BACKUP_INTERVAL = int(os.environ.get('BACKUP_INTERVAL', '0'))
+    BACKUP_MAX_CHAIN = int(os.environ.get('BACKUP_MAX_CHAIN', '24'))
+    BACKUP_OVERLAP_SECONDS = int(os.environ.get('BACKUP_OVERLAP_SECONDS', '300'))
+    # A SQLite file database is backed up as gzipped snapshots (snapshots.py)
+    # unless BACKUP_SNAPSHOTS is false: pages copied per online-backup step
+    # and the pause between steps; the newest SNAPSHOT_KEEP snapshots are
+    # kept, plus the newest of each of the last SNAPSHOT_KEEP_DAILY days
+    BACKUP_SNAPSHOTS = os.environ.get('BACKUP_SNAPSHOTS', 'true').lower() == 'true'
+    SNAPSHOT_STEP_PAGES = int(os.environ.get('SNAPSHOT_STEP_PAGES', '1024'))
+    SNAPSHOT_STEP_PAUSE = float(os.environ.get('SNAPSHOT_STEP_PAUSE', '0.005'))
+    SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', '10'))
+    SNAPSHOT_KEEP_DAILY = int(os.environ.get('SNAPSHOT_KEEP_DAILY', '7'))
+
+    # Bearer token for the Prometheus scrape endpoint /metrics (see metrics.py);
+    # unset → /metrics answers 404.
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+    # Statement timeout for the /readyz probe's SELECT 1 (Postgres only)
+    HEALTHCHECK_DB_TIMEOUT_MS = int(os.environ.get('HEALTHCHECK_DB_TIMEOUT_MS', '2000'))
+
+    # Logging (see app_logging.py). LOG_LEVELS overrides single loggers,
+    # e.g. "blueprints.debts.routes=DEBUG,sql_stats=WARNING"; per-step route
+    # chatter is DEBUG. LOG_FORMAT is 'json' or 'text'.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
 
 class ProductionConfig(Config):
     """Configuration for Railway cloud deployment.
@@ -55,7 +165,23 @@ class ProductionConfig(Config):
     SQLALCHEMY_DATABASE_URI = (
         os.environ.get('DATABASE_URL') or 'sqlite:////data/personal_finance.db'
     )
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     # Secure cookie settings
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Strict'
+
+
+class DesktopConfig(Config):
+    """Configuration for the local desktop app (desktop_app_launcher.py).
+
+    The launcher changes into its data directory before importing the app,
+    so the SQLite database resolves to ./data/personal_finance.db there.
+    """
+    DEBUG = False
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    SQLALCHEMY_DATABASE_URI = (
+        os.environ.get('DATABASE_URL')
+        or 'sqlite:///' + os.path.abspath(os.path.join('data', 'personal_finance.db'))
+    )
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
@@ -0,0 +1,115 @@
+"""
+Per-user data version counter.
+
+user_data_versions holds one monotonically increasing number per user. Every
+database transaction that writes user data bumps the writing user's version
+as part of the same commit, so "the version changed" is exactly "something
+this user can see may have changed". Caches key their entries on it
+(response_cache.py, recommendation_cache.py) instead of tracking which
+write affects which result.
+
+Nothing calls bump_data_version() by hand: install_data_versioning() hooks
+the engine, notes INSERT/UPDATE/DELETE statements against user tables, and
+bumps the current request's user just before the transaction commits.
+Writes outside a request (CLI scripts, background cache refreshes) are not
+versioned — the background tasks only write the cache tables listed in
+_UNVERSIONED_TABLES.
+
+user_id 0 stands for NULL (dev/auth-bypass mode), as in the rollup tables.
+"""
+
+import re
+
+from sqlalchemy import event, text
+
+# Bookkeeping tables whose writes do not change what a user can see
+_UNVERSIONED_TABLES = frozenset({
+    'user_data_versions', 'budget_recommendation_cache', 'audit_logs', 'revoked_tokens',
+    'slow_queries', 'import_jobs', 'import_mappings',
+})
+
+_WRITE_RE = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+
+_PENDING = 'data_versions_pending'
+
+
+def request_uid():
+    """The current request's user (0 in dev mode), or None outside a request."""
+    from flask import has_request_context
+    if not has_request_context():
+        return None
+    from utils import current_user_id
+    return current_user_id() or 0
+
+
+def bump_data_version(conn, uid):
+    """Increment (creating if needed) a user's data version; returns the new value."""
+    return conn.execute(text("""
+        INSERT INTO user_data_versions (user_id, version) VALUES (:uid, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = user_data_versions.version + 1
+        RETURNING version
+    """), {'uid': uid or 0}).scalar()
+
+
+def read_data_version(conn, uid):
+    """A user's current data version from the main database (0 if never written)."""
+    version = conn.execute(text("SELECT version FROM user_data_versions WHERE user_id = :uid"),
+                           {'uid': uid or 0}).scalar()
+    return int(version or 0)
+
+
+def _note_write(conn, cursor, statement, parameters, context, executemany):
+    m = _WRITE_RE.match(statement)
+    if m and m.group(1).lower() not in _UNVERSIONED_TABLES:
+        conn.info[_PENDING] = True
+
+
+def _bump_on_commit(conn):
+    if not conn.info.pop(_PENDING, False):
+        return
+    uid = request_uid()
+    if uid is None:
+        return
+    version = bump_data_version(conn, uid)
+    # Published to the shared cache tier after the request (i.e. after commit)
+    from flask import g
+    g.setdefault('bumped_data_versions', {})[uid] = version
+    g.setdefault('data_versions', {})[uid] = version
+
+
+def _discard_on_rollback(conn):
+    conn.info.pop(_PENDING, None)
+
+
+def install_data_versioning(engine):
+    """Attach the write-tracking hooks to an engine (once per engine)."""
+    if event.contains(engine, 'commit', _bump_on_commit):
+        return
+    event.listen(engine, 'before_cursor_execute', _note_write)
+    event.listen(engine, 'commit', _bump_on_commit)
+    event.listen(engine, 'rollback', _discard_on_rollback)
+
+
+def current_data_version(uid=None):
+    """
+    The data version for uid (default: the current request's user), read
+    once per request — from the shared cache tier when one is configured,
+    otherwise from the main database.
+    """
+    from flask import g, has_request_context
+    from models import db
+    import response_cache
+
+    if uid is None:
+        uid = request_uid() or 0
+    memo = g.setdefault('data_versions', {}) if has_request_context() else {}
+    if uid in memo:
+        return memo[uid]
+
+    version = response_cache.shared_data_version(uid)
+    if version is None:
+        with db.engine.connect() as conn:
+            version = read_data_version(conn, uid)
+        response_cache.publish_data_version(uid, version)
+    memo[uid] = version
+    return version
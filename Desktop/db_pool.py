@@ -0,0 +1,147 @@
+"""
+Engine options per database dialect, and pool wait timing.
+
+engine_options(uri) builds SQLALCHEMY_ENGINE_OPTIONS for config.py:
+
+  Postgres (Neon on Railway)
+    - TimedQueuePool sized for one gunicorn worker: the request thread plus
+      QUERY_POOL_WORKERS fan-out threads, with max_overflow (default 2)
+      covering the BACKGROUND_WORKERS threads (DB_POOL_SIZE /
+      DB_MAX_OVERFLOW override). Every worker holds its own pool, so the
+      server sees up to workers × (pool_size + max_overflow) connections.
+    - pool_pre_ping, because Neon closes idle connections and suspends
+      idle computes; pool_recycle (DB_POOL_RECYCLE, default 280s) retires
+      connections before that happens.
+    - pool_timeout (DB_POOL_TIMEOUT, default 10s): fail a request instead
+      of queueing it for the default 30s.
+    - statement_timeout (DB_STATEMENT_TIMEOUT_MS, default 30s) and
+      application_name (DB_APPLICATION_NAME) as connection parameters.
+
+  SQLite (desktop / local)
+    - SQLITE_POOL = 'queue' (default; TimedQueuePool, as SQLAlchemy would
+      pick), 'null' (NullPool: a fresh connection per checkout) or
+      'static' (StaticPool: one shared connection; always used for
+      :memory: databases).
+    - check_same_thread off, since query_pool.py and Flask's threaded
+      server use connections from several threads.
+
+install_engine_hooks(engine, config) applies the SQLITE_PRAGMAS from the
+config on every new SQLite connection.
+
+Pool waits — time spent in QueuePool checkout, i.e. waiting for a free
+connection or opening one — are kept per process (pool_wait_stats(), shown
+on /metrics) and per request (SqlStats.pool_wait_ms, in Server-Timing).
+"""
+
+import os
+import time
+import weakref
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+# Upper bounds in seconds for the pool wait histogram; +Inf is implied
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_hooked_engines = weakref.WeakSet()
+
+_wait_lock = threading.Lock()
+_wait = {'buckets': [0] * (len(WAIT_BUCKETS) + 1), 'sum': 0.0, 'count': 0, 'max': 0.0}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_wait(time.perf_counter() - started)
+
+
+def _record_wait(elapsed):
+    with _wait_lock:
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if elapsed <= bound:
+                _wait['buckets'][i] += 1
+                break
+        else:
+            _wait['buckets'][-1] += 1
+        _wait['sum'] += elapsed
+        _wait['count'] += 1
+        _wait['max'] = max(_wait['max'], elapsed)
+
+    from sql_stats import current_sql_stats
+    stats = current_sql_stats()
+    if stats is not None:
+        stats.record_pool_wait(elapsed * 1000)
+
+
+def pool_wait_stats():
+    """Checkout wait histogram for this process: per-bucket counts, sum, count, max (seconds)."""
+    with _wait_lock:
+        return {**_wait, 'buckets': list(_wait['buckets'])}
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, str(default)))
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI (see the module docstring)."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+
+    if backend == 'postgresql':
+        connect_args = {'application_name': os.environ.get('DB_APPLICATION_NAME', 'personal-finance')}
+        # Neon's pooled endpoints (PgBouncer, "-pooler" hosts) reject startup
+        # options; set statement_timeout on the role there instead.
+        if '-pooler' not in (url.host or ''):
+            timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 30000)
+            connect_args['options'] = f'-c statement_timeout={timeout_ms}'
+        query_workers = _env_int('QUERY_POOL_WORKERS', 4)
+        return {
+            'poolclass': TimedQueuePool,
+            'pool_size': _env_int('DB_POOL_SIZE', query_workers + 1),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 2),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+            'pool_recycle': _env_int('DB_POOL_RECYCLE', 280),
+            'pool_pre_ping': True,
+            'connect_args': connect_args,
+        }
+
+    if backend == 'sqlite':
+        options = {'connect_args': {'check_same_thread': False}}
+        choice = os.environ.get('SQLITE_POOL', 'queue').lower()
+        if url.database in (None, '', ':memory:') or choice == 'static':
+            options['poolclass'] = StaticPool
+        elif choice == 'null':
+            options['poolclass'] = NullPool
+        else:
+            options['poolclass'] = TimedQueuePool
+        return options
+
+    return {'pool_pre_ping': True}
+
+
+def _apply_sqlite_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def install_engine_hooks(engine, config):
+    """Per-connection setup that engine options cannot express (SQLite pragmas)."""
+    pragmas = config.get('SQLITE_PRAGMAS') if isinstance(config, dict) else getattr(config, 'SQLITE_PRAGMAS', None)
+    if engine.dialect.name != 'sqlite' or not pragmas or engine in _hooked_engines:
+        return
+    _hooked_engines.add(engine)
+    event.listen(engine, 'connect', _apply_sqlite_pragmas(dict(pragmas)))
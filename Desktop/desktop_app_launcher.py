@@ -177,24 +177,26 @@ def initialize_app():
     print("Finance Dashboard - Desktop Application")
     print("=" * 50)
 
+    # Pick config class
+    if RAILWAY_MODE:
+        from config import ProductionConfig as config_class
+    else:
+        from config import DesktopConfig as config_class
+
     # Initialize database
     print("\nInitializing database...")
-    if not initialize_personal_finance_database():
+    if not initialize_personal_finance_database(config_class):
         print("ERROR: Database initialization failed")
         return False
 
-    if not test_database_connection():
+    if not test_database_connection(config_class):
         print("ERROR: Database connection test failed")
         return False
 
-    # Pick config class
+    app = create_app(config_class)
     if RAILWAY_MODE:
-        from config import ProductionConfig
-        app = create_app(ProductionConfig)
         print("\nFlask application created (Railway/production mode)")
     else:
-        from config import DesktopConfig
-        app = create_app(DesktopConfig)
         print("\nFlask application created (local desktop mode)")
 
     return True
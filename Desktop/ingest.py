@@ -0,0 +1,202 @@
+"""
+Set-based transaction ingestion.
+
+The bulk form (/transactions/bulk) and the Flutter batch endpoint
+(POST /api/transactions/batch) share one path:
+
+    rows, errors = validate_transactions(items, defaults)
+    with db.engine.begin() as conn:
+        inserted = insert_transactions(conn, rows)
+
+validate_transactions() checks every item in one pass before anything is
+written and reports problems per item as {'index': i, 'error': '...'}, so
+the caller decides whether to write the valid rows or nothing.
+
+insert_transactions() writes the rows with a constant number of statements,
+whatever the batch size:
+
+  - one executemany INSERT, which SQLAlchemy sends as multi-row VALUES
+    batches on Postgres ("insertmanyvalues");
+  - on Postgres with psycopg2 and at least BULK_COPY_THRESHOLD rows, a
+    COPY FROM STDIN instead;
+  - on SQLite, the sqlite3 driver's own executemany;
+  - one executemany for the categories that need a budget_templates row;
+  - one executemany into the monthly rollup (rollups.add_rollup_rows).
+
+Everything runs in the caller's transaction. The rollup write is what
+bumps the user's data version (data_versions.py), since COPY goes around
+SQLAlchemy's statement hooks.
+"""
+
+import io
+import csv
+import logging
+from datetime import date, datetime
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import Transaction
+from rollups import add_rollup_rows
+
+logger = logging.getLogger(__name__)
+
+# Per-item fields; the shared defaults fill any the item leaves out
+FIELDS = ('date', 'description', 'amount', 'account_name', 'category',
+          'sub_category', 'type', 'owner', 'is_business')
+REQUIRED = ('date', 'description', 'amount', 'account_name', 'category', 'type', 'owner')
+
+_COPY_COLUMNS = ('account_name', 'date', 'description', 'amount', 'sub_category', 'category',
+                 'type', 'owner', 'is_business', 'is_active', 'user_id', 'created_at', 'updated_at')
+
+# VARCHAR limits from the model: rejected here rather than failing the whole batch on Postgres
+_MAX_LENGTHS = {
+    name: Transaction.__table__.c[name].type.length
+    for name in ('account_name', 'description', 'category', 'sub_category', 'type', 'owner')
+}
+
+
+def _as_text(value):
+    return value.strip() if isinstance(value, str) else ('' if value is None else str(value).strip())
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def validate_transactions(items, defaults=None):
+    """
+    Normalize and check transaction items (dicts) in one pass.
+
+    Returns (rows, errors): rows are ready for insert_transactions() and keep
+    their item's position as 'index'; errors are [{'index', 'error'}].
+    """
+    defaults = defaults or {}
+    rows, errors = [], []
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({'index': index, 'error': 'Item must be an object'})
+            continue
+        values = {field: item.get(field, defaults.get(field)) for field in FIELDS}
+        row = {name: _as_text(values[name]) for name in _MAX_LENGTHS}
+
+        missing = [f for f in REQUIRED if f in row and not row[f]]
+        if values['date'] in (None, ''):
+            missing.insert(0, 'date')
+        if values['amount'] in (None, ''):
+            missing.insert(0, 'amount')
+        if missing:
+            errors.append({'index': index, 'error': f"{', '.join(missing)} required"})
+            continue
+
+        try:
+            amount = round(float(values['amount']), 2)
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Invalid amount'})
+            continue
+        if amount == 0:
+            errors.append({'index': index, 'error': 'Amount cannot be zero'})
+            continue
+
+        txn_date = values['date']
+        if type(txn_date) is not date:
+            try:
+                txn_date = date.fromisoformat(_as_text(txn_date)[:10])
+            except ValueError:
+                errors.append({'index': index, 'error': 'Invalid date format, expected YYYY-MM-DD'})
+                continue
+
+        too_long = [name for name, limit in _MAX_LENGTHS.items() if len(row[name]) > limit]
+        if too_long:
+            errors.append({'index': index, 'error': f"{', '.join(too_long)} too long"})
+            continue
+
+        row['index'] = index
+        row['date'] = txn_date
+        row['amount'] = amount
+        row['sub_category'] = row['sub_category'] or None
+        row['is_business'] = _as_bool(values['is_business'])
+        rows.append(row)
+
+    return rows, errors
+
+
+def _copy_transactions(conn, params):
+    """COPY rows into transactions through the psycopg2 connection under conn."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for p in params:
+        writer.writerow(['' if p[c] is None else p[c] for c in _COPY_COLUMNS])
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY transactions ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _sqlite_insert(conn, params):
+    """
+    executemany straight on the sqlite3 cursor: SQLite has no round trips to
+    save, so SQLAlchemy's per-row parameter processing is most of the cost.
+    Dates are bound as the ISO strings SQLAlchemy's SQLite types store.
+    """
+    placeholders = ', '.join('?' * len(_COPY_COLUMNS))
+    stamp = params[0]['created_at'].isoformat(' ')
+    conn.exec_driver_sql(
+        f"INSERT INTO transactions ({', '.join(_COPY_COLUMNS)}) VALUES ({placeholders})",
+        [(p['account_name'], p['date'].isoformat(), p['description'], p['amount'],
+          p['sub_category'], p['category'], p['type'], p['owner'], p['is_business'],
+          True, p['user_id'], stamp, stamp)
+         for p in params],
+    )
+
+
+def insert_transactions(conn, rows, user_id=None, template_note='Added from bulk transaction form'):
+    """
+    Insert validated rows for user_id in the caller's transaction, with their
+    categories and rollup. Returns the number of rows written.
+    """
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    params = [{
+        'account_name': r['account_name'], 'date': r['date'], 'description': r['description'],
+        'amount': r['amount'], 'sub_category': r['sub_category'], 'category': r['category'],
+        'type': r['type'], 'owner': r['owner'], 'is_business': r['is_business'],
+        'is_active': True, 'user_id': user_id, 'created_at': now, 'updated_at': now,
+    } for r in rows]
+
+    # The unique (category, user_id) constraint never fires for NULL user_id,
+    # so look for an existing template explicitly (IS: NULL-safe equality)
+    same_user = 'IS' if conn.dialect.name == 'sqlite' else 'IS NOT DISTINCT FROM'
+    conn.execute(text(f"""
+        INSERT INTO budget_templates (category, budget_amount, notes, is_active, user_id, created_at, updated_at)
+        SELECT :cat, 0.00, :notes, true, :uid, :now, :now
+        WHERE NOT EXISTS (
+            SELECT 1 FROM budget_templates WHERE category = :cat AND user_id {same_user} :uid
+        )
+        ON CONFLICT DO NOTHING
+    """), [{'cat': cat, 'notes': template_note, 'uid': user_id, 'now': now}
+           for cat in sorted({r['category'] for r in rows})])
+
+    threshold = current_app.config.get('BULK_COPY_THRESHOLD', 500)
+    use_copy = (conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+                and threshold and len(params) >= threshold)
+    if use_copy:
+        _copy_transactions(conn, params)
+    elif conn.dialect.name == 'sqlite':
+        _sqlite_insert(conn, params)
+    else:
+        conn.execute(Transaction.__table__.insert(), params)
+
+    add_rollup_rows(conn, params)
+    logger.debug("Inserted %s transactions for user %s%s", len(params), user_id,
+                 ' via COPY' if use_copy else '')
+    return len(params)
@@ -0,0 +1,185 @@
+"""
+Prometheus text-format metrics at /metrics, without prometheus_client.
+
+Every worker process keeps its own counters; each sample carries a pid
+label so the series of gunicorn's workers stay apart (a scrape reaches one
+worker — sum by endpoint across pids in PromQL). Exposed:
+
+  app_request_duration_seconds   histogram per endpoint (Flask endpoint
+                                 name, 'unmatched' for 404s)
+  app_requests_total             counter per endpoint, method and status
+  app_db_queries_total           statements per endpoint (sql_stats.py)
+  app_db_query_seconds_total     DB time per endpoint (sql_stats.py)
+  app_db_pool_*                  db.engine.pool gauges (QueuePool only)
+  app_db_pool_wait_seconds       histogram of connection checkout waits
+                                 (db_pool.TimedQueuePool)
+  app_response_cache_*           response_cache.py counters and hit ratio
+  app_process_start_time_seconds
+
+The endpoint answers 404 unless METRICS_TOKEN is set, and then only to
+"Authorization: Bearer <METRICS_TOKEN>" — Prometheus' bearer_token setting.
+"""
+
+import os
+import hmac
+import time
+import threading
+
+from flask import Blueprint, Response, abort, current_app, g, request
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# Upper bounds in seconds; +Inf is implied
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}     # endpoint → [bucket counts..., +Inf count, sum]
+_requests = {}       # (endpoint, method, status) → count
+_db_queries = {}     # endpoint → [statements, seconds]
+_started = time.time()
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    stats = g.get('sql_stats')
+
+    with _lock:
+        hist = _histograms.get(endpoint)
+        if hist is None:
+            hist = _histograms[endpoint] = [0] * (len(_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(_BUCKETS):
+            if elapsed <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(_BUCKETS)] += 1
+        hist[-1] += elapsed
+
+        key = (endpoint, request.method, response.status_code)
+        _requests[key] = _requests.get(key, 0) + 1
+
+        if stats is not None:
+            totals = _db_queries.setdefault(endpoint, [0, 0.0])
+            totals[0] += stats.count
+            totals[1] += stats.total_ms / 1000
+    return response
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics():
+    """The current process's metrics in Prometheus text exposition format."""
+    from models import db
+    from blueprints.health.routes import pool_stats
+    from db_pool import WAIT_BUCKETS, pool_wait_stats
+    import response_cache
+
+    pid = os.getpid()
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    def sample(name, value, **labels):
+        lines.append(f'{name}{_labels(pid=pid, **labels)} {_num(value)}')
+
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        requests = dict(_requests)
+        db_queries = {k: list(v) for k, v in _db_queries.items()}
+
+    family('app_request_duration_seconds', 'histogram', 'Request latency per Flask endpoint.')
+    for endpoint, hist in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(_BUCKETS, hist):
+            cumulative += count
+            sample('app_request_duration_seconds_bucket', cumulative, endpoint=endpoint, le=f'{bound:g}')
+        cumulative += hist[len(_BUCKETS)]
+        sample('app_request_duration_seconds_bucket', cumulative, endpoint=endpoint, le='+Inf')
+        sample('app_request_duration_seconds_sum', round(hist[-1], 6), endpoint=endpoint)
+        sample('app_request_duration_seconds_count', cumulative, endpoint=endpoint)
+
+    family('app_requests_total', 'counter', 'Requests per endpoint, method and status.')
+    for (endpoint, method, status), count in sorted(requests.items()):
+        sample('app_requests_total', count, endpoint=endpoint, method=method, status=status)
+
+    family('app_db_queries_total', 'counter', 'SQL statements executed per endpoint.')
+    for endpoint, (count, _) in sorted(db_queries.items()):
+        sample('app_db_queries_total', count, endpoint=endpoint)
+    family('app_db_query_seconds_total', 'counter', 'Time spent in SQL statements per endpoint.')
+    for endpoint, (_, seconds) in sorted(db_queries.items()):
+        sample('app_db_query_seconds_total', round(seconds, 6), endpoint=endpoint)
+
+    # NullPool/StaticPool (SQLite) have no size or overflow to report
+    pool = pool_stats(db.engine.pool)
+    for key, help_text in (
+        ('size', 'Configured connection pool size.'),
+        ('checked_out', 'Connections currently checked out.'),
+        ('checked_in', 'Idle connections in the pool.'),
+        ('overflow', 'Connections open beyond pool_size.'),
+    ):
+        if key in pool:
+            family(f'app_db_pool_{key}', 'gauge', help_text)
+            sample(f'app_db_pool_{key}', pool[key])
+
+    wait = pool_wait_stats()
+    family('app_db_pool_wait_seconds', 'histogram', 'Time spent checking a connection out of the pool.')
+    cumulative = 0
+    for bound, count in zip(WAIT_BUCKETS, wait['buckets']):
+        cumulative += count
+        sample('app_db_pool_wait_seconds_bucket', cumulative, le=f'{bound:g}')
+    sample('app_db_pool_wait_seconds_bucket', wait['count'], le='+Inf')
+    sample('app_db_pool_wait_seconds_sum', round(wait['sum'], 6))
+    sample('app_db_pool_wait_seconds_count', wait['count'])
+
+    cache = response_cache.stats()
+    for key in ('hits', 'shared_hits', 'misses', 'stores', 'evictions', 'not_modified'):
+        name = f'app_response_cache_{key}_total'
+        family(name, 'counter', f'Response cache {key.replace("_", " ")}.')
+        sample(name, cache[key])
+    family('app_response_cache_hit_ratio', 'gauge', 'Response cache hits / lookups since start.')
+    sample('app_response_cache_hit_ratio', cache['hit_ratio'])
+    family('app_response_cache_memory_bytes', 'gauge', 'Bytes held by the in-process cache tier.')
+    sample('app_response_cache_memory_bytes', cache['memory_bytes'])
+
+    family('app_process_start_time_seconds', 'gauge', 'Start time of the worker process.')
+    sample('app_process_start_time_seconds', round(_started, 3))
+    return '\n'.join(lines) + '\n'
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        abort(404)
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain',
+                        headers={'WWW-Authenticate': 'Bearer'})
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+def install_metrics(app):
+    """Time every request and register /metrics."""
+    app.before_request(_start_timer)
+    app.after_request(_observe)
+    app.register_blueprint(metrics_bp)
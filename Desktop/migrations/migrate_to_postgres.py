@@ -7,15 +7,45 @@ Usage:
     cd Desktop/
     DATABASE_URL=postgresql://... python migrations/migrate_to_postgres.py
     DATABASE_URL=postgresql://... python migrations/migrate_to_postgres.py --dry-run
+    DATABASE_URL=postgresql://... python migrations/migrate_to_postgres.py --jobs 8 --batch-size 20000
+
+Data tables are read in id order, --batch-size rows at a time, and each
+batch is written in one transaction:
+  - with psycopg2, COPY into a temporary staging table, then one
+    INSERT ... SELECT ... ON CONFLICT (id) DO NOTHING;
+  - otherwise (or with --no-copy), one multi-row INSERT ... ON CONFLICT
+    (id) DO NOTHING.
+Either way a batch can be written twice without harm. After each batch the
+table's last id goes into the checkpoint file, so a rerun after a failure
+resumes where the table stopped; --restart ignores it. The data tables only
+reference users, so --jobs tables load at once, each on its own SQLite and
+PostgreSQL connection. The script builds its own engine for that, rather
+than the app's request-sized one: --jobs + 1 pooled connections with no
+overflow limit, and no statement_timeout.
+
+Afterwards the rollups are rebuilt and every table is verified: rows are
+read back from both sides in id order, compared column by column (except
+user_id and the timestamps, which the migration fills in) and summarized
+as a row count and a checksum per side.
+
+DATABASE_URL may also be a SQLite URL, to rehearse the migration locally.
 """
 
+import io
 import os
 import sys
+import json
+import time
 import sqlite3
+import hashlib
 import argparse
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 
-from sqlalchemy import text
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, text
+from sqlalchemy.pool import NullPool, StaticPool
 
 # ── path bootstrap ────────────────────────────────────────────────────────────
 _HERE    = os.path.dirname(os.path.abspath(__file__))
@@ -23,9 +53,75 @@ _DESKTOP = os.path.dirname(_HERE)
 sys.path.insert(0, _DESKTOP)
 
 SQLITE_PATH = os.path.join(_DESKTOP, 'data', 'personal_finance.db')
+CHECKPOINT_PATH = os.path.join(_DESKTOP, 'data', 'migrate_to_postgres.checkpoint.json')
+
+# ── table specs ───────────────────────────────────────────────────────────────
+# columns: copied in this order (user_id is set to the migrated user);
+# numeric: read through _float; booleans: column → value used for NULL;
+# defaults: value used for NULL. Timestamps default to the migration time;
+# dates and timestamps are parsed from SQLite's ISO text.
+
+TABLES = {
+    'transactions': {
+        'columns': ('id', 'account_name', 'date', 'description', 'amount', 'sub_category',
+                    'category', 'type', 'owner', 'is_business', 'debt_payment_id', 'is_active',
+                    'created_at', 'updated_at'),
+        'numeric': ('amount',),
+        'booleans': {'is_business': False, 'is_active': True},
+    },
+    'budget_templates': {
+        'columns': ('id', 'category', 'budget_amount', 'notes', 'is_active', 'created_at', 'updated_at'),
+        'numeric': ('budget_amount',),
+        'booleans': {'is_active': True},
+    },
+    'budget_subcategory_templates': {
+        'columns': ('id', 'category', 'sub_category', 'budget_amount', 'notes', 'budget_by_category',
+                    'is_active', 'created_at', 'updated_at'),
+        'numeric': ('budget_amount',),
+        'booleans': {'budget_by_category': False, 'is_active': True},
+    },
+    'monthly_budgets': {
+        'columns': ('id', 'category', 'month', 'year', 'budget_amount', 'notes', 'created_at', 'updated_at'),
+        'numeric': ('budget_amount',),
+    },
+    'unexpected_expenses': {
+        'columns': ('id', 'category', 'month', 'year', 'amount', 'description', 'is_active',
+                    'created_at', 'updated_at'),
+        'numeric': ('amount',),
+        'booleans': {'is_active': True},
+    },
+    'debt_accounts': {
+        'columns': ('id', 'name', 'debt_type', 'original_balance', 'current_balance', 'interest_rate',
+                    'minimum_payment', 'due_date', 'owner', 'category', 'account_number_last4',
+                    'is_active', 'created_at', 'updated_at'),
+        'numeric': ('original_balance', 'current_balance', 'interest_rate', 'minimum_payment'),
+        'booleans': {'is_active': True},
+    },
+    'debt_payments': {
+        'columns': ('id', 'debt_account_id', 'debt_charge_id', 'payment_amount', 'principal_amount',
+                    'interest_amount', 'payment_date', 'balance_after_payment', 'payment_type', 'notes'),
+        'numeric': ('payment_amount', 'principal_amount', 'interest_amount', 'balance_after_payment'),
+        'defaults': {'payment_type': 'Regular'},
+    },
+    'budget_commitments': {
+        'columns': ('id', 'name', 'category', 'sub_category', 'estimated_amount', 'due_day_of_month',
+                    'is_fixed', 'is_active', 'created_at', 'updated_at'),
+        'numeric': ('estimated_amount',),
+        'booleans': {'is_fixed': True, 'is_active': True},
+    },
+}
+
+_TIMESTAMPS = ('created_at', 'updated_at')
+
+_print_lock = threading.Lock()
 
 # ── helpers ───────────────────────────────────────────────────────────────────
 
+def _say(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
 def _bool(val, default=True):
     """Convert SQLite 0/1/None to Python bool."""
     if val is None:
@@ -39,258 +135,283 @@ def _float(val):
     try:
         return float(val)
     except (ValueError, TypeError):
-        print(f'  ⚠  bad numeric value {val!r} — stored as 0.0')
+        _say(f'  ⚠  bad numeric value {val!r} — stored as 0.0')
         return 0.0
 
 
-def _open_sqlite():
-    conn = sqlite3.connect(SQLITE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def _date(val):
+    if val is None or isinstance(val, date):
+        return val
+    return date.fromisoformat(str(val)[:10])
+
+
+def _timestamp(val):
+    if val is None or isinstance(val, datetime):
+        return val
+    return datetime.fromisoformat(str(val))
+
+
+def _open_sqlite(path):
+    return sqlite3.connect(path, check_same_thread=False)
 
 
-def _make_minimal_app():
-    """Minimal Flask app — just SQLAlchemy, no blueprints."""
+def _engine_options(uri, jobs):
+    """
+    The app's engine options (db_pool.py) resized for this script: a
+    connection per loader thread plus the main thread, no overflow limit,
+    and no statement_timeout — a COPY or verification pass over a big table
+    may take far longer than a request should.
+    """
+    from sqlalchemy.engine import make_url
+    from db_pool import engine_options
+
+    options = engine_options(uri)
+    if make_url(uri).get_backend_name() == 'postgresql':
+        connect_args = dict(options['connect_args'])
+        connect_args['application_name'] = f"{connect_args['application_name']}-migration"
+        # Pooled endpoints reject startup options; there the role's timeout applies
+        if 'options' in connect_args:
+            connect_args['options'] = '-c statement_timeout=0'
+        options['connect_args'] = connect_args
+    if options.get('poolclass') not in (StaticPool, NullPool):
+        options.update(pool_size=max(jobs, 1) + 1, max_overflow=-1)
+    return options
+
+
+def _make_minimal_app(jobs=1):
+    """Minimal Flask app — just SQLAlchemy, no blueprints — with an engine sized for --jobs."""
     from flask import Flask
     from config import Config
     from models import db as _db
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'], jobs)
     _db.init_app(app)
     return app, _db
 
 
-# ── per-table migration functions ─────────────────────────────────────────────
+def _row_converter(table, user_id, now):
+    """Source row (TABLES[table]['columns'] order) → target row ([user_id] + columns)."""
+    from models import db
+
+    spec = TABLES[table]
+    model = db.metadata.tables[table]
+    numeric = set(spec.get('numeric', ()))
+    booleans = spec.get('booleans', {})
+    defaults = spec.get('defaults', {})
+    dates = {c for c in spec['columns'] if isinstance(model.c[c].type, Date)}
+    timestamps = {c for c in spec['columns'] if isinstance(model.c[c].type, DateTime)}
+
+    def convert(row):
+        out = [user_id]
+        for name, value in zip(spec['columns'], row):
+            if name in numeric:
+                value = _float(value)
+            elif name in booleans:
+                value = _bool(value, booleans[name])
+            elif name in _TIMESTAMPS:
+                value = _timestamp(value) or now
+            elif name in dates:
+                value = _date(value)
+            elif name in timestamps:
+                value = _timestamp(value)
+            elif value is None:
+                value = defaults.get(name)
+            out.append(value)
+        return out
+    return convert
+
+
+# ── loading ───────────────────────────────────────────────────────────────────
+
+def _copy_value(value):
+    """One field in COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copy_batch(pg, table, columns, rows):
+    """COPY rows into the staging table, then move the new ids into table."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(v) for v in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    names = ', '.join(columns)
+    cursor = pg.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY _stage_{table} ({names}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+    pg.execute(text(f"""
+        INSERT INTO {table} ({names}) SELECT {names} FROM _stage_{table}
+        ON CONFLICT (id) DO NOTHING
+    """))
+
+
+def _insert_statement(pg, table):
+    """INSERT ... ON CONFLICT (id) DO NOTHING for the target's dialect."""
+    from models import db
+    if pg.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(db.metadata.tables[table]).on_conflict_do_nothing(index_elements=['id'])
+
+
+class Checkpoint:
+    """Per-table progress in a JSON file, for one source and target pair."""
+
+    def __init__(self, path, source, target, restart=False):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        state = None
+        if not restart and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    state = json.load(f)
+            except ValueError:
+                state = None
+            if state and (state.get('source'), state.get('target')) != (source, target):
+                _say('  ℹ  Checkpoint is for another source or target — starting over')
+                state = None
+        self.resumed = state is not None
+        self.state = state or {'source': source, 'target': target, 'tables': {}}
+
+    def table(self, name):
+        return self.state['tables'].setdefault(name, {'last_id': 0, 'rows': 0, 'seconds': 0.0, 'done': False})
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.table(name).update(fields)
+            with open(self.path + '.partial', 'w') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(self.path + '.partial', self.path)
+
+
+def _migrate_table(table, engine, sqlite_path, user_id, batch_size, use_copy, checkpoint):
+    """Load one table from its checkpoint on. Returns (rows, seconds) for this run, or None if it was done."""
+    spec = TABLES[table]
+    progress = checkpoint.table(table)
+    if progress['done']:
+        return None
 
-def _migrate_transactions(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO transactions
-                (id, user_id, account_name, date, description, amount, sub_category,
-                 category, type, owner, is_business, debt_payment_id, is_active,
-                 created_at, updated_at)
-            VALUES
-                (:id, :user_id, :account_name, :date, :description, :amount,
-                 :sub_category, :category, :type, :owner, :is_business,
-                 :debt_payment_id, :is_active, :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':              r['id'],
-            'user_id':         user_id,
-            'account_name':    r['account_name'],
-            'date':            r['date'],
-            'description':     r['description'],
-            'amount':          _float(r['amount']),
-            'sub_category':    r['sub_category'],
-            'category':        r['category'],
-            'type':            r['type'],
-            'owner':           r['owner'],
-            'is_business':     _bool(r['is_business'], False),
-            'debt_payment_id': r['debt_payment_id'],
-            'is_active':       _bool(r['is_active'], True),
-            'created_at':      r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':      r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_budget_templates(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO budget_templates
-                (id, user_id, category, budget_amount, notes, is_active,
-                 created_at, updated_at)
-            VALUES
-                (:id, :user_id, :category, :budget_amount, :notes, :is_active,
-                 :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':            r['id'],
-            'user_id':       user_id,
-            'category':      r['category'],
-            'budget_amount': _float(r['budget_amount']),
-            'notes':         r['notes'],
-            'is_active':     _bool(r['is_active'], True),
-            'created_at':    r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':    r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_budget_subcategory_templates(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO budget_subcategory_templates
-                (id, user_id, category, sub_category, budget_amount, notes,
-                 budget_by_category, is_active, created_at, updated_at)
-            VALUES
-                (:id, :user_id, :category, :sub_category, :budget_amount, :notes,
-                 :budget_by_category, :is_active, :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':                r['id'],
-            'user_id':           user_id,
-            'category':          r['category'],
-            'sub_category':      r['sub_category'],
-            'budget_amount':     _float(r['budget_amount']),
-            'notes':             r['notes'],
-            'budget_by_category': _bool(r['budget_by_category'], False),
-            'is_active':         _bool(r['is_active'], True),
-            'created_at':        r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':        r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_monthly_budgets(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO monthly_budgets
-                (id, user_id, category, month, year, budget_amount, notes,
-                 created_at, updated_at)
-            VALUES
-                (:id, :user_id, :category, :month, :year, :budget_amount, :notes,
-                 :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':            r['id'],
-            'user_id':       user_id,
-            'category':      r['category'],
-            'month':         r['month'],
-            'year':          r['year'],
-            'budget_amount': _float(r['budget_amount']),
-            'notes':         r['notes'],
-            'created_at':    r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':    r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_unexpected_expenses(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO unexpected_expenses
-                (id, user_id, category, month, year, amount, description,
-                 is_active, created_at, updated_at)
-            VALUES
-                (:id, :user_id, :category, :month, :year, :amount, :description,
-                 :is_active, :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':          r['id'],
-            'user_id':     user_id,
-            'category':    r['category'],
-            'month':       r['month'],
-            'year':        r['year'],
-            'amount':      _float(r['amount']),
-            'description': r['description'],
-            'is_active':   _bool(r['is_active'], True),
-            'created_at':  r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':  r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_debt_accounts(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO debt_accounts
-                (id, user_id, name, debt_type, original_balance, current_balance,
-                 interest_rate, minimum_payment, due_date, owner, category,
-                 account_number_last4, is_active, created_at, updated_at)
-            VALUES
-                (:id, :user_id, :name, :debt_type, :original_balance, :current_balance,
-                 :interest_rate, :minimum_payment, :due_date, :owner, :category,
-                 :account_number_last4, :is_active, :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':                   r['id'],
-            'user_id':              user_id,
-            'name':                 r['name'],
-            'debt_type':            r['debt_type'],
-            'original_balance':     _float(r['original_balance']),
-            'current_balance':      _float(r['current_balance']),
-            'interest_rate':        _float(r['interest_rate']),
-            'minimum_payment':      _float(r['minimum_payment']),
-            'due_date':             r['due_date'],
-            'owner':                r['owner'],
-            'category':             r['category'],
-            'account_number_last4': r['account_number_last4'],
-            'is_active':            _bool(r['is_active'], True),
-            'created_at':           r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':           r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
-
-
-def _migrate_debt_payments(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO debt_payments
-                (id, user_id, debt_account_id, debt_charge_id, payment_amount,
-                 principal_amount, interest_amount, payment_date,
-                 balance_after_payment, payment_type, notes)
-            VALUES
-                (:id, :user_id, :debt_account_id, :debt_charge_id, :payment_amount,
-                 :principal_amount, :interest_amount, :payment_date,
-                 :balance_after_payment, :payment_type, :notes)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':                   r['id'],
-            'user_id':              user_id,
-            'debt_account_id':      r['debt_account_id'],
-            'debt_charge_id':       r['debt_charge_id'],
-            'payment_amount':       _float(r['payment_amount']),
-            'principal_amount':     _float(r['principal_amount']),
-            'interest_amount':      _float(r['interest_amount']),
-            'payment_date':         r['payment_date'],
-            'balance_after_payment': _float(r['balance_after_payment']),
-            'payment_type':         r['payment_type'] or 'Regular',
-            'notes':                r['notes'],
-        })
-    return len(rows)
-
-
-def _migrate_budget_commitments(rows, pg, user_id, dry_run):
-    if dry_run:
-        return len(rows)
-    for r in rows:
-        pg.execute(text("""
-            INSERT INTO budget_commitments
-                (id, user_id, name, category, sub_category, estimated_amount,
-                 due_day_of_month, is_fixed, is_active, created_at, updated_at)
-            VALUES
-                (:id, :user_id, :name, :category, :sub_category, :estimated_amount,
-                 :due_day_of_month, :is_fixed, :is_active, :created_at, :updated_at)
-            ON CONFLICT (id) DO NOTHING
-        """), {
-            'id':               r['id'],
-            'user_id':          user_id,
-            'name':             r['name'],
-            'category':         r['category'],
-            'sub_category':     r['sub_category'],
-            'estimated_amount': _float(r['estimated_amount']),
-            'due_day_of_month': r['due_day_of_month'],
-            'is_fixed':         _bool(r['is_fixed'], True),
-            'is_active':        _bool(r['is_active'], True),
-            'created_at':       r['created_at'] or datetime.utcnow().isoformat(),
-            'updated_at':       r['updated_at'] or datetime.utcnow().isoformat(),
-        })
-    return len(rows)
+    columns = ('user_id',) + spec['columns']
+    convert = _row_converter(table, user_id, datetime.utcnow())
+    select = f"SELECT {', '.join(spec['columns'])} FROM {table} WHERE id > ? ORDER BY id LIMIT ?"
+    last_id, total, seconds = progress['last_id'], progress['rows'], progress['seconds']
+    rows_run, started = 0, time.perf_counter()
+
+    src = _open_sqlite(sqlite_path)
+    try:
+        with engine.connect() as pg:
+            if use_copy:
+                with pg.begin():
+                    pg.execute(text(f"""
+                        CREATE TEMP TABLE IF NOT EXISTS _stage_{table}
+                            (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+                    """))
+            else:
+                insert = _insert_statement(pg, table)
+
+            while True:
+                batch_started = time.perf_counter()
+                rows = src.execute(select, (last_id, batch_size)).fetchall()
+                if not rows:
+                    break
+                converted = [convert(r) for r in rows]
+                with pg.begin():
+                    if use_copy:
+                        _copy_batch(pg, table, columns, converted)
+                    else:
+                        pg.execute(insert, [dict(zip(columns, r)) for r in converted])
+                last_id = rows[-1][0]
+                total += len(rows)
+                rows_run += len(rows)
+                seconds += time.perf_counter() - batch_started
+                checkpoint.update(table, last_id=last_id, rows=total, seconds=round(seconds, 3))
+    finally:
+        src.close()
+
+    checkpoint.update(table, done=True)
+    return rows_run, time.perf_counter() - started
+
+
+# ── verification ──────────────────────────────────────────────────────────────
+
+def _normalizer(column):
+    """Value → comparable text, by the model column's type."""
+    kind = column.type
+    if isinstance(kind, Numeric):
+        quantum = Decimal(1).scaleb(-(kind.scale or 0))
+
+        def numeric(v):
+            try:
+                return str(Decimal(str(v)).quantize(quantum, rounding=ROUND_HALF_UP))
+            except InvalidOperation:
+                return str(v)
+        return numeric
+    if isinstance(kind, Boolean):
+        return lambda v: str(bool(v))
+    if isinstance(kind, Date):
+        return lambda v: str(v)[:10]
+    if isinstance(kind, Integer):
+        return lambda v: str(int(v))
+    return str
+
+
+def _verify_table(table, engine, sqlite_path, user_id):
+    """Compare one table's source rows with the target. Returns a dict of counts and checksums."""
+    from models import db
+
+    spec = TABLES[table]
+    model = db.metadata.tables[table]
+    compared = [c for c in spec['columns'] if c not in _TIMESTAMPS]
+    positions = [spec['columns'].index(c) for c in compared]
+    normalize = [_normalizer(model.c[c]) for c in compared]
+    convert = _row_converter(table, user_id, None)
+
+    def key(values):
+        return '\x1f'.join('\\N' if v is None else f(v) for f, v in zip(normalize, values))
+
+    src_hash, pg_hash = hashlib.sha256(), hashlib.sha256()
+    result = {'source': 0, 'target': 0, 'missing': 0, 'different': 0}
+
+    src = _open_sqlite(sqlite_path)
+    try:
+        with engine.connect() as pg:
+            target = pg.execution_options(stream_results=True, yield_per=5000).execute(
+                text(f"SELECT {', '.join(compared)} FROM {table} ORDER BY id"))
+            pending = next(target, None)
+            for row in src.execute(f"SELECT {', '.join(spec['columns'])} FROM {table} ORDER BY id"):
+                values = convert(row)[1:]
+                source_key = key([values[i] for i in positions])
+                src_hash.update(source_key.encode() + b'\n')
+                result['source'] += 1
+
+                while pending is not None and pending[0] < row[0]:
+                    pending = next(target, None)   # rows the source never had
+                if pending is None or pending[0] != row[0]:
+                    result['missing'] += 1
+                    continue
+                target_key = key(pending)
+                pg_hash.update(target_key.encode() + b'\n')
+                result['target'] += 1
+                if target_key != source_key:
+                    result['different'] += 1
+                pending = next(target, None)
+            target.close()
+    finally:
+        src.close()
+
+    result['source_checksum'] = src_hash.hexdigest()[:16]
+    result['target_checksum'] = pg_hash.hexdigest()[:16]
+    return result
 
 
 # ── sequence reset ────────────────────────────────────────────────────────────
@@ -316,24 +437,28 @@ def _reset_sequences(pg):
 
 # ── main ──────────────────────────────────────────────────────────────────────
 
-TABLES = [
-    ('transactions',                _migrate_transactions),
-    ('budget_templates',            _migrate_budget_templates),
-    ('budget_subcategory_templates', _migrate_budget_subcategory_templates),
-    ('monthly_budgets',             _migrate_monthly_budgets),
-    ('unexpected_expenses',         _migrate_unexpected_expenses),
-    ('debt_accounts',               _migrate_debt_accounts),
-    ('debt_payments',               _migrate_debt_payments),
-    ('budget_commitments',          _migrate_budget_commitments),
-]
+def _run_parallel(fn, tables, jobs):
+    """fn(table) for each table on up to jobs threads; yields (table, result) as each finishes."""
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(fn, table): table for table in tables}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
 
 def main():
     parser = argparse.ArgumentParser(description='Migrate Finance Dashboard: SQLite → PostgreSQL')
     parser.add_argument('--dry-run', action='store_true',
                         help='Show what would be migrated without writing anything')
+    parser.add_argument('--sqlite', default=SQLITE_PATH, help='SQLite database to migrate')
+    parser.add_argument('--batch-size', type=int, default=5000, help='rows per batch (one transaction each)')
+    parser.add_argument('--jobs', type=int, default=4, help='tables loaded at the same time')
+    parser.add_argument('--no-copy', action='store_true', help='multi-row INSERTs instead of COPY')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='progress file for resuming')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and load every table again')
+    parser.add_argument('--skip-verify', action='store_true', help='skip the row-by-row verification')
     args = parser.parse_args()
     dry_run = args.dry_run
+    sqlite_path = os.path.abspath(args.sqlite)
 
     print('=' * 60)
     print('Finance Dashboard — SQLite → PostgreSQL Migration')
@@ -342,8 +467,8 @@ def main():
     print('=' * 60)
     print()
 
-    if not os.path.exists(SQLITE_PATH):
-        print(f'ERROR: SQLite database not found: {SQLITE_PATH}')
+    if not os.path.exists(sqlite_path):
+        print(f'ERROR: SQLite database not found: {sqlite_path}')
         sys.exit(1)
 
     database_url = os.environ.get('DATABASE_URL')
@@ -351,9 +476,12 @@ def main():
         print('ERROR: DATABASE_URL environment variable not set')
         sys.exit(1)
 
-    app, db = _make_minimal_app()
+    app, db = _make_minimal_app(args.jobs)
 
     with app.app_context():
+        engine = db.engine
+        is_postgres = engine.dialect.name == 'postgresql'
+        use_copy = is_postgres and engine.dialect.driver == 'psycopg2' and not args.no_copy
 
         # ── Step 1: Schema ────────────────────────────────────────────────────
         print('Step 1: PostgreSQL schema...')
@@ -367,7 +495,7 @@ def main():
         print('\nStep 2: Admin user...')
         user_id = 1
         if not dry_run:
-            with db.engine.begin() as pg:
+            with engine.begin() as pg:
                 existing = pg.execute(
                     text("SELECT id FROM users WHERE username = 'suricata'")
                 ).fetchone()
@@ -376,8 +504,8 @@ def main():
                     print(f'  ℹ  User "suricata" already exists (id={user_id}) — skipping')
                 else:
                     row = pg.execute(text("""
-                        INSERT INTO users (username, role, is_active, created_at)
-                        VALUES ('suricata', 'admin', true, NOW())
+                        INSERT INTO users (username, role, is_active, onboarded, created_at)
+                        VALUES ('suricata', 'admin', true, true, CURRENT_TIMESTAMP)
                         RETURNING id
                     """)).fetchone()
                     user_id = row[0]
@@ -387,26 +515,39 @@ def main():
 
         # ── Step 3: Data tables ───────────────────────────────────────────────
         print('\nStep 3: Migrating data tables...')
-        sqlite_conn = _open_sqlite()
-        counts = {}
-
-        with db.engine.begin() as pg:
-            for table_name, fn in TABLES:
-                rows = sqlite_conn.execute(
-                    f'SELECT * FROM {table_name} ORDER BY id'
-                ).fetchall()
-                sqlite_n = len(rows)
-
-                n = fn(rows, pg if not dry_run else None, user_id, dry_run)
+        sqlite_conn = _open_sqlite(sqlite_path)
+        source_counts = {
+            table: sqlite_conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            for table in TABLES
+        }
 
-                if not dry_run:
-                    pg_n = pg.execute(text(f'SELECT COUNT(*) FROM {table_name}')).scalar()
-                else:
-                    pg_n = '—'
-
-                label = f'[dry-run] {sqlite_n}' if dry_run else f'{sqlite_n} → {pg_n}'
-                print(f'  {table_name:<35} {label}')
-                counts[table_name] = (sqlite_n, pg_n)
+        if dry_run:
+            for table_name, n in source_counts.items():
+                print(f'  {table_name:<35} [dry-run] {n}')
+        else:
+            target = engine.url.render_as_string(hide_password=True)
+            checkpoint = Checkpoint(args.checkpoint, sqlite_path, target, restart=args.restart)
+            if checkpoint.resumed:
+                print(f'  ℹ  Resuming from {args.checkpoint}')
+            print(f"  {'COPY' if use_copy else 'multi-row INSERT'}, {args.batch_size} rows per batch, "
+                  f'{args.jobs} table(s) at a time')
+
+            def load(table):
+                return _migrate_table(table, engine, sqlite_path, user_id,
+                                      args.batch_size, use_copy, checkpoint)
+
+            started = time.perf_counter()
+            loaded = 0
+            for table_name, result in _run_parallel(load, list(TABLES), args.jobs):
+                if result is None:
+                    _say(f'  ℹ  {table_name:<32} already loaded ({checkpoint.table(table_name)["rows"]} rows)')
+                    continue
+                n, seconds = result
+                loaded += n
+                _say(f'  ✓ {table_name:<33} {n:>9} rows in {seconds:6.1f}s — '
+                     f'{n / seconds if seconds else 0:,.0f} rows/s')
+            elapsed = time.perf_counter() - started
+            print(f'  Loaded {loaded} rows in {elapsed:.1f}s — {loaded / elapsed if elapsed else 0:,.0f} rows/s overall')
 
         # ── Step 4: User owners ───────────────────────────────────────────────
         print('\nStep 4: User owners...')
@@ -419,13 +560,12 @@ def main():
         print(f'  Found: {owners}')
 
         if not dry_run:
-            with db.engine.begin() as pg:
-                for name in owners:
-                    pg.execute(text("""
-                        INSERT INTO user_owners (user_id, name, is_active, created_at)
-                        VALUES (:user_id, :name, true, NOW())
-                        ON CONFLICT (user_id, name) DO NOTHING
-                    """), {'user_id': user_id, 'name': name})
+            with engine.begin() as pg:
+                pg.execute(text("""
+                    INSERT INTO user_owners (user_id, name, is_active, created_at)
+                    VALUES (:user_id, :name, true, CURRENT_TIMESTAMP)
+                    ON CONFLICT (user_id, name) DO NOTHING
+                """), [{'user_id': user_id, 'name': name} for name in owners])
             print(f'  ✓ Inserted {len(owners)} owner(s) for user_id={user_id}')
         else:
             print(f'  [dry-run] Would insert {len(owners)} user_owners')
@@ -437,47 +577,76 @@ def main():
         from seeds.categories import CATEGORY_SEEDS
 
         if not dry_run:
-            with db.engine.begin() as pg:
+            with engine.begin() as pg:
                 existing = pg.execute(text('SELECT COUNT(*) FROM category_seeds')).scalar()
                 if existing > 0:
                     print(f'  ℹ  category_seeds already has {existing} row(s) — skipping')
                 else:
-                    for seed in CATEGORY_SEEDS:
-                        pg.execute(text("""
-                            INSERT INTO category_seeds
-                                (category, sub_category, budget_amount, is_active)
-                            VALUES (:category, :sub_category, :budget_amount, true)
-                        """), seed)
+                    pg.execute(text("""
+                        INSERT INTO category_seeds
+                            (category, sub_category, budget_amount, is_active)
+                        VALUES (:category, :sub_category, :budget_amount, true)
+                    """), CATEGORY_SEEDS)
                     print(f'  ✓ Inserted {len(CATEGORY_SEEDS)} category seeds')
         else:
             print(f'  [dry-run] Would insert {len(CATEGORY_SEEDS)} category seeds')
 
+        if dry_run:
+            print('\nDry run complete. Run without --dry-run to execute.')
+            return
+
         # ── Step 6: Sequence reset ────────────────────────────────────────────
-        if not dry_run:
-            print('\nStep 6: Resetting sequences...')
-            with db.engine.begin() as pg:
+        print('\nStep 6: Resetting sequences...')
+        if is_postgres:
+            with engine.begin() as pg:
                 _reset_sequences(pg)
+        else:
+            print('  ℹ  Not PostgreSQL — nothing to reset')
 
-        # ── Summary ───────────────────────────────────────────────────────────
+        # ── Step 7: Rollups ───────────────────────────────────────────────────
+        print('\nStep 7: Rebuilding monthly rollups...')
+        from rollups import rebuild_rollups
+        started = time.perf_counter()
+        with engine.begin() as pg:
+            rebuild_rollups(pg, user_id)
+        print(f'  ✓ Rollups rebuilt for user_id={user_id} in {time.perf_counter() - started:.1f}s')
+
+        # ── Step 8: Verification ──────────────────────────────────────────────
         print()
-        print('=' * 62)
+        print('=' * 86)
         print('MIGRATION SUMMARY')
-        print('=' * 62)
-        print(f"{'Table':<35} {'SQLite':>8} {'PostgreSQL':>12}  {'OK?':>4}")
-        print('-' * 62)
-        for table_name, (sc, pc) in counts.items():
-            if dry_run:
-                ok = '—'
-            else:
-                ok = '✓' if int(pc) >= sc else '⚠'
-            print(f'{table_name:<35} {sc:>8} {str(pc):>12}  {ok:>4}')
-        print('=' * 62)
-
-        if dry_run:
-            print('\nDry run complete. Run without --dry-run to execute.')
-        else:
+        print('=' * 86)
+        if args.skip_verify:
+            print('Verification skipped (--skip-verify).')
+            print('\nMigration complete!')
+            return
+
+        def verify(table):
+            return _verify_table(table, engine, sqlite_path, user_id)
+
+        started = time.perf_counter()
+        results = dict(_run_parallel(verify, list(TABLES), args.jobs))
+        print(f"{'Table':<30} {'SQLite':>8} {'PostgreSQL':>10} {'Missing':>8} {'Differ':>7}  "
+              f"{'Checksum':<16}  {'OK?':>3}")
+        print('-' * 86)
+        all_ok = True
+        for table_name in TABLES:
+            r = results[table_name]
+            ok = (r['missing'] == 0 and r['different'] == 0
+                  and r['source_checksum'] == r['target_checksum'])
+            all_ok = all_ok and ok
+            print(f"{table_name:<30} {r['source']:>8} {r['target']:>10} {r['missing']:>8} "
+                  f"{r['different']:>7}  {r['target_checksum']:<16}  {'✓' if ok else '⚠':>3}")
+        print('=' * 86)
+        print(f'Verified in {time.perf_counter() - started:.1f}s')
+
+        if all_ok:
             print('\nMigration complete!')
             print('Next: start Flask with DATABASE_URL set and smoke-test all pages.')
+        else:
+            print('\n⚠  Some rows are missing or differ. --restart loads missing rows again; rows that')
+            print('   differ already exist in PostgreSQL and are left as they are — check them by id.')
+            sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,83 @@
+"""
+Rebuild (or verify) transaction_monthly_rollups from the transactions table.
+
+The app keeps the rollup in step on every write and backfills it once on
+startup; run this after editing transactions by hand or to audit drift.
+
+Usage (run from the Desktop/ directory):
+    python migrations/rebuild_rollups.py                 # rebuild everything
+    python migrations/rebuild_rollups.py --user-id 3     # rebuild one user
+    python migrations/rebuild_rollups.py --check         # report drift, change nothing
+
+DATABASE_URL is read from Desktop/.env automatically (falls back to the
+local SQLite database used by the dev server).
+"""
+
+import os
+import sys
+import argparse
+
+# ── path bootstrap ─────────────────────────────────────────────────────────────
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_DESKTOP = os.path.dirname(_HERE)
+sys.path.insert(0, _DESKTOP)
+
+
+# ── load .env from Desktop/ (same as Flask dev server does) ───────────────────
+def _load_dotenv(path):
+    """Minimal .env loader — no extra dependencies needed."""
+    if not os.path.isfile(path):
+        return
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, _, value = line.partition('=')
+            key = key.strip()
+            value = value.strip().strip('"').strip("'")
+            if key and key not in os.environ:
+                os.environ[key] = value
+
+
+_load_dotenv(os.path.join(_DESKTOP, '.env'))
+
+
+# ── main ──────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild or verify monthly transaction rollups')
+    parser.add_argument('--check', action='store_true', help='Only compare rollups with transactions')
+    parser.add_argument('--user-id', type=int, default=None, help='Limit to one user')
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from config import Config
+    from models import TransactionMonthlyRollup
+    from rollups import rebuild_rollups, check_rollups
+
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    TransactionMonthlyRollup.__table__.create(engine, checkfirst=True)
+    scope = f'user {args.user_id}' if args.user_id is not None else 'all users'
+
+    if args.check:
+        with engine.connect() as conn:
+            mismatches = check_rollups(conn, args.user_id)
+        if not mismatches:
+            print(f"✅ Rollups consistent for {scope}")
+            return
+        for m in mismatches[:50]:
+            print(f"  ✗ {m['key']}: expected {m['expected']}, found {m['actual']}")
+        print(f"❌ {len(mismatches)} rollup bucket(s) out of step for {scope}")
+        sys.exit(1)
+
+    with engine.begin() as conn:
+        rebuild_rollups(conn, args.user_id)
+        mismatches = check_rollups(conn, args.user_id)
+    if mismatches:
+        print(f"❌ Rebuild left {len(mismatches)} mismatched bucket(s)")
+        sys.exit(1)
+    print(f"✅ Rollups rebuilt for {scope}")
+
+
+if __name__ == '__main__':
+    main()
@@ -118,6 +118,158 @@ class Transaction(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Every dashboard query is "this user, this date range" plus optionally a
+    # category or owner — these back the range predicates from utils.period_clause().
+    # (user_id, date, id) also matches the listings' ORDER BY date DESC, id DESC
+    # and backs the keyset cursors from utils.keyset_clause(); (date, id) does
+    # the same in dev/auth-bypass mode, where there is no user_id predicate.
+    __table_args__ = (
+        db.Index('ix_transactions_user_date_id', 'user_id', 'date', 'id'),
+        db.Index('ix_transactions_date_id', 'date', 'id'),
+        db.Index('ix_transactions_user_category_date', 'user_id', 'category', 'date'),
+        db.Index('ix_transactions_user_owner_date', 'user_id', 'owner', 'date'),
+    )
+
+
+class TransactionMonthlyRollup(db.Model):
+    """Per-month totals of active transactions, maintained by rollups.py on every write.
+
+    Key columns are NOT NULL so the unique constraint can drive upserts:
+    user_id 0 stands for NULL (dev/auth-bypass rows), sub_category '' for NULL.
+    """
+    __tablename__ = 'transaction_monthly_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    sub_category = db.Column(db.String(100), nullable=False, default='')
+    owner = db.Column(db.String(50), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    is_business = db.Column(db.Boolean, nullable=False, default=False)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total_abs = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    txn_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', 'category', 'sub_category',
+                            'owner', 'type', 'is_business',
+                            name='uq_transaction_monthly_rollups_key'),
+    )
+
+
+class SchemaVersion(db.Model):
+    """Single row (id 1) recording the schema version this database was last brought up to.
+
+    Checked at startup by schema_version.ensure_schema() so create_all() only
+    runs when the code expects a newer schema.
+    """
+    __tablename__ = 'schema_version'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.String(20), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class UserDataVersion(db.Model):
+    """Per-user counter bumped by every commit that writes the user's data (data_versions.py).
+
+    user_id 0 stands for NULL (dev/auth-bypass mode).
+    """
+    __tablename__ = 'user_data_versions'
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class SlowQuery(db.Model):
+    """Statements slower than SLOW_QUERY_THRESHOLD_MS, written in batches by slow_queries.py.
+
+    fingerprint is the statement with literals and bind values replaced by ?,
+    so runs of the same query group together on the admin page.
+    """
+    __tablename__ = 'slow_queries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.Text, nullable=False)
+    fingerprint_hash = db.Column(db.String(16), nullable=False)
+    endpoint = db.Column(db.String(200), nullable=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    duration_ms = db.Column(db.Float, nullable=False)
+    row_count = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_slow_queries_created_at', 'created_at'),
+        db.Index('ix_slow_queries_hash_created_at', 'fingerprint_hash', 'created_at'),
+    )
+
+
+class ImportMapping(db.Model):
+    """Saved statement-import settings per (user, account), used by statement_import.py.
+
+    mapping is JSON: format, CSV columns, date format, sign convention and
+    the category/type/owner defaults. user_id 0 stands for NULL (dev mode).
+    """
+    __tablename__ = 'import_mappings'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    account_name = db.Column(db.String(100), nullable=False)
+    mapping = db.Column(db.Text, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'account_name', name='uq_import_mappings_user_account'),
+    )
+
+
+class ImportJob(db.Model):
+    """One statement import: progress counters updated after every batch, polled by the import page.
+
+    updated_at is the job's heartbeat; a queued/running job whose heartbeat
+    stops is failed by statement_import.fail_stale_jobs().
+    """
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    account_name = db.Column(db.String(100), nullable=False)
+    filename = db.Column(db.String(255), nullable=True)
+    format = db.Column(db.String(10), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')   # queued/running/done/failed
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    bytes_read = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text, nullable=True)         # JSON list of the first errors
+    message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class BudgetRecommendationCache(db.Model):
+    """Budget recommendations per (user, owner), managed by recommendation_cache.py.
+
+    user_id 0 stands for NULL (dev/auth-bypass) and owner '' for all owners.
+    Rows are current while data_version matches the user's user_data_versions row.
+    """
+    __tablename__ = 'budget_recommendation_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    owner = db.Column(db.String(50), nullable=False, default='')
+    data_version = db.Column(db.BigInteger, nullable=False, default=0)
+    recommendations = db.Column(db.Text, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'owner', name='uq_budget_recommendation_cache_key'),
+    )
+
 
 class BudgetTemplate(db.Model):
     __tablename__ = 'budget_templates'
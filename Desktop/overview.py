@@ -0,0 +1,276 @@
+"""
+Overview dashboard aggregation engine.
+
+The overview page used to issue one query per widget (spending by type,
+category and subcategory trends, previous-year month, YTD, previous YTD,
+budget actuals, owner comparison, recent transactions, debt) — each a
+network round trip to Neon and several rescanning the same rollup slice.
+
+build_overview() computes every widget from two queries, run side by side
+on the shared query pool (query_pool.run_queries):
+
+  1. one scan of transaction_monthly_rollups over the union of all the
+     month windows the page needs, grouped by (owner, year, month) × type /
+     category / sub_category — GROUPING SETS on PostgreSQL, a materialized
+     CTE + UNION ALL on SQLite. Owner stays in the grouping key so the
+     owner filter and the cross-owner comparison share the same rows.
+  2. one UNION ALL over the small per-user tables: budget templates,
+     unexpected expenses, debt balances and the 10 most recent transactions.
+
+Everything else is folded in Python over a few hundred grouped rows.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+
+from query_pool import run_queries
+from rollups import rollup_since_clause
+
+_TREND_MONTHS = 3
+_TREND_TOP_N = 5
+_RECENT_LIMIT = 10
+_ON_TRACK_MARGIN = 50
+
+
+@dataclass
+class OverviewData:
+    """Everything dashboard_overview.html renders, as one typed result."""
+    monthly_spending: list[tuple[str, float, int]] = field(default_factory=list)
+    category_trend: list[dict] = field(default_factory=list)
+    subcategory_trend: list[dict] = field(default_factory=list)
+    current_total: float = 0.0
+    prev_year_total: float = 0.0
+    month_change: float = 0.0
+    ytd_total: float = 0.0
+    prev_ytd_total: float = 0.0
+    ytd_change: float = 0.0
+    budget_performance: dict = field(default_factory=lambda: {
+        'over_budget_count': 0, 'under_budget_count': 0, 'on_track_count': 0})
+    recent_transactions: list[dict] = field(default_factory=list)
+    total_debt: float = 0.0
+    owner_comparison: list[dict] = field(default_factory=list)
+    # Legacy template slots, no longer populated
+    top_categories: list = field(default_factory=list)
+    monthly_trend: list = field(default_factory=list)
+
+
+@dataclass
+class _RollupRow:
+    dim: str
+    label: str
+    owner: str
+    year: int
+    month: int
+    total: float
+    txn_count: int
+
+
+def _pct_change(current, previous):
+    return ((current - previous) / previous * 100) if previous > 0 else 0
+
+
+def _rollup_scan_sql(conn, where_sql):
+    """Grouped rollup rows for the type, category and sub_category dimensions."""
+    if conn.dialect.name == 'sqlite':
+        # MATERIALIZED (SQLite ≥ 3.35) makes the three branches share one scan
+        materialized = 'MATERIALIZED' if sqlite3.sqlite_version_info >= (3, 35) else ''
+        branches = "\nUNION ALL\n".join(f"""
+            SELECT '{dim}' AS dim, {dim} AS label, owner, year, month,
+                   SUM(total) AS total, SUM(txn_count) AS txn_count
+            FROM base GROUP BY owner, year, month, {dim}
+        """ for dim in ('type', 'category', 'sub_category'))
+        return f"""
+            WITH base AS {materialized} (
+                SELECT owner, year, month, type, category, sub_category, total, txn_count
+                FROM transaction_monthly_rollups
+                WHERE {where_sql}
+            )
+            {branches}
+        """
+    return f"""
+        SELECT CASE WHEN GROUPING(type) = 0 THEN 'type'
+                    WHEN GROUPING(category) = 0 THEN 'category'
+                    ELSE 'sub_category' END AS dim,
+               CASE WHEN GROUPING(type) = 0 THEN type
+                    WHEN GROUPING(category) = 0 THEN category
+                    ELSE sub_category END AS label,
+               owner, year, month, SUM(total) AS total, SUM(txn_count) AS txn_count
+        FROM transaction_monthly_rollups
+        WHERE {where_sql}
+        GROUP BY GROUPING SETS (
+            (owner, year, month, type),
+            (owner, year, month, category),
+            (owner, year, month, sub_category)
+        )
+    """
+
+
+def _side_sql(uid_sql):
+    """Budget templates, unexpected expenses, debt total and recent transactions in one round trip."""
+    # The typed branch goes first: PostgreSQL resolves UNION column types
+    # pairwise left to right, so leading NULL-only branches would fix them as text.
+    return f"""
+        SELECT 'recent' AS kind, category, amount, date, description, owner, account_name, seq
+        FROM (
+            SELECT category, amount, date, description, owner, account_name,
+                   ROW_NUMBER() OVER (ORDER BY date DESC, created_at DESC) AS seq
+            FROM transactions
+            WHERE COALESCE(is_active, true) = true {uid_sql}
+            ORDER BY date DESC, created_at DESC
+            LIMIT {_RECENT_LIMIT}
+        ) recent
+        UNION ALL
+        SELECT 'budget', category, budget_amount, NULL, NULL, NULL, NULL, 0
+        FROM budget_templates
+        WHERE is_active = true {uid_sql}
+        UNION ALL
+        SELECT 'unexpected', category, SUM(amount), NULL, NULL, NULL, NULL, 0
+        FROM unexpected_expenses
+        WHERE month = :month AND year = :year AND is_active = true {uid_sql}
+        GROUP BY category
+        UNION ALL
+        SELECT 'debt', NULL, COALESCE(SUM(current_balance), 0), NULL, NULL, NULL, NULL, 0
+        FROM debt_accounts
+        WHERE is_active = true {uid_sql}
+    """
+
+
+def _trend(rows, dim, key_name, in_window):
+    """Top-N labels by total over the trend window, each with a per-month series."""
+    totals, series, months = {}, {}, set()
+    for r in rows:
+        if r.dim != dim or not r.label or not in_window(r):
+            continue
+        ym = f"{r.year:04d}-{r.month:02d}"
+        months.add(ym)
+        totals[r.label] = totals.get(r.label, 0.0) + r.total
+        per_label = series.setdefault(r.label, {})
+        per_label[ym] = per_label.get(ym, 0.0) + r.total
+    top = sorted(totals, key=totals.get, reverse=True)[:_TREND_TOP_N]
+    months = sorted(months)
+    return [{key_name: label,
+             'months': [{'month': m, 'total': round(series[label].get(m, 0.0), 2)} for m in months]}
+            for label in top]
+
+
+def build_overview(year, month, owner='all', uid_sql='', uid_p=None, today=None):
+    """
+    Compute the overview dashboard for (year, month, owner). The two queries
+    run concurrently on the shared query pool. `uid_sql`/`uid_p` come from
+    utils.uid_clause(), resolved on the request thread.
+    """
+    uid_p = uid_p or {}
+    year, month = int(year), int(month)
+    prev_y, prev_m = (year - 1, 12) if month == 1 else (year, month - 1)
+    since_sql, since_p = rollup_since_clause(_TREND_MONTHS, today=today)
+    since_y, since_m = since_p['since_year'], since_p['since_month']
+
+    # 1. rollup scan: union of every month window the page reads
+    window_sql = f"""
+        ((year IN (:year, :prev_year) AND month <= :month)
+         OR (year = :prev_y AND month = :prev_m)
+         OR {since_sql})
+        {uid_sql}
+    """
+    scan_p = {'year': year, 'prev_year': year - 1, 'month': month,
+              'prev_y': prev_y, 'prev_m': prev_m, **since_p, **uid_p}
+    # 2. small tables + recent transactions
+    side_p = {'year': year, 'month': month, **uid_p}
+
+    results = run_queries({
+        'rollup_scan': lambda conn: conn.execute(
+            text(_rollup_scan_sql(conn, window_sql)), scan_p).fetchall(),
+        'side': lambda conn: conn.execute(text(_side_sql(uid_sql)), side_p).fetchall(),
+    })
+    rows = [
+        _RollupRow(r.dim, r.label, r.owner, int(r.year), int(r.month),
+                   float(r.total or 0), int(r.txn_count or 0))
+        for r in results['rollup_scan']
+    ]
+    side = results['side']
+
+    data = OverviewData()
+    mine = [r for r in rows if owner == 'all' or r.owner == owner]
+    by_type = [r for r in mine if r.dim == 'type']
+
+    # Spending by type for the selected month
+    type_totals = {}
+    for r in by_type:
+        if r.year == year and r.month == month:
+            t = type_totals.setdefault(r.label, [0.0, 0])
+            t[0] += r.total
+            t[1] += r.txn_count
+    data.monthly_spending = sorted(((k, round(v[0], 2), v[1]) for k, v in type_totals.items()),
+                                   key=lambda x: x[1], reverse=True)
+    data.current_total = sum(amount for _, amount, _ in data.monthly_spending)
+
+    # Year-over-year month and YTD
+    data.prev_year_total = round(sum(r.total for r in by_type if r.year == year - 1 and r.month == month), 2)
+    data.ytd_total = round(sum(r.total for r in by_type if r.year == year and r.month <= month), 2)
+    data.prev_ytd_total = round(sum(r.total for r in by_type if r.year == year - 1 and r.month <= month), 2)
+    data.month_change = _pct_change(data.current_total, data.prev_year_total)
+    data.ytd_change = _pct_change(data.ytd_total, data.prev_ytd_total)
+
+    # 3-month category / subcategory trends
+    def in_trend_window(r):
+        return (r.year, r.month) >= (since_y, since_m)
+    data.category_trend = _trend(mine, 'category', 'category', in_trend_window)
+    data.subcategory_trend = _trend(mine, 'sub_category', 'subcategory', in_trend_window)
+
+    # Owner comparison — across all owners, current vs previous month
+    owners = {}
+    for r in rows:
+        if r.dim != 'type':
+            continue
+        if (r.year, r.month) == (year, month):
+            owners.setdefault(r.owner, [0.0, 0.0])[0] += r.total
+        elif (r.year, r.month) == (prev_y, prev_m):
+            owners.setdefault(r.owner, [0.0, 0.0])[1] += r.total
+    data.owner_comparison = sorted((
+        {'owner': o, 'current_month': round(cur, 2), 'previous_month': round(prev, 2),
+         'change_percent': _pct_change(cur, prev)}
+        for o, (cur, prev) in owners.items() if cur > 0 or prev > 0
+    ), key=lambda x: x['current_month'], reverse=True)
+
+    # Budget performance, recent transactions, debt
+    actual_by_cat = {}
+    for r in mine:
+        if r.dim == 'category' and (r.year, r.month) == (year, month):
+            actual_by_cat[r.label] = actual_by_cat.get(r.label, 0.0) + r.total
+    budgets, unexpected, recent = [], {}, []
+    for s in side:
+        if s.kind == 'budget':
+            budgets.append((s.category, float(s.amount or 0)))
+        elif s.kind == 'unexpected':
+            unexpected[s.category] = float(s.amount or 0)
+        elif s.kind == 'debt':
+            data.total_debt = float(s.amount or 0)
+        else:
+            recent.append(s)
+
+    perf = data.budget_performance
+    for category, budget_amount in budgets:
+        eff = budget_amount + unexpected.get(category, 0.0)
+        variance = actual_by_cat.get(category, 0.0) - eff
+        if eff > 0:
+            if variance > _ON_TRACK_MARGIN:
+                perf['over_budget_count'] += 1
+            elif variance < -_ON_TRACK_MARGIN:
+                perf['under_budget_count'] += 1
+            else:
+                perf['on_track_count'] += 1
+
+    data.recent_transactions = [{
+        'date': str(s.date),
+        'description': s.description,
+        'amount': float(s.amount),
+        'category': s.category,
+        'owner': s.owner,
+        'account_name': s.account_name,
+    } for s in sorted(recent, key=lambda s: s.seq)]
+
+    return data
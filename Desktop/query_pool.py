@@ -0,0 +1,155 @@
+"""
+Shared bounded thread pool for independent dashboard queries.
+
+Pages such as the overview, budget dashboard and analytics landing page run
+several read queries that do not depend on each other. Against remote
+Postgres each one is a network round trip, so running them one after another
+on a single connection costs the *sum* of their latencies. run_queries()
+fans them out over one process-wide ThreadPoolExecutor — each task on its
+own pooled connection — and joins the results, so the page waits roughly
+as long as its slowest query.
+
+    uid_sql, uid_p = uid_clause()            # resolve request state first
+    results = run_queries({
+        'spending': lambda conn: conn.execute(text(...), uid_p).fetchall(),
+        'budgets':  lambda conn: conn.execute(text(...), uid_p).fetchall(),
+    })
+
+Tasks run under a pushed app context but *not* the request context: read
+everything that needs request/session (uid_clause(), local_now(), request
+args) before submitting. Per-task timings are kept on g.query_timings, and
+the tasks' statements are counted in the request's SQL stats (sql_stats.py).
+
+The worker count comes from Config.QUERY_POOL_WORKERS; 1 (or less) runs the
+tasks inline on the request thread.
+
+submit_background() runs fire-and-forget work (cache refreshes, backups,
+maintenance) on a second, smaller executor of BACKGROUND_WORKERS threads, so
+a slow background job never holds a query-pool worker that a page's
+run_queries() is waiting on. At most BACKGROUND_QUEUE_SIZE background tasks
+may be waiting at once; further submissions are dropped with a warning.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_background_executor = None
+_background_slots = None
+_executor_lock = threading.Lock()
+
+
+def _pool_size():
+    return int(current_app.config.get('QUERY_POOL_WORKERS', 4))
+
+
+def get_executor():
+    """Return the process-wide executor, creating it on first use (after any fork)."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(_pool_size(), 1),
+                                               thread_name_prefix='query-pool')
+    return _executor
+
+
+def _run_task(app, fn, sql_stats=None):
+    """Run one task on its own connection; returns (result, elapsed_ms)."""
+    started = time.perf_counter()
+    with app.app_context():
+        if sql_stats is not None:
+            # Count this task's statements towards the request (sql_stats.py)
+            g.sql_stats = sql_stats
+        with db.engine.connect() as conn:
+            result = fn(conn)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run_queries(tasks):
+    """
+    Run {name: fn(conn)} tasks concurrently and return {name: result}.
+
+    Every task is waited for before returning; if any raised, the first
+    failure (in task order) is re-raised so the caller's error path runs.
+    """
+    app = current_app._get_current_object()
+    sql_stats = g.get('sql_stats')
+    started = time.perf_counter()
+
+    outcomes = {}
+    if _pool_size() <= 1 or len(tasks) <= 1:
+        for name, fn in tasks.items():
+            try:
+                outcomes[name] = _run_task(app, fn, sql_stats)
+            except Exception as e:
+                outcomes[name] = e
+    else:
+        executor = get_executor()
+        futures = {name: executor.submit(_run_task, app, fn, sql_stats) for name, fn in tasks.items()}
+        for name, future in futures.items():
+            try:
+                outcomes[name] = future.result()
+            except Exception as e:
+                outcomes[name] = e
+
+    wall_ms = (time.perf_counter() - started) * 1000
+    timings = {name: round(o[1], 1) for name, o in outcomes.items() if not isinstance(o, Exception)}
+    g.setdefault('query_timings', []).append({'tasks': timings, 'wall_ms': round(wall_ms, 1)})
+    logger.debug("%d queries in %.0fms wall", len(tasks), wall_ms,
+                 extra={'wall_ms': round(wall_ms, 1), 'tasks': timings})
+
+    for o in outcomes.values():
+        if isinstance(o, Exception):
+            raise o
+    return {name: o[0] for name, o in outcomes.items()}
+
+
+def get_background_executor():
+    """Return the process-wide executor for submit_background(), creating it on first use."""
+    global _background_executor, _background_slots
+    if _background_executor is None:
+        with _executor_lock:
+            if _background_executor is None:
+                config = current_app.config
+                workers = max(int(config.get('BACKGROUND_WORKERS', 2)), 1)
+                _background_slots = threading.BoundedSemaphore(
+                    workers + max(int(config.get('BACKGROUND_QUEUE_SIZE', 32)), 0))
+                _background_executor = ThreadPoolExecutor(max_workers=workers,
+                                                          thread_name_prefix='background')
+    return _background_executor
+
+
+def submit_background(fn):
+    """
+    Run fn() on the background executor after the current request, under an
+    app context. Failures are logged, never raised — for cache warm-ups and
+    other work the response does not wait for. Returns the Future, or None
+    when the backlog is full and fn was dropped.
+    """
+    app = current_app._get_current_object()
+    executor = get_background_executor()
+    name = getattr(fn, '__name__', fn)
+    if not _background_slots.acquire(blocking=False):
+        logger.warning("Background queue full; dropped %s", name)
+        return None
+
+    def _task():
+        try:
+            with app.app_context():
+                try:
+                    fn()
+                except Exception as e:
+                    logger.exception("Background task %s failed: %s", name, e)
+        finally:
+            _background_slots.release()
+
+    return executor.submit(_task)
@@ -0,0 +1,64 @@
+"""
+Lightweight query helpers that return JSON-ready Python rows.
+
+Routes used to run every query through pd.read_sql_query() and then walk
+df.iterrows() with float() casts just to build a JSON response — a
+DataFrame, a Series per row and boxed NumPy scalars on every request. These
+helpers read the DBAPI rows directly and coerce only the types jsonify()
+cannot (or would format differently per database):
+
+  - Decimal          → float
+  - date             → 'YYYY-MM-DD' (the string SQLite already returns)
+  - datetime         → 'YYYY-MM-DD HH:MM:SS[.ffffff]' (likewise)
+
+NULLs stay None — check `row['x'] is not None` where the old code used
+pd.notna().
+
+    with db.engine.connect() as conn:
+        rows = fetch_rows(conn, f"SELECT category, SUM(amount) AS total ... {uid_sql}", uid_p)
+    return jsonify([{'category': r['category'], 'total': r['total'] or 0.0} for r in rows])
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import text
+
+# type → converter; looked up by exact type, so the common str/int/float/None
+# values cost one dict miss each
+_COERCE = {
+    Decimal: float,
+    date: date.isoformat,
+    datetime: str,
+}
+
+
+def json_value(value):
+    """Coerce one database value to a JSON-ready Python value."""
+    convert = _COERCE.get(type(value))
+    return convert(value) if convert is not None else value
+
+
+def fetch_rows(conn, sql, params=None):
+    """Run a text() query and return its rows as a list of {column: value} dicts."""
+    result = conn.execute(text(sql), params or {})
+    keys = tuple(result.keys())
+    get = _COERCE.get
+    return [
+        {k: (c(v) if (c := get(type(v))) is not None else v) for k, v in zip(keys, row)}
+        for row in result
+    ]
+
+
+def fetch_row(conn, sql, params=None):
+    """The first row as a dict, or None when the query returns nothing."""
+    result = conn.execute(text(sql), params or {})
+    row = result.fetchone()
+    if row is None:
+        return None
+    return {k: json_value(v) for k, v in zip(result.keys(), row)}
+
+
+def fetch_column(conn, sql, params=None):
+    """The first column of every row, as a list."""
+    return [json_value(row[0]) for row in conn.execute(text(sql), params or {})]
@@ -0,0 +1,142 @@
+"""
+Shared cache for budget recommendations.
+
+calculate_subcategory_recommendations() reads a user's whole spending
+history, but its answer only changes when the user's data does — or when
+the day changes, since its 6/3/1-month windows end today. Results are
+stored per (user, owner) in budget_recommendation_cache — so both gunicorn
+workers share one copy — tagged with the user's data version
+(data_versions.py) at the time they were computed:
+
+  - get_recommendations() answers from the table. A row from an older
+    data version or an earlier (local) day is still served, and a
+    background refresh is queued; only a missing row is computed on the
+    request;
+  - refresh_recommendations_async() recomputes in the background
+    (query_pool.submit_background) after bulk imports, so the next page
+    load is a hit. A refresh requested while one for the same user is
+    still waiting to start is skipped: the waiting one reads the newer data
+    (and picks up the owner the skipped request asked for).
+
+The version is read *before* computing, so a write that lands mid-way
+leaves the row one version behind and the next call queues another refresh.
+
+user_id 0 stands for NULL (dev/auth-bypass) and owner '' for all owners,
+matching transaction_monthly_rollups.
+"""
+
+import json
+import logging
+import threading
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from data_versions import read_data_version
+
+logger = logging.getLogger(__name__)
+
+# uid -> owners to refresh besides the usual ones, for refreshes submitted but not yet started
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def _cache_key(uid, owner):
+    return {'uid': uid or 0, 'owner': owner or ''}
+
+
+def refresh_recommendations(uid, owner=None):
+    """Recompute and store recommendations for (uid, owner). Returns (recommendations, computed_at)."""
+    from models import db
+    from budget_recommender import calculate_subcategory_recommendations
+
+    with db.engine.connect() as conn:
+        version = read_data_version(conn, uid)
+
+    recommendations = calculate_subcategory_recommendations(owner=owner, user_id=uid)
+    computed_at = datetime.utcnow()
+
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO budget_recommendation_cache
+                (user_id, owner, data_version, recommendations, computed_at)
+            VALUES (:uid, :owner, :version, :payload, :computed_at)
+            ON CONFLICT (user_id, owner) DO UPDATE SET
+                data_version = excluded.data_version,
+                recommendations = excluded.recommendations,
+                computed_at = excluded.computed_at
+            WHERE budget_recommendation_cache.data_version <= excluded.data_version
+        """), {**_cache_key(uid, owner), 'version': version,
+               'payload': json.dumps(recommendations), 'computed_at': computed_at})
+
+    return recommendations, computed_at
+
+
+def _computed_today(computed_at):
+    """Whether a UTC computed_at falls on today's local date, which the recommender's windows end on."""
+    return computed_at.replace(tzinfo=timezone.utc).astimezone().date() == date.today()
+
+
+def get_recommendations(uid, owner=None):
+    """
+    Cached recommendations for (uid, owner). Stale rows are served while a
+    background refresh runs; only a missing row is computed here. Returns
+    (recommendations, computed_at).
+    """
+    from models import db
+
+    with db.engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT c.recommendations, c.computed_at,
+                   c.data_version = COALESCE(
+                       (SELECT version FROM user_data_versions WHERE user_id = :uid), 0) AS is_current
+            FROM budget_recommendation_cache c
+            WHERE c.user_id = :uid AND c.owner = :owner
+        """), _cache_key(uid, owner)).fetchone()
+
+    if not row:
+        return refresh_recommendations(uid, owner)
+    computed_at = row[1]
+    if isinstance(computed_at, str):
+        computed_at = datetime.fromisoformat(computed_at)
+    if not (row[2] and _computed_today(computed_at)):
+        refresh_recommendations_async(uid, owner)
+    return json.loads(row[0]), computed_at
+
+
+def refresh_recommendations_async(uid, owner=None):
+    """
+    Recompute a user's recommendations (all owners, then each active owner,
+    plus owner if given) in the background.
+    """
+    from models import db
+    from query_pool import submit_background
+
+    with _pending_lock:
+        if uid in _pending:
+            if owner:
+                _pending[uid].add(owner)
+            return
+        _pending[uid] = {owner} if owner else set()
+
+    def _refresh():
+        # Writes from here on schedule a refresh of their own
+        with _pending_lock:
+            extra = _pending.pop(uid, set())
+        with db.engine.connect() as conn:
+            if uid is not None:
+                owners = [r[0] for r in conn.execute(text(
+                    "SELECT name FROM user_owners WHERE user_id = :uid AND is_active = true ORDER BY name"
+                ), {'uid': uid})]
+            else:
+                owners = [r[0] for r in conn.execute(text(
+                    "SELECT DISTINCT owner FROM transaction_monthly_rollups ORDER BY owner"
+                ))]
+        owners += sorted(extra - set(owners))
+        for name in [None, *owners]:
+            refresh_recommendations(uid, name)
+        logger.info("Budget recommendations refreshed for user %s (%s views)", uid, len(owners) + 1)
+
+    if submit_background(_refresh) is None:
+        with _pending_lock:
+            _pending.pop(uid, None)
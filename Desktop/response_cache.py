@@ -0,0 +1,332 @@
+"""
+Response cache for read-only JSON endpoints.
+
+Most GETs in api_bp, analytics_bp and budgets_bp are a pure function of the
+user's data and the query string. Responses are cached under
+
+    (user_id, data_version, endpoint, local date, normalized query args)
+
+where data_version comes from data_versions.py and moves on every write the
+user makes — so entries never need invalidating; a write simply makes the
+old keys unreachable. The local date is part of the key because endpoints
+default their month/year to "today".
+
+Two tiers:
+
+  - an in-process LRU bounded by RESPONSE_CACHE_MAX_BYTES, entries expiring
+    after RESPONSE_CACHE_TTL seconds;
+  - optionally, a SQLite file at RESPONSE_CACHE_SHARED_PATH shared by every
+    gunicorn worker on the host. It also holds the users' current data
+    versions, published after each writing request commits, so a cache hit
+    does not touch the main database at all.
+
+install_response_cache(bp) adds the lookup/store hooks to a blueprint —
+register it *after* the blueprint's auth hooks. Only 200 JSON responses are
+stored; HTML pages pass straight through. stats() returns the hit/miss
+counters.
+
+The same key doubles as a strong ETag. Before any lookup or SQL, a GET whose
+If-None-Match carries the current tag is answered 304 Not Modified;
+apply_etag() (an app after_request hook) tags every cacheable response.
+Clients are told to revalidate on each use (Cache-Control: private,
+no-cache), so a revisited screen costs one version read and no body.
+"""
+
+import os
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+# Query args that only bust browser caches
+_IGNORED_ARGS = frozenset({'_'})
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0,
+          'not_modified': 0}
+
+
+class _LRUTier:
+    """In-process LRU with a byte budget and per-entry TTL."""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self._entries = OrderedDict()  # key → (expires_at, body, mimetype)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def set(self, key, body, mimetype, expires_at=None):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at or time.time() + self.ttl, body, mimetype)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                _stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, body, _ = self._entries.pop(key)
+        self.bytes -= len(body)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _SQLiteTier:
+    """Cache entries and data versions in a SQLite file shared by all workers."""
+
+    _PRUNE_EVERY = 200  # stores between expired-entry sweeps
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._stores = 0
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY, expires_at REAL NOT NULL,
+                    body BLOB NOT NULL, mimetype TEXT NOT NULL)
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS data_versions (
+                    user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL)
+            """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT expires_at, body, mimetype FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], bytes(row[1]), row[2]
+
+    def set(self, key, body, mimetype):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                     (key, time.time() + self.ttl, body, mimetype))
+        self._stores += 1
+        if self._stores % self._PRUNE_EVERY == 0:
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+
+    def get_version(self, uid):
+        row = self._conn().execute(
+            "SELECT version FROM data_versions WHERE user_id = ?", (uid,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_version(self, uid, version):
+        # MAX keeps the version monotonic when a stale read races a bump
+        self._conn().execute("""
+            INSERT INTO data_versions (user_id, version) VALUES (?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET version = MAX(version, excluded.version)
+        """, (uid, version))
+
+
+_memory = None
+_shared = None
+
+
+def _tiers():
+    """Create the tiers on first use from the app config."""
+    global _memory, _shared
+    if _memory is None:
+        with _lock:
+            if _memory is None:
+                cfg = current_app.config
+                ttl = int(cfg.get('RESPONSE_CACHE_TTL', 300))
+                path = cfg.get('RESPONSE_CACHE_SHARED_PATH')
+                if path:
+                    try:
+                        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                        _shared = _SQLiteTier(path, ttl)
+                    except sqlite3.Error as e:
+                        logger.warning("Shared response cache disabled (%s): %s", path, e)
+                _memory = _LRUTier(int(cfg.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024)), ttl)
+    return _memory, _shared
+
+
+def _enabled():
+    return current_app.config.get('RESPONSE_CACHE_ENABLED', True)
+
+
+# ── data versions in the shared tier ──────────────────────────────────────────
+
+def shared_data_version(uid):
+    """The user's data version from the shared tier, or None if unknown/disabled."""
+    if not _enabled():
+        return None
+    _, shared = _tiers()
+    if shared is None:
+        return None
+    try:
+        return shared.get_version(uid)
+    except sqlite3.Error:
+        return None
+
+
+def publish_data_version(uid, version):
+    """Record a user's data version in the shared tier (no-op without one)."""
+    if not _enabled():
+        return
+    _, shared = _tiers()
+    if shared is not None:
+        try:
+            shared.set_version(uid, version)
+        except sqlite3.Error as e:
+            logger.warning("Could not publish data version for user %s: %s", uid, e)
+
+
+def publish_bumped_versions(response):
+    """after_request: publish versions bumped by this request's commits."""
+    for uid, version in g.get('bumped_data_versions', {}).items():
+        publish_data_version(uid, version)
+    return response
+
+
+# ── request hooks ─────────────────────────────────────────────────────────────
+
+def response_cache_key():
+    """Cache key (and ETag) for the current GET request, computed once per request."""
+    if 'response_key' in g:
+        return g.response_key
+    from config import get_app_version
+    from data_versions import current_data_version, request_uid
+    from utils import local_now
+
+    uid = request_uid() or 0
+    args = sorted((k, v) for k, v in request.args.lists() if k not in _IGNORED_ARGS)
+    # The build number retires every tag when a deploy changes response shapes
+    raw = '|'.join([str(uid), str(current_data_version(uid)), request.endpoint or request.path,
+                    local_now().date().isoformat(), repr(args),
+                    str(get_app_version().get('build_number', 0))])
+    g.response_key = sha256(raw.encode()).hexdigest()
+    return g.response_key
+
+
+def _check_etag():
+    """before_request: 304 when the client already holds the current representation."""
+    if request.method != 'GET':
+        return None
+    g.response_etag = response_cache_key()
+    if request.if_none_match.contains(g.response_etag):
+        _stats['not_modified'] += 1
+        return current_app.response_class(status=304)
+    return None
+
+
+def apply_etag(response):
+    """after_request: tag cacheable GET responses (and 304s) with their ETag."""
+    etag = g.pop('response_etag', None)
+    if etag is None or g.get('bumped_data_versions'):
+        return response
+    if response.status_code == 304 or (response.status_code == 200 and response.is_json
+                                       and not response.is_streamed):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _lookup():
+    if request.method != 'GET' or not _enabled():
+        return None
+    memory, shared = _tiers()
+    key = response_cache_key()
+    g.response_cache_key = key
+
+    cached = memory.get(key)
+    if cached is None and shared is not None:
+        try:
+            entry = shared.get(key)
+        except sqlite3.Error:
+            entry = None
+        if entry is not None:
+            expires_at, body, mimetype = entry
+            memory.set(key, body, mimetype, expires_at)
+            cached = body, mimetype
+            _stats['shared_hits'] += 1
+    if cached is None:
+        _stats['misses'] += 1
+        return None
+
+    _stats['hits'] += 1
+    body, mimetype = cached
+    response = current_app.response_class(body, status=200, mimetype=mimetype)
+    response.headers['X-Cache'] = 'HIT'
+    g.response_cache_hit = True
+    return response
+
+
+def _store(response):
+    key = g.pop('response_cache_key', None)
+    if key is None or g.pop('response_cache_hit', False):
+        return response
+    response.headers['X-Cache'] = 'MISS'
+    # Skip errors, non-JSON (HTML pages), streams and GETs that wrote data
+    if (response.status_code != 200 or not response.is_json or response.is_streamed
+            or g.get('bumped_data_versions')):
+        return response
+
+    body = response.get_data()
+    memory, shared = _tiers()
+    memory.set(key, body, response.mimetype)
+    if shared is not None:
+        try:
+            shared.set(key, body, response.mimetype)
+        except sqlite3.Error as e:
+            logger.warning("Shared response cache write failed: %s", e)
+    _stats['stores'] += 1
+    return response
+
+
+def install_response_cache(bp):
+    """Cache the blueprint's GET JSON responses. Call after its auth hooks are registered."""
+    bp.before_request(_check_etag)
+    bp.before_request(_lookup)
+    bp.after_request(_store)
+
+
+def stats():
+    """Hit/miss counters and tier sizes for this process."""
+    memory, shared = _tiers()
+    lookups = _stats['hits'] + _stats['misses']
+    return {
+        **_stats,
+        'hit_ratio': round(_stats['hits'] / lookups, 4) if lookups else 0.0,
+        'memory_entries': len(memory),
+        'memory_bytes': memory.bytes,
+        'memory_max_bytes': memory.max_bytes,
+        'shared_path': shared.path if shared is not None else None,
+    }
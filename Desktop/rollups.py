@@ -0,0 +1,245 @@
+"""
+Monthly transaction rollups.
+
+transaction_monthly_rollups keeps SUM(amount), SUM(ABS(amount)) and COUNT(*)
+of active transactions per (user, year, month, category, sub_category, owner,
+type, is_business). Month-level reports read it instead of aggregating the
+transactions table on every page load.
+
+The rollup is only correct if every write keeps it in step, inside the same
+database transaction as the write itself:
+
+    with db.engine.begin() as conn:
+        apply_rollup(conn, "id = :id", {"id": txn_id}, sign=-1)   # old values out
+        conn.execute(text("UPDATE transactions SET ... WHERE id = :id"), ...)
+        apply_rollup(conn, "id = :id", {"id": txn_id})            # new values in
+
+Bulk inserts that already hold the rows in memory use add_rollup_rows()
+instead of re-reading them. rebuild_rollups() / check_rollups() recompute
+from scratch; see migrations/rebuild_rollups.py.
+"""
+
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from utils import months_ago, local_now
+
+_KEY_COLS = "user_id, year, month, category, sub_category, owner, type, is_business"
+
+_UPSERT_TAIL = f"""
+    ON CONFLICT ({_KEY_COLS}) DO UPDATE SET
+        total = transaction_monthly_rollups.total + excluded.total,
+        total_abs = transaction_monthly_rollups.total_abs + excluded.total_abs,
+        txn_count = transaction_monthly_rollups.txn_count + excluded.txn_count
+"""
+
+
+def _date_parts(conn):
+    if conn.dialect.name == 'sqlite':
+        return ("CAST(strftime('%Y', date) AS INTEGER)",
+                "CAST(strftime('%m', date) AS INTEGER)")
+    return "EXTRACT(YEAR FROM date)::integer", "EXTRACT(MONTH FROM date)::integer"
+
+
+def _aggregate_sql(conn, where_sql):
+    """SELECT producing rollup rows for the active transactions matching where_sql."""
+    yr, mo = _date_parts(conn)
+    return f"""
+        SELECT COALESCE(user_id, 0) AS user_id, {yr} AS year, {mo} AS month,
+               category, COALESCE(sub_category, '') AS sub_category, owner, type,
+               COALESCE(is_business, false) AS is_business,
+               SUM(amount) AS total, SUM(ABS(amount)) AS total_abs, COUNT(*) AS txn_count
+        FROM transactions
+        WHERE ({where_sql}) AND COALESCE(is_active, true) = true
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+    """
+
+
+def _prune(conn, params):
+    """Drop buckets emptied by a removal, scoped to the caller's user when known."""
+    if '_uid' in params:
+        conn.execute(text("""
+            DELETE FROM transaction_monthly_rollups
+            WHERE user_id = :_uid AND txn_count <= 0
+        """), {'_uid': params['_uid']})
+    else:
+        conn.execute(text("DELETE FROM transaction_monthly_rollups WHERE txn_count <= 0"))
+
+
+def apply_rollup(conn, where_sql, params=None, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) the active transactions matching
+    `where_sql` to/from the rollup. Call with sign=-1 *before* an UPDATE or
+    soft-delete and with sign=1 *after* an INSERT or UPDATE.
+    """
+    params = dict(params or {})
+    # The outer WHERE true keeps SQLite's parser from reading ON CONFLICT as a join clause
+    conn.execute(text(f"""
+        INSERT INTO transaction_monthly_rollups ({_KEY_COLS}, total, total_abs, txn_count)
+        SELECT {_KEY_COLS}, :_sign * total, :_sign * total_abs, :_sign * txn_count
+        FROM ({_aggregate_sql(conn, where_sql)}) agg
+        WHERE true
+        {_UPSERT_TAIL}
+    """), {**params, '_sign': sign})
+    if sign < 0:
+        _prune(conn, params)
+
+
+def add_rollup_rows(conn, rows):
+    """
+    Fold in-memory transaction rows (dicts with user_id, date, category,
+    sub_category, owner, type, is_business, amount) into the rollup with a
+    single executemany — for bulk inserts that already validated every row.
+    """
+    buckets = {}
+    for r in rows:
+        d = r['date']
+        year, month = (d.year, d.month) if hasattr(d, 'year') else (int(str(d)[:4]), int(str(d)[5:7]))
+        key = (r.get('user_id') or 0, year, month, r['category'], r.get('sub_category') or '',
+               r['owner'], r['type'], bool(r.get('is_business')))
+        amount = round(float(r['amount']), 2)
+        b = buckets.setdefault(key, [0.0, 0.0, 0])
+        b[0] += amount
+        b[1] += abs(amount)
+        b[2] += 1
+    if not buckets:
+        return
+
+    conn.execute(text(f"""
+        INSERT INTO transaction_monthly_rollups ({_KEY_COLS}, total, total_abs, txn_count)
+        VALUES (:user_id, :year, :month, :category, :sub_category, :owner, :type, :is_business,
+                :total, :total_abs, :txn_count)
+        {_UPSERT_TAIL}
+    """), [{
+        'user_id': k[0], 'year': k[1], 'month': k[2], 'category': k[3], 'sub_category': k[4],
+        'owner': k[5], 'type': k[6], 'is_business': k[7],
+        'total': round(v[0], 2), 'total_abs': round(v[1], 2), 'txn_count': v[2],
+    } for k, v in buckets.items()])
+
+
+@contextmanager
+def rollup_rekey(conn, field, old_value, new_value, uid_sql='', uid_p=None):
+    """
+    Keep the rollup in step while a bulk UPDATE moves rows from one value of a
+    key column to another (renames and category migrations):
+
+        with rollup_rekey(conn, 'owner', old, new, uid_sql, uid_p):
+            conn.execute(text("UPDATE transactions SET owner = :new ..."), ...)
+
+    Rows already carrying new_value are taken out and put back too, so
+    merging into an existing value is counted exactly once.
+    """
+    if field not in _KEY_COLS.split(', '):
+        yield
+        return
+    params = {'_rk_old': old_value, '_rk_new': new_value, **(uid_p or {})}
+    apply_rollup(conn, f"{field} IN (:_rk_old, :_rk_new) {uid_sql}", params, sign=-1)
+    yield
+    apply_rollup(conn, f"{field} = :_rk_new {uid_sql}", params)
+
+
+def clear_rollups(conn, uid=None):
+    """Remove every rollup row for a user (all rows when uid is None)."""
+    if uid is None:
+        conn.execute(text("DELETE FROM transaction_monthly_rollups"))
+    else:
+        conn.execute(text("DELETE FROM transaction_monthly_rollups WHERE user_id = :uid"),
+                     {'uid': uid})
+
+
+def rebuild_rollups(conn, uid=None):
+    """
+    Recompute the rollup from transactions for one user (or everyone).
+
+    A plain INSERT into the rows just cleared, not the additive upsert:
+    a concurrent rebuild then fails on the unique key instead of adding
+    its totals on top of the other one's.
+    """
+    clear_rollups(conn, uid)
+    where_sql, params = ("1=1", {}) if uid is None else ("user_id = :uid", {'uid': uid})
+    conn.execute(text(f"""
+        INSERT INTO transaction_monthly_rollups ({_KEY_COLS}, total, total_abs, txn_count)
+        SELECT {_KEY_COLS}, total, total_abs, txn_count
+        FROM ({_aggregate_sql(conn, where_sql)}) agg
+    """), params)
+
+
+def ensure_rollups_populated(conn):
+    """Backfill the rollup once on databases that predate it."""
+    has_rollups = conn.execute(text("SELECT 1 FROM transaction_monthly_rollups LIMIT 1")).fetchone()
+    if has_rollups:
+        return False
+    has_transactions = conn.execute(text("SELECT 1 FROM transactions LIMIT 1")).fetchone()
+    if not has_transactions:
+        return False
+    rebuild_rollups(conn)
+    return True
+
+
+def check_rollups(conn, uid=None):
+    """
+    Compare the rollup against a fresh aggregate of transactions.
+    Returns a list of {'key', 'expected', 'actual'} dicts — empty when consistent.
+    """
+    where, params = ("1=1", {}) if uid is None else ("user_id = :uid", {'uid': uid})
+    expected = {}
+    for r in conn.execute(text(_aggregate_sql(conn, where)), params).mappings():
+        key = (r['user_id'], r['year'], r['month'], r['category'], r['sub_category'],
+               r['owner'], r['type'], bool(r['is_business']))
+        expected[key] = (round(float(r['total']), 2), round(float(r['total_abs']), 2), int(r['txn_count']))
+
+    rollup_where = "1=1" if uid is None else "user_id = :uid"
+    actual = {}
+    for r in conn.execute(text(f"""
+        SELECT {_KEY_COLS}, total, total_abs, txn_count
+        FROM transaction_monthly_rollups WHERE {rollup_where}
+    """), params).mappings():
+        key = (r['user_id'], r['year'], r['month'], r['category'], r['sub_category'],
+               r['owner'], r['type'], bool(r['is_business']))
+        actual[key] = (round(float(r['total']), 2), round(float(r['total_abs']), 2), int(r['txn_count']))
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=repr):
+        if expected.get(key) != actual.get(key):
+            mismatches.append({'key': key, 'expected': expected.get(key), 'actual': actual.get(key)})
+    return mismatches
+
+
+# ── read helpers ──────────────────────────────────────────────────────────────
+
+def rollup_period_clause(year, month=None, through_month=None, prefix='period'):
+    """
+    Returns (sql_fragment, params_dict) selecting rollup rows for a calendar
+    period — the rollup counterpart of utils.period_clause().
+    """
+    params = {f'{prefix}_year': int(year)}
+    if through_month not in (None, 'all'):
+        params[f'{prefix}_month'] = int(through_month)
+        return f"year = :{prefix}_year AND month <= :{prefix}_month", params
+    if month not in (None, 'all', ''):
+        params[f'{prefix}_month'] = int(month)
+        return f"year = :{prefix}_year AND month = :{prefix}_month", params
+    return f"year = :{prefix}_year", params
+
+
+def rollup_since_clause(months, prefix='since', today=None):
+    """
+    Returns (sql_fragment, params_dict) selecting rollup rows from the
+    calendar month `months` months ago through the current month.
+    """
+    start = months_ago(months, today or local_now().date())
+    return (f"(year > :{prefix}_year OR (year = :{prefix}_year AND month >= :{prefix}_month))",
+            {f'{prefix}_year': start.year, f'{prefix}_month': start.month})
+
+
+def rollup_txn_count(conn, filters_sql='', params=None):
+    """
+    Number of active transactions matching `filters_sql` (rollup columns:
+    user_id, year, month, category, owner, ...) — a SUM over a few hundred
+    rollup rows instead of a COUNT(*) over the transactions table.
+    """
+    return int(conn.execute(text(f"""
+        SELECT COALESCE(SUM(txn_count), 0) FROM transaction_monthly_rollups
+        WHERE true {filters_sql}
+    """), params or {}).scalar() or 0)
@@ -0,0 +1,157 @@
+"""
+Startup schema gate.
+
+Every gunicorn worker and every desktop launch used to run db.create_all(),
+create each Transaction index with checkfirst and probe the rollup table —
+a round of catalog reflection queries before the first request could be
+served. The schema only changes when the code does, so the database now
+records the version it was last brought up to (schema_version table) and
+startup compares it with the version the code requires:
+
+    required = max(SCHEMA_VERSION, version.json's min_db_version)
+
+  - stored >= required  → one SELECT and done;
+  - otherwise (new database, or code that expects a newer schema) →
+    create missing tables and indexes, backfill the rollups if needed, and
+    store the required version — in one transaction holding a lock (see
+    _upgrade_transaction), re-reading the stored version once it is held,
+    so the workers gunicorn boots together upgrade the database only once.
+
+Bump SCHEMA_VERSION whenever models.py gains a table or an index, or drops
+an index (list it in _DROPPED_INDEXES). Note that create_all() never alters
+existing tables: a nullable column added to one is listed in _ADDED_COLUMNS
+and added with ALTER TABLE; other column changes still need a script in
+migrations/.
+"""
+
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from config import get_app_version
+
+logger = logging.getLogger(__name__)
+
+# Schema expected by this code — see the module docstring
+SCHEMA_VERSION = '1.7.0'
+
+# pg_advisory_xact_lock key serializing upgrades across processes (arbitrary, fixed)
+_UPGRADE_LOCK_KEY = 4_815_162_342
+
+# Nullable (table, column)s added to models.py after their table was created
+_ADDED_COLUMNS = (
+    ('import_jobs', 'updated_at'),    # 1.7.0: import job heartbeat
+)
+
+# Indexes models.py no longer declares, dropped from existing databases
+_DROPPED_INDEXES = (
+    'ix_transactions_user_date',    # 1.6.0: a prefix of ix_transactions_user_date_id
+)
+
+
+def _parse(version):
+    """'1.2.10' → (1, 2, 10); anything unparsable sorts first."""
+    try:
+        return tuple(int(part) for part in str(version).split('.'))
+    except ValueError:
+        return (0,)
+
+
+def required_schema_version():
+    """The newer of SCHEMA_VERSION and version.json's min_db_version."""
+    min_db_version = get_app_version().get('min_db_version') or '0'
+    return max(SCHEMA_VERSION, min_db_version, key=_parse)
+
+
+def schema_is_current(stored, required=None):
+    """True when a stored version satisfies the required one."""
+    required = required or required_schema_version()
+    return stored is not None and _parse(stored) >= _parse(required)
+
+
+def stored_schema_version(engine):
+    """The version recorded in the database, or None (new or pre-versioning database)."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+    except DBAPIError:
+        return None
+
+
+@contextmanager
+def _upgrade_transaction(engine):
+    """
+    One transaction that holds the upgrade lock: gunicorn workers boot
+    together, and without --preload each would otherwise upgrade the same
+    database at once (racing create_all/ALTER TABLE, doubling the rollup
+    backfill). Postgres takes a transaction-scoped advisory lock; SQLite
+    takes the write lock up front (BEGIN IMMEDIATE). DDL is transactional
+    on both, so a failed upgrade leaves nothing half done.
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            # pysqlite would only BEGIN before the first INSERT/UPDATE
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _UPGRADE_LOCK_KEY})
+        yield conn
+        conn.commit()
+
+
+def _stored_version(conn):
+    if not inspect(conn).has_table('schema_version'):
+        return None
+    return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar()
+
+
+def upgrade_schema(engine, version):
+    """
+    Create missing tables, columns and indexes, drop retired indexes, backfill
+    rollups, and record `version` — under the upgrade lock. Another process
+    may have finished the upgrade while this one waited for the lock, so the
+    stored version is read again first. Returns True if this call upgraded.
+    """
+    from models import db
+    from rollups import ensure_rollups_populated
+
+    with _upgrade_transaction(engine) as conn:
+        if schema_is_current(_stored_version(conn), version):
+            return False
+
+        # create_all() skips tables that already exist, including their indexes
+        db.metadata.create_all(conn)
+        inspector = inspect(conn)
+        for table_name, column_name in _ADDED_COLUMNS:
+            if column_name not in {c['name'] for c in inspector.get_columns(table_name)}:
+                column = db.metadata.tables[table_name].c[column_name]
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} "
+                                  f"{column.type.compile(engine.dialect)}"))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        for name in _DROPPED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+        ensure_rollups_populated(conn)
+        conn.execute(text("""
+            INSERT INTO schema_version (id, version, applied_at) VALUES (1, :version, :now)
+            ON CONFLICT (id) DO UPDATE SET version = excluded.version, applied_at = excluded.applied_at
+        """), {'version': version, 'now': datetime.utcnow()})
+    return True
+
+
+def ensure_schema(engine):
+    """Bring the database up to the required schema if needed. Returns True if it upgraded."""
+    required = required_schema_version()
+    stored = stored_schema_version(engine)
+    if schema_is_current(stored, required):
+        return False
+
+    logger.info("Upgrading database schema %s → %s", stored or '(none)', required)
+    upgraded = upgrade_schema(engine, required)
+    if not upgraded:
+        logger.info("Schema already upgraded to %s by another process", required)
+    return upgraded
@@ -0,0 +1,213 @@
+"""
+Persistent slow-query log.
+
+sql_stats.py collects every statement of a request that took at least
+SLOW_QUERY_THRESHOLD_MS. When the response goes out they are handed to
+enqueue_slow_queries(), which only appends to an in-process buffer. The
+buffer is written to slow_queries in one executemany INSERT in the
+background (query_pool.submit_background) once it holds
+SLOW_QUERY_BATCH_SIZE rows or its oldest row is SLOW_QUERY_FLUSH_SECONDS
+old, so the request path never waits on the log.
+
+Each row stores a fingerprint of the statement — literals, bind markers and
+IN lists collapsed to ? — so repeated runs of one query aggregate together
+on /admin/slow-queries, and no user values end up in the table.
+
+The flush's own INSERTs run with the skip_sql_stats execution option, so
+they are never counted or logged as slow themselves. Rows older than
+SLOW_QUERY_RETENTION_DAYS are pruned at most once an hour during a flush.
+"""
+
+import re
+import logging
+import math
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Longest fingerprint stored — enough to tell queries apart
+_MAX_FINGERPRINT = 2000
+
+_NORMALIZE = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                     # string literals
+    (re.compile(r'%\(\w+\)s|(?<!:):\w+|\$\d+'), '?'),        # named / numbered binds
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                  # numeric literals
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?, ...)'),  # IN lists and VALUES rows
+    (re.compile(r'(\(\?, \.\.\.\))(?:\s*,\s*\(\?, \.\.\.\))+'), r'\1, ...'),
+]
+
+_lock = threading.Lock()
+_pending = []            # [{'fingerprint', 'fingerprint_hash', ...}]
+_oldest_pending = None   # monotonic time of the first buffered row
+_flush_scheduled = False
+_last_prune = 0.0
+
+
+def fingerprint(statement):
+    """Normalize a SQL statement for grouping: literals and binds become ?."""
+    for pattern, replacement in _NORMALIZE:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()[:_MAX_FINGERPRINT]
+
+
+def _fingerprint_hash(fp):
+    return hashlib.sha1(fp.encode('utf-8')).hexdigest()[:16]
+
+
+def enqueue_slow_queries(slow, endpoint):
+    """
+    Buffer a request's slow statements [(statement, ms, rowcount)] and
+    schedule a flush if one is due. Called at the end of every instrumented
+    request (with an empty list too) so a partial batch still goes out once
+    it is SLOW_QUERY_FLUSH_SECONDS old.
+    """
+    global _oldest_pending, _flush_scheduled
+    if not slow and not _pending:
+        return
+    from utils import current_user_id
+
+    now = datetime.utcnow()
+    uid = current_user_id() if slow else None
+    rows = []
+    for statement, elapsed_ms, rowcount in slow:
+        fp = fingerprint(statement)
+        rows.append({
+            'fingerprint': fp,
+            'fingerprint_hash': _fingerprint_hash(fp),
+            'endpoint': (endpoint or '')[:200] or None,
+            'user_id': uid,
+            'duration_ms': round(elapsed_ms, 2),
+            'row_count': rowcount,
+            'created_at': now,
+        })
+
+    config = current_app.config
+    with _lock:
+        _pending.extend(rows)
+        if not _pending:
+            return
+        if _oldest_pending is None:
+            _oldest_pending = time.monotonic()
+        due = (len(_pending) >= config.get('SLOW_QUERY_BATCH_SIZE', 50)
+               or time.monotonic() - _oldest_pending >= config.get('SLOW_QUERY_FLUSH_SECONDS', 10))
+        if not due or _flush_scheduled:
+            return
+        _flush_scheduled = True
+
+    from query_pool import submit_background
+    if submit_background(flush_slow_queries) is None:
+        # Dropped by a full queue; let a later request schedule the flush
+        with _lock:
+            _flush_scheduled = False
+
+
+def flush_slow_queries():
+    """Write the buffered rows now (needs an app context). Returns the number written."""
+    global _oldest_pending, _flush_scheduled, _last_prune
+    from models import db
+
+    with _lock:
+        rows = _pending[:]
+        _pending.clear()
+        _oldest_pending = None
+        _flush_scheduled = False
+
+    prune = time.monotonic() - _last_prune >= 3600
+    if not rows and not prune:
+        return 0
+
+    with db.engine.begin() as conn:
+        conn.execution_options(skip_sql_stats=True)
+        if rows:
+            conn.execute(text("""
+                INSERT INTO slow_queries (fingerprint, fingerprint_hash, endpoint, user_id,
+                                          duration_ms, row_count, created_at)
+                VALUES (:fingerprint, :fingerprint_hash, :endpoint, :user_id,
+                        :duration_ms, :row_count, :created_at)
+            """), rows)
+        if prune:
+            days = current_app.config.get('SLOW_QUERY_RETENTION_DAYS', 30)
+            conn.execute(text("DELETE FROM slow_queries WHERE created_at < :cutoff"),
+                         {'cutoff': datetime.utcnow() - timedelta(days=days)})
+            _last_prune = time.monotonic()
+    if rows:
+        logger.debug("Logged %s slow queries", len(rows))
+    return len(rows)
+
+
+def _percentile(ordered, pct):
+    """Nearest-rank percentile of an ascending list."""
+    rank = math.ceil(len(ordered) * pct / 100)
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def slow_query_summary(conn, since, endpoint=None, limit=100, max_rows=50_000):
+    """
+    Slow queries since `since`, aggregated per fingerprint and sorted by total
+    time: count, p50, p95, max, avg rows, endpoints and last seen. Percentiles
+    are computed here so the same code runs on SQLite and Postgres.
+    """
+    from query_rows import fetch_rows
+
+    where_sql = 'WHERE created_at >= :since'
+    params = {'since': since, 'max_rows': max_rows}
+    if endpoint:
+        where_sql += ' AND LOWER(endpoint) LIKE :endpoint'
+        params['endpoint'] = f'%{endpoint.lower()}%'
+
+    rows = fetch_rows(conn, f"""
+        SELECT fingerprint_hash, endpoint, duration_ms, row_count, created_at
+        FROM slow_queries
+        {where_sql}
+        ORDER BY created_at DESC
+        LIMIT :max_rows
+    """, params)
+
+    groups = {}
+    for r in rows:
+        group = groups.setdefault(r['fingerprint_hash'], {
+            'durations': [], 'row_counts': [], 'endpoints': {}, 'last_seen': r['created_at'],
+        })
+        group['durations'].append(r['duration_ms'])
+        if r['row_count'] is not None:
+            group['row_counts'].append(r['row_count'])
+        endpoint_name = r['endpoint'] or '—'
+        group['endpoints'][endpoint_name] = group['endpoints'].get(endpoint_name, 0) + 1
+
+    summary = []
+    for fp_hash, group in groups.items():
+        durations = sorted(group['durations'])
+        summary.append({
+            'fingerprint_hash': fp_hash,
+            'count': len(durations),
+            'p50_ms': _percentile(durations, 50),
+            'p95_ms': _percentile(durations, 95),
+            'max_ms': durations[-1],
+            'total_ms': sum(durations),
+            'avg_rows': (sum(group['row_counts']) / len(group['row_counts']))
+                        if group['row_counts'] else None,
+            'endpoints': sorted(group['endpoints'], key=group['endpoints'].get, reverse=True),
+            'last_seen': group['last_seen'],
+        })
+    summary.sort(key=lambda s: s['total_ms'], reverse=True)
+    summary = summary[:limit]
+
+    # Fingerprint text once per group rather than once per row
+    if summary:
+        hashes = {s['fingerprint_hash']: s for s in summary}
+        names = ', '.join(f':h{i}' for i in range(len(hashes)))
+        for r in fetch_rows(conn, f"""
+            SELECT fingerprint_hash, MIN(fingerprint) AS fingerprint
+            FROM slow_queries
+            WHERE fingerprint_hash IN ({names})
+            GROUP BY fingerprint_hash
+        """, {f'h{i}': h for i, h in enumerate(hashes)}):
+            hashes[r['fingerprint_hash']]['fingerprint'] = r['fingerprint']
+    return summary, len(rows) >= max_rows
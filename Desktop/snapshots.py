@@ -0,0 +1,216 @@
+"""
+Native SQLite snapshots for local backups (desktop mode).
+
+When the database is a SQLite file, Create Local Backup copies the database
+itself with SQLite's online backup API rather than dumping rows to JSON
+(backup_chain.py). A snapshot keeps every column's type, the indexes and
+the rollup tables, so restoring one needs no parsing, conversion or rebuild.
+
+create_snapshot():
+  - copies SNAPSHOT_STEP_PAGES pages per step on a connection of its own,
+    pausing SNAPSHOT_STEP_PAUSE seconds between steps. A step holds a read
+    lock only while it runs, so requests keep reading and writing. A write
+    from another connection makes SQLite restart the copy, so steps are
+    large enough that a typical desktop database takes only a few;
+  - checks the copy (PRAGMA quick_check) and gzips it to
+    backup_<stamp>.sqlite.gz through a .partial file;
+  - prunes old snapshots: the newest SNAPSHOT_KEEP are kept, plus the
+    newest of each of the SNAPSHOT_KEEP_DAILY most recent days that have one.
+
+restore_snapshot() unpacks a snapshot to a scratch file, checks that it is
+a database of this app no newer than the code, and copies it over the live
+database in a single backup step, so readers see either the old data or
+the new. An older snapshot's schema is then brought up to date
+(schema_version.py). user_data_versions comes back with the snapshot, so
+every user's version is moved past both the old and the restored value;
+otherwise caches keyed on it (data_versions.py) could serve stale results.
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+from datetime import datetime
+
+from flask import current_app, g, has_request_context
+from sqlalchemy import text
+
+from backup_chain import SNAPSHOT_SUFFIX, _lock, _unique_path, backups_dir, reset_chain
+from backup_io import BACKUP_TABLES
+
+logger = logging.getLogger(__name__)
+
+_COPY_CHUNK = 1024 * 1024
+
+
+def _database_path(engine):
+    """The SQLite file behind engine, or None (another database, or in-memory)."""
+    if engine.dialect.name != 'sqlite':
+        return None
+    database = engine.url.database
+    if not database or database == ':memory:' or database.startswith('file:'):
+        return None
+    return os.path.abspath(database)
+
+
+def snapshots_enabled():
+    """True when local backups are snapshots (a SQLite file database and BACKUP_SNAPSHOTS on)."""
+    from models import db
+    return bool(current_app.config.get('BACKUP_SNAPSHOTS', True)) and _database_path(db.engine) is not None
+
+
+def _copy_database(source_path, dest_path, pages=-1, pause=0):
+    """Online-backup source_path into dest_path, pages per step (-1: all in one step)."""
+    source = sqlite3.connect(source_path, timeout=30)
+    dest = sqlite3.connect(dest_path, timeout=30)
+    try:
+        progress = (lambda status, remaining, total: time.sleep(pause)) if pause else None
+        source.backup(dest, pages=pages or -1, progress=progress)
+    finally:
+        dest.close()
+        source.close()
+
+
+def _check(path):
+    """Raise ValueError unless path is an intact database of this app; returns its schema version."""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f"Snapshot is damaged: {result}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        missing = [t for t in BACKUP_TABLES if t not in tables]
+        if missing:
+            raise ValueError(f"Not a backup of this app's database (no {', '.join(missing)} table).")
+        if 'schema_version' not in tables:
+            return None
+        row = conn.execute("SELECT version FROM schema_version WHERE id = 1").fetchone()
+        return row[0] if row else None
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Not a SQLite database: {e}")
+    finally:
+        conn.close()
+
+
+def _gzip_file(source_path, dest_path):
+    with open(source_path, 'rb') as src, gzip.open(dest_path + '.partial', 'wb', compresslevel=6) as out:
+        shutil.copyfileobj(src, out, _COPY_CHUNK)
+    os.replace(dest_path + '.partial', dest_path)
+    return os.path.getsize(dest_path)
+
+
+def _gunzip_file(source_path, dest_path):
+    try:
+        with gzip.open(source_path, 'rb') as src, open(dest_path, 'wb') as out:
+            shutil.copyfileobj(src, out, _COPY_CHUNK)
+    except (OSError, EOFError) as e:
+        raise ValueError(f"{os.path.basename(source_path)} is not a readable snapshot: {e}")
+
+
+def _prune(directory, keep, keep_daily):
+    """Delete snapshots outside the retention policy; returns their names."""
+    names = sorted((n for n in os.listdir(directory) if n.endswith(SNAPSHOT_SUFFIX)), reverse=True)
+    kept = set(names[:max(keep, 1)])
+    days = []
+    for name in names:
+        day = name[len('backup_'):][:8]
+        if day not in days:
+            days.append(day)
+            if len(days) <= keep_daily:
+                kept.add(name)
+    removed = [n for n in names if n not in kept]
+    for name in removed:
+        os.remove(os.path.join(directory, name))
+    return removed
+
+
+def create_snapshot():
+    """Snapshot the database into data/backups/. Returns {'filename', 'kind', 'bytes'}."""
+    from models import db
+
+    config = current_app.config
+    source_path = _database_path(db.engine)
+    directory = backups_dir()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    scratch = os.path.join(directory, '.snapshot.db')
+
+    with _lock:
+        started = time.perf_counter()
+        if os.path.exists(scratch):
+            os.remove(scratch)
+        try:
+            _copy_database(source_path, scratch,
+                           config.get('SNAPSHOT_STEP_PAGES', 1024), config.get('SNAPSHOT_STEP_PAUSE', 0.005))
+            _check(scratch)
+            path = _unique_path(directory, f'backup_{stamp}{SNAPSHOT_SUFFIX}')
+            written = _gzip_file(scratch, path)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+        removed = _prune(directory, config.get('SNAPSHOT_KEEP', 10), config.get('SNAPSHOT_KEEP_DAILY', 7))
+
+    filename = os.path.basename(path)
+    logger.info("Wrote snapshot %s (%s bytes) in %.1fs; pruned %s old snapshot(s)",
+                filename, written, time.perf_counter() - started, len(removed))
+    return {'filename': filename, 'kind': 'snapshot', 'bytes': written}
+
+
+def _advance_data_versions(before):
+    """Move every user's data version past its pre-restore value and the restored one."""
+    from models import db
+    import response_cache
+
+    with db.engine.begin() as conn:
+        restored = dict(conn.execute(text("SELECT user_id, version FROM user_data_versions")).all())
+        versions = {uid: max(before.get(uid, 0), restored.get(uid, 0)) + 1
+                    for uid in set(before) | set(restored)}
+        if versions:
+            conn.execute(text("""
+                INSERT INTO user_data_versions (user_id, version) VALUES (:uid, :version)
+                ON CONFLICT (user_id) DO UPDATE SET version = excluded.version
+            """), [{'uid': uid, 'version': version} for uid, version in versions.items()])
+
+    for uid, version in versions.items():
+        response_cache.publish_data_version(uid, version)
+    if has_request_context():
+        g.setdefault('data_versions', {}).update(versions)
+
+
+def restore_snapshot(filename):
+    """Replace the whole database with a snapshot in data/backups/."""
+    from models import db
+    from schema_version import _parse, required_schema_version, schema_is_current, upgrade_schema
+
+    filename = os.path.basename(filename)
+    directory = backups_dir()
+    path = os.path.join(directory, filename)
+    if not filename.endswith(SNAPSHOT_SUFFIX) or not os.path.exists(path):
+        raise ValueError(f"Snapshot {filename} not found.")
+    target = _database_path(db.engine)
+    if target is None:
+        raise ValueError("Snapshots can only be restored into a SQLite database file.")
+    scratch = os.path.join(directory, '.restore.db')
+
+    with _lock:
+        started = time.perf_counter()
+        try:
+            _gunzip_file(path, scratch)
+            version = _check(scratch)
+            required = required_schema_version()
+            if version and _parse(version) > _parse(required):
+                raise ValueError(f"{filename} is from a newer version of the app (schema {version}).")
+
+            with db.engine.connect() as conn:
+                before = dict(conn.execute(text("SELECT user_id, version FROM user_data_versions")).all())
+            _copy_database(scratch, target)
+            if not schema_is_current(version, required):
+                upgrade_schema(db.engine, required)
+            _advance_data_versions(before)
+        finally:
+            if os.path.exists(scratch):
+                os.remove(scratch)
+        # Ids and timestamps went back in time: the JSON chain starts over
+        reset_chain()
+    logger.info("Restored snapshot %s in %.1fs", filename, time.perf_counter() - started)
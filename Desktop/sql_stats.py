@@ -0,0 +1,141 @@
+"""
+Per-request SQL instrumentation.
+
+install_sql_instrumentation() hooks the engine's before/after_cursor_execute
+events and counts every statement a request runs — including the ones
+query_pool.run_queries() fans out to worker threads, which share the
+request's SqlStats object. When the response goes out the totals are
+emitted twice:
+
+  - a Server-Timing header, visible in the browser's network panel:
+        Server-Timing: db;dur=12.4;desc="7 queries", db-slowest;dur=4.1, db-pool;dur=0.2, total;dur=31.0
+  - one INFO record per request on the sql_stats logger, with the numbers as
+    structured fields (app_logging.py writes them as JSON keys):
+        {"msg": "GET /api/... 200: 7 queries, 12.4ms", "queries": 7, "db_ms": 12.4, ...}
+
+The slowest statement's text only goes to the log, never to the header.
+Statements over SLOW_QUERY_THRESHOLD_MS are also handed to slow_queries.py,
+which writes them to the slow_queries table in batches.
+
+The hooks cost two perf_counter() calls and a g lookup per statement and do
+nothing outside a request, so they are on by default; set
+SQL_INSTRUMENTATION_ENABLED=false to skip installing them.
+"""
+
+import time
+import logging
+import threading
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Requests that get the header but no log line (assets, probes, scrapes)
+_QUIET_ENDPOINTS = frozenset({'static', 'health.healthz', 'health.readyz', 'metrics.metrics'})
+
+# Longest slowest-statement excerpt written to the log
+_STATEMENT_EXCERPT = 300
+
+
+class SqlStats:
+    """Statement count, total DB time and slowest statement for one request."""
+
+    __slots__ = ('started', 'count', 'total_ms', 'slowest_ms', 'slowest_sql',
+                 'pool_wait_ms', 'slow_threshold_ms', 'slow', '_lock')
+
+    def __init__(self, slow_threshold_ms=0):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        # Time spent checking connections out of the pool (db_pool.TimedQueuePool)
+        self.pool_wait_ms = 0.0
+        # 0 disables the slow-query log; slow holds (statement, ms, rowcount)
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow = []
+        # Pool workers record into the same object as the request thread
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms, statement, rowcount=None):
+        with self._lock:
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.slowest_ms:
+                self.slowest_ms = elapsed_ms
+                self.slowest_sql = statement
+            if self.slow_threshold_ms and elapsed_ms >= self.slow_threshold_ms:
+                self.slow.append((statement, elapsed_ms, rowcount))
+
+    def record_pool_wait(self, elapsed_ms):
+        with self._lock:
+            self.pool_wait_ms += elapsed_ms
+
+
+def current_sql_stats():
+    """The SqlStats collecting for the current request/pool task, or None."""
+    return g.get('sql_stats') if has_app_context() else None
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_sql_stats()
+    # skip_sql_stats: the instrumentation's own bookkeeping writes (slow_queries.py)
+    if stats is not None and not context.execution_options.get('skip_sql_stats'):
+        context._sql_stats = stats
+        context._sql_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = getattr(context, '_sql_stats', None)
+    if stats is not None:
+        rowcount = cursor.rowcount
+        stats.record((time.perf_counter() - context._sql_started) * 1000, statement,
+                     rowcount if rowcount >= 0 else None)
+
+
+def _start_request():
+    g.sql_stats = SqlStats(current_app.config.get('SLOW_QUERY_THRESHOLD_MS', 0))
+
+
+def _emit_stats(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+    total_ms = (time.perf_counter() - stats.started) * 1000
+
+    response.headers.add('Server-Timing', ', '.join([
+        f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"',
+        f'db-slowest;dur={stats.slowest_ms:.1f}',
+        f'db-pool;dur={stats.pool_wait_ms:.1f}',
+        f'total;dur={total_ms:.1f}',
+    ]))
+
+    if request.endpoint not in _QUIET_ENDPOINTS and logger.isEnabledFor(logging.INFO):
+        slowest = ' '.join((stats.slowest_sql or '').split())[:_STATEMENT_EXCERPT]
+        logger.info("%s %s %s: %d queries, %.1fms", request.method, request.path,
+                    response.status_code, stats.count, stats.total_ms, extra={
+                        'status': response.status_code,
+                        'queries': stats.count,
+                        'db_ms': round(stats.total_ms, 1),
+                        'slowest_ms': round(stats.slowest_ms, 1),
+                        'slowest_sql': slowest or None,
+                        'pool_wait_ms': round(stats.pool_wait_ms, 1),
+                        'total_ms': round(total_ms, 1),
+                    })
+
+    if stats.slow_threshold_ms:
+        from slow_queries import enqueue_slow_queries
+        enqueue_slow_queries(stats.slow, request.endpoint)
+    return response
+
+
+def install_sql_instrumentation(app, engine):
+    """Attach the statement hooks to engine (once) and the request hooks to app."""
+    if not app.config.get('SQL_INSTRUMENTATION_ENABLED', True):
+        return
+    if not event.contains(engine, 'after_cursor_execute', _after_execute):
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+    app.before_request(_start_request)
+    app.after_request(_emit_stats)
@@ -0,0 +1,90 @@
+"""
+Periodic query-planner maintenance for SQLite (desktop mode).
+
+SQLite only plans well with statistics in sqlite_stat1, which nothing
+collects on its own. Every SQLITE_OPTIMIZE_INTERVAL seconds (default one
+hour, 0 disables) the end of a request schedules a background run
+(query_pool.submit_background), so no request waits for it:
+
+    PRAGMA analysis_limit = 400   -- approximate ANALYZE: bounded per index
+    ANALYZE                       -- only while sqlite_stat1 does not exist
+    PRAGMA optimize               -- re-analyzes tables whose size changed
+
+The first run is due after the first request, so a fresh or restored
+database gets statistics straight away. Postgres keeps its own statistics
+(autovacuum), so nothing is installed there.
+"""
+
+import time
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_last_run = None         # monotonic time of the last scheduled run
+_scheduled = False
+
+
+def run_sqlite_optimize(engine=None):
+    """Refresh planner statistics now. Returns True if a full ANALYZE ran."""
+    if engine is None:
+        from models import db
+        engine = db.engine
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn = conn.execution_options(skip_sql_stats=True)
+        conn.execute(text("PRAGMA analysis_limit = 400"))
+        has_stats = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )).first() is not None
+        if not has_stats:
+            conn.execute(text("ANALYZE"))
+        conn.execute(text("PRAGMA optimize"))
+        conn.commit()
+    logger.info("SQLite optimize finished in %.0f ms%s",
+                (time.perf_counter() - started) * 1000,
+                '' if has_stats else ' (initial ANALYZE)')
+    return not has_stats
+
+
+def _background_optimize():
+    global _scheduled
+    try:
+        run_sqlite_optimize()
+    finally:
+        with _lock:
+            _scheduled = False
+
+
+def _schedule_if_due(response):
+    global _last_run, _scheduled
+    interval = current_app.config.get('SQLITE_OPTIMIZE_INTERVAL', 3600)
+    if not interval:
+        return response
+    now = time.monotonic()
+    with _lock:
+        if _scheduled or (_last_run is not None and now - _last_run < interval):
+            return response
+        previous_run = _last_run
+        _scheduled = True
+        _last_run = now
+
+    from query_pool import submit_background
+    if submit_background(_background_optimize) is None:
+        # Dropped by a full queue; let the next request retry
+        with _lock:
+            _scheduled = False
+            _last_run = previous_run
+    return response
+
+
+def install_sqlite_maintenance(app, engine):
+    """Schedule PRAGMA optimize from after_request on SQLite engines."""
+    if engine.dialect.name != 'sqlite' or not app.config.get('SQLITE_OPTIMIZE_INTERVAL', 3600):
+        return
+    app.after_request(_schedule_if_due)
@@ -0,0 +1,538 @@
+"""
+Streaming bank-statement import (CSV, OFX, QIF).
+
+The upload is saved to a temporary file and imported on this process's
+import thread (submit_import_job): a single-thread executor of its own, so
+a long import never holds a worker of the query pool or of the background
+executor, and imports run one at a time. The parsers read the file
+incrementally: CSV and QIF line by line, OFX in 64KB chunks cut at
+</STMTTRN>. Only one batch of IMPORT_BATCH_SIZE rows is in memory at a
+time, whatever the file size.
+
+Each parser yields items in the shape ingest.validate_transactions()
+expects. Every batch is validated, written with ingest.insert_transactions()
+and committed together with the job's progress counters (import_jobs), so
+the import page can poll /transactions/import/<job_id> while it runs. A
+failure stops the job. Batches already committed stay in place and the job
+reports how many rows they hold.
+
+A job whose process dies mid-import would stay queued/running forever, so
+every batch also stamps import_jobs.updated_at — for the running job and
+the ones queued behind it. At startup, and whenever the page polls a job,
+queued/running jobs whose stamp is older than IMPORT_STALE_SECONDS are
+marked failed (fail_stale_jobs). The timeout rather than "everything still
+running" keeps a restarting gunicorn worker from failing the imports its
+sibling is running.
+
+Mappings (import_mappings, one per user and account) hold everything the
+file itself does not say:
+
+    {
+      "format": "csv",                  # csv / ofx / qif
+      "delimiter": ",", "has_header": true, "skip_rows": 0,
+      "columns": {"date": "Date", "description": "Description",
+                  "amount": "Amount", "debit": "", "credit": "",
+                  "category": "", "sub_category": ""},
+      "date_format": "",                # strptime format; "" detects it
+      "decimal_comma": false,           # 1.234,56
+      "negate": true,                   # bank files use negative for money out
+      "defaults": {"category": "Uncategorized", "type": "Needs", "owner": "..."}
+    }
+
+CSV columns are header names, or 0-based positions when has_header is
+off. A debit/credit column pair can replace the single signed amount
+column. The app stores expenses as positive and income as negative, so
+signed amounts are negated by default.
+"""
+
+import io
+import os
+import re
+import csv
+import json
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ofx', 'qif')
+
+DEFAULT_MAPPING = {
+    'format': 'csv',
+    'delimiter': ',',
+    'has_header': True,
+    'skip_rows': 0,
+    'columns': {'date': 'Date', 'description': 'Description', 'amount': 'Amount',
+                'debit': '', 'credit': '', 'category': '', 'sub_category': ''},
+    'date_format': '',
+    'decimal_comma': False,
+    'negate': True,
+    'defaults': {'category': 'Uncategorized', 'type': 'Needs', 'owner': ''},
+}
+
+# Tried in order until one parses the file's first date
+_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%m/%d/%y', '%d/%m/%y',
+                 '%Y%m%d', '%d.%m.%Y', '%Y/%m/%d', '%d-%m-%Y', '%d %b %Y', '%b %d, %Y')
+
+# Errors kept on the job row; the rest are only counted
+_MAX_STORED_ERRORS = 100
+_STALE_MESSAGE = ('The import was interrupted (the server stopped or restarted). '
+                  'Rows imported before then were kept.')
+
+_executor = None
+_executor_lock = threading.Lock()
+_queued = set()    # job ids submitted to _executor that have not started
+
+_OFX_TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+_OFX_END = re.compile(r'</STMTTRN>', re.IGNORECASE)
+_OFX_START = re.compile(r'<STMTTRN>', re.IGNORECASE)
+_AMOUNT_JUNK = re.compile(r'[^\d.\-+]')
+
+
+def detect_format(filename):
+    """csv / ofx / qif from the file extension (.qfx is OFX); csv when unknown."""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return {'qfx': 'ofx'}.get(ext, ext if ext in FORMATS else 'csv')
+
+
+def merge_mapping(saved=None, overrides=None):
+    """DEFAULT_MAPPING ← saved mapping ← overrides, one level deep for columns/defaults."""
+    mapping = json.loads(json.dumps(DEFAULT_MAPPING))
+    for source in (saved or {}, overrides or {}):
+        for key, value in source.items():
+            if isinstance(value, dict) and isinstance(mapping.get(key), dict):
+                mapping[key].update(value)
+            elif key in mapping:
+                mapping[key] = value
+    return mapping
+
+
+# ── Field parsing ──────────────────────────────────────────────────────────────
+
+class _DateParser:
+    """Parses one file's dates: detects the format once, then memoizes by string."""
+
+    def __init__(self, fmt=''):
+        self.fmt = fmt or None
+        self.cache = {}
+
+    def __call__(self, value):
+        value = (value or '').strip()
+        parsed = self.cache.get(value)
+        if parsed is None:
+            parsed = self.cache[value] = self._parse(value)
+        return parsed
+
+    def _parse(self, value):
+        if self.fmt:
+            try:
+                return datetime.strptime(value, self.fmt).date()
+            except ValueError:
+                return value
+        for fmt in _DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt).date()
+            except ValueError:
+                continue
+            self.fmt = fmt
+            return parsed
+        return value   # left for validate_transactions() to reject
+
+
+def _parse_amount(value, decimal_comma=False):
+    """'$1,234.56', '(12.00)', '1.234,56' (decimal_comma) → float; unparsable → the raw value."""
+    raw = (value or '').strip() if isinstance(value, str) else value
+    if not isinstance(raw, str):
+        return raw
+    negative = raw.startswith('(') and raw.endswith(')')
+    cleaned = raw.replace('.', '').replace(',', '.') if decimal_comma else raw.replace(',', '')
+    cleaned = _AMOUNT_JUNK.sub('', cleaned)
+    if cleaned.endswith('-'):          # trailing minus: 12.00-
+        cleaned = '-' + cleaned[:-1]
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        return raw
+    return -amount if negative else amount
+
+
+def _signed(amount, mapping):
+    if isinstance(amount, float) and mapping.get('negate'):
+        return -amount
+    return amount
+
+
+# ── Parsers: binary file → items ───────────────────────────────────────────────
+
+def _text(fh):
+    return io.TextIOWrapper(fh, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def _iter_csv(fh, mapping):
+    reader = csv.reader(_text(fh), delimiter=mapping.get('delimiter') or ',')
+    for _ in range(int(mapping.get('skip_rows') or 0)):
+        next(reader, None)
+
+    columns = mapping['columns']
+    if mapping.get('has_header', True):
+        header = [h.strip().lower() for h in next(reader, [])]
+        positions = {}
+        for field, name in columns.items():
+            if name not in (None, ''):
+                try:
+                    positions[field] = header.index(str(name).strip().lower())
+                except ValueError:
+                    raise ValueError(f"Column '{name}' ({field}) not found in the CSV header")
+    else:
+        positions = {field: int(pos) for field, pos in columns.items() if str(pos).strip() != ''}
+    if 'date' not in positions or 'description' not in positions:
+        raise ValueError('The mapping needs date and description columns')
+    if 'amount' not in positions and not ('debit' in positions or 'credit' in positions):
+        raise ValueError('The mapping needs an amount column, or debit/credit columns')
+
+    parse_date = _DateParser(mapping.get('date_format'))
+    decimal_comma = mapping.get('decimal_comma')
+    width = max(positions.values()) + 1
+
+    for record in reader:
+        if not any(cell.strip() for cell in record):
+            continue
+        if len(record) < width:
+            record = record + [''] * (width - len(record))
+        get = {field: record[pos] for field, pos in positions.items()}.get
+
+        if 'amount' in positions:
+            amount = _signed(_parse_amount(get('amount'), decimal_comma), mapping)
+        else:
+            # Separate columns: debit is money out (expense, positive here)
+            debit = _parse_amount(get('debit') or '', decimal_comma)
+            credit = _parse_amount(get('credit') or '', decimal_comma)
+            if isinstance(debit, float) and debit:
+                amount = abs(debit)
+            elif isinstance(credit, float) and credit:
+                amount = -abs(credit)
+            else:
+                amount = get('debit') or get('credit') or ''
+        yield {
+            'date': parse_date(get('date')),
+            'description': get('description'),
+            'amount': amount,
+            'category': get('category') or None,
+            'sub_category': get('sub_category') or None,
+        }
+
+
+def _iter_ofx(fh, mapping, chunk_size=64 * 1024):
+    reader = _text(fh)
+    parse_date = _DateParser('%Y%m%d')
+    buffer = ''
+    while True:
+        chunk = reader.read(chunk_size)
+        buffer += chunk
+        while True:
+            end = _OFX_END.search(buffer)
+            if not end:
+                break
+            start = _OFX_START.search(buffer, 0, end.start())
+            block = buffer[start.end() if start else 0:end.start()]
+            buffer = buffer[end.end():]
+            fields = {tag.upper(): value.strip() for tag, value in _OFX_TAG.findall(block)}
+            yield {
+                'date': parse_date(fields.get('DTPOSTED', '')[:8]),
+                'description': fields.get('NAME') or fields.get('MEMO') or fields.get('PAYEE') or '',
+                'amount': _signed(_parse_amount(fields.get('TRNAMT', ''), mapping.get('decimal_comma')),
+                                  mapping),
+            }
+        if not chunk:
+            break
+        # Keep only the tail that may hold the start of the next transaction
+        start = _OFX_START.search(buffer)
+        buffer = buffer[start.start():] if start else buffer[-16:]
+
+
+def _iter_qif(fh, mapping):
+    parse_date = _DateParser(mapping.get('date_format'))
+    decimal_comma = mapping.get('decimal_comma')
+    record = {}
+    for line in _text(fh):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                category, _, sub_category = (record.get('L') or '').strip('[]').partition(':')
+                yield {
+                    # 1/31'24 and " 1/ 5/24" → 1/31/24, 1/5/24
+                    'date': parse_date(record.get('D', '').replace("'", '/').replace(' ', '')),
+                    'description': record.get('P') or record.get('M') or '',
+                    'amount': _signed(_parse_amount(record.get('T') or record.get('U') or '',
+                                                    decimal_comma), mapping),
+                    'category': category or None,
+                    'sub_category': sub_category or None,
+                }
+            record = {}
+        elif code in 'DTUPML' and code not in record:
+            record[code] = value
+
+
+_PARSERS = {'csv': _iter_csv, 'ofx': _iter_ofx, 'qif': _iter_qif}
+
+
+def iter_statement(fh, fmt, mapping):
+    """Items parsed from a binary file object, with the mapping's defaults filled in."""
+    defaults = mapping.get('defaults') or {}
+    for item in _PARSERS[fmt](fh, mapping):
+        item['category'] = item.get('category') or defaults.get('category')
+        item['sub_category'] = item.get('sub_category') or defaults.get('sub_category')
+        yield item
+
+
+# ── Jobs ───────────────────────────────────────────────────────────────────────
+
+def load_mapping(conn, user_id, account_name):
+    """The saved mapping for an account, or None."""
+    raw = conn.execute(text("""
+        SELECT mapping FROM import_mappings WHERE user_id = :uid AND account_name = :account
+    """), {'uid': user_id or 0, 'account': account_name}).scalar()
+    return json.loads(raw) if raw else None
+
+
+def save_mapping(conn, user_id, account_name, mapping):
+    conn.execute(text("""
+        INSERT INTO import_mappings (user_id, account_name, mapping, updated_at)
+        VALUES (:uid, :account, :mapping, :now)
+        ON CONFLICT (user_id, account_name) DO UPDATE
+        SET mapping = excluded.mapping, updated_at = excluded.updated_at
+    """), {'uid': user_id or 0, 'account': account_name,
+           'mapping': json.dumps(mapping), 'now': datetime.utcnow()})
+
+
+def create_job(conn, user_id, account_name, filename, fmt, total_bytes):
+    return conn.execute(text("""
+        INSERT INTO import_jobs (user_id, account_name, filename, format, status, total_bytes,
+                                 bytes_read, rows_read, inserted, error_count, created_at, updated_at)
+        VALUES (:uid, :account, :filename, :format, 'queued', :total, 0, 0, 0, 0, :now, :now)
+        RETURNING id
+    """), {'uid': user_id or 0, 'account': account_name, 'filename': (filename or '')[:255],
+           'format': fmt, 'total': total_bytes, 'now': datetime.utcnow()}).scalar()
+
+
+def _update_job(conn, job_id, **fields):
+    if job_id is None:
+        return
+    fields.setdefault('updated_at', datetime.utcnow())
+    assignments = ', '.join(f'{name} = :{name}' for name in fields)
+    conn.execute(text(f"UPDATE import_jobs SET {assignments} WHERE id = :id"), {'id': job_id, **fields})
+
+
+def _read_batches(path, fmt, mapping, defaults, batch_size, out, stop):
+    """
+    Producer thread: parse and validate batches into the queue `out` as
+    (rows, errors, rows_read, bytes_read); then None, or the exception that
+    stopped the parse.
+    """
+    from ingest import validate_transactions
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                out.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def emit(batch, rows_read, bytes_read):
+        rows, errors = validate_transactions(batch, defaults)
+        first_row = rows_read - len(batch)
+        for e in errors:
+            e['index'] += first_row
+        return put((rows, errors, rows_read, bytes_read))
+
+    try:
+        total = os.path.getsize(path)
+        rows_read = 0
+        with open(path, 'rb') as fh:
+            batch = []
+            for item in iter_statement(fh, fmt, mapping):
+                batch.append(item)
+                rows_read += 1
+                if len(batch) >= batch_size:
+                    if not emit(batch, rows_read, fh.tell()):
+                        return
+                    batch = []
+            # The exhausted parser has closed fh along with its text wrapper
+            if batch and not emit(batch, rows_read, total):
+                return
+        put(None)
+    except Exception as e:
+        put(e)
+
+
+def import_statement(path, fmt, mapping, account_name, user_id, job_id=None, batch_size=None):
+    """
+    Import a statement file in batches (needs an app context). Returns
+    {'rows', 'inserted', 'errors', 'error_count', 'seconds'}; raises on a
+    file-level problem (bad mapping, unreadable file) after marking the job failed.
+
+    Parsing and validation run on a helper thread, at most two batches
+    ahead, while this thread writes: the sqlite3/psycopg2 calls release
+    the GIL, so the two overlap.
+    """
+    from flask import current_app
+    from models import db
+    from ingest import insert_transactions
+    from data_versions import bump_data_version
+    import response_cache
+
+    batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 2000)
+    defaults = {**(mapping.get('defaults') or {}), 'account_name': account_name}
+    started = time.perf_counter()
+    total = os.path.getsize(path)
+    rows_read = inserted = error_count = 0
+    errors = []
+
+    batches = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_batches, name=f'import-{job_id}', daemon=True,
+                              args=(path, fmt, mapping, defaults, batch_size, batches, stop))
+    reader.start()
+    try:
+        while True:
+            entry = batches.get()
+            if entry is None:
+                break
+            if isinstance(entry, Exception):
+                raise entry
+            rows, batch_errors, rows_read, bytes_read = entry
+            error_count += len(batch_errors)
+            errors.extend(batch_errors[:max(_MAX_STORED_ERRORS - len(errors), 0)])
+            with db.engine.begin() as conn:
+                inserted += insert_transactions(conn, rows, user_id, 'Added from statement import')
+                version = bump_data_version(conn, user_id) if rows else None
+                _update_job(conn, job_id, status='running', bytes_read=bytes_read, rows_read=rows_read,
+                            inserted=inserted, error_count=error_count, errors=json.dumps(errors))
+                _touch_queued(conn)
+            if version is not None:
+                response_cache.publish_data_version(user_id or 0, version)
+    except Exception as e:
+        with db.engine.begin() as conn:
+            _update_job(conn, job_id, status='failed', message=str(e)[:1000], rows_read=rows_read,
+                        inserted=inserted, error_count=error_count, errors=json.dumps(errors),
+                        finished_at=datetime.utcnow())
+        raise
+    finally:
+        stop.set()
+        reader.join()
+
+    seconds = time.perf_counter() - started
+    with db.engine.begin() as conn:
+        _update_job(conn, job_id, status='done', bytes_read=total, rows_read=rows_read,
+                    inserted=inserted, error_count=error_count, errors=json.dumps(errors),
+                    message=None, finished_at=datetime.utcnow())
+    logger.info("Imported %s of %s rows from a %s statement in %.1fs (%s errors)",
+                inserted, rows_read, fmt, seconds, error_count,
+                extra={'job_id': job_id, 'bytes': total})
+    return {'rows': rows_read, 'inserted': inserted, 'errors': errors,
+            'error_count': error_count, 'seconds': seconds}
+
+
+def run_import_job(job_id, path, fmt, mapping, account_name, user_id):
+    """Background entry point: import, refresh recommendations, delete the upload."""
+    from recommendation_cache import refresh_recommendations_async
+    try:
+        result = import_statement(path, fmt, mapping, account_name, user_id, job_id)
+        if result['inserted']:
+            refresh_recommendations_async(user_id)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def submit_import_job(job_id, path, fmt, mapping, account_name, user_id):
+    """Queue run_import_job() on this process's import thread (needs an app context)."""
+    from flask import current_app
+    global _executor
+
+    app = current_app._get_current_object()
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='statement-import')
+        _queued.add(job_id)
+
+    def _task():
+        with _executor_lock:
+            _queued.discard(job_id)
+        with app.app_context():
+            try:
+                run_import_job(job_id, path, fmt, mapping, account_name, user_id)
+            except Exception as e:
+                logger.exception("Statement import %s failed: %s", job_id, e)
+
+    return _executor.submit(_task)
+
+
+def _touch_queued(conn):
+    """Heartbeat the jobs waiting behind the running one, so fail_stale_jobs() leaves them be."""
+    with _executor_lock:
+        waiting = sorted(_queued)
+    if waiting:
+        now = datetime.utcnow()
+        conn.execute(text("UPDATE import_jobs SET updated_at = :now WHERE id = :id"),
+                     [{'id': job_id, 'now': now} for job_id in waiting])
+
+
+def fail_stale_jobs(conn, stale_seconds, job_id=None):
+    """
+    Mark queued/running jobs (all, or just job_id) failed when their heartbeat
+    is older than stale_seconds. Returns how many were marked.
+    """
+    now = datetime.utcnow()
+    params = {'cutoff': now - timedelta(seconds=stale_seconds), 'now': now, 'message': _STALE_MESSAGE}
+    job_sql = ''
+    if job_id is not None:
+        job_sql = 'AND id = :id'
+        params['id'] = job_id
+    return conn.execute(text(f"""
+        UPDATE import_jobs SET status = 'failed', message = :message, finished_at = :now
+        WHERE status IN ('queued', 'running') AND COALESCE(updated_at, created_at) < :cutoff {job_sql}
+    """), params).rowcount
+
+
+def job_status(conn, job_id, user_id, stale_seconds=None):
+    """
+    A job's progress as a dict for the status endpoint, or None if it is not
+    the user's. With stale_seconds, a queued/running job whose heartbeat is
+    older is marked failed first (conn must be able to write).
+    """
+    from query_rows import fetch_row
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=stale_seconds) if stale_seconds else now
+    row = fetch_row(conn, """
+        SELECT id, account_name, filename, format, status, total_bytes, bytes_read, rows_read,
+               inserted, error_count, errors, message, created_at, finished_at,
+               CASE WHEN status IN ('queued', 'running')
+                    AND COALESCE(updated_at, created_at) < :cutoff THEN 1 ELSE 0 END AS stale
+        FROM import_jobs WHERE id = :id AND user_id = :uid
+    """, {'id': job_id, 'uid': user_id or 0, 'cutoff': cutoff})
+    if row is None:
+        return None
+    row = dict(row)
+    if row.pop('stale') and stale_seconds and fail_stale_jobs(conn, stale_seconds, job_id):
+        row.update(status='failed', message=_STALE_MESSAGE, finished_at=now)
+    row['errors'] = json.loads(row['errors']) if row['errors'] else []
+    row['progress'] = (round(row['bytes_read'] / row['total_bytes'], 3)
+                       if row['total_bytes'] else (1.0 if row['status'] == 'done' else 0.0))
+    for key in ('created_at', 'finished_at'):
+        if isinstance(row[key], (date, datetime)):
+            row[key] = row[key].isoformat()
+    return row
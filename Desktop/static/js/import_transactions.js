@@ -0,0 +1,120 @@
+/**
+ * Statement Import JavaScript
+ * Loads the saved mapping for an account, uploads the file and polls the import's progress
+ */
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.getElementById('account_name').addEventListener('change', loadMapping);
+    document.getElementById('format').addEventListener('change', toggleCsvOptions);
+    document.getElementById('file').addEventListener('change', toggleCsvOptions);
+    document.getElementById('importForm').addEventListener('submit', handleSubmit);
+});
+
+/**
+ * Fill the form from the account's saved mapping, if there is one
+ */
+async function loadMapping() {
+    const account = document.getElementById('account_name').value.trim();
+    const note = document.getElementById('mappingNote');
+    if (!account) {
+        note.textContent = '';
+        return;
+    }
+    const response = await fetch(`${window.IMPORT_URLS.mapping}?account=${encodeURIComponent(account)}`);
+    if (!response.ok) return;
+    const data = await response.json();
+    note.textContent = data.saved ? 'Using the settings saved for this account.' : '';
+    if (!data.saved) return;
+
+    const m = data.mapping;
+    const form = document.getElementById('importForm');
+    form.format.value = m.format || '';
+    form.date_format.value = m.date_format || '';
+    form.delimiter.value = m.delimiter || ',';
+    form.skip_rows.value = m.skip_rows || 0;
+    form.negate.checked = !!m.negate;
+    form.decimal_comma.checked = !!m.decimal_comma;
+    form.has_header.checked = !!m.has_header;
+    for (const [field, value] of Object.entries(m.columns || {})) {
+        const input = form[`col_${field}`];
+        if (input) input.value = value ?? '';
+    }
+    for (const [field, value] of Object.entries(m.defaults || {})) {
+        const input = form[`default_${field}`];
+        if (input && value) input.value = value;
+    }
+    toggleCsvOptions();
+}
+
+/**
+ * Column settings only matter for CSV files
+ */
+function toggleCsvOptions() {
+    const chosen = document.getElementById('format').value;
+    const name = (document.getElementById('file').files[0] || {}).name || '';
+    const ext = name.split('.').pop().toLowerCase();
+    const isCsv = chosen ? chosen === 'csv' : !['ofx', 'qfx', 'qif'].includes(ext);
+    document.getElementById('csvOptions').style.display = isCsv ? '' : 'none';
+}
+
+async function handleSubmit(event) {
+    event.preventDefault();
+    const form = event.target;
+    const submitBtn = document.getElementById('submitBtn');
+    submitBtn.disabled = true;
+    submitBtn.textContent = 'Uploading…';
+    showProgress(0, 'Uploading…', []);
+
+    try {
+        const response = await fetch(form.action || window.location.href, {
+            method: 'POST',
+            body: new FormData(form)
+        });
+        const data = await response.json();
+        if (!response.ok || !data.success) {
+            throw new Error(data.error || `Upload failed (${response.status})`);
+        }
+        submitBtn.textContent = 'Importing…';
+        pollStatus(data.status_url);
+    } catch (error) {
+        showProgress(0, error.message, []);
+        submitBtn.disabled = false;
+        submitBtn.textContent = 'Import';
+    }
+}
+
+async function pollStatus(url) {
+    const response = await fetch(url);
+    const job = await response.json();
+    const pct = Math.round((job.progress || 0) * 100);
+    let text = `${job.rows_read.toLocaleString()} rows read, ${job.inserted.toLocaleString()} imported`;
+    if (job.error_count) text += `, ${job.error_count.toLocaleString()} skipped`;
+
+    if (job.status === 'done') {
+        showProgress(100, `Done — ${text}.`, job.errors);
+        const submitBtn = document.getElementById('submitBtn');
+        submitBtn.textContent = 'View Transactions';
+        submitBtn.disabled = false;
+        submitBtn.onclick = (e) => { e.preventDefault(); window.location.href = window.IMPORT_URLS.transactions; };
+    } else if (job.status === 'failed') {
+        showProgress(pct, `Import stopped: ${job.message}. ${text}.`, job.errors);
+        document.getElementById('submitBtn').textContent = 'Import';
+        document.getElementById('submitBtn').disabled = false;
+    } else {
+        showProgress(pct, `${pct}% — ${text}`, job.errors);
+        setTimeout(() => pollStatus(url), 1000);
+    }
+}
+
+function showProgress(pct, text, errors) {
+    document.getElementById('progressCard').style.display = '';
+    document.getElementById('progressBar').style.width = `${pct}%`;
+    document.getElementById('progressText').textContent = text;
+    const list = document.getElementById('progressErrors');
+    list.innerHTML = '';
+    (errors || []).slice(0, 20).forEach(e => {
+        const li = document.createElement('li');
+        li.textContent = `Row ${e.index + 1}: ${e.error}`;
+        list.appendChild(li);
+    });
+}
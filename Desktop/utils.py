@@ -1,7 +1,10 @@
 import os
-from datetime import datetime
+import logging
+from datetime import datetime, date, timedelta
 from sqlalchemy import text, inspect
 
+logger = logging.getLogger(__name__)
+
 
 def local_now():
     """Return the current datetime in the client's timezone.
@@ -72,21 +75,138 @@ def uid_clause(uid=None):
     return 'AND user_id = :_uid', {'_uid': uid}
 
 
+def month_bounds(year, month):
+    """Return (start, end) dates of a calendar month as a half-open range."""
+    start = date(int(year), int(month), 1)
+    end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    return start, end
+
+
+def period_bounds(year, month=None, through_month=None):
+    """
+    Return (start, end) dates for a half-open [start, end) reporting period.
+
+      period_bounds(2025)                   → the whole of 2025
+      period_bounds(2025, 3)                → March 2025
+      period_bounds(2025, through_month=3)  → Jan 1 – Mar 31 2025 (year-to-date)
+
+    A month of None or 'all' means the whole year.
+    """
+    year = int(year)
+    if through_month not in (None, 'all'):
+        return date(year, 1, 1), month_bounds(year, through_month)[1]
+    if month not in (None, 'all', ''):
+        return month_bounds(year, month)
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def months_ago(months, today=None):
+    """Return the date `months` calendar months before today (day clamped to month end)."""
+    today = today or local_now().date()
+    y, m = divmod(today.year * 12 + today.month - 1 - int(months), 12)
+    m += 1
+    _, next_month = month_bounds(y, m)
+    return date(y, m, min(today.day, (next_month - timedelta(days=1)).day))
+
+
+def period_clause(year, month=None, through_month=None, col='date', prefix='period'):
+    """
+    Returns (sql_fragment, params_dict) restricting `col` to a calendar period.
+
+    The fragment is a plain range predicate (`col >= :start AND col < :end`) so
+    it can use the (user_id, …, date) indexes — never wrap the column in
+    EXTRACT/strftime in a WHERE clause.
+
+    Usage:
+        period_sql, period_p = period_clause(year, month)
+        conn.execute(
+            text(f"SELECT ... FROM transactions WHERE {period_sql} {uid_sql}"),
+            {**period_p, **uid_p}
+        )
+    """
+    start, end = period_bounds(year, month, through_month)
+    return (f"{col} >= :{prefix}_start AND {col} < :{prefix}_end",
+            {f'{prefix}_start': start.isoformat(), f'{prefix}_end': end.isoformat()})
+
+
+def rolling_clause(months=0, days=0, col='date', prefix='since', today=None):
+    """
+    Returns (sql_fragment, params_dict) for a trailing window ending today,
+    e.g. rolling_clause(months=12) → `date >= <today - 12 months>`.
+    """
+    today = today or local_now().date()
+    start = months_ago(months, today) - timedelta(days=int(days))
+    return f"{col} >= :{prefix}_start", {f'{prefix}_start': start.isoformat()}
+
+
+def keyset_cursor(row_date, row_id):
+    """Cursor token (`YYYY-MM-DD,id`) for the last row of a page ordered by date DESC, id DESC."""
+    if isinstance(row_date, (date, datetime)):
+        row_date = row_date.isoformat()
+    return f"{str(row_date)[:10]},{int(row_id)}"
+
+
+def keyset_clause(after, prefix='after'):
+    """
+    Returns (sql_fragment, params_dict) selecting the rows that follow the
+    `after` cursor in `ORDER BY date DESC, id DESC` order. The row-value
+    comparison seeks straight into the (user_id, date, id) index — or
+    (date, id) when there is no user filter — so every page costs the same
+    however deep it is. Raises ValueError for a
+    malformed cursor.
+
+    Usage:
+        after_sql, after_p = keyset_clause(request.args['after'])
+        conn.execute(text(f"SELECT ... WHERE {after_sql} {uid_sql}
+                             ORDER BY date DESC, id DESC LIMIT :n"), ...)
+    """
+    date_str, _, id_str = (after or '').partition(',')
+    cursor_date = datetime.strptime(date_str.strip(), '%Y-%m-%d').date()
+    return (f"(date, id) < (:{prefix}_date, :{prefix}_id)",
+            {f'{prefix}_date': cursor_date.isoformat(), f'{prefix}_id': int(id_str)})
+
+
+def transaction_years(conn, uid_sql='', uid_p=None):
+    """
+    Return the years that have active transactions, newest first.
+
+    Reads DISTINCT year from transaction_monthly_rollups — a few hundred rows
+    at most — instead of a DISTINCT over a per-row year expression on the
+    transactions table, which has to scan every row. uid_sql may only filter
+    on columns the rollup shares with transactions (user_id, owner, ...).
+    """
+    rows = conn.execute(
+        text(f"SELECT DISTINCT year FROM transaction_monthly_rollups "
+             f"WHERE txn_count > 0 {uid_sql} ORDER BY year DESC"),
+        uid_p or {},
+    ).fetchall()
+    return [int(r[0]) for r in rows]
+
+
+def month_in_years_clause(years, month, col='date', prefix='period'):
+    """
+    Returns (sql_fragment, params_dict) restricting `col` to `month` of any of
+    `years` — one half-open range per year, OR'd, so the date indexes still
+    apply. Matches nothing when `years` is empty.
+    """
+    if not years:
+        return '1 = 0', {}
+    ranges, params = [], {}
+    for i, year in enumerate(years):
+        start, end = month_bounds(year, month)
+        ranges.append(f"({col} >= :{prefix}_start{i} AND {col} < :{prefix}_end{i})")
+        params[f'{prefix}_start{i}'] = start.isoformat()
+        params[f'{prefix}_end{i}'] = end.isoformat()
+    return '(' + ' OR '.join(ranges) + ')', params
+
+
 def get_available_years_and_owners():
     """Get available years and owners for the current user."""
     from models import db
     try:
         uid = current_user_id()
         with db.engine.connect() as conn:
-            year_expr = ("CAST(strftime('%Y', date) AS INTEGER)"
-                         if db.engine.dialect.name == 'sqlite'
-                         else "EXTRACT(YEAR FROM date)::integer")
-            years_result = conn.execute(text(f"""
-                SELECT DISTINCT {year_expr} AS year
-                FROM transactions
-                ORDER BY year DESC
-            """))
-            available_years = [row[0] for row in years_result if row[0] is not None]
+            available_years = transaction_years(conn)
 
             if uid is not None:
                 owners_result = conn.execute(
@@ -111,7 +231,7 @@ def get_available_years_and_owners():
         return available_years, available_owners
 
     except Exception as e:
-        print(f"Error getting years/owners: {e}")
+        logger.error("Error getting years/owners: %s", e)
         current_year = datetime.now().year
         return [current_year - 1, current_year, current_year + 1], []
 
@@ -119,7 +239,7 @@ def get_available_years_and_owners():
 def validate_database_integrity():
     """Validate that the database has all required tables."""
     from models import db
-    print("Validating database integrity...")
+    logger.debug("Validating database integrity...")
 
     try:
         inspector = inspect(db.engine)
@@ -133,7 +253,7 @@ def validate_database_integrity():
         missing_tables = [t for t in required_tables if t not in existing_tables]
 
         if missing_tables:
-            print(f"Missing tables: {missing_tables}")
+            logger.warning("Missing tables: %s", missing_tables)
             return False
 
         with db.engine.connect() as conn:
@@ -142,13 +262,13 @@ def validate_database_integrity():
             ).scalar()
 
         if budget_count == 0:
-            print("No active budget templates found — tables present but empty")
+            logger.debug("No active budget templates found — tables present but empty")
 
-        print("Database integrity validated")
+        logger.debug("Database integrity validated")
         return True
 
     except Exception as e:
-        print(f"Database validation failed: {e}")
+        logger.error("Database validation failed: %s", e)
         return False
 
 
@@ -182,7 +302,7 @@ def get_database_stats():
         return stats
 
     except Exception as e:
-        print(f"Error getting database stats: {e}")
+        logger.error("Error getting database stats: %s", e)
         return {
             'transactions': 0,
             'budget_categories': 0,
@@ -193,7 +313,7 @@ def get_database_stats():
 
 def ensure_budget_tables(conn=None):
     """
-    Legacy compatibility shim — budget tables are created by db.create_all() at startup.
+    Legacy compatibility shim — budget tables are created by schema_version.ensure_schema() at startup.
     The `conn` parameter is ignored; kept for call-site compatibility.
     """
     pass